@@ -28,10 +28,20 @@ REQUEST_TIMEOUT = 30  # 请求超时时间（秒）
 POLL_INTERVAL = 3     # 轮询间隔（秒）
 TASK_TIMEOUT = 300    # 任务超时时间（秒）
 MAX_RETRIES = 3       # 最大重试次数
+RETRY_BACKOFF_BASE = 1.0   # 首次重试的基础等待时间（秒），之后指数增长并加随机抖动
+RETRY_BACKOFF_MAX = 30.0   # 单次重试的最长等待时间（秒）
+
+# 客户端限流（所有线程共享，避免触发账户配额的 429）
+RATE_LIMIT_PER_SECOND = 10  # 每秒允许的 API 请求数
+RATE_LIMIT_BURST = 20       # 允许的突发请求数
 
 # 输出配置
 DEFAULT_OUTPUT_DIR = "./outputs/"
 HISTORY_DIR = "./outputs/history/"
 
+# 结果缓存配置（相同提示词和参数直接复用已生成的图片）
+RESULT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存总大小上限（2 GB）
+RESULT_CACHE_MAX_ENTRIES = 5000                  # 缓存条目数上限
+
 # 提示词配置
 PROMPT_TEMPLATE_PATH = "./prompt.md"
\ No newline at end of file
@@ -4,24 +4,182 @@
 
 import time
 import json
+import importlib.util
 import requests
-from typing import Dict, Optional, List, Any
+from typing import Callable, Dict, Optional, List, Any, Tuple
 from tqdm import tqdm
 import os
+import uuid
+
+try:
+    from .http_pool import ConnectionPool, get_shared_pool
+    from .task_poller import TaskPoller
+    from .poll_schedule import AdaptivePollSchedule, get_shared_schedule
+    from .callback_receiver import CallbackRegistry, DEFAULT_CALLBACK_DEADLINE
+    from .retry import RetryPolicy, TokenBucket, get_shared_limiter
+    from .result_cache import ResultCache, cache_key, get_shared_cache, link_or_copy
+    from .single_flight import SingleFlight, get_shared_single_flight
+    from .downloader import RangeDownloader, DownloadResult, BackgroundWriter, get_shared_writer, write_atomic
+except ImportError:
+    from http_pool import ConnectionPool, get_shared_pool
+    from task_poller import TaskPoller
+    from poll_schedule import AdaptivePollSchedule, get_shared_schedule
+    from callback_receiver import CallbackRegistry, DEFAULT_CALLBACK_DEADLINE
+    from retry import RetryPolicy, TokenBucket, get_shared_limiter
+    from result_cache import ResultCache, cache_key, get_shared_cache, link_or_copy
+    from single_flight import SingleFlight, get_shared_single_flight
+    from downloader import RangeDownloader, DownloadResult, BackgroundWriter, get_shared_writer, write_atomic
+
+
+def _load_api_config():
+    """读取项目根目录下的 config/api_config.py（不存在时返回 None）"""
+    config_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "config", "api_config.py"
+    )
+    if not os.path.exists(config_path):
+        return None
+    try:
+        spec = importlib.util.spec_from_file_location("api_config", config_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except Exception as e:
+        print(f"Warning: Failed to load API config from {config_path}: {e}")
+        return None
+
+
+# API 调用配置（来自 config/api_config.py）
+_API_CONFIG = _load_api_config()
+REQUEST_TIMEOUT = getattr(_API_CONFIG, "REQUEST_TIMEOUT", 30)
+MAX_RETRIES = getattr(_API_CONFIG, "MAX_RETRIES", 3)
+RETRY_BACKOFF_BASE = getattr(_API_CONFIG, "RETRY_BACKOFF_BASE", 1.0)
+RETRY_BACKOFF_MAX = getattr(_API_CONFIG, "RETRY_BACKOFF_MAX", 30.0)
+RATE_LIMIT_PER_SECOND = getattr(_API_CONFIG, "RATE_LIMIT_PER_SECOND", 10)
+RATE_LIMIT_BURST = getattr(_API_CONFIG, "RATE_LIMIT_BURST", 20)
+RESULT_CACHE_MAX_BYTES = getattr(_API_CONFIG, "RESULT_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+RESULT_CACHE_MAX_ENTRIES = getattr(_API_CONFIG, "RESULT_CACHE_MAX_ENTRIES", 5000)
+
+# 进度估算中生成阶段所占的百分比，其余为下载阶段
+GENERATION_PROGRESS_SHARE = 90
+
+# 相同请求合并时由 leader 转发给其他请求的回调
+FAN_OUT_EVENTS = ("on_task_created", "on_progress")
+
+
+def build_task_params(model_name: str, prompt: str, **kwargs) -> Dict[str, Any]:
+    """
+    构建 createTask 请求体
+
+    Args:
+        model_name: 模型名称
+        prompt: 图像生成提示词
+        **kwargs: 其他参数（aspect_ratio, resolution, output_format, image_input, callback_url）
+
+    Returns:
+        请求体字典
+    """
+    # 设置默认参数
+    params = {
+        "model": model_name,
+        "input": {
+            "prompt": prompt,
+            "aspect_ratio": kwargs.get("aspect_ratio", "3:4"),  # A4 竖版
+            "resolution": kwargs.get("resolution", "2K"),
+            "output_format": kwargs.get("output_format", "png"),
+            "image_input": kwargs.get("image_input", [])
+        }
+    }
+
+    # 添加回调 URL（如果提供）
+    if "callback_url" in kwargs:
+        params["callBackUrl"] = kwargs["callback_url"]
+
+    return params
+
+
+def extract_image_urls(completion_result: Dict[str, Any]) -> List[str]:
+    """
+    从 recordInfo 成功响应中提取图像 URL
+
+    Args:
+        completion_result: 任务完成时的 API 响应
+
+    Returns:
+        图像 URL 列表
+
+    Raises:
+        Exception: 当结果中没有图像 URL 时
+    """
+    data = completion_result["data"]
+    result_json = json.loads(data["resultJson"])
+    image_urls = result_json.get("resultUrls", [])
+
+    if not image_urls:
+        raise Exception("No image URLs in result")
+
+    return image_urls
+
+
+def default_output_path(output_dir: str) -> str:
+    """在输出目录下自动生成图像文件名"""
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = int(time.time())
+    # 附加随机后缀，同一秒内生成的多张图片不会互相覆盖
+    filename = f"generated_{timestamp}_{uuid.uuid4().hex[:8]}.png"
+    return os.path.join(output_dir, filename)
 
 
 class APIClient:
     """Kie AI API 客户端"""
 
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        pool: Optional[ConnectionPool] = None,
+        poll_schedule: Optional[AdaptivePollSchedule] = None,
+        base_url: Optional[str] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        request_timeout: float = REQUEST_TIMEOUT,
+        result_cache: Optional[ResultCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        writer: Optional[BackgroundWriter] = None
+    ):
         """
         初始化 API 客户端
 
         Args:
             api_key: API 密钥
+            pool: HTTP 连接池（默认使用进程内共享的连接池）
+            poll_schedule: 自适应轮询调度器（默认使用进程内共享的调度器）
+            base_url: API 基础地址（默认 https://api.kie.ai，离线测试时可指向模拟服务）
+            retry_policy: 重试策略（默认按 config/api_config.py 中的 MAX_RETRIES 等配置）
+            rate_limiter: API 请求限流器（默认使用进程内共享的令牌桶）
+            request_timeout: 单次请求超时时间（秒）
+            result_cache: 结果缓存（默认使用 outputs/cache 下的共享缓存）
+            single_flight: 请求合并器（默认使用进程内共享、带跨进程文件锁的合并器）
+            writer: 后台写盘器（内存下载模式使用，默认使用进程内共享的写盘器）
         """
         self.api_key = api_key
-        self.base_url = "https://api.kie.ai"
+        self.pool = pool or get_shared_pool()
+        self.poll_schedule = poll_schedule or get_shared_schedule()
+        self.base_url = (base_url or "https://api.kie.ai").rstrip("/")
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=MAX_RETRIES,
+            backoff_base=RETRY_BACKOFF_BASE,
+            backoff_max=RETRY_BACKOFF_MAX
+        )
+        self.rate_limiter = rate_limiter or get_shared_limiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+        self.request_timeout = request_timeout
+        self._result_cache = result_cache
+        self.single_flight = single_flight or get_shared_single_flight()
+        self.downloader = RangeDownloader(
+            self.pool.cdn_session,
+            retry_policy=self.retry_policy,
+            timeout=self.request_timeout
+        )
+        self.writer = writer or get_shared_writer()
         self.api_version = "v1"
         self.model_name = "nano-banana-pro"
         self.headers = {
@@ -29,6 +187,52 @@ class APIClient:
             "Content-Type": "application/json"
         }
 
+    def _api_request(self, method: str, url: str, idempotent: bool, **kwargs) -> requests.Response:
+        """
+        发送 API 请求（限流 + 重试）
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            idempotent: 是否幂等；非幂等请求只在 429（请求未被处理）时重试
+            **kwargs: 传给 requests 的参数
+
+        Returns:
+            成功的响应
+
+        Raises:
+            requests.exceptions.RequestException: 重试耗尽后仍失败时
+        """
+        kwargs.setdefault("timeout", self.request_timeout)
+        policy = self.retry_policy
+        attempt = 0
+
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.pool.api_session.request(method, url, headers=self.headers, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if not idempotent or attempt >= policy.max_retries:
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+                continue
+
+            status = response.status_code
+            retryable = status == 429 or (idempotent and policy.should_retry_status(status))
+            if retryable and attempt < policy.max_retries:
+                delay = policy.delay(attempt, response.headers.get("Retry-After"))
+                if status == 429:
+                    # 配额已满：所有线程一起暂停，而不是各自继续撞 429
+                    self.rate_limiter.pause(delay)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            response.raise_for_status()
+            return response
+
     def create_task(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """
         创建图像生成任务
@@ -43,28 +247,13 @@ class APIClient:
         Raises:
             Exception: 当 API 调用失败时
         """
-        # 设置默认参数
-        params = {
-            "model": self.model_name,
-            "input": {
-                "prompt": prompt,
-                "aspect_ratio": kwargs.get("aspect_ratio", "3:4"),  # A4 竖版
-                "resolution": kwargs.get("resolution", "2K"),
-                "output_format": kwargs.get("output_format", "png"),
-                "image_input": kwargs.get("image_input", [])
-            }
-        }
-
-        # 添加回调 URL（如果提供）
-        if "callback_url" in kwargs:
-            params["callBackUrl"] = kwargs["callback_url"]
+        params = build_task_params(self.model_name, prompt, **kwargs)
 
         # 发送请求
         url = f"{self.base_url}/api/{self.api_version}/jobs/createTask"
 
         try:
-            response = requests.post(url, headers=self.headers, json=params)
-            response.raise_for_status()
+            response = self._api_request("POST", url, idempotent=False, json=params)
             return response.json()
         except requests.exceptions.RequestException as e:
             error_msg = f"Failed to create task: {str(e)}"
@@ -89,8 +278,7 @@ class APIClient:
         params = {"taskId": task_id}
 
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
+            response = self._api_request("GET", url, idempotent=True, params=params)
             return response.json()
         except requests.exceptions.RequestException as e:
             error_msg = f"Failed to query task: {str(e)}"
@@ -103,7 +291,9 @@ class APIClient:
         task_id: str,
         timeout: int = 300,
         poll_interval: int = 3,
-        show_progress: bool = True
+        show_progress: bool = True,
+        profile: Optional[Tuple[str, str]] = None,
+        on_state: Optional[Callable[[str, Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         """
         等待任务完成
@@ -111,8 +301,10 @@ class APIClient:
         Args:
             task_id: 任务 ID
             timeout: 超时时间（秒）
-            poll_interval: 轮询间隔（秒）
+            poll_interval: 轮询间隔（秒），提供 profile 时由自适应调度器决定
             show_progress: 是否显示进度条
+            profile: (分辨率, 宽高比)，用于按历史耗时安排轮询时间
+            on_state: 每次查询后以 (state, data) 调用的函数
 
         Returns:
             任务结果数据
@@ -121,6 +313,7 @@ class APIClient:
             Exception: 当任务失败或超时时
         """
         start_time = time.time()
+        schedule = self.poll_schedule if profile else None
 
         # 初始化进度条
         if show_progress:
@@ -133,6 +326,10 @@ class APIClient:
             pbar.update(0)
 
         try:
+            # 首次轮询前先等到预计完成时间附近
+            if schedule:
+                time.sleep(min(schedule.first_delay(profile), timeout))
+
             while True:
                 # 检查超时
                 if time.time() - start_time > timeout:
@@ -146,6 +343,8 @@ class APIClient:
 
                 data = result["data"]
                 state = data.get("state", "waiting")
+                if on_state is not None:
+                    on_state(state, data)
 
                 # 更新进度条（估算）
                 if show_progress:
@@ -164,6 +363,8 @@ class APIClient:
                 if state == "success":
                     if show_progress:
                         pbar.close()
+                    if schedule:
+                        schedule.observe(profile, data)
                     return result
                 elif state == "fail":
                     if show_progress:
@@ -173,7 +374,10 @@ class APIClient:
                     raise Exception(f"Task failed with code {fail_code}: {fail_msg}")
 
                 # 等待后继续轮询
-                time.sleep(poll_interval)
+                if schedule:
+                    time.sleep(schedule.next_interval(profile, time.time() - start_time))
+                else:
+                    time.sleep(poll_interval)
 
         except KeyboardInterrupt:
             if show_progress and pbar:
@@ -184,10 +388,58 @@ class APIClient:
                 pbar.close()
             raise
 
+    @property
+    def result_cache(self) -> ResultCache:
+        """结果缓存（首次使用时打开共享缓存）"""
+        if self._result_cache is None:
+            self._result_cache = get_shared_cache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRIES)
+        return self._result_cache
+
+    def cache_key(self, prompt: str, **kwargs) -> str:
+        """
+        计算提示词和生成参数对应的缓存键
+
+        Args:
+            prompt: 图像生成提示词
+            **kwargs: 生成参数（aspect_ratio, resolution, output_format, image_input）
+
+        Returns:
+            缓存键
+        """
+        return cache_key(self.model_name, prompt, **kwargs)
+
+    def fetch_cached_image(
+        self,
+        prompt: str,
+        output_path: Optional[str] = None,
+        **kwargs
+    ) -> Optional[str]:
+        """
+        查找缓存中相同提示词和参数的图像
+
+        Args:
+            prompt: 图像生成提示词
+            output_path: 命中时图像放置的路径（如果为 None，则自动生成）
+            **kwargs: 生成参数
+
+        Returns:
+            命中时返回图像文件路径，否则返回 None
+        """
+        key = self.cache_key(prompt, **kwargs)
+        if output_path is None:
+            output_path = default_output_path(kwargs.get("output_dir", "./outputs/"))
+        if not self.result_cache.fetch(key, output_path):
+            return None
+        return output_path
+
     def generate_image(
         self,
         prompt: str,
         output_path: Optional[str] = None,
+        poller: Optional[TaskPoller] = None,
+        callback_registry: Optional[CallbackRegistry] = None,
+        callback_deadline: float = DEFAULT_CALLBACK_DEADLINE,
+        use_cache: bool = True,
         **kwargs
     ) -> str:
         """
@@ -196,64 +448,359 @@ class APIClient:
         Args:
             prompt: 图像生成提示词
             output_path: 输出文件路径（如果为 None，则自动生成）
-            **kwargs: 其他参数
+            poller: 批量轮询器（提供时由轮询器统一查询任务状态）
+            callback_registry: 回调登记表（与 callback_url 一起提供时优先等待回调）
+            callback_deadline: 等待回调的最长时间（秒），超时后改为轮询
+            use_cache: 是否复用相同提示词和参数的已生成图像；
+                开启时相同请求并发到达只会提交一个上游任务，其余请求共享其结果，
+                并通过各自的 on_task_created / on_progress 收到该任务的 ID 和进度
+            **kwargs: 其他参数（生成参数，以及 resume_task_id: 继续等待已提交的任务，
+                on_task_created: 任务提交后以任务 ID 调用的函数，
+                on_progress: 以 (阶段, 百分比, **信息) 报告 waiting/generating/downloading 进度的函数）
 
         Returns:
             生成的图像文件路径
         """
-        print("Creating generation task...")
-        # 创建任务
-        task_result = self.create_task(prompt, **kwargs)
-        task_id = task_result["data"]["taskId"]
-        print(f"Task created with ID: {task_id}")
-
-        # 等待任务完成
-        print("Waiting for task completion...")
-        completion_result = self.wait_for_completion(task_id)
+        if not use_cache:
+            return self._run_generation(
+                prompt, output_path, poller, callback_registry, callback_deadline, use_cache, **kwargs
+            )
 
-        # 获取图像 URL
-        data = completion_result["data"]
-        result_json = json.loads(data["resultJson"])
-        image_urls = result_json.get("resultUrls", [])
+        cached_path = self.fetch_cached_image(prompt, output_path, **kwargs)
+        if cached_path is not None:
+            print(f"Cache hit, reusing image: {cached_path}")
+            return cached_path
+
+        # 相同请求只提交一个上游任务；其他进程已生成时在拿到锁后直接命中缓存
+        # leader 的任务 ID 和进度同时转发给合并进来的请求
+        key = self.cache_key(prompt, **kwargs)
+        result_path = self.single_flight.do(
+            key,
+            lambda: self._run_generation(
+                prompt, output_path, poller, callback_registry, callback_deadline, use_cache,
+                **self._publishing_callbacks(key, kwargs)
+            ),
+            recheck=lambda: self.fetch_cached_image(prompt, output_path, **kwargs),
+            listener=self._callback_listener(kwargs)
+        )
+        if output_path is None:
+            return result_path
+        link_or_copy(result_path, output_path)
+        return output_path
 
-        if not image_urls:
-            raise Exception("No image URLs in result")
+    def _publishing_callbacks(self, key: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """包装 on_task_created / on_progress：调用本请求的回调后再转发给合并进来的请求"""
+        kwargs = dict(kwargs)
+        for event in FAN_OUT_EVENTS:
+            kwargs[event] = self._publishing_callback(key, event, kwargs.get(event))
+        return kwargs
+
+    def _publishing_callback(self, key: str, event: str, callback: Optional[Callable[..., None]]):
+        """单个事件的转发函数"""
+        def publish(*args, **info):
+            if callback is not None:
+                callback(*args, **info)
+            self.single_flight.publish(key, event, *args, **info)
+        return publish
+
+    @staticmethod
+    def _callback_listener(kwargs: Dict[str, Any]) -> Optional[Callable[..., None]]:
+        """合并进来的请求接收 leader 事件的函数（没有回调时为 None）"""
+        callbacks = {event: kwargs[event] for event in FAN_OUT_EVENTS if kwargs.get(event) is not None}
+        if not callbacks:
+            return None
+
+        def listener(event, *args, **info):
+            callback = callbacks.get(event)
+            if callback is not None:
+                callback(*args, **info)
+        return listener
+
+    def _run_generation(
+        self,
+        prompt: str,
+        output_path: Optional[str],
+        poller: Optional[TaskPoller],
+        callback_registry: Optional[CallbackRegistry],
+        callback_deadline: float,
+        use_cache: bool,
+        **kwargs
+    ) -> str:
+        """创建任务、等待完成并下载图像（generate_image 的实际执行部分）"""
+        image_url = self._await_image_url(prompt, poller, callback_registry, callback_deadline, **kwargs)
 
         # 下载图像
-        image_url = image_urls[0]
         if output_path is None:
-            # 自动生成文件名
-            output_dir = kwargs.get("output_dir", "./outputs/")
-            os.makedirs(output_dir, exist_ok=True)
-            timestamp = int(time.time())
-            filename = f"generated_{timestamp}.png"
-            output_path = os.path.join(output_dir, filename)
+            output_path = default_output_path(kwargs.get("output_dir", "./outputs/"))
 
         print(f"Downloading image to: {output_path}")
-        self._download_image(image_url, output_path)
-        print("Image downloaded successfully!")
+        download = self._download_image(image_url, output_path)
+        print(f"Image downloaded successfully! "
+              f"({download.size / (1024 * 1024):.2f} MB in {download.seconds:.1f}s, "
+              f"{download.throughput / (1024 * 1024):.2f} MB/s)")
+
+        if use_cache:
+            self.result_cache.put(
+                self.cache_key(prompt, **kwargs),
+                output_path,
+                params=self._cache_params(kwargs)
+            )
 
         return output_path
 
-    def _download_image(self, url: str, output_path: str):
+    def generate_image_bytes(
+        self,
+        prompt: str,
+        save_to: Optional[str] = None,
+        poller: Optional[TaskPoller] = None,
+        callback_registry: Optional[CallbackRegistry] = None,
+        callback_deadline: float = DEFAULT_CALLBACK_DEADLINE,
+        use_cache: bool = True,
+        **kwargs
+    ) -> memoryview:
         """
-        下载图像文件
+        生成图像并直接返回内存中的图像内容（省去“写盘再读回”）
+
+        Args:
+            prompt: 图像生成提示词
+            save_to: 同时保存的文件路径（由后台线程异步写入，为 None 时不单独写盘）
+            poller: 批量轮询器
+            callback_registry: 回调登记表
+            callback_deadline: 等待回调的最长时间（秒）
+            use_cache: 是否复用/写入结果缓存（缓存写入同样在后台进行）
+            **kwargs: 其他参数
+
+        Returns:
+            图像内容（只读 memoryview，可直接用于 HTTP 响应或 base64 编码）
+        """
+        generate = lambda: self._run_generation_bytes(
+            prompt, save_to, poller, callback_registry, callback_deadline, use_cache, **kwargs
+        )
+        if not use_cache:
+            return generate()
+
+        key = self.cache_key(prompt, **kwargs)
+        cached = self._read_cached_bytes(key, save_to)
+        if cached is not None:
+            print("Cache hit, reusing image from cache")
+            return cached
+
+        # 与 generate_image 的结果类型不同，使用独立的合并键
+        return self.single_flight.do(
+            f"{key}.bytes",
+            generate,
+            recheck=lambda: self._read_cached_bytes(key, save_to)
+        )
+
+    def _read_cached_bytes(self, key: str, save_to: Optional[str]) -> Optional[memoryview]:
+        """命中缓存时读入缓存图像（并放置到 save_to）"""
+        path = self.result_cache.get(key)
+        if path is None:
+            return None
+        if save_to is not None:
+            link_or_copy(path, save_to)
+        buffer = bytearray(os.path.getsize(path))
+        with open(path, "rb") as f:
+            f.readinto(buffer)
+        return memoryview(buffer).toreadonly()
+
+    def _run_generation_bytes(
+        self,
+        prompt: str,
+        save_to: Optional[str],
+        poller: Optional[TaskPoller],
+        callback_registry: Optional[CallbackRegistry],
+        callback_deadline: float,
+        use_cache: bool,
+        **kwargs
+    ) -> memoryview:
+        """创建任务、等待完成并把图像下载到内存（generate_image_bytes 的实际执行部分）"""
+        image_url = self._await_image_url(prompt, poller, callback_registry, callback_deadline, **kwargs)
+
+        print("Downloading image into memory...")
+        try:
+            data, download = self.downloader.fetch_bytes(image_url)
+        except Exception as e:
+            raise Exception(f"Failed to download image: {str(e)}")
+        print(f"Image downloaded successfully! "
+              f"({download.size / (1024 * 1024):.2f} MB in {download.seconds:.1f}s, "
+              f"{download.throughput / (1024 * 1024):.2f} MB/s)")
+
+        if save_to is not None or use_cache:
+            key = self.cache_key(prompt, **kwargs)
+            params = self._cache_params(kwargs)
+            extension = f".{kwargs.get('output_format', 'png')}"
+
+            def persist():
+                if save_to is not None:
+                    write_atomic(data, save_to)
+                    if use_cache:
+                        self.result_cache.put(key, save_to, params=params)
+                elif use_cache:
+                    self.result_cache.put_bytes(key, data, extension, params=params)
+
+            self.writer.submit(persist, path=save_to)
+
+        return data
+
+    def _report_state(self, on_progress: Callable[..., None], profile: Tuple[str, str],
+                      state: str, elapsed: float):
+        """将 Kie 任务状态转换为进度阶段并估算百分比（生成阶段占 0~90%）"""
+        if state in ("success", "fail"):
+            # 结束状态由调用方在下载完成或出错后报告
+            return
+        stage = "generating" if state == "generating" else "waiting"
+        estimate = self.poll_schedule.estimate_progress(profile, elapsed)
+        on_progress(
+            stage,
+            None if estimate is None else round(estimate * GENERATION_PROGRESS_SHARE),
+            elapsed=round(elapsed, 1),
+            expected_seconds=self.poll_schedule.expected_seconds(profile)
+        )
+
+    @staticmethod
+    def _cache_params(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """记录到缓存索引中的生成参数"""
+        return {name: kwargs[name] for name in ("aspect_ratio", "resolution", "output_format") if name in kwargs}
+
+    def _await_image_url(
+        self,
+        prompt: str,
+        poller: Optional[TaskPoller],
+        callback_registry: Optional[CallbackRegistry],
+        callback_deadline: float,
+        **kwargs
+    ) -> str:
+        """
+        创建任务并等待完成（优先等待回调，否则轮询），返回图像 URL
+
+        kwargs 中的 resume_task_id 表示继续等待已提交的任务（例如进程重启后），
+        on_task_created 会在任务提交后以任务 ID 调用，便于调用方持久化。
+        """
+        task_id = kwargs.get("resume_task_id")
+        if task_id:
+            print(f"Resuming task with ID: {task_id}")
+        else:
+            print("Creating generation task...")
+            # 回调地址附带令牌，接收端据此拒绝伪造的回调
+            if callback_registry is not None and kwargs.get("callback_url"):
+                kwargs["callback_url"] = callback_registry.signed_url(kwargs["callback_url"])
+            # 创建任务
+            task_result = self.create_task(prompt, **kwargs)
+            task_id = task_result["data"]["taskId"]
+            print(f"Task created with ID: {task_id}")
+
+        on_task_created = kwargs.get("on_task_created")
+        if on_task_created is not None:
+            on_task_created(task_id)
+
+        # 等待任务完成
+        print("Waiting for task completion...")
+        profile = (kwargs.get("resolution", "2K"), kwargs.get("aspect_ratio", "3:4"))
+        on_progress = kwargs.get("on_progress")
+        on_state = None
+        if on_progress is not None:
+            started = time.time()
+            on_state = lambda state, data: self._report_state(on_progress, profile, state, time.time() - started)
+            on_state("waiting", {})
+        completion_result = None
+        if callback_registry is not None and kwargs.get("callback_url"):
+            if callback_registry.wait(task_id, timeout=callback_deadline) is None:
+                print("Callback not received in time, falling back to polling...")
+            else:
+                completion_result = self._confirm_completion(task_id, profile)
+                if completion_result is None:
+                    print("Callback not confirmed by recordInfo, falling back to polling...")
+
+        if completion_result is None:
+            if poller is not None:
+                completion_result = poller.wait(task_id, client=self, profile=profile, on_state=on_state)
+            else:
+                completion_result = self.wait_for_completion(
+                    task_id,
+                    show_progress=kwargs.get("show_progress", True),
+                    profile=profile,
+                    on_state=on_state
+                )
+
+        if on_progress is not None:
+            on_progress("downloading", GENERATION_PROGRESS_SHARE)
+
+        # 获取图像 URL
+        return extract_image_urls(completion_result)[0]
+
+    def _confirm_completion(self, task_id: str, profile: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        收到回调后查询一次 recordInfo 确认任务状态（回调内容可能被伪造，结果地址以查询为准）
+
+        Args:
+            task_id: 任务 ID
+            profile: (分辨率, 宽高比)
+
+        Returns:
+            任务成功时返回查询结果；任务尚未结束时返回 None
+
+        Raises:
+            Exception: 当查询失败或任务失败时
+        """
+        result = self.query_task(task_id)
+        if result["code"] != 200:
+            raise Exception(f"API returned error code {result['code']}: {result.get('msg', 'Unknown error')}")
+
+        data = result["data"]
+        state = data.get("state")
+        if state == "success":
+            self.poll_schedule.observe(profile, data)
+            return result
+        if state == "fail":
+            fail_code = data.get("failCode", "Unknown")
+            fail_msg = data.get("failMsg", "Task failed")
+            raise Exception(f"Task failed with code {fail_code}: {fail_msg}")
+        return None
+
+    def _download_image(self, url: str, output_path: str) -> DownloadResult:
+        """
+        下载图像文件（断点续传、大文件分段并行、校验长度后原子替换）
 
         Args:
             url: 图像 URL
             output_path: 输出文件路径
+
+        Returns:
+            下载结果（大小、耗时、吞吐量）
         """
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-        except requests.exceptions.RequestException as e:
+            return self.downloader.download(url, output_path)
+        except Exception as e:
             raise Exception(f"Failed to download image: {str(e)}")
 
+    def get_download_stats(self) -> Dict[str, Any]:
+        """
+        获取图像下载统计信息
+
+        Returns:
+            累计下载量、平均吞吐量和最近的下载记录
+        """
+        return self.downloader.stats.snapshot()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        获取 HTTP 连接池统计信息
+
+        Returns:
+            各连接池的请求数、新建连接数和连接复用率
+        """
+        return self.pool.stats()
+
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """
+        获取客户端限流统计信息
+
+        Returns:
+            令牌桶的速率、已发放令牌数、累计等待时间和 429 暂停次数
+        """
+        return self.rate_limiter.stats()
+
     def get_task_history(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         获取任务历史（如果 API 支持）
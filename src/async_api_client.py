@@ -0,0 +1,351 @@
+"""异步 API 客户端模块
+基于 asyncio/aiohttp 的 Kie AI Nano Banana Pro API 客户端，
+返回结构与同步的 APIClient 保持一致
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Any, AsyncIterator, Tuple
+
+import aiohttp
+
+try:
+    from .api_client import (build_task_params, extract_image_urls, default_output_path, REQUEST_TIMEOUT,
+                             MAX_RETRIES, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+                             RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+    from .poll_schedule import AdaptivePollSchedule, get_shared_schedule
+    from .retry import RetryPolicy, TokenBucket, get_shared_limiter
+except ImportError:
+    from api_client import (build_task_params, extract_image_urls, default_output_path, REQUEST_TIMEOUT,
+                            MAX_RETRIES, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+                            RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+    from poll_schedule import AdaptivePollSchedule, get_shared_schedule
+    from retry import RetryPolicy, TokenBucket, get_shared_limiter
+
+
+# 默认连接限制
+DEFAULT_CONNECTION_LIMIT = 100      # 连接总数上限
+DEFAULT_LIMIT_PER_HOST = 32         # 每个主机的连接数上限
+DEFAULT_CHUNK_SIZE = 64 * 1024      # 流式下载分块大小
+
+
+class AsyncAPIClient:
+    """Kie AI API 异步客户端
+
+    一个事件循环内可以同时等待成千上万个任务，不再为每个任务占用一个线程。
+    重试策略和限流令牌桶与同步 APIClient 相同（默认共用进程内的令牌桶），
+    等待令牌和退避都使用 asyncio.sleep，不阻塞事件循环。
+    推荐用法：
+
+        async with AsyncAPIClient(api_key) as client:
+            path = await client.generate_image(prompt)
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        session: Optional[aiohttp.ClientSession] = None,
+        limit: int = DEFAULT_CONNECTION_LIMIT,
+        limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+        poll_schedule: Optional[AdaptivePollSchedule] = None,
+        base_url: Optional[str] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        request_timeout: float = REQUEST_TIMEOUT
+    ):
+        """
+        初始化异步 API 客户端
+
+        Args:
+            api_key: API 密钥
+            session: 外部传入的 aiohttp 会话（传入时由调用方负责关闭）
+            limit: 连接总数上限
+            limit_per_host: 每个主机的连接数上限
+            poll_schedule: 自适应轮询调度器（默认使用进程内共享的调度器）
+            base_url: API 基础地址（默认 https://api.kie.ai，离线测试时可指向模拟服务）
+            retry_policy: 重试策略（默认按 config/api_config.py 中的 MAX_RETRIES 等配置）
+            rate_limiter: API 请求限流器（默认使用进程内共享的令牌桶）
+            request_timeout: 单次 API 请求超时时间（秒）
+        """
+        self.api_key = api_key
+        self.base_url = (base_url or "https://api.kie.ai").rstrip("/")
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=MAX_RETRIES,
+            backoff_base=RETRY_BACKOFF_BASE,
+            backoff_max=RETRY_BACKOFF_MAX
+        )
+        self.rate_limiter = rate_limiter or get_shared_limiter(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+        self.request_timeout = request_timeout
+        self.api_version = "v1"
+        self.model_name = "nano-banana-pro"
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self._session = session
+        self._owns_session = session is None
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self.poll_schedule = poll_schedule or get_shared_schedule()
+
+    async def __aenter__(self) -> "AsyncAPIClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """获取 aiohttp 会话（首次使用时创建）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """关闭自己创建的会话"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def create_task(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """
+        创建图像生成任务
+
+        Args:
+            prompt: 图像生成提示词
+            **kwargs: 其他参数（aspect_ratio, resolution, output_format, image_input, callback_url）
+
+        Returns:
+            API 响应数据
+
+        Raises:
+            Exception: 当 API 调用失败时
+        """
+        params = build_task_params(self.model_name, prompt, **kwargs)
+        url = f"{self.base_url}/api/{self.api_version}/jobs/createTask"
+
+        try:
+            return await self._api_request("POST", url, idempotent=False, json=params)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise Exception(f"Failed to create task: {str(e) or type(e).__name__}")
+
+    async def query_task(self, task_id: str) -> Dict[str, Any]:
+        """
+        查询任务状态
+
+        Args:
+            task_id: 任务 ID
+
+        Returns:
+            API 响应数据
+
+        Raises:
+            Exception: 当 API 调用失败时
+        """
+        url = f"{self.base_url}/api/{self.api_version}/jobs/recordInfo"
+        params = {"taskId": task_id}
+
+        try:
+            return await self._api_request("GET", url, idempotent=True, params=params)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise Exception(f"Failed to query task: {str(e) or type(e).__name__}")
+
+    async def _acquire_token(self):
+        """获取限流令牌（等待期间让出事件循环）"""
+        started = time.monotonic()
+        while True:
+            wait_time = self.rate_limiter.try_acquire(started=started)
+            if wait_time <= 0:
+                return
+            await asyncio.sleep(wait_time)
+
+    async def _api_request(self, method: str, url: str, idempotent: bool, **kwargs) -> Dict[str, Any]:
+        """
+        发送 API 请求（限流 + 重试），重试规则与同步 APIClient._api_request 相同
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            idempotent: 是否幂等；非幂等请求只在 429（请求未被处理）时重试
+            **kwargs: 传给 aiohttp 的参数
+
+        Returns:
+            响应 JSON
+
+        Raises:
+            aiohttp.ClientError / asyncio.TimeoutError: 重试耗尽后仍失败时
+        """
+        kwargs.setdefault("timeout", aiohttp.ClientTimeout(total=self.request_timeout))
+        policy = self.retry_policy
+        attempt = 0
+
+        while True:
+            await self._acquire_token()
+            try:
+                async with self.session.request(method, url, headers=self.headers, **kwargs) as response:
+                    status = response.status
+                    retryable = status == 429 or (idempotent and policy.should_retry_status(status))
+                    if retryable and attempt < policy.max_retries:
+                        delay = policy.delay(attempt, response.headers.get("Retry-After"))
+                        if status == 429:
+                            # 配额已满：所有请求一起暂停
+                            self.rate_limiter.pause(delay)
+                    elif status >= 400:
+                        text = await response.text()
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history, status=status,
+                            message=f"HTTP {status}\nResponse: {text}"
+                        )
+                    else:
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not idempotent or attempt >= policy.max_retries:
+                    raise
+                delay = policy.delay(attempt)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def wait_for_completion(
+        self,
+        task_id: str,
+        timeout: int = 300,
+        poll_interval: int = 3,
+        profile: Optional[Tuple[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        等待任务完成
+
+        Args:
+            task_id: 任务 ID
+            timeout: 超时时间（秒）
+            poll_interval: 轮询间隔（秒），提供 profile 时由自适应调度器决定
+            profile: (分辨率, 宽高比)，用于按历史耗时安排轮询时间
+
+        Returns:
+            任务结果数据
+
+        Raises:
+            Exception: 当任务失败或超时时
+        """
+        start_time = time.monotonic()
+        schedule = self.poll_schedule if profile else None
+
+        # 首次轮询前先等到预计完成时间附近
+        if schedule:
+            await asyncio.sleep(min(schedule.first_delay(profile), timeout))
+
+        while True:
+            # 检查超时
+            if time.monotonic() - start_time > timeout:
+                raise Exception(f"Task timeout after {timeout} seconds")
+
+            # 查询任务状态
+            result = await self.query_task(task_id)
+
+            if result["code"] != 200:
+                raise Exception(f"API returned error code {result['code']}: {result.get('msg', 'Unknown error')}")
+
+            data = result["data"]
+            state = data.get("state", "waiting")
+
+            # 检查任务状态
+            if state == "success":
+                if schedule:
+                    schedule.observe(profile, data)
+                return result
+            elif state == "fail":
+                fail_code = data.get("failCode", "Unknown")
+                fail_msg = data.get("failMsg", "Task failed")
+                raise Exception(f"Task failed with code {fail_code}: {fail_msg}")
+
+            # 等待后继续轮询（不占用线程）
+            if schedule:
+                await asyncio.sleep(schedule.next_interval(profile, time.monotonic() - start_time))
+            else:
+                await asyncio.sleep(poll_interval)
+
+    async def generate_image(
+        self,
+        prompt: str,
+        output_path: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        """
+        生成图像的完整流程
+
+        Args:
+            prompt: 图像生成提示词
+            output_path: 输出文件路径（如果为 None，则自动生成）
+            **kwargs: 其他参数（timeout, poll_interval 用于等待任务完成）
+
+        Returns:
+            生成的图像文件路径
+        """
+        task_result = await self.create_task(prompt, **kwargs)
+        task_id = task_result["data"]["taskId"]
+
+        profile = (kwargs.get("resolution", "2K"), kwargs.get("aspect_ratio", "3:4"))
+        completion_result = await self.wait_for_completion(
+            task_id,
+            timeout=kwargs.get("timeout", 300),
+            poll_interval=kwargs.get("poll_interval", 3),
+            profile=None if "poll_interval" in kwargs else profile
+        )
+
+        image_url = extract_image_urls(completion_result)[0]
+        if output_path is None:
+            output_path = default_output_path(kwargs.get("output_dir", "./outputs/"))
+
+        await self._download_image(image_url, output_path)
+        return output_path
+
+    async def stream_image(
+        self,
+        url: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        流式读取图像内容
+
+        Args:
+            url: 图像 URL
+            chunk_size: 分块大小（字节）
+
+        Yields:
+            图像数据块
+        """
+        try:
+            async with self.session.get(url) as response:
+                if response.status >= 400:
+                    raise Exception(f"Failed to download image: HTTP {response.status}")
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    yield chunk
+        except aiohttp.ClientError as e:
+            raise Exception(f"Failed to download image: {str(e)}")
+
+    async def _download_image(self, url: str, output_path: str):
+        """
+        下载图像文件（写盘在线程池中进行，磁盘延迟不阻塞事件循环；写完后原子替换）
+
+        Args:
+            url: 图像 URL
+            output_path: 输出文件路径
+        """
+        loop = asyncio.get_running_loop()
+        tmp_path = f"{output_path}.part"
+        f = await loop.run_in_executor(None, open, tmp_path, "wb")
+        try:
+            async for chunk in self.stream_image(url):
+                await loop.run_in_executor(None, f.write, chunk)
+        except BaseException:
+            await loop.run_in_executor(None, f.close)
+            await loop.run_in_executor(None, os.remove, tmp_path)
+            raise
+        await loop.run_in_executor(None, f.close)
+        await loop.run_in_executor(None, os.replace, tmp_path, output_path)
@@ -0,0 +1,404 @@
+"""批量生成模块
+按清单（CSV 或 JSONL）并发生成一整套识字小报：可配置并发数和提交速率，
+显示一个汇总进度条，结果逐条追加到结果清单，中断后重新运行会跳过已完成的条目
+"""
+
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Any
+
+from tqdm import tqdm
+
+try:
+    from .retry import TokenBucket
+    from .task_poller import get_shared_poller
+    from .task_journal import upstream_failure
+except ImportError:
+    from retry import TokenBucket
+    from task_poller import get_shared_poller
+    from task_journal import upstream_failure
+
+
+# 默认批量参数
+DEFAULT_CONCURRENCY = 4         # 同时进行的生成任务数
+DEFAULT_RATE_PER_MINUTE = 20    # 每分钟最多提交的生成任务数（<= 0 表示不限制）
+PROGRESS_REFRESH = 1.0          # 汇总进度的刷新间隔（秒）
+
+# 清单中可以覆盖的生成参数：清单列名 -> generate_image 参数名
+ENTRY_PARAMS = {
+    "ratio": "aspect_ratio",
+    "resolution": "resolution",
+    "format": "output_format",
+}
+
+
+def _normalize_title(title: str) -> str:
+    """与单张生成一致，标题统一加书名号"""
+    if not title.startswith("《") and not title.startswith("<"):
+        title = f"《{title}》"
+    return title
+
+
+def load_manifest(path: str, defaults: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    读取批量清单
+
+    每条记录需要 theme 和 title，可选 id、ratio、resolution、format、output（输出文件名）。
+    未提供 id 时按主题、标题和参数计算，清单顺序变化后仍能识别已完成的条目。
+
+    Args:
+        path: 清单路径（.csv 或 .jsonl）
+        defaults: 默认生成参数（ratio/resolution/format）
+
+    Returns:
+        条目列表
+
+    Raises:
+        ValueError: 清单格式不支持或缺少必填字段时
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if extension == ".csv":
+            rows = list(csv.DictReader(f))
+        elif extension in (".jsonl", ".ndjson"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f"Unsupported manifest format: {extension} (expected .csv or .jsonl)")
+
+    entries = []
+    seen_ids: Dict[str, int] = {}
+    for line_number, row in enumerate(rows, 1):
+        row = {str(name).strip(): str(value).strip() for name, value in row.items()
+               if name is not None and value is not None and str(value).strip()}
+        if not row.get("theme") or not row.get("title"):
+            raise ValueError(f"Manifest row {line_number} is missing theme or title")
+
+        entry = {"theme": row["theme"], "title": _normalize_title(row["title"])}
+        for name in ENTRY_PARAMS:
+            entry[name] = row.get(name) or (defaults or {}).get(name)
+        entry["output"] = row.get("output")
+
+        entry_id = row.get("id")
+        if not entry_id:
+            material = json.dumps([entry["theme"], entry["title"], entry["ratio"],
+                                   entry["resolution"], entry["format"]], ensure_ascii=False)
+            entry_id = hashlib.sha1(material.encode("utf-8")).hexdigest()[:12]
+        # 完全相同的条目重复出现时各自记录结果（生成时合并为同一个上游任务，共用同一张图片）
+        seen_ids[entry_id] = seen_ids.get(entry_id, 0) + 1
+        if seen_ids[entry_id] > 1:
+            entry_id = f"{entry_id}-{seen_ids[entry_id]}"
+        entry["id"] = entry_id
+        entries.append(entry)
+    return entries
+
+
+class BatchInterrupted(Exception):
+    """批量生成被中断，工作线程据此放弃当前条目"""
+
+
+def default_results_path(manifest_path: str) -> str:
+    """默认的结果清单路径（与清单同目录，如 semester.results.jsonl）"""
+    return f"{os.path.splitext(manifest_path)[0]}.results.jsonl"
+
+
+def load_results(results_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    读取结果清单
+
+    Args:
+        results_path: 结果清单路径
+
+    Returns:
+        条目 ID -> 最后一条结果
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(results_path):
+        return results
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 进程被杀时最后一行可能不完整
+                continue
+            results[record["id"]] = record
+    return results
+
+
+class BatchRunner:
+    """批量生成器
+
+    并发数决定同时等待中的任务数，速率限制决定提交新任务的节奏；
+    任务状态由共享的 TaskPoller 统一调度轮询。
+    """
+
+    def __init__(
+        self,
+        client,
+        prompt_generator,
+        output_dir: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_per_minute: float = DEFAULT_RATE_PER_MINUTE,
+        use_cache: bool = True,
+        on_success: Optional[Callable[[Dict[str, Any], str], None]] = None,
+        journal=None,
+        **generation_options
+    ):
+        """
+        初始化批量生成器
+
+        Args:
+            client: APIClient 实例
+            prompt_generator: PromptGenerator 实例
+            output_dir: 输出目录
+            concurrency: 同时进行的生成任务数
+            rate_per_minute: 每分钟最多提交的生成任务数（<= 0 表示不限制）
+            use_cache: 是否复用缓存中相同提示词和参数的图片
+            on_success: 条目生成成功后以 (条目, 输出路径) 调用的函数（如保存历史）
+            journal: 任务日志（TaskJournal）；提供时记录已创建的上游任务，
+                续跑时直接等待上次中断时已提交的任务，不再重新提交
+            **generation_options: 传给 generate_image 的其他参数（如回调设置）
+        """
+        self.client = client
+        self.prompt_generator = prompt_generator
+        self.output_dir = output_dir
+        self.concurrency = max(concurrency, 1)
+        self.submit_limiter = TokenBucket(rate_per_minute / 60.0, 1)
+        self.use_cache = use_cache
+        self.on_success = on_success
+        self.journal = journal
+        self.generation_options = generation_options
+
+        self._lock = threading.Lock()
+        self._stages: Dict[str, str] = {}
+        self._task_ids: Dict[str, str] = {}    # 进行中的条目 ID -> 上游任务 ID
+        self._stopping = threading.Event()
+
+    def output_path_for(self, entry: Dict[str, Any]) -> str:
+        """条目的输出路径（固定路径，便于续跑时检查文件是否已存在）"""
+        filename = entry.get("output") or f"{entry['id']}.{entry.get('format') or 'png'}"
+        return os.path.join(self.output_dir, filename)
+
+    def pending_entries(self, entries: List[Dict[str, Any]],
+                        results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        过滤出需要生成的条目（结果清单中已成功且图片仍存在的条目跳过）
+
+        Args:
+            entries: 清单条目
+            results: 已有结果
+
+        Returns:
+            待生成的条目
+        """
+        pending = []
+        for entry in entries:
+            result = results.get(entry["id"])
+            if (result and result.get("status") == "success"
+                    and result.get("output_path") and os.path.exists(result["output_path"])):
+                continue
+            pending.append(entry)
+        return pending
+
+    def run(self, entries: List[Dict[str, Any]], results_path: str,
+            log_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        执行批量生成
+
+        Args:
+            entries: 清单条目
+            results_path: 结果清单路径（JSONL，逐条追加）
+            log_path: 详细日志路径（默认与结果清单同名的 .log），各任务的输出写入该文件
+
+        Returns:
+            汇总信息（total/skipped/succeeded/failed/interrupted/seconds），
+            interrupted 为调用 stop() 后放弃的条目数（不写入结果清单，续跑时重新生成）
+        """
+        pending = self.pending_entries(entries, load_results(results_path))
+        summary = {
+            "total": len(entries),
+            "skipped": len(entries) - len(pending),
+            "succeeded": 0,
+            "failed": 0,
+            "interrupted": 0,
+        }
+        if not pending:
+            summary["seconds"] = 0.0
+            return summary
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(results_path)), exist_ok=True)
+        if log_path is None:
+            log_path = f"{os.path.splitext(results_path)[0]}.log"
+
+        # 上次中断时已提交但未下载的任务：按输出路径续上
+        resumable = {}
+        if self.journal is not None:
+            resumable = {task["output_path"]: task["task_id"] for task in self.journal.unfinished()}
+
+        start = time.time()
+        poller = get_shared_poller()
+        self._stopping.clear()
+        # 不使用 with：退出 with 时会等待所有工作线程结束，中断后要立即返回
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        running = set()
+        try:
+            with open(results_path, "a", encoding="utf-8") as results_file, \
+                    open(log_path, "a", encoding="utf-8") as log_file, \
+                    tqdm(total=len(pending), desc="Batch", unit="poster") as pbar, \
+                    contextlib.redirect_stdout(log_file):
+                running = {
+                    executor.submit(self._generate, entry, poller, resumable.get(self.output_path_for(entry)))
+                    for entry in pending
+                }
+                while running:
+                    done, running = wait(running, timeout=PROGRESS_REFRESH, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        # 调用 stop() 后被取消或放弃的条目没有结果记录
+                        record = None if future.cancelled() else future.result()
+                        if record is None:
+                            summary["interrupted"] += 1
+                            pbar.update(1)
+                            continue
+                        # 每完成一条立即落盘，中断后可以从这里续跑
+                        results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        results_file.flush()
+                        summary["succeeded" if record["status"] == "success" else "failed"] += 1
+                        pbar.update(1)
+                    # 没有任务完成时也刷新各阶段的任务数
+                    pbar.set_postfix_str(self._postfix(summary))
+        except KeyboardInterrupt:
+            self.stop(running, poller)
+            raise
+        finally:
+            executor.shutdown(wait=False)
+
+        summary["seconds"] = round(time.time() - start, 1)
+        return summary
+
+    def stop(self, running=(), poller=None):
+        """
+        中断批量生成：排队中的条目不再开始，进行中的条目尽快放弃
+
+        已提交的上游任务保留在任务日志中，下次续跑时继续等待，不会重新提交。
+
+        Args:
+            running: 尚未完成的 Future（取消其中还没开始的）
+            poller: 进行中的任务所用的轮询器（取消其中本批次的任务，唤醒等待的工作线程）
+        """
+        self._stopping.set()
+        # cancel_futures 参数需要 Python 3.9，这里逐个取消
+        for future in running:
+            future.cancel()
+        if poller is not None:
+            with self._lock:
+                task_ids = list(self._task_ids.values())
+            for task_id in task_ids:
+                poller.cancel(task_id)
+
+    def _check_stopping(self):
+        """批量已中断时放弃当前条目"""
+        if self._stopping.is_set():
+            raise BatchInterrupted("batch interrupted")
+
+    def _on_progress(self, entry_id: str, stage: str, progress=None, **info):
+        """条目进度回调：更新阶段，批量已中断时抛出异常结束生成"""
+        self._check_stopping()
+        self._set_stage(entry_id, stage)
+
+    def _generate(self, entry: Dict[str, Any], poller,
+                  resume_task_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """生成一个条目（在工作线程中执行），返回结果记录；批量已中断时返回 None"""
+        entry_id = entry["id"]
+        if self._stopping.is_set():
+            return None
+        self._set_stage(entry_id, "queued")
+        output_path = self.output_path_for(entry)
+        params = {ENTRY_PARAMS[name]: entry[name] for name in ENTRY_PARAMS if entry.get(name)}
+        record = {"id": entry_id, "theme": entry["theme"], "title": entry["title"], **params}
+
+        # 速率限制：控制提交新任务的节奏（续上已提交的任务不占用额度）
+        if resume_task_id is None:
+            self.submit_limiter.acquire()
+        started = time.time()
+        created_task_ids = [resume_task_id] if resume_task_id else []
+        try:
+            self._check_stopping()
+            print(f"[{entry_id}] {entry['theme']} {entry['title']}")
+            prompt = self.prompt_generator.generate_prompt(entry["theme"], entry["title"])
+
+            def on_task_created(task_id):
+                with self._lock:
+                    self._task_ids[entry_id] = task_id
+                if task_id == resume_task_id:
+                    return
+                created_task_ids.append(task_id)
+                if self.journal is not None:
+                    self.journal.created(task_id, self.client.cache_key(prompt, **params), prompt, params,
+                                         output_path, theme=entry["theme"], title=entry["title"])
+
+            options = dict(self.generation_options)
+            if resume_task_id is not None:
+                options["resume_task_id"] = resume_task_id
+            self._set_stage(entry_id, "waiting")
+            self.client.generate_image(
+                prompt=prompt,
+                output_path=output_path,
+                poller=poller,
+                use_cache=self.use_cache,
+                show_progress=False,
+                on_task_created=on_task_created,
+                on_progress=lambda stage, progress, **info: self._on_progress(entry_id, stage, progress, **info),
+                **params,
+                **options
+            )
+            if self.journal is not None:
+                for task_id in created_task_ids:
+                    self.journal.completed(task_id, output_path)
+            record.update(status="success", output_path=output_path)
+            if self.on_success is not None:
+                self.on_success(entry, output_path)
+        except Exception as e:
+            if self._stopping.is_set():
+                # 批量已中断：任务日志中的任务保留，下次续跑时继续等待
+                print(f"[{entry_id}] interrupted")
+                return None
+            print(f"[{entry_id}] failed: {e}")
+            record.update(status="error", error=str(e))
+            if self.journal is not None:
+                # 上游任务已失败的不再续跑，下次重新提交；其他错误保留，下次继续等待
+                for task_id in created_task_ids:
+                    failure = upstream_failure(self.client, task_id)
+                    if failure is not None:
+                        self.journal.failed(task_id, failure)
+        finally:
+            self._set_stage(entry_id, None)
+            with self._lock:
+                self._task_ids.pop(entry_id, None)
+
+        record["seconds"] = round(time.time() - started, 1)
+        record["finished"] = datetime.now().isoformat()
+        return record
+
+    def _set_stage(self, entry_id: str, stage: Optional[str]):
+        with self._lock:
+            if stage is None:
+                self._stages.pop(entry_id, None)
+            else:
+                self._stages[entry_id] = stage
+
+    def _postfix(self, summary: Dict[str, Any]) -> str:
+        """进度条后缀：成功/失败数和进行中任务的阶段分布"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for stage in self._stages.values():
+                counts[stage] = counts.get(stage, 0) + 1
+        stages = " ".join(f"{stage}={count}" for stage, count in sorted(counts.items()))
+        return f"ok={summary['succeeded']} failed={summary['failed']} {stages}".strip()
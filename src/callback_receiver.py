@@ -0,0 +1,282 @@
+"""任务回调接收模块
+接收 Kie API 通过 callBackUrl 推送的任务完成通知，唤醒等待中的任务
+
+回调地址附带每个进程随机生成的令牌，没有令牌的回调直接拒绝；
+回调只作为唤醒信号，任务状态和结果地址由调用方再查询一次 recordInfo 确认。
+"""
+
+import hmac
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Any
+from urllib.parse import urlparse, parse_qs
+
+
+# 默认回调参数
+DEFAULT_CALLBACK_DEADLINE = 180     # 等待回调的最长时间（秒），超时后改为轮询
+DEFAULT_CALLBACK_PORT = 8765        # 独立接收器的监听端口
+DEFAULT_CALLBACK_HOST = "127.0.0.1" # 独立接收器的监听地址（公网地址通过反向代理或隧道转发）
+MAX_EARLY_CALLBACKS = 1000          # 缓存的提前到达回调数量上限
+
+# 回调地址中携带令牌的查询参数名
+TOKEN_PARAM = "token"
+
+# 结束状态（其他状态的回调不唤醒等待者）
+TERMINAL_STATES = ("success", "fail")
+
+
+class CallbackRegistry:
+    """回调登记表
+
+    创建任务时用 signed_url 给回调地址加上令牌，之后调用 expect 登记任务 ID；
+    收到令牌正确、状态为 success / fail 的回调时由 resolve 完成对应的 Future。
+    回调内容与 recordInfo 响应结构相同，但可能被伪造，调用方不应直接使用其中的结果地址。
+    """
+
+    def __init__(self, max_early_callbacks: int = MAX_EARLY_CALLBACKS, token: Optional[str] = None):
+        """
+        初始化回调登记表
+
+        Args:
+            max_early_callbacks: 缓存的提前到达回调数量上限
+            token: 回调令牌（默认每个进程随机生成；多个进程共用回调地址时可指定相同的令牌）
+        """
+        self.max_early_callbacks = max_early_callbacks
+        self.token = token or secrets.token_urlsafe(24)
+        self._waiting: Dict[str, Future] = {}
+        # 在 expect 之前到达的回调
+        self._early: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._received = 0
+        self._ignored = 0
+        self._rejected = 0
+
+    def signed_url(self, url: str) -> str:
+        """
+        给回调地址附加令牌
+
+        Args:
+            url: 回调地址
+
+        Returns:
+            带令牌查询参数的回调地址
+        """
+        separator = "&" if urlparse(url).query else "?"
+        return f"{url}{separator}{TOKEN_PARAM}={self.token}"
+
+    def verify(self, token: Optional[str]) -> bool:
+        """
+        校验回调令牌（令牌错误时计入拒绝次数）
+
+        Args:
+            token: 回调请求携带的令牌
+
+        Returns:
+            是否有效
+        """
+        if token and hmac.compare_digest(token.encode("utf-8"), self.token.encode("utf-8")):
+            return True
+        with self._lock:
+            self._rejected += 1
+        return False
+
+    def expect(self, task_id: str) -> Future:
+        """
+        登记一个等待回调的任务
+
+        Args:
+            task_id: Kie 任务 ID
+
+        Returns:
+            收到回调时完成的 Future
+        """
+        with self._lock:
+            future = self._waiting.get(task_id)
+            if future is None:
+                future = Future()
+                self._waiting[task_id] = future
+            payload = self._early.pop(task_id, None)
+
+        if payload is not None:
+            self._complete(future, payload)
+        return future
+
+    def resolve(self, payload: Dict[str, Any], token: Optional[str]) -> bool:
+        """
+        处理一次回调
+
+        Args:
+            payload: 回调请求体（与 recordInfo 响应结构相同）
+            token: 回调地址中携带的令牌
+
+        Returns:
+            是否唤醒了等待中的任务
+        """
+        if not self.verify(token):
+            return False
+        data = payload.get("data") or {}
+        task_id = data.get("taskId")
+        if not task_id or data.get("state") not in TERMINAL_STATES:
+            with self._lock:
+                self._ignored += 1
+            return False
+
+        with self._lock:
+            self._received += 1
+            future = self._waiting.pop(task_id, None)
+            if future is None:
+                self._early[task_id] = payload
+                while len(self._early) > self.max_early_callbacks:
+                    self._early.popitem(last=False)
+                return False
+
+        self._complete(future, payload)
+        return True
+
+    @staticmethod
+    def _complete(future: Future, payload: Dict[str, Any]):
+        """用回调内容完成 Future"""
+        if not future.done():
+            future.set_result(payload)
+
+    def wait(self, task_id: str, timeout: float = DEFAULT_CALLBACK_DEADLINE) -> Optional[Dict[str, Any]]:
+        """
+        等待任务回调
+
+        Args:
+            task_id: Kie 任务 ID
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            回调内容（state 为 success 或 fail，仅作为唤醒信号）；超时未收到回调时返回 None
+        """
+        future = self.expect(task_id)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self.discard(task_id)
+            return None
+
+    def discard(self, task_id: str):
+        """取消对某个任务回调的等待"""
+        with self._lock:
+            future = self._waiting.pop(task_id, None)
+        if future is not None:
+            future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取回调统计信息"""
+        with self._lock:
+            return {
+                "waiting": len(self._waiting),
+                "received": self._received,
+                "early": len(self._early),
+                "ignored": self._ignored,
+                "rejected": self._rejected,
+            }
+
+
+class CallbackServer:
+    """独立的轻量回调接收器
+
+    供命令行批量生成使用，在后台线程中监听 HTTP POST 并转交给 CallbackRegistry。
+    默认只监听本机地址，公网回调通过反向代理或隧道转发到该端口。
+    """
+
+    def __init__(
+        self,
+        registry: CallbackRegistry,
+        host: str = DEFAULT_CALLBACK_HOST,
+        port: int = DEFAULT_CALLBACK_PORT,
+        path: str = "/api/callback"
+    ):
+        """
+        初始化回调接收器
+
+        Args:
+            registry: 回调登记表
+            host: 监听地址
+            port: 监听端口（0 表示自动分配）
+            path: 接收回调的路径
+        """
+        self.registry = registry
+        self.path = path
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """实际监听的端口"""
+        return self._server.server_address[1]
+
+    def _make_handler(self):
+        """生成绑定到当前登记表的请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != server.path:
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                token = parse_qs(url.query).get(TOKEN_PARAM, [None])[0]
+                if not server.registry.verify(token):
+                    self.send_error(403, "Invalid callback token")
+                    return
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    self.send_error(400, "Invalid JSON")
+                    return
+
+                server.registry.resolve(payload, token)
+                body = b'{"success": true}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不输出访问日志，避免干扰命令行进度显示
+                pass
+
+        return Handler
+
+    def start(self) -> "CallbackServer":
+        """在后台线程中启动接收器"""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="CallbackServer",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止接收器"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# 进程内共享的回调登记表
+_shared_registry: Optional[CallbackRegistry] = None
+_shared_registry_lock = threading.Lock()
+
+
+def get_shared_registry() -> CallbackRegistry:
+    """获取进程内共享的回调登记表（首次调用时创建，令牌可由 KIE_CALLBACK_TOKEN 指定）"""
+    global _shared_registry
+    if _shared_registry is None:
+        with _shared_registry_lock:
+            if _shared_registry is None:
+                _shared_registry = CallbackRegistry(token=os.getenv("KIE_CALLBACK_TOKEN"))
+    return _shared_registry
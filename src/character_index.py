@@ -0,0 +1,272 @@
+"""识字倒排索引模块
+建立「汉字 / 带声调拼音音节 -> 场景与类别」的倒排索引，
+回答「哪些场景教『医』和『药』」这类查询时只需合并几个倒排表，不必遍历全部词汇
+
+每个倒排表由两个等长的 array 组成：场景序号（递增）和该场景中出现的类别位图。
+场景序号按加入顺序分配，新增场景只需追加；求交集在 C 实现的集合运算中完成。
+"""
+
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from itertools import chain
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple, Any
+
+# 类别位图宽度（array('I')，32 位）：前 31 个类别各占一位，
+# 之后出现的类别共用最高位，查询结果中显示为 OVERFLOW_CATEGORY
+MAX_CATEGORIES = 32
+OVERFLOW_CATEGORY_ID = MAX_CATEGORIES - 1
+OVERFLOW_CATEGORY = "其他"
+
+# 查询结果默认条数
+DEFAULT_RESULT_LIMIT = 50
+
+# 汉字范围（基本区、扩展 A、兼容表意文字、扩展 B–F）
+HANZI_RANGES = (
+    (0x4E00, 0x9FFF),
+    (0x3400, 0x4DBF),
+    (0xF900, 0xFAFF),
+    (0x20000, 0x2EBEF),
+)
+
+# 场景词汇：类别 -> (拼音, 汉字) 列表
+SceneVocabulary = Dict[str, List[Tuple[str, str]]]
+
+
+def is_hanzi(char: str) -> bool:
+    """是否为汉字"""
+    code = ord(char)
+    return any(start <= code <= end for start, end in HANZI_RANGES)
+
+
+def hanzi_in(text: str) -> List[str]:
+    """文本中的汉字（去重，保持出现顺序）"""
+    return list(dict.fromkeys(char for char in text if is_hanzi(char)))
+
+
+def normalize_syllable(syllable: str) -> str:
+    """统一拼音音节的写法（组合声调符号合并、小写）"""
+    return unicodedata.normalize("NFC", syllable.strip()).lower()
+
+
+class _Postings:
+    """倒排表：场景序号与类别位图"""
+
+    __slots__ = ("scene_ids", "masks")
+
+    def __init__(self):
+        self.scene_ids = array("I")
+        self.masks = array("I")
+
+    def __len__(self) -> int:
+        return len(self.scene_ids)
+
+    def mask(self, scene_id: int) -> int:
+        """二分查找场景的类别位图，不存在时返回 0"""
+        index = bisect_left(self.scene_ids, scene_id)
+        if index < len(self.scene_ids) and self.scene_ids[index] == scene_id:
+            return self.masks[index]
+        return 0
+
+
+class CharacterIndex:
+    """汉字 / 拼音音节倒排索引"""
+
+    def __init__(self):
+        """初始化空索引"""
+        self._lock = threading.RLock()
+        self._scenes: List[Optional[str]] = []           # 场景序号 -> 场景名（删除后为 None）
+        self._scene_ids: Dict[str, int] = {}
+        self._categories: List[str] = []                 # 类别序号 -> 类别名
+        self._category_ids: Dict[str, int] = {}
+        self._chars: Dict[str, _Postings] = {}           # 汉字 -> 倒排表
+        self._syllables: Dict[str, _Postings] = {}       # 拼音音节 -> 倒排表
+        self._scene_terms: Dict[int, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._scene_ids)
+
+    def _category_bit(self, category: str) -> int:
+        """类别对应的位（调用方需持有锁），类别位用完后返回共用的溢出位"""
+        category_id = self._category_ids.get(category)
+        if category_id is None:
+            category_id = len(self._categories)
+            if category_id >= OVERFLOW_CATEGORY_ID:
+                return 1 << OVERFLOW_CATEGORY_ID
+            self._categories.append(category)
+            self._category_ids[category] = category_id
+        return 1 << category_id
+
+    def _category_names(self, mask: int) -> List[str]:
+        names = [name for category_id, name in enumerate(self._categories) if mask >> category_id & 1]
+        if mask >> OVERFLOW_CATEGORY_ID & 1:
+            names.append(OVERFLOW_CATEGORY)
+        return names
+
+    def add_scene(self, scene: str, vocab: SceneVocabulary):
+        """
+        加入（或替换）场景
+
+        Args:
+            scene: 场景名称
+            vocab: 场景词汇
+        """
+        with self._lock:
+            # 先分配类别位并统计词条，再替换旧条目，词汇数据有误时索引保持原样
+            chars: Dict[str, int] = {}
+            syllables: Dict[str, int] = {}
+            for category, items in vocab.items():
+                bit = self._category_bit(category)
+                for pinyin, chinese in items:
+                    for char in hanzi_in(chinese):
+                        chars[char] = chars.get(char, 0) | bit
+                    for syllable in pinyin.split():
+                        syllable = normalize_syllable(syllable)
+                        syllables[syllable] = syllables.get(syllable, 0) | bit
+
+            self.remove_scene(scene)
+            scene_id = len(self._scenes)
+            self._scenes.append(scene)
+            self._scene_ids[scene] = scene_id
+
+            # 新场景序号最大，追加后倒排表仍然有序
+            for table, terms in ((self._chars, chars), (self._syllables, syllables)):
+                for term, mask in terms.items():
+                    postings = table.get(term)
+                    if postings is None:
+                        postings = table[term] = _Postings()
+                    postings.scene_ids.append(scene_id)
+                    postings.masks.append(mask)
+            self._scene_terms[scene_id] = (tuple(chars), tuple(syllables))
+
+    def remove_scene(self, scene: str):
+        """
+        移除场景
+
+        Args:
+            scene: 场景名称
+        """
+        with self._lock:
+            scene_id = self._scene_ids.pop(scene, None)
+            if scene_id is None:
+                return
+            self._scenes[scene_id] = None
+            chars, syllables = self._scene_terms.pop(scene_id)
+            for table, terms in ((self._chars, chars), (self._syllables, syllables)):
+                for term in terms:
+                    postings = table[term]
+                    index = bisect_left(postings.scene_ids, scene_id)
+                    del postings.scene_ids[index]
+                    del postings.masks[index]
+                    if not postings:
+                        del table[term]
+
+    def build(self, scenes: Iterable[Tuple[str, SceneVocabulary]]):
+        """
+        批量加入场景
+
+        Args:
+            scenes: (场景名, 场景词汇) 序列
+        """
+        with self._lock:
+            for scene, vocab in scenes:
+                self.add_scene(scene, vocab)
+
+    def _lookup(self, table: Dict[str, _Postings], terms: List[str], match_all: bool,
+                limit: Optional[int]) -> Dict[str, Any]:
+        """在倒排表中查找包含全部（或任意）查询项的场景"""
+        with self._lock:
+            found = {term: table[term] for term in terms if term in table}
+            missing = [term for term in terms if term not in found]
+
+            if match_all:
+                if missing or not found:
+                    ranked = []
+                else:
+                    # 从最短的倒排表开始求交集，结果按加入顺序排列
+                    ordered = sorted(found.values(), key=len)
+                    scene_ids = set(ordered[0].scene_ids)
+                    for postings in ordered[1:]:
+                        scene_ids.intersection_update(postings.scene_ids)
+                    ranked = sorted(scene_ids)
+            else:
+                # 命中的查询项多的场景在前，其次按加入顺序
+                counts = Counter(chain.from_iterable(postings.scene_ids for postings in found.values()))
+                ranked = []
+                for hits in range(len(found), 0, -1):
+                    ranked.extend(sorted(scene_id for scene_id, count in counts.items() if count == hits))
+
+            total = len(ranked)
+            if limit is not None:
+                # 0 或负数不应截掉结果（如 ranked[:-1]），至少返回一个
+                ranked = ranked[:max(limit, 1)]
+            scenes = []
+            for scene_id in ranked:
+                matches = {}
+                for term, postings in found.items():
+                    mask = postings.mask(scene_id)
+                    if mask:
+                        matches[term] = self._category_names(mask)
+                scenes.append({"scene": self._scenes[scene_id], "matches": matches})
+        return {"scenes": scenes, "total": total, "missing": missing}
+
+    def scenes_with_characters(self, text: str, match_all: bool = True,
+                               limit: Optional[int] = DEFAULT_RESULT_LIMIT) -> Dict[str, Any]:
+        """
+        查找教这些汉字的场景
+
+        Args:
+            text: 查询的汉字（非汉字字符被忽略）
+            match_all: True 时场景需包含全部汉字，False 时包含任意一个即可
+            limit: 最多返回的场景数（至少 1），None 表示不限
+
+        Returns:
+            {"scenes": [{"scene": 场景名, "matches": {汉字: [类别]}}], "total": 总数, "missing": [未收录的汉字]}
+        """
+        return self._lookup(self._chars, hanzi_in(text), match_all, limit)
+
+    def scenes_containing_any(self, text: str) -> Dict[str, Any]:
+        """
+        包含任意一个查询汉字的场景（只合并倒排表，不统计命中的类别）
+
+        Args:
+            text: 查询的汉字（非汉字字符被忽略）
+
+        Returns:
+            {"scenes": [场景名，按加入顺序], "missing": [未收录的汉字]}
+        """
+        with self._lock:
+            scene_ids = set()
+            missing = []
+            for char in hanzi_in(text):
+                postings = self._chars.get(char)
+                if postings is None:
+                    missing.append(char)
+                else:
+                    scene_ids.update(postings.scene_ids)
+            return {"scenes": [self._scenes[scene_id] for scene_id in sorted(scene_ids)], "missing": missing}
+
+    def scenes_with_syllables(self, syllables: Iterable[str], match_all: bool = True,
+                              limit: Optional[int] = DEFAULT_RESULT_LIMIT) -> Dict[str, Any]:
+        """
+        查找包含这些带声调拼音音节的场景（参数和返回值同 scenes_with_characters）
+
+        Args:
+            syllables: 拼音音节，如 ["yī", "yào"]
+        """
+        terms = list(dict.fromkeys(normalize_syllable(s) for s in syllables if s.strip()))
+        return self._lookup(self._syllables, terms, match_all, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        with self._lock:
+            postings = sum(len(p) for p in self._chars.values()) + sum(len(p) for p in self._syllables.values())
+            return {
+                "scenes": len(self._scene_ids),
+                "characters": len(self._chars),
+                "syllables": len(self._syllables),
+                "postings": postings,
+                "posting_bytes": postings * 2 * array("I").itemsize,
+            }
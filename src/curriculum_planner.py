@@ -0,0 +1,230 @@
+"""识字课程规划模块
+给定一份目标汉字表（如一年级 300 字），从词汇库中挑选尽量少的场景，
+使这些场景的小报（即写入提示词的词汇）合起来覆盖全部目标汉字，结果直接写成批量生成清单
+
+这是集合覆盖问题：每个场景是一个候选集合（小报上出现的目标汉字），
+用惰性贪心（增益只会变小，堆顶重新计算后仍最大即可选中）求近似解，再去掉被其他小报完全覆盖的冗余场景。
+候选集合用整数位图表示，求交和计数都在 C 实现的整数运算中完成，数万个候选场景也只需零点几秒。
+"""
+
+import csv
+import heapq
+import json
+import os
+import time
+from typing import Dict, List, Optional, Any, Tuple
+
+try:
+    from .character_index import hanzi_in
+    from .vocabulary import prompt_items
+except ImportError:
+    from character_index import hanzi_in
+    from vocabulary import prompt_items
+
+
+# 清单中小报标题的默认格式
+DEFAULT_TITLE_FORMAT = "走进{scene}"
+
+
+def load_character_list(path: str) -> List[str]:
+    """
+    读取目标汉字表
+
+    Args:
+        path: 文本文件路径（任意分隔，非汉字字符被忽略）
+
+    Returns:
+        汉字列表（去重，保持出现顺序）
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return hanzi_in(f.read())
+
+
+def default_plan_path(characters_path: str) -> str:
+    """默认的规划清单路径（与汉字表同目录，如 grade1.plan.csv）"""
+    return f"{os.path.splitext(characters_path)[0]}.plan.csv"
+
+
+def _bit_count(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+# Python 3.10+ 有原生的位计数
+if hasattr(int, "bit_count"):
+    _bit_count = int.bit_count
+
+
+def _bits(mask: int) -> List[int]:
+    """位图中为 1 的位序号"""
+    bits = []
+    while mask:
+        low = mask & -mask
+        bits.append(low.bit_length() - 1)
+        mask ^= low
+    return bits
+
+
+class CurriculumPlanner:
+    """识字课程规划器"""
+
+    def __init__(self, vocab_manager, title_format: str = DEFAULT_TITLE_FORMAT):
+        """
+        初始化规划器
+
+        Args:
+            vocab_manager: VocabularyManager 实例
+            title_format: 小报标题格式（{scene} 替换为场景名）
+        """
+        self.vocab_manager = vocab_manager
+        self.title_format = title_format
+
+    def candidates(self, targets: List[str]) -> Tuple[List[Tuple[str, int, List[str]]], List[str]]:
+        """
+        收集候选场景
+
+        先用识字倒排索引找出词汇中含任意目标汉字的场景，再按提示词的选词规则
+        计算每个场景小报上实际出现的目标汉字；小报覆盖相同汉字的场景只保留先出现的一个。
+
+        Args:
+            targets: 目标汉字（去重）
+
+        Returns:
+            ([(场景名, 覆盖位图, 小报上含目标汉字的词)], 词汇库中完全没有的汉字)
+        """
+        bit_of = {char: position for position, char in enumerate(targets)}
+        found = self.vocab_manager.get_character_index().scenes_containing_any("".join(targets))
+
+        candidates = []
+        seen_masks = set()
+        for scene in found["scenes"]:
+            vocab = self.vocab_manager.load_scene(scene, cache=False)
+            if vocab is None:
+                continue
+            mask = 0
+            words = []
+            for group in prompt_items(vocab):
+                for _, chinese in group:
+                    word_mask = 0
+                    for char in chinese:
+                        position = bit_of.get(char)
+                        if position is not None:
+                            word_mask |= 1 << position
+                    if word_mask:
+                        mask |= word_mask
+                        words.append(chinese)
+            if mask and mask not in seen_masks:
+                seen_masks.add(mask)
+                candidates.append((scene, mask, words))
+
+        return candidates, found["missing"]
+
+    def plan(self, characters: str, max_posters: Optional[int] = None) -> Dict[str, Any]:
+        """
+        规划覆盖目标汉字的最少小报
+
+        Args:
+            characters: 目标汉字（非汉字字符被忽略）
+            max_posters: 最多选择的小报数，None 表示直到无法再覆盖新汉字
+
+        Returns:
+            {"posters": [{"theme", "title", "characters": 该小报首次覆盖的汉字, "words": 小报上含目标汉字的词}],
+             "targets": 目标汉字数, "covered": 覆盖数, "uncovered": [未覆盖的汉字],
+             "missing": [词汇库中完全没有的汉字], "candidates": 候选场景数, "seconds": 耗时}
+        """
+        started = time.perf_counter()
+        targets = hanzi_in(characters)
+        candidates, missing = self.candidates(targets)
+
+        # 惰性贪心：堆中是增益的上界，弹出后重新计算，仍不小于下一个上界时选中
+        uncovered = (1 << len(targets)) - 1
+        heap = [(-_bit_count(mask), order) for order, (_, mask, _) in enumerate(candidates)]
+        heapq.heapify(heap)
+        selected: List[int] = []
+        while heap and uncovered and (max_posters is None or len(selected) < max_posters):
+            _, order = heapq.heappop(heap)
+            gain = _bit_count(candidates[order][1] & uncovered)
+            if not gain:
+                continue
+            if heap and (-gain, order) > heap[0]:
+                heapq.heappush(heap, (-gain, order))
+                continue
+            selected.append(order)
+            uncovered &= ~candidates[order][1]
+
+        selected = self._prune(candidates, selected)
+
+        posters = []
+        assigned = 0
+        for order in selected:
+            scene, mask, words = candidates[order]
+            new = mask & ~assigned
+            assigned |= mask
+            posters.append({
+                "theme": scene,
+                "title": self.title_format.format(scene=scene),
+                "characters": [targets[position] for position in sorted(_bits(new))],
+                "words": words,
+            })
+
+        return {
+            "posters": posters,
+            "targets": len(targets),
+            "covered": _bit_count(assigned),
+            "uncovered": [char for position, char in enumerate(targets) if not assigned >> position & 1],
+            "missing": missing,
+            "candidates": len(candidates),
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+
+    @staticmethod
+    def _prune(candidates: List[Tuple[str, int, List[str]]], selected: List[int]) -> List[int]:
+        """去掉覆盖的汉字都已被其他小报覆盖的场景（从最后选中的开始，后选的增益小，更可能冗余）"""
+        counts: Dict[int, int] = {}
+        for order in selected:
+            for position in _bits(candidates[order][1]):
+                counts[position] = counts.get(position, 0) + 1
+
+        kept = list(selected)
+        for order in reversed(selected):
+            positions = _bits(candidates[order][1])
+            if all(counts[position] > 1 for position in positions):
+                kept.remove(order)
+                for position in positions:
+                    counts[position] -= 1
+        return kept
+
+
+def write_plan_manifest(plan: Dict[str, Any], path: str) -> int:
+    """
+    把规划结果写成批量生成清单（可直接用于 --batch）
+
+    除 theme 和 title 外还写入 characters 列（该小报首次覆盖的汉字），批量生成时忽略。
+
+    Args:
+        plan: CurriculumPlanner.plan 的返回值
+        path: 清单路径（.csv 或 .jsonl）
+
+    Returns:
+        写入的条目数
+
+    Raises:
+        ValueError: 清单格式不支持时
+    """
+    extension = os.path.splitext(path)[1].lower()
+    rows = [
+        {"theme": poster["theme"], "title": poster["title"], "characters": "".join(poster["characters"])}
+        for poster in plan["posters"]
+    ]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if extension == ".csv":
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["theme", "title", "characters"])
+            writer.writeheader()
+            writer.writerows(rows)
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    else:
+        raise ValueError(f"Unsupported manifest format: {extension} (expected .csv or .jsonl)")
+    return len(rows)
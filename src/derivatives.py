@@ -0,0 +1,255 @@
+"""图片衍生尺寸模块
+图片下载完成后，在后台进程池中生成缩略图和中等尺寸预览图，保存在原图旁边，
+历史记录和结果页按 size 参数加载小图，不必每次都传输原图
+
+依赖 Pillow（可选）：未安装时不生成衍生图，调用方退回原图。
+"""
+
+import os
+import sys
+import threading
+import types
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.context import SpawnContext, SpawnProcess
+from typing import Dict, List, Optional, Any, Tuple
+
+
+# 衍生尺寸：名称 -> 最长边像素
+DERIVATIVE_SIZES = {
+    "thumb": 320,
+    "preview": 1024,
+}
+
+# 衍生图编码质量
+DERIVATIVE_QUALITY = 80
+
+# 默认后台进程数
+DEFAULT_WORKERS = 2
+
+
+def render_derivatives(source_path: str, targets: List[Tuple[str, int]], image_format: str,
+                       quality: int = DERIVATIVE_QUALITY) -> List[str]:
+    """
+    生成衍生图（在后台进程中执行）
+
+    Args:
+        source_path: 原图路径
+        targets: (输出路径, 最长边像素) 列表
+        image_format: 输出格式（WEBP/JPEG）
+        quality: 编码质量
+
+    Returns:
+        已生成的文件路径列表
+    """
+    from PIL import Image
+
+    written = []
+    with Image.open(source_path) as original:
+        original.load()
+        if image_format == "JPEG" and original.mode not in ("RGB", "L"):
+            original = original.convert("RGB")
+
+        for path, max_edge in targets:
+            image = original.copy()
+            # 只缩小不放大
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            tmp_path = f"{path}.part"
+            image.save(tmp_path, format=image_format, quality=quality)
+            os.replace(tmp_path, path)
+            written.append(path)
+    return written
+
+
+# 启动子进程时临时替换 __main__ 的锁（多个流水线同时启动子进程时不会互相还原）
+_main_module_lock = threading.Lock()
+
+
+class _WorkerProcess(SpawnProcess):
+    """不重新导入入口脚本的 spawn 子进程
+
+    spawn 子进程默认会以 __mp_main__ 重新执行入口脚本（如 web/app.py），其中模块级创建的服务
+    （词汇监视线程、任务轮询器、任务队列等）会在每个子进程里再创建一遍；衍生图子进程只需要
+    本模块，因此启动时让子进程看到一个空的 __main__。
+    """
+
+    def start(self):
+        with _main_module_lock:
+            main_module = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                super().start()
+            finally:
+                sys.modules["__main__"] = main_module
+
+
+class _WorkerContext(SpawnContext):
+    """创建 _WorkerProcess 的 spawn 上下文"""
+
+    Process = _WorkerProcess
+
+
+def _detect_format() -> Optional[str]:
+    """选择衍生图格式：优先 WebP，不支持时用 JPEG；未安装 Pillow 时返回 None"""
+    try:
+        from PIL import features
+    except ImportError:
+        return None
+    try:
+        return "WEBP" if features.check("webp") else "JPEG"
+    except Exception:
+        return "JPEG"
+
+
+class DerivativePipeline:
+    """缩略图 / 预览图生成流水线
+
+    每张原图只生成一次：衍生图比原图新时直接复用，同一张图同时只有一个生成任务。
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, sizes: Optional[Dict[str, int]] = None):
+        """
+        初始化流水线
+
+        Args:
+            max_workers: 后台进程数
+            sizes: 衍生尺寸（名称 -> 最长边像素），默认 DERIVATIVE_SIZES
+        """
+        self.max_workers = max_workers
+        self.sizes = dict(sizes or DERIVATIVE_SIZES)
+        self.image_format = _detect_format()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+        # 统计信息
+        self._generated = 0
+        self._failed = 0
+
+    @property
+    def available(self) -> bool:
+        """是否可以生成衍生图（需要 Pillow）"""
+        return self.image_format is not None
+
+    def path_for(self, source_path: str, size: str) -> str:
+        """
+        衍生图路径（与原图同目录，如 poster.thumb.webp）
+
+        Args:
+            source_path: 原图路径
+            size: 衍生尺寸名称
+
+        Returns:
+            衍生图路径
+        """
+        if size not in self.sizes:
+            raise ValueError(f"Unknown derivative size: {size}")
+        extension = ".webp" if self.image_format == "WEBP" else ".jpg"
+        stem = os.path.splitext(source_path)[0]
+        return f"{stem}.{size}{extension}"
+
+    def _is_fresh(self, source_path: str, path: str) -> bool:
+        try:
+            return os.path.getmtime(path) >= os.path.getmtime(source_path)
+        except OSError:
+            return False
+
+    def get(self, source_path: str, size: str) -> Optional[str]:
+        """
+        获取已生成的衍生图
+
+        衍生图不存在或已过期时提交生成任务并返回 None，调用方这次先使用原图。
+
+        Args:
+            source_path: 原图路径
+            size: 衍生尺寸名称
+
+        Returns:
+            衍生图路径，尚未生成时返回 None
+        """
+        if not self.available:
+            return None
+        path = self.path_for(source_path, size)
+        if self._is_fresh(source_path, path):
+            return path
+        self.schedule(source_path)
+        return None
+
+    def schedule(self, source_path: str) -> Optional[Future]:
+        """
+        提交原图的衍生图生成任务
+
+        Args:
+            source_path: 原图路径
+
+        Returns:
+            生成任务的 Future；不可用、原图不存在或衍生图都已是最新时返回 None
+        """
+        if not self.available or not os.path.exists(source_path):
+            return None
+
+        key = os.path.abspath(source_path)
+        targets = [
+            (self.path_for(key, size), max_edge)
+            for size, max_edge in self.sizes.items()
+            if not self._is_fresh(key, self.path_for(key, size))
+        ]
+        if not targets:
+            return None
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                # 使用 spawn 启动子进程，避免在多线程的 Web 进程中 fork；子进程不导入入口脚本
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_WorkerContext())
+            future = self._executor.submit(render_derivatives, key, targets, self.image_format)
+            self._in_flight[key] = future
+        # 已完成时回调会立即在当前线程执行，因此在锁外注册
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return future
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if future.exception() is None:
+                self._generated += 1
+            else:
+                self._failed += 1
+        if future.exception() is not None:
+            print(f"Derivative generation failed for {key}: {future.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """获取流水线统计信息"""
+        with self._lock:
+            return {
+                "available": self.available,
+                "format": self.image_format,
+                "sizes": dict(self.sizes),
+                "in_flight": len(self._in_flight),
+                "generated": self._generated,
+                "failed": self._failed,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """关闭后台进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+# 进程内共享的衍生图流水线
+_shared_pipeline: Optional[DerivativePipeline] = None
+_shared_pipeline_lock = threading.Lock()
+
+
+def get_shared_pipeline() -> DerivativePipeline:
+    """获取进程内共享的衍生图流水线（首次调用时创建）"""
+    global _shared_pipeline
+    if _shared_pipeline is None:
+        with _shared_pipeline_lock:
+            if _shared_pipeline is None:
+                _shared_pipeline = DerivativePipeline()
+    return _shared_pipeline
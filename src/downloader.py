@@ -0,0 +1,630 @@
+"""图片下载模块
+支持断点续传、分段并行下载、临时文件原子替换和长度校验，并统计下载吞吐量；
+也可以直接下载到内存，由后台线程异步写盘
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterator, Optional, Any, List, Tuple, Union
+
+import requests
+
+try:
+    from .retry import RetryPolicy
+except ImportError:
+    from retry import RetryPolicy
+
+
+# 默认下载参数
+DEFAULT_CHUNK_SIZE = 64 * 1024                  # 流式读取分块大小
+DEFAULT_PARALLEL_THRESHOLD = 4 * 1024 * 1024    # 超过该大小时分段并行下载
+DEFAULT_MAX_PARTS = 4                           # 最大并行分段数
+DEFAULT_TIMEOUT = 30                            # 单次请求超时时间（秒）
+
+# 记录临时文件来源（URL、验证器、大小）的文件后缀
+PART_META_SUFFIX = ".part.json"
+
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class DownloadResult:
+    """单次下载结果"""
+
+    def __init__(self, url: str, path: Optional[str], size: int, seconds: float,
+                 resumed_bytes: int = 0, parts: int = 1, retries: int = 0):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.seconds = seconds
+        self.resumed_bytes = resumed_bytes
+        self.parts = parts
+        self.retries = retries
+
+    @property
+    def throughput(self) -> float:
+        """本次实际传输的吞吐量（字节/秒，不含续传前已下载的部分）"""
+        transferred = self.size - self.resumed_bytes
+        return transferred / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "path": self.path,
+            "size": self.size,
+            "seconds": round(self.seconds, 3),
+            "throughput_mbps": round(self.throughput / (1024 * 1024), 3),
+            "resumed_bytes": self.resumed_bytes,
+            "parts": self.parts,
+            "retries": self.retries,
+        }
+
+
+class DownloadStats:
+    """下载统计（进程内共享，便于区分 CDN 下载耗时与生成耗时）"""
+
+    def __init__(self, keep_recent: int = 50):
+        self.keep_recent = keep_recent
+        self._lock = threading.Lock()
+        self._recent: List[DownloadResult] = []
+        self._downloads = 0
+        self._total_bytes = 0
+        self._total_seconds = 0.0
+
+    def record(self, result: DownloadResult):
+        """记录一次下载"""
+        with self._lock:
+            self._recent.append(result)
+            del self._recent[:-self.keep_recent]
+            self._downloads += 1
+            self._total_bytes += result.size - result.resumed_bytes
+            self._total_seconds += result.seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取下载统计信息
+
+        Returns:
+            累计下载量、平均吞吐量和最近的下载记录
+        """
+        with self._lock:
+            recent = [result.to_dict() for result in self._recent[-10:]]
+            throughput = self._total_bytes / self._total_seconds if self._total_seconds > 0 else 0.0
+            return {
+                "downloads": self._downloads,
+                "total_bytes": self._total_bytes,
+                "total_seconds": round(self._total_seconds, 3),
+                "average_throughput_mbps": round(throughput / (1024 * 1024), 3),
+                "recent": recent,
+            }
+
+
+_shared_stats = DownloadStats()
+
+
+def get_shared_download_stats() -> DownloadStats:
+    """获取进程内共享的下载统计"""
+    return _shared_stats
+
+
+class RangeDownloader:
+    """基于 HTTP Range 的下载器
+
+    下载过程写入 `<output>.part`（分段时为 `<output>.part0`、`<output>.part1` ...），
+    中断后再次下载同一路径会从已下载的位置继续，完成并校验长度后原子替换为目标文件。
+    来源 URL、ETag / Last-Modified 和大小记录在 `<output>.part.json` 中，与本次下载不一致的
+    临时文件会被丢弃；续传请求还会带上 If-Range，文件在下载过程中变化时服务端返回完整内容。
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        retry_policy: Optional[RetryPolicy] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        parallel_threshold: int = DEFAULT_PARALLEL_THRESHOLD,
+        max_parts: int = DEFAULT_MAX_PARTS,
+        stats: Optional[DownloadStats] = None
+    ):
+        """
+        初始化下载器
+
+        Args:
+            session: 用于下载的 requests 会话（通常是 CDN 连接池）
+            retry_policy: 重试策略
+            timeout: 单次请求超时时间（秒）
+            chunk_size: 流式读取分块大小（字节）
+            parallel_threshold: 超过该大小时分段并行下载（字节）
+            max_parts: 最大并行分段数
+            stats: 下载统计（默认使用进程内共享的统计）
+        """
+        self.session = session
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        self.max_parts = max(max_parts, 1)
+        self.stats = stats or get_shared_download_stats()
+
+    def download(self, url: str, output_path: str) -> DownloadResult:
+        """
+        下载文件
+
+        Args:
+            url: 文件 URL
+            output_path: 输出文件路径
+
+        Returns:
+            下载结果（大小、耗时、吞吐量等）
+
+        Raises:
+            Exception: 下载失败或长度校验失败时
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        start_time = time.time()
+
+        size, accepts_ranges, validator = self._probe(url)
+        self._discard_stale_parts(output_path, url, size, validator)
+        if size and accepts_ranges and size >= self.parallel_threshold and self.max_parts > 1:
+            result = self._download_parallel(url, output_path, size, validator)
+        else:
+            result = self._download_single(url, output_path, size, accepts_ranges, validator)
+        self._remove_parts(output_path)
+        result.seconds = time.time() - start_time
+        self.stats.record(result)
+        return result
+
+    def _probe(self, url: str) -> Tuple[Optional[int], bool, Optional[str]]:
+        """通过 HEAD 请求获取文件大小、是否支持 Range 和验证器（强 ETag 或 Last-Modified）"""
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=True)
+            response.close()
+            if response.status_code >= 400:
+                return None, False, None
+        except requests.exceptions.RequestException:
+            return None, False, None
+
+        length = response.headers.get("Content-Length")
+        size = int(length) if length and length.isdigit() else None
+        accepts_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        # 弱 ETag 不能用于 If-Range
+        etag = response.headers.get("ETag")
+        validator = etag if etag and not etag.startswith("W/") else response.headers.get("Last-Modified")
+        return size, accepts_ranges, validator
+
+    @staticmethod
+    def _remove_parts(output_path: str):
+        """删除目标文件的所有临时文件和来源记录"""
+        for path in glob.glob(f"{glob.escape(output_path)}.part*"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _discard_stale_parts(self, output_path: str, url: str, size: Optional[int], validator: Optional[str]):
+        """已有临时文件的来源与本次下载不一致（或无法确认）时丢弃，并记录本次下载的来源"""
+        source = {"url": url, "validator": validator, "size": size}
+        meta_path = f"{output_path}{PART_META_SUFFIX}"
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = None
+        if previous != source:
+            self._remove_parts(output_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(source, f)
+
+    def _download_single(self, url: str, output_path: str, size: Optional[int],
+                         accepts_ranges: bool, validator: Optional[str] = None) -> DownloadResult:
+        """单连接下载（支持断点续传）"""
+        part_path = f"{output_path}.part"
+        if not accepts_ranges and os.path.exists(part_path):
+            os.remove(part_path)
+        resumed = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size is not None and resumed > size:
+            os.remove(part_path)
+            resumed = 0
+
+        retries = self._fetch_range(url, part_path, 0, None if size is None else size - 1, validator)
+        actual_size = os.path.getsize(part_path)
+        self._finalize([part_path], output_path, size if size is not None else actual_size)
+        return DownloadResult(url, output_path, actual_size, 0.0,
+                              resumed_bytes=resumed, parts=1, retries=retries)
+
+    def _split_ranges(self, size: int) -> List[Tuple[int, int]]:
+        """将 [0, size) 切分为若干个闭区间字节范围"""
+        part_count = min(self.max_parts, max(1, size // (self.parallel_threshold // 2)))
+        part_size = -(-size // part_count)
+        return [
+            (i * part_size, min(size, (i + 1) * part_size) - 1)
+            for i in range(part_count)
+        ]
+
+    def _download_parallel(self, url: str, output_path: str, size: int,
+                           validator: Optional[str] = None) -> DownloadResult:
+        """按字节范围分段并行下载"""
+        ranges = [
+            (f"{output_path}.part{i}", start, end)
+            for i, (start, end) in enumerate(self._split_ranges(size))
+        ]
+        part_count = len(ranges)
+
+        resumed = 0
+        for part_path, start, end in ranges:
+            if os.path.exists(part_path):
+                existing = os.path.getsize(part_path)
+                if existing > end - start + 1:
+                    os.remove(part_path)
+                else:
+                    resumed += existing
+
+        with ThreadPoolExecutor(max_workers=part_count) as executor:
+            futures = [
+                executor.submit(self._fetch_range, url, part_path, start, end, validator)
+                for part_path, start, end in ranges
+            ]
+            retries = sum(future.result() for future in futures)
+
+        self._finalize([part_path for part_path, _, _ in ranges], output_path, size)
+        return DownloadResult(url, output_path, size, 0.0,
+                              resumed_bytes=resumed, parts=part_count, retries=retries)
+
+    def _fetch_range(self, url: str, part_path: str, start: int, end: Optional[int],
+                     validator: Optional[str] = None) -> int:
+        """
+        下载 [start, end] 字节范围到 part_path，已存在的部分会被跳过
+
+        validator 不为空时随 Range 发送 If-Range，文件已变化时服务端返回完整内容
+
+        Returns:
+            重试次数
+        """
+        policy = self.retry_policy
+        attempt = 0
+
+        while True:
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if end is not None and offset >= end - start + 1:
+                return attempt
+
+            headers = {}
+            if offset or start or end is not None:
+                range_end = "" if end is None else str(end)
+                headers["Range"] = f"bytes={start + offset}-{range_end}"
+                if validator:
+                    headers["If-Range"] = validator
+
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if policy.should_retry_status(response.status_code) and attempt < policy.max_retries:
+                        time.sleep(policy.delay(attempt, response.headers.get("Retry-After")))
+                        attempt += 1
+                        continue
+                    response.raise_for_status()
+
+                    if headers.get("Range") and response.status_code != 206:
+                        if start:
+                            raise Exception("Server ignored Range request for a partial download")
+                        # 服务端不支持续传，从头开始写
+                        mode = "wb"
+                    else:
+                        mode = "ab"
+
+                    with open(part_path, mode) as f:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            if chunk:
+                                f.write(chunk)
+                return attempt
+            except RETRYABLE_ERRORS:
+                if attempt >= policy.max_retries:
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+
+    def fetch_bytes(self, url: str) -> Tuple[memoryview, DownloadResult]:
+        """
+        下载文件到内存（不经过磁盘）
+
+        Args:
+            url: 文件 URL
+
+        Returns:
+            (文件内容的 memoryview, 下载结果)
+
+        Raises:
+            Exception: 下载失败或长度校验失败时
+        """
+        start_time = time.time()
+
+        size, accepts_ranges, _ = self._probe(url)
+        if size is None:
+            buffer, retries = self._read_unsized(url)
+            parts = 1
+        else:
+            buffer = bytearray(size)
+            view = memoryview(buffer)
+            if accepts_ranges and size >= self.parallel_threshold and self.max_parts > 1:
+                ranges = self._split_ranges(size)
+                parts = len(ranges)
+                with ThreadPoolExecutor(max_workers=parts) as executor:
+                    futures = [
+                        executor.submit(self._read_range, url, view[start:end + 1], start, True)
+                        for start, end in ranges
+                    ]
+                    retries = sum(future.result() for future in futures)
+            else:
+                retries = self._read_range(url, view, 0, accepts_ranges)
+                parts = 1
+
+        result = DownloadResult(url, None, len(buffer), time.time() - start_time,
+                                parts=parts, retries=retries)
+        self.stats.record(result)
+        # 结果可能被多个请求共享，返回只读视图
+        return memoryview(buffer).toreadonly(), result
+
+    def _read_range(self, url: str, view: memoryview, start: int, accepts_ranges: bool) -> int:
+        """
+        将从 start 开始、长度为 len(view) 的字节读入 view，中断后从已读位置继续
+
+        Returns:
+            重试次数
+        """
+        policy = self.retry_policy
+        length = len(view)
+        filled = 0
+        attempt = 0
+
+        while True:
+            headers = {}
+            if accepts_ranges:
+                headers["Range"] = f"bytes={start + filled}-{start + length - 1}"
+            else:
+                # 服务端不支持续传，只能从头读取
+                filled = 0
+
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if policy.should_retry_status(response.status_code) and attempt < policy.max_retries:
+                        time.sleep(policy.delay(attempt, response.headers.get("Retry-After")))
+                        attempt += 1
+                        continue
+                    response.raise_for_status()
+
+                    if headers and response.status_code != 206:
+                        if start:
+                            raise Exception("Server ignored Range request for a partial download")
+                        filled = 0
+
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        end = filled + len(chunk)
+                        if end > length:
+                            raise Exception(
+                                f"Downloaded size mismatch: expected {length} bytes, got more"
+                            )
+                        view[filled:end] = chunk
+                        filled = end
+
+                if filled != length:
+                    raise requests.exceptions.ChunkedEncodingError(
+                        f"Incomplete read: {filled} of {length} bytes"
+                    )
+                return attempt
+            except RETRYABLE_ERRORS:
+                if attempt >= policy.max_retries:
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+
+    def _read_unsized(self, url: str) -> Tuple[bytearray, int]:
+        """读取长度未知的响应（无法续传，失败时从头重试）"""
+        policy = self.retry_policy
+        attempt = 0
+
+        while True:
+            buffer = bytearray()
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    if policy.should_retry_status(response.status_code) and attempt < policy.max_retries:
+                        time.sleep(policy.delay(attempt, response.headers.get("Retry-After")))
+                        attempt += 1
+                        continue
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        buffer += chunk
+                return buffer, attempt
+            except RETRYABLE_ERRORS:
+                if attempt >= policy.max_retries:
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+
+    def _finalize(self, part_paths: List[str], output_path: str, expected_size: int):
+        """合并分段、校验长度并原子替换为目标文件"""
+        if len(part_paths) == 1:
+            tmp_path = part_paths[0]
+        else:
+            tmp_path = f"{output_path}.part"
+            with open(tmp_path, "wb") as out:
+                for part_path in part_paths:
+                    with open(part_path, "rb") as f:
+                        while True:
+                            block = f.read(1024 * 1024)
+                            if not block:
+                                break
+                            out.write(block)
+
+        actual_size = os.path.getsize(tmp_path)
+        if actual_size != expected_size:
+            os.remove(tmp_path)
+            raise Exception(
+                f"Downloaded size mismatch: expected {expected_size} bytes, got {actual_size} bytes"
+            )
+
+        os.replace(tmp_path, output_path)
+        for part_path in part_paths:
+            if part_path != tmp_path and os.path.exists(part_path):
+                os.remove(part_path)
+
+
+def iter_chunks(buffer: Union[bytes, bytearray, memoryview], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    按块遍历内存中的文件内容（用于流式 HTTP 响应，避免整体复制）
+
+    Args:
+        buffer: 文件内容
+        chunk_size: 分块大小（字节）
+
+    Yields:
+        文件内容分块
+    """
+    view = memoryview(buffer)
+    for offset in range(0, len(view), chunk_size):
+        yield view[offset:offset + chunk_size].tobytes()
+
+
+def write_atomic(data: Union[bytes, bytearray, memoryview], path: str):
+    """先写临时文件再原子替换为目标文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BackgroundWriter:
+    """后台写盘器
+
+    内存下载的图片交给后台线程写入磁盘（以及结果缓存），请求线程不必等待磁盘 I/O。
+    """
+
+    def __init__(self, max_workers: int = 1):
+        """
+        初始化后台写盘器
+
+        Args:
+            max_workers: 写盘线程数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-writer")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._written = 0
+        self._failed = 0
+        self._pending_paths: Dict[str, Future] = {}
+
+    def submit(self, task: Callable[[], Any], path: Optional[str] = None) -> Future:
+        """
+        提交一次写盘
+
+        Args:
+            task: 执行写盘的函数
+            path: 写入的目标文件路径（提供时可以用 flush 等待该文件写完）
+
+        Returns:
+            写盘完成时返回 task 返回值的 Future
+        """
+        with self._lock:
+            self._pending += 1
+            future = self._executor.submit(self._run, task)
+            if path is not None:
+                self._pending_paths[os.path.abspath(path)] = future
+        if path is not None:
+            # 写完后移除登记（已完成时回调会立即在当前线程执行，因此在锁外注册）
+            key = os.path.abspath(path)
+            future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key: str, future: Future):
+        with self._lock:
+            if self._pending_paths.get(key) is future:
+                del self._pending_paths[key]
+
+    def flush(self, path: str, timeout: Optional[float] = None) -> bool:
+        """
+        等待某个文件的后台写盘完成
+
+        Args:
+            path: 文件路径
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            没有未完成的写盘或写盘已完成时返回 True，超时返回 False
+        """
+        with self._lock:
+            future = self._pending_paths.get(os.path.abspath(path))
+        if future is None:
+            return True
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Python 3.11 之前 concurrent.futures.TimeoutError 不是内置 TimeoutError
+            return False
+        except Exception:
+            pass
+        return True
+
+    def when_written(self, path: str, callback: Callable[[], Any]):
+        """
+        在某个文件的后台写盘完成后执行回调（没有未完成的写盘时立即执行）
+
+        Args:
+            path: 文件路径
+            callback: 回调函数（写盘失败时不执行）
+        """
+        with self._lock:
+            future = self._pending_paths.get(os.path.abspath(path))
+        if future is None:
+            callback()
+            return
+
+        def run_callback(f: Future):
+            if f.exception() is None:
+                callback()
+        future.add_done_callback(run_callback)
+
+    def _run(self, task: Callable[[], Any]) -> Any:
+        try:
+            result = task()
+        except Exception as e:
+            with self._lock:
+                self._failed += 1
+            print(f"Background write failed: {e}")
+            raise
+        else:
+            with self._lock:
+                self._written += 1
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """获取写盘统计信息"""
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "written": self._written,
+                "failed": self._failed,
+            }
+
+
+# 进程内共享的后台写盘器
+_shared_writer: Optional[BackgroundWriter] = None
+_shared_writer_lock = threading.Lock()
+
+
+def get_shared_writer() -> BackgroundWriter:
+    """获取进程内共享的后台写盘器（首次调用时创建）"""
+    global _shared_writer
+    if _shared_writer is None:
+        with _shared_writer_lock:
+            if _shared_writer is None:
+                _shared_writer = BackgroundWriter()
+    return _shared_writer
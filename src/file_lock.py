@@ -0,0 +1,110 @@
+"""文件锁模块
+跨进程的独占文件锁，兼容 Windows 与类 Unix 系统
+"""
+
+import os
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """基于锁文件的跨进程独占锁
+
+    用法：
+
+        with FileLock(path):
+            ...
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = None, poll_interval: float = 0.1,
+                 unlink: bool = False):
+        """
+        初始化文件锁
+
+        Args:
+            path: 锁文件路径
+            timeout: 获取锁的超时时间（秒），None 表示一直等待
+            poll_interval: Windows 下重试获取锁的间隔（秒）
+            unlink: 释放前删除锁文件（按键创建的锁文件用完即删，目录不会无限增长；
+                Windows 下无法删除打开中的文件，此选项不生效）
+        """
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.unlink = unlink and fcntl is not None
+        self._fd: Optional[int] = None
+
+    def acquire(self):
+        """
+        获取锁
+
+        Raises:
+            TimeoutError: 超时仍未获取到锁时
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            while True:
+                try:
+                    if fcntl is not None:
+                        flags = fcntl.LOCK_EX if deadline is None else fcntl.LOCK_EX | fcntl.LOCK_NB
+                        fcntl.flock(fd, flags)
+                    else:
+                        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        os.close(fd)
+                        raise TimeoutError(f"Timed out waiting for lock: {self.path}")
+                    time.sleep(self.poll_interval)
+
+            if self.unlink and not self._is_current(fd):
+                # 等待期间上一个持有者删除了锁文件，锁住的是已删除的文件，重新打开
+                os.close(fd)
+                continue
+            self._fd = fd
+            return
+
+    def _is_current(self, fd: int) -> bool:
+        """fd 是否仍是 path 当前指向的文件"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+    def release(self):
+        """释放锁"""
+        if self._fd is None:
+            return
+        try:
+            if self.unlink:
+                # 持有锁时删除，等待者拿到锁后会发现文件已不是当前文件
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
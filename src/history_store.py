@@ -0,0 +1,268 @@
+"""生成历史模块
+生成记录追加写入 SQLite（WAL 模式），多个命令行进程和 Web 服务可以同时写入而不丢记录；
+按时间倒序分页查询，支持按主题和日期过滤，不必每次读取整个历史文件
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple, Union
+
+
+# 默认查询参数
+DEFAULT_PAGE_SIZE = 20      # 每页记录数
+MAX_PAGE_SIZE = 100         # 每页记录数上限
+
+# 旧版历史文件（整体读写的 JSON 数组），首次打开时导入
+LEGACY_HISTORY_FILE = "generation_history.json"
+
+
+def parse_time(value: Union[str, float, int, datetime, None], end_of_day: bool = False) -> Optional[float]:
+    """
+    将日期/时间转换为时间戳
+
+    Args:
+        value: ISO 日期（2024-01-01）、ISO 时间、datetime 或时间戳
+        end_of_day: 只给出日期时是否取当天结束（用于查询上界）
+
+    Returns:
+        时间戳，value 为空时返回 None
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        # 只有日期时包含当天
+        parsed += timedelta(days=1)
+    return parsed.timestamp()
+
+
+class HistoryStore:
+    """只追加的生成历史存储
+
+    SQLite 负责跨进程加锁（写入时持有数据库写锁，busy_timeout 内等待），
+    记录按自增 ID 排序，分页使用 before_id 游标，翻页不随历史增长变慢。
+    """
+
+    COLUMNS = ("id", "timestamp", "theme", "title", "output_path", "status", "extra")
+
+    def __init__(self, path: str):
+        """
+        初始化历史存储
+
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                theme TEXT NOT NULL,
+                title TEXT NOT NULL,
+                output_path TEXT,
+                status TEXT NOT NULL DEFAULT 'success',
+                extra TEXT
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_created ON history(created)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_history_theme ON history(theme, id)")
+        self._db.commit()
+
+        self._import_legacy(os.path.join(os.path.dirname(os.path.abspath(path)), LEGACY_HISTORY_FILE))
+
+    def _import_legacy(self, legacy_path: str):
+        """历史表为空时导入旧版 JSON 历史文件（只导入一次）"""
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            # BEGIN IMMEDIATE 取得写锁，避免多个进程同时导入
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("SELECT 1 FROM history LIMIT 1").fetchone() is None:
+                    for record in records:
+                        self._insert(record)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def _insert(self, record: Dict[str, Any]) -> int:
+        """写入一条记录（调用方需持有锁并负责提交）"""
+        timestamp = record.get("timestamp") or datetime.now().isoformat()
+        try:
+            created = datetime.fromisoformat(timestamp).timestamp()
+        except ValueError:
+            created = time.time()
+        known = {"timestamp", "theme", "title", "output_path", "status"}
+        extra = {name: value for name, value in record.items() if name not in known}
+        cursor = self._db.execute(
+            """INSERT INTO history (created, timestamp, theme, title, output_path, status, extra)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (created, timestamp, record.get("theme", ""), record.get("title", ""),
+             record.get("output_path"), record.get("status", "success"),
+             json.dumps(extra, ensure_ascii=False) if extra else None)
+        )
+        return cursor.lastrowid
+
+    def append(self, theme: str, title: str, output_path: Optional[str],
+               status: str = "success", **extra) -> int:
+        """
+        追加一条生成记录
+
+        Args:
+            theme: 主题
+            title: 标题
+            output_path: 图片路径
+            status: 生成状态
+            **extra: 其他信息（如 task_id），需可 JSON 序列化
+
+        Returns:
+            记录 ID
+        """
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "theme": theme,
+            "title": title,
+            "output_path": output_path,
+            "status": status,
+            **extra
+        }
+        with self._lock:
+            record_id = self._insert(record)
+            self._db.commit()
+        return record_id
+
+    def query(
+        self,
+        theme: Optional[str] = None,
+        since: Union[str, float, datetime, None] = None,
+        until: Union[str, float, datetime, None] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        按时间倒序查询历史
+
+        Args:
+            theme: 只返回该主题的记录
+            since: 起始日期/时间（包含）
+            until: 结束日期/时间（只给日期时包含当天）
+            limit: 返回条数（不超过 MAX_PAGE_SIZE）
+            before_id: 分页游标，只返回 ID 小于该值的记录（传入上一页最后一条的 ID）
+
+        Returns:
+            记录列表（最新的在前）
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        return self._select(theme, since, until, limit, before_id)
+
+    def page(
+        self,
+        theme: Optional[str] = None,
+        since: Union[str, float, datetime, None] = None,
+        until: Union[str, float, datetime, None] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        before_id: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        分页查询历史（参数同 query）
+
+        Returns:
+            (记录列表, 下一页游标)，没有更多记录时游标为 None
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        records = self._select(theme, since, until, limit + 1, before_id)
+        if len(records) > limit:
+            records = records[:limit]
+            return records, records[-1]["id"]
+        return records, None
+
+    def _select(self, theme, since, until, limit: int, before_id: Optional[int]) -> List[Dict[str, Any]]:
+        """按条件查询记录（最新的在前）"""
+        conditions, args = [], []
+        if theme:
+            conditions.append("theme = ?")
+            args.append(theme)
+        since_ts = parse_time(since)
+        if since_ts is not None:
+            conditions.append("created >= ?")
+            args.append(since_ts)
+        until_ts = parse_time(until, end_of_day=True)
+        if until_ts is not None:
+            conditions.append("created < ?")
+            args.append(until_ts)
+        if before_id is not None:
+            conditions.append("id < ?")
+            args.append(before_id)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM history {where} ORDER BY id DESC LIMIT ?",
+                (*args, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def themes(self) -> List[Dict[str, Any]]:
+        """各主题的记录数（按记录数降序）"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT theme, COUNT(*) FROM history GROUP BY theme ORDER BY COUNT(*) DESC"
+            ).fetchall()
+        return [{"theme": theme, "count": count} for theme, count in rows]
+
+    def count(self) -> int:
+        """记录总数"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def _to_dict(self, row) -> Dict[str, Any]:
+        record = dict(zip(self.COLUMNS, row))
+        extra = record.pop("extra")
+        if extra:
+            record.update(json.loads(extra))
+        return record
+
+
+def default_history_store_path() -> str:
+    """默认的历史数据库路径（outputs/history/history.sqlite3）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "outputs", "history", "history.sqlite3"
+    )
+
+
+# 进程内共享的历史存储
+_shared_store: Optional[HistoryStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_history_store() -> HistoryStore:
+    """获取进程内共享的历史存储（首次调用时创建）"""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = HistoryStore(default_history_store_path())
+    return _shared_store
@@ -0,0 +1,205 @@
+"""HTTP 连接池模块
+为 APIClient 提供进程内共享的 keep-alive 连接池
+"""
+
+import threading
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 默认连接池参数
+DEFAULT_POOL_CONNECTIONS = 4    # 每个会话缓存的主机连接池数量
+DEFAULT_API_POOL_MAXSIZE = 32   # api.kie.ai 每个主机的最大连接数
+DEFAULT_CDN_POOL_MAXSIZE = 16   # 结果图片 CDN 每个主机的最大连接数
+
+# 连接池名称
+API_POOL = "api"
+CDN_POOL = "cdn"
+
+
+class ConnectionPool:
+    """按用途划分的 HTTP 连接池
+
+    API 请求（createTask / recordInfo）和结果图片下载分别使用独立的
+    requests.Session，避免大文件下载占满 API 轮询所需的连接。
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        api_pool_maxsize: int = DEFAULT_API_POOL_MAXSIZE,
+        cdn_pool_maxsize: int = DEFAULT_CDN_POOL_MAXSIZE
+    ):
+        """
+        初始化连接池
+
+        Args:
+            pool_connections: 每个会话缓存的主机连接池数量
+            api_pool_maxsize: API 主机的最大连接数
+            cdn_pool_maxsize: CDN 主机的最大连接数
+        """
+        self.pool_connections = pool_connections
+        self.pool_sizes = {
+            API_POOL: api_pool_maxsize,
+            CDN_POOL: cdn_pool_maxsize,
+        }
+        self._sessions: Dict[str, requests.Session] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _create_session(self, name: str) -> requests.Session:
+        """创建带连接池适配器的会话"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_sizes[name],
+            pool_block=False
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # requests 默认即为 keep-alive，这里显式声明
+        session.headers["Connection"] = "keep-alive"
+        session.hooks["response"].append(self._make_counter(name))
+        return session
+
+    def _make_counter(self, name: str):
+        """生成统计请求次数的响应钩子"""
+        def count_response(response, *args, **kwargs):
+            with self._lock:
+                self._request_counts[name] = self._request_counts.get(name, 0) + 1
+            return response
+        return count_response
+
+    def session(self, name: str) -> requests.Session:
+        """
+        获取指定用途的会话（按需创建）
+
+        Args:
+            name: 连接池名称（"api" 或 "cdn"）
+
+        Returns:
+            requests.Session 实例
+        """
+        if name not in self.pool_sizes:
+            raise ValueError(f"Unknown connection pool: {name}")
+
+        session = self._sessions.get(name)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(name)
+                if session is None:
+                    session = self._create_session(name)
+                    self._sessions[name] = session
+        return session
+
+    @property
+    def api_session(self) -> requests.Session:
+        """API 主机会话"""
+        return self.session(API_POOL)
+
+    @property
+    def cdn_session(self) -> requests.Session:
+        """结果 CDN 会话"""
+        return self.session(CDN_POOL)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        Returns:
+            每个连接池的请求数、新建连接数和连接复用率
+        """
+        result = {}
+        total_requests = 0
+        total_connections = 0
+
+        with self._lock:
+            sessions = dict(self._sessions)
+            request_counts = dict(self._request_counts)
+
+        for name in self.pool_sizes:
+            hosts = {}
+            connections = 0
+            session = sessions.get(name)
+            if session is not None:
+                adapter = session.get_adapter("https://")
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    host_pool = pools.get(key)
+                    if host_pool is None:
+                        continue
+                    hosts[host_pool.host] = {
+                        "connections_opened": host_pool.num_connections,
+                        "requests": host_pool.num_requests,
+                    }
+                    connections += host_pool.num_connections
+
+            requests_made = request_counts.get(name, 0)
+            result[name] = {
+                "pool_maxsize": self.pool_sizes[name],
+                "requests": requests_made,
+                "connections_opened": connections,
+                "reuse_ratio": _reuse_ratio(requests_made, connections),
+                "hosts": hosts,
+            }
+            total_requests += requests_made
+            total_connections += connections
+
+        result["total"] = {
+            "requests": total_requests,
+            "connections_opened": total_connections,
+            "reuse_ratio": _reuse_ratio(total_requests, total_connections),
+        }
+        return result
+
+    def close(self):
+        """关闭所有会话及其连接"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+def _reuse_ratio(requests_made: int, connections: int) -> float:
+    """计算连接复用率（复用的请求数 / 总请求数）"""
+    if requests_made <= 0:
+        return 0.0
+    reused = max(requests_made - connections, 0)
+    return round(reused / requests_made, 4)
+
+
+# 进程内共享的连接池
+_shared_pool: Optional[ConnectionPool] = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool() -> ConnectionPool:
+    """获取进程内共享的连接池（首次调用时创建）"""
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_pool_lock:
+            if _shared_pool is None:
+                _shared_pool = ConnectionPool()
+    return _shared_pool
+
+
+def configure_shared_pool(**kwargs) -> ConnectionPool:
+    """
+    重新配置共享连接池
+
+    Args:
+        **kwargs: ConnectionPool 的构造参数
+
+    Returns:
+        新的共享连接池
+    """
+    global _shared_pool
+    with _shared_pool_lock:
+        old_pool = _shared_pool
+        _shared_pool = ConnectionPool(**kwargs)
+    if old_pool is not None:
+        old_pool.close()
+    return _shared_pool
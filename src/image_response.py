@@ -0,0 +1,163 @@
+"""图片响应模块
+Web 版本统一通过 URL 提供生成的图片：响应带 ETag、Last-Modified、Cache-Control，
+并支持条件请求（304）和 Range 请求（206），JSON 中只在显式要求时才内嵌 Base64；
+带 size 参数（thumb/preview）时返回缩略图或预览图
+"""
+
+import base64
+import mimetypes
+import os
+from typing import Optional, Union
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    from .derivatives import get_shared_pipeline
+    from .downloader import iter_chunks
+except ImportError:
+    from derivatives import get_shared_pipeline
+    from downloader import iter_chunks
+
+
+# 生成的图片按唯一的任务 ID / 文件名提供，内容不会再变化，浏览器可以长期缓存
+IMAGE_MAX_AGE = 7 * 24 * 3600
+
+# 显式要求在 JSON 中内嵌 Base64 的查询参数，例如 /api/status/<task_id>?include_base64=1
+BASE64_QUERY_FLAG = "include_base64"
+
+# 选择衍生尺寸的查询参数，例如 /outputs/<文件名>?size=thumb
+SIZE_QUERY_PARAM = "size"
+
+
+def wants_base64() -> bool:
+    """当前请求是否显式要求在 JSON 中内嵌 Base64 图片"""
+    return request.args.get(BASE64_QUERY_FLAG, "").lower() in ("1", "true", "yes")
+
+
+def encode_base64(source: Union[str, bytes, bytearray, memoryview]) -> str:
+    """
+    将图片编码为 Base64 字符串
+
+    Args:
+        source: 图片文件路径或图片内容
+
+    Returns:
+        Base64 字符串（不含 data: 前缀）
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = f.read()
+    return base64.b64encode(source).decode("utf-8")
+
+
+def send_image(
+    path: str,
+    download_name: Optional[str] = None,
+    mimetype: Optional[str] = None,
+    max_age: int = IMAGE_MAX_AGE
+):
+    """
+    以静态文件方式返回图片
+
+    由 send_file 从磁盘流式发送，并处理 If-None-Match / If-Modified-Since / Range 请求。
+
+    Args:
+        path: 图片文件路径
+        download_name: 下载文件名（提供时作为附件下载）
+        mimetype: MIME 类型（默认按扩展名推断）
+        max_age: 浏览器缓存时间（秒）
+
+    Returns:
+        Flask 响应
+    """
+    response = send_file(
+        os.path.abspath(path),
+        mimetype=mimetype,
+        as_attachment=download_name is not None,
+        download_name=download_name,
+        conditional=True,
+        etag=True,
+        max_age=max_age
+    )
+    response.cache_control.immutable = True
+    return response
+
+
+def send_image_buffer(
+    data: Union[bytes, bytearray, memoryview],
+    path: str,
+    download_name: Optional[str] = None
+):
+    """
+    从内存返回图片（后台写盘尚未完成时使用，不必等待写盘后再读回）
+
+    不允许缓存：写盘完成后同一 URL 改由 send_image 从磁盘返回，带 ETag 和长期缓存。
+
+    Args:
+        data: 图片内容
+        path: 图片将要写入的路径（用于推断 MIME 类型）
+        download_name: 下载文件名（提供时作为附件下载）
+
+    Returns:
+        Flask 响应
+    """
+    response = Response(iter_chunks(data), mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream")
+    response.content_length = memoryview(data).nbytes
+    if download_name is not None:
+        response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    response.cache_control.no_cache = True
+    return response
+
+
+def requested_size() -> Optional[str]:
+    """当前请求要求的衍生尺寸（未指定或为 original 时返回 None，未知尺寸返回 400）"""
+    size = request.args.get(SIZE_QUERY_PARAM, "").lower()
+    if not size or size == "original":
+        return None
+    if size not in get_shared_pipeline().sizes:
+        abort(400, description=f"Unknown size: {size}")
+    return size
+
+
+def send_image_variant(path: str, mimetype: Optional[str] = None):
+    """
+    按请求的 size 参数返回原图或衍生图
+
+    衍生图还没生成时先返回原图，但不允许缓存，生成后同一 URL 即可拿到小图。
+
+    Args:
+        path: 原图路径
+        mimetype: 原图的 MIME 类型
+
+    Returns:
+        Flask 响应
+    """
+    size = requested_size()
+    if size is None:
+        return send_image(path, mimetype=mimetype)
+
+    derivative = get_shared_pipeline().get(path, size)
+    if derivative is None:
+        response = send_image(path, mimetype=mimetype, max_age=0)
+        response.cache_control.immutable = False
+        response.cache_control.no_cache = True
+        return response
+    return send_image(derivative)
+
+
+def send_output_file(directory: str, filename: str):
+    """
+    返回输出目录中的图片（文件名不能跳出目录，不存在时返回 404，支持 size 参数）
+
+    Args:
+        directory: 输出目录
+        filename: 文件名
+
+    Returns:
+        Flask 响应
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    return send_image_variant(path)
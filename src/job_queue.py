@@ -0,0 +1,534 @@
+"""生成任务队列模块
+有界线程池执行生成任务，队列满时拒绝新任务并给出预计等待时间；
+任务持久化到 SQLite，进程重启后重新接管已提交到上游的任务
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+
+
+# 默认队列参数
+DEFAULT_MAX_WORKERS = 4         # 同时执行的生成任务数
+DEFAULT_MAX_PENDING = 64        # 排队等待的任务数上限
+DEFAULT_JOB_SECONDS = 60.0      # 尚无完成记录时假定的单个任务耗时（秒）
+DEFAULT_JOB_TTL = 7 * 24 * 3600 # 已结束任务的保留时间（秒）
+DEFAULT_MAX_JOBS = 10000        # 最多保留的已结束任务数
+PRUNE_INTERVAL = 60.0           # 清理已结束任务的最小间隔（秒）
+DEFAULT_JOB_LEASE = 60.0        # 任务租约时长（秒）：持有者停止续约超过该时间后其他进程可以接管
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCESS = "success"
+STATUS_ERROR = "error"
+UNFINISHED_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+
+class QueueFullError(Exception):
+    """队列已满"""
+
+    def __init__(self, estimated_wait: float):
+        super().__init__(f"Job queue is full, estimated wait {estimated_wait:.0f}s")
+        self.estimated_wait = estimated_wait
+
+
+def new_owner_id() -> str:
+    """进程（队列实例）的唯一标识：主机名、进程号和随机后缀，进程号被复用时也不会冲突"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobStore:
+    """基于 SQLite（WAL 模式）的任务存储
+
+    多个进程（如 gunicorn 的多个 worker）可以共用同一个数据库：未完成的任务由 owner 和 lease_until
+    标记归属，持有者定期续约，只有无主或租约已过期的任务才能被接管。
+    """
+
+    COLUMNS = ("job_id", "status", "params", "kie_task_id", "output_path",
+               "message", "error", "created", "updated", "owner", "lease_until")
+
+    def __init__(self, path: str):
+        """
+        初始化任务存储
+
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                kie_task_id TEXT,
+                output_path TEXT,
+                message TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL,
+                owner TEXT,
+                lease_until REAL
+            )"""
+        )
+        # 旧版本创建的数据库没有归属字段
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._db.commit()
+
+    def add(self, job_id: str, params: Dict[str, Any], status: str = STATUS_QUEUED, **fields):
+        """
+        新增任务
+
+        Args:
+            job_id: 任务 ID
+            params: 任务参数（需可 JSON 序列化）
+            status: 初始状态
+            **fields: 其他字段（output_path, message 等）
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO jobs (job_id, status, params, kie_task_id, output_path, message, error, created, updated,
+                                     owner, lease_until)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, status, json.dumps(params, ensure_ascii=False),
+                 fields.get("kie_task_id"), fields.get("output_path"),
+                 fields.get("message"), fields.get("error"), now, now,
+                 fields.get("owner"), fields.get("lease_until"))
+            )
+            self._db.commit()
+
+    def update(self, job_id: str, **fields):
+        """
+        更新任务字段
+
+        Args:
+            job_id: 任务 ID
+            **fields: 要更新的字段
+        """
+        fields = {name: value for name, value in fields.items() if name in self.COLUMNS and name != "job_id"}
+        if not fields:
+            return
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?",
+                (*fields.values(), job_id)
+            )
+            self._db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询任务
+
+        Args:
+            job_id: 任务 ID
+
+        Returns:
+            任务字典，不存在时返回 None
+        """
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """获取所有未完成的任务（按创建时间排序）"""
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN ({placeholders}) ORDER BY created",
+                UNFINISHED_STATUSES
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim_unfinished(self, owner: str, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        接管无主或租约已过期的未完成任务（在一个写事务中查询并改写归属，多个进程同时接管也不会重复）
+
+        Args:
+            owner: 接管者标识
+            lease_seconds: 租约时长（秒）
+
+        Returns:
+            本次接管的任务（按创建时间排序）
+        """
+        now = time.time()
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    f"""SELECT {', '.join(self.COLUMNS)} FROM jobs
+                        WHERE status IN ({placeholders})
+                          AND (owner IS NULL OR lease_until IS NULL OR lease_until < ?)
+                        ORDER BY created""",
+                    (*UNFINISHED_STATUSES, now)
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE jobs SET owner = ?, lease_until = ?, updated = ? WHERE job_id = ?",
+                    [(owner, now + lease_seconds, now, row[0]) for row in rows]
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        jobs = [self._to_dict(row) for row in rows]
+        for job in jobs:
+            job.update(owner=owner, lease_until=now + lease_seconds)
+        return jobs
+
+    def renew_leases(self, owner: str, lease_seconds: float) -> int:
+        """
+        为持有的未完成任务续约
+
+        Args:
+            owner: 持有者标识
+            lease_seconds: 租约时长（秒）
+
+        Returns:
+            续约的任务数
+        """
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        with self._lock:
+            renewed = self._db.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND status IN ({placeholders})",
+                (time.time() + lease_seconds, owner, *UNFINISHED_STATUSES)
+            ).rowcount
+            self._db.commit()
+        return renewed
+
+    def prune(self, ttl: float, max_rows: int) -> int:
+        """
+        清理已结束的任务（未完成的任务不会被清理）
+
+        Args:
+            ttl: 已结束任务的保留时间（秒）
+            max_rows: 最多保留的已结束任务数
+
+        Returns:
+            删除的任务数
+        """
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        with self._lock:
+            deleted = self._db.execute(
+                f"DELETE FROM jobs WHERE status NOT IN ({placeholders}) AND updated < ?",
+                (*UNFINISHED_STATUSES, time.time() - ttl)
+            ).rowcount
+            deleted += self._db.execute(
+                f"""DELETE FROM jobs WHERE job_id IN (
+                        SELECT job_id FROM jobs WHERE status NOT IN ({placeholders})
+                        ORDER BY updated DESC LIMIT -1 OFFSET ?
+                    )""",
+                (*UNFINISHED_STATUSES, max_rows)
+            ).rowcount
+            self._db.commit()
+        return deleted
+
+    def size_bytes(self) -> int:
+        """数据库文件（含 WAL）占用的磁盘空间"""
+        return sum(
+            os.path.getsize(path)
+            for path in (self.path, f"{self.path}-wal")
+            if os.path.exists(path)
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _to_dict(self, row) -> Dict[str, Any]:
+        job = dict(zip(self.COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        return job
+
+
+class JobQueue:
+    """有界、持久化的生成任务队列
+
+    handler(job, report) 执行单个任务：job 为任务字典（重新接管时带有 kie_task_id），
+    report(**fields) 用于在执行过程中持久化 kie_task_id、message 等字段；
+    handler 返回的字典会在成功时写入任务记录。
+
+    提交和接管的任务记录本队列为 owner，后台线程定期续约；多个进程共用同一个存储时，
+    recover 只接管无主或租约已过期（持有者已退出）的任务，之后每次续约时继续接管新过期的任务。
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any], Callable[..., None]], Optional[Dict[str, Any]]],
+        store: JobStore,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        ttl: float = DEFAULT_JOB_TTL,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        on_status: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+        lease_seconds: float = DEFAULT_JOB_LEASE
+    ):
+        """
+        初始化任务队列
+
+        Args:
+            handler: 执行单个任务的函数
+            store: 任务存储
+            max_workers: 同时执行的任务数
+            max_pending: 排队等待的任务数上限（超过时拒绝新任务）
+            ttl: 已结束任务的保留时间（秒）
+            max_jobs: 最多保留的已结束任务数
+            on_status: 任务状态变化时以 (job_id, status, fields) 调用的函数
+            lease_seconds: 任务租约时长（秒），每三分之一租约续约一次
+        """
+        self.handler = handler
+        self.store = store
+        self.max_workers = max(max_workers, 1)
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.on_status = on_status
+        self.lease_seconds = lease_seconds
+        self.owner = new_owner_id()
+        self._last_prune = 0.0
+        self._pruned = 0
+
+        # 续约线程：首次提交或接管任务时启动（只导入模块的进程，如调试重载器的监控进程，不会接管任务）
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._recovering = False
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job-worker")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+
+        # 统计信息
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._recovered = 0
+        self._average_seconds = DEFAULT_JOB_SECONDS
+
+    def recover(self) -> int:
+        """
+        接管并重新提交无主或持有者已退出（租约过期）的未完成任务
+
+        已提交到上游（带 kie_task_id）的任务会继续等待原任务，不会重复提交；
+        其他进程仍在续约的任务不会被接管。调用后续约线程也会定期接管新过期的任务。
+
+        Returns:
+            重新提交的任务数
+        """
+        with self._lock:
+            self._recovering = True
+        self._ensure_heartbeat()
+        return self._claim()
+
+    def _claim(self) -> int:
+        """接管租约已过期的任务并加入队列"""
+        jobs = self.store.claim_unfinished(self.owner, self.lease_seconds)
+        for job in jobs:
+            self.store.update(job["job_id"], status=STATUS_QUEUED, message="服务重启，任务已恢复")
+            self._notify(job["job_id"], STATUS_QUEUED, {"message": "服务重启，任务已恢复"})
+            self._enqueue(job["job_id"])
+        with self._lock:
+            self._recovered += len(jobs)
+        return len(jobs)
+
+    def _ensure_heartbeat(self):
+        """启动续约线程（重复调用无副作用）"""
+        with self._lock:
+            if self._heartbeat is not None or self._stopping.is_set():
+                return
+            self._heartbeat = threading.Thread(target=self._renew_loop, name="job-lease", daemon=True)
+            self._heartbeat.start()
+
+    def _renew_loop(self):
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew_leases(self.owner, self.lease_seconds)
+                with self._lock:
+                    recovering = self._recovering
+                if recovering:
+                    self._claim()
+            except Exception as e:
+                # 单次续约失败不影响后续续约（数据库暂时被锁等）
+                print(f"Warning: job lease renewal failed: {e}")
+
+    def submit(self, job_id: str, params: Dict[str, Any], message: Optional[str] = None) -> Dict[str, Any]:
+        """
+        提交任务
+
+        Args:
+            job_id: 任务 ID
+            params: 任务参数（需可 JSON 序列化）
+            message: 初始状态说明
+
+        Returns:
+            任务字典
+
+        Raises:
+            QueueFullError: 排队任务数达到上限时
+        """
+        with self._lock:
+            if self._queued >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(self._estimate_wait_locked())
+            self._queued += 1
+
+        self._ensure_heartbeat()
+        try:
+            self.store.add(job_id, params, status=STATUS_QUEUED, message=message,
+                           owner=self.owner, lease_until=time.time() + self.lease_seconds)
+        except Exception:
+            # 任务没有写入存储，也不会执行，归还排队名额
+            with self._lock:
+                self._queued -= 1
+            raise
+        self._notify(job_id, STATUS_QUEUED, {"message": message})
+        self._executor.submit(self._run, job_id)
+        self._maybe_prune()
+        return self.store.get(job_id)
+
+    def record(self, job_id: str, params: Dict[str, Any], status: str, **fields):
+        """
+        直接记录一个无需执行的任务（例如命中缓存）
+
+        Args:
+            job_id: 任务 ID
+            params: 任务参数
+            status: 任务状态
+            **fields: 其他字段
+        """
+        self.store.add(job_id, params, status=status, **fields)
+        self._notify(job_id, status, fields)
+        self._maybe_prune()
+
+    def _notify(self, job_id: str, status: str, fields: Dict[str, Any]):
+        """调用状态变化回调（回调出错不影响任务本身）"""
+        if self.on_status is None:
+            return
+        try:
+            self.on_status(job_id, status, fields)
+        except Exception as e:
+            print(f"Warning: status callback failed for job {job_id}: {e}")
+
+    def _maybe_prune(self):
+        """定期清理过期和超出数量上限的已结束任务"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        deleted = self.store.prune(self.ttl, self.max_jobs)
+        with self._lock:
+            self._pruned += deleted
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务"""
+        return self.store.get(job_id)
+
+    def _enqueue(self, job_id: str):
+        with self._lock:
+            self._queued += 1
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str):
+        """在工作线程中执行任务"""
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        start_time = time.time()
+
+        try:
+            job = self.store.get(job_id)
+            if job is None:
+                raise Exception("Job record not found")
+            self.store.update(job_id, status=STATUS_RUNNING)
+            self._notify(job_id, STATUS_RUNNING, {})
+            result = self.handler(job, lambda **fields: self.store.update(job_id, **fields)) or {}
+            self.store.update(job_id, status=STATUS_SUCCESS, error=None, **result)
+            self._notify(job_id, STATUS_SUCCESS, result)
+            succeeded = True
+        except Exception as e:
+            self.store.update(job_id, status=STATUS_ERROR, error=str(e), message="生成失败")
+            self._notify(job_id, STATUS_ERROR, {"error": str(e), "message": "生成失败"})
+            succeeded = False
+
+        with self._lock:
+            self._running -= 1
+            if succeeded:
+                self._completed += 1
+                # 指数移动平均，用于估算排队等待时间
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * (time.time() - start_time)
+            else:
+                self._failed += 1
+
+    def _estimate_wait_locked(self) -> float:
+        """估算新任务需要等待的时间（调用方需持有锁）"""
+        ahead = self._queued + self._running
+        rounds = ahead // self.max_workers + 1
+        return rounds * self._average_seconds
+
+    def estimated_wait(self) -> float:
+        """估算新任务需要等待的时间（秒）"""
+        with self._lock:
+            return self._estimate_wait_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取队列统计信息"""
+        with self._lock:
+            stats = {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "recovered": self._recovered,
+                "pruned": self._pruned,
+                "average_job_seconds": round(self._average_seconds, 1),
+                "estimated_wait_seconds": round(self._estimate_wait_locked(), 1),
+            }
+        stats["stored"] = self.store.counts()
+        stats["store_bytes"] = self.store.size_bytes()
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """停止接收任务并关闭线程池（未执行完的任务在租约过期后由其他进程接管）"""
+        self._stopping.set()
+        self._executor.shutdown(wait=wait)
+
+
+def default_job_store_path(name: str = "jobs") -> str:
+    """
+    默认的任务数据库路径（outputs/jobs/<name>.sqlite3）
+
+    Args:
+        name: 数据库名称（不同的 Web 服务应使用不同的名称，避免互相接管任务）
+
+    Returns:
+        数据库文件路径
+    """
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "outputs", "jobs", f"{name}.sqlite3"
+    )
@@ -13,7 +13,14 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from prompt_generator import PromptGenerator
-from api_client import APIClient
+from api_client import APIClient, default_output_path
+from poll_schedule import get_shared_schedule
+from callback_receiver import CallbackServer, get_shared_registry, DEFAULT_CALLBACK_PORT, DEFAULT_CALLBACK_HOST
+from history_store import get_shared_history_store
+from batch_runner import (BatchRunner, load_manifest, default_results_path,
+                          DEFAULT_CONCURRENCY, DEFAULT_RATE_PER_MINUTE)
+from task_journal import get_shared_journal, upstream_failure
+from curriculum_planner import CurriculumPlanner, load_character_list, default_plan_path, write_plan_manifest
 
 
 def print_banner():
@@ -50,36 +57,148 @@ def print_info(message: str):
 
 
 def save_history(theme: str, title: str, output_path: str):
-    """保存生成历史"""
-    history_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs", "history")
-    os.makedirs(history_dir, exist_ok=True)
+    """保存生成历史（追加写入共享的历史数据库，多个进程同时运行也不会丢记录）"""
+    get_shared_history_store().append(theme, title, output_path)
 
-    history_file = os.path.join(history_dir, "generation_history.json")
 
-    import json
-    from datetime import datetime
+def run_resume(args, api_key: str):
+    """继续完成任务日志中已创建但尚未下载的任务"""
+    journal = get_shared_journal()
+    tasks = journal.unfinished()
+    if not tasks:
+        print_info("没有需要恢复的任务")
+        journal.compact()
+        return
 
-    # 读取现有历史
-    history = []
-    if os.path.exists(history_file):
+    print_info(f"发现 {len(tasks)} 个未完成的任务")
+    client = APIClient(api_key, base_url=os.getenv("KIE_API_BASE_URL"))
+    failed = 0
+    for task in tasks:
+        task_id = task["task_id"]
+        label = f"{task.get('theme', '')} {task.get('title', '')}".strip() or task_id
+        print_info(f"\n恢复任务 {task_id}（{label}）")
         try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        except:
-            history = []
+            # 上游任务已失败时不再等待
+            error = upstream_failure(client, task_id)
+            if error is not None:
+                journal.failed(task_id, error)
+                print_warning(f"任务已失败：{error}")
+                failed += 1
+                continue
+
+            output_path = client.generate_image(
+                prompt=task["prompt"],
+                output_path=task["output_path"],
+                use_cache=not args.no_cache,
+                resume_task_id=task_id,
+                **task["params"]
+            )
+            journal.completed(task_id, output_path)
+            if task.get("theme") and task.get("title"):
+                save_history(task["theme"], task["title"], output_path)
+            print_success(f"已下载：{output_path}")
+        except KeyboardInterrupt:
+            print_error("\n用户中断了恢复过程")
+            sys.exit(1)
+        except Exception as e:
+            # 网络等临时错误保留在日志中，下次 --resume 继续
+            print_error(f"恢复失败：{str(e)}")
+            failed += 1
+
+    remaining = journal.compact()
+    print_success(f"恢复完成：成功 {len(tasks) - failed} 个")
+    if remaining:
+        print_warning(f"仍有 {remaining} 个任务未完成，可稍后再次运行 --resume")
+        sys.exit(1)
 
-    # 添加新记录
-    history.append({
-        "timestamp": datetime.now().isoformat(),
-        "theme": theme,
-        "title": title,
-        "output_path": output_path
-    })
 
-    # 保存历史（最多保留 100 条）
-    history = history[-100:]
-    with open(history_file, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+def run_batch(args, api_key: str, prompt_generator: PromptGenerator):
+    """按清单批量生成"""
+    try:
+        entries = load_manifest(args.batch, defaults={
+            "ratio": args.ratio,
+            "resolution": args.resolution,
+            "format": args.format
+        })
+    except (OSError, ValueError) as e:
+        print_error(f"读取清单失败：{str(e)}")
+        sys.exit(1)
+
+    results_path = args.batch_results or default_results_path(args.batch)
+    print_info(f"清单：{args.batch}（{len(entries)} 张）")
+    print_info(f"并发数：{args.concurrency}，提交速率：{args.rate_limit or '不限'} 张/分钟")
+    print_info(f"结果清单：{results_path}")
+
+    client = APIClient(api_key, base_url=os.getenv("KIE_API_BASE_URL"))
+    callback_options = {}
+    if args.callback_url:
+        CallbackServer(get_shared_registry(), host=args.callback_host, port=args.callback_port).start()
+        callback_options = {
+            "callback_url": args.callback_url,
+            "callback_registry": get_shared_registry()
+        }
+
+    runner = BatchRunner(
+        client,
+        prompt_generator,
+        output_dir=args.output,
+        concurrency=args.concurrency,
+        rate_per_minute=args.rate_limit,
+        use_cache=not args.no_cache,
+        on_success=lambda entry, output_path: save_history(entry["theme"], entry["title"], output_path),
+        journal=get_shared_journal(),
+        **callback_options
+    )
+
+    try:
+        summary = runner.run(entries, results_path)
+    except KeyboardInterrupt:
+        print_error("\n用户中断了批量生成，重新运行同一命令即可继续")
+        sys.exit(1)
+    finally:
+        # 批量结束后只保留未下载的任务，日志不会随批次无限增长
+        runner.journal.compact()
+
+    if summary["skipped"]:
+        print_info(f"跳过已完成的 {summary['skipped']} 张")
+    print_success(f"成功 {summary['succeeded']} 张，用时 {summary['seconds']:.0f} 秒")
+    if summary["failed"]:
+        print_error(f"失败 {summary['failed']} 张，重新运行同一命令会重试失败的条目")
+        sys.exit(1)
+
+
+def run_plan(args, prompt_generator: PromptGenerator) -> str:
+    """按目标汉字表规划最少的小报并写出批量清单，返回清单路径"""
+    try:
+        characters = load_character_list(args.plan_curriculum)
+    except OSError as e:
+        print_error(f"读取汉字表失败：{str(e)}")
+        sys.exit(1)
+    if not characters:
+        print_error(f"汉字表中没有汉字：{args.plan_curriculum}")
+        sys.exit(1)
+
+    planner = CurriculumPlanner(prompt_generator.vocab_manager)
+    plan = planner.plan("".join(characters), max_posters=args.max_posters)
+
+    print_info(f"目标 {plan['targets']} 字，候选场景 {plan['candidates']} 个，用时 {plan['seconds']:.2f} 秒")
+    for i, poster in enumerate(plan["posters"], 1):
+        print(f"  {i:2d}. {poster['theme']}  +{len(poster['characters'])} 字：{''.join(poster['characters'])}")
+    print_success(f"{len(plan['posters'])} 张小报覆盖 {plan['covered']}/{plan['targets']} 字")
+    if plan["missing"]:
+        print_warning(f"词汇库中没有的字（{len(plan['missing'])}）：{''.join(plan['missing'])}")
+    not_on_poster = [char for char in plan["uncovered"] if char not in plan["missing"]]
+    if not_on_poster:
+        print_warning(f"词汇库中有但不在任何小报上的字（{len(not_on_poster)}）：{''.join(not_on_poster)}")
+
+    manifest_path = args.batch or default_plan_path(args.plan_curriculum)
+    try:
+        write_plan_manifest(plan, manifest_path)
+    except (OSError, ValueError) as e:
+        print_error(f"写入清单失败：{str(e)}")
+        sys.exit(1)
+    print_info(f"批量清单：{manifest_path}")
+    return manifest_path
 
 
 def main():
@@ -107,6 +226,15 @@ def main():
 
   # 预览提示词
   python main.py -t 公园 -T "美丽的公园" --preview
+
+  # 按清单批量生成（CSV 或 JSONL，列：theme,title[,id,ratio,resolution,format,output]）
+  python main.py --batch semester.csv --concurrency 8 --rate-limit 30
+
+  # 按汉字表规划最少的小报并批量生成（--plan-only 只写出清单）
+  python main.py --plan-curriculum grade1.txt --batch grade1.csv
+
+  # 进程中断后，继续下载已提交的任务
+  python main.py --resume
         """
     )
 
@@ -133,6 +261,32 @@ def main():
                        help="列出所有可用的场景")
     parser.add_argument("--save-prompt", type=str,
                        help="保存提示词到指定文件")
+    parser.add_argument("--poll-stats", action="store_true",
+                       help="显示学习到的任务完成时间分布")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="不复用缓存中相同提示词和参数的图片，强制重新生成")
+    parser.add_argument("--callback-url", type=str,
+                       help="公网可访问的回调地址（转发到本机回调接收器），提供时优先等待回调")
+    parser.add_argument("--callback-port", type=int, default=DEFAULT_CALLBACK_PORT,
+                       help=f"本机回调接收器端口（默认：{DEFAULT_CALLBACK_PORT}）")
+    parser.add_argument("--callback-host", type=str, default=DEFAULT_CALLBACK_HOST,
+                       help=f"本机回调接收器监听地址（默认：{DEFAULT_CALLBACK_HOST}）")
+    parser.add_argument("--batch", type=str, metavar="MANIFEST",
+                       help="按清单批量生成（.csv 或 .jsonl），重新运行时跳过已完成的条目")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                       help=f"批量生成时同时进行的任务数（默认：{DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_PER_MINUTE,
+                       help=f"批量生成时每分钟最多提交的任务数，0 表示不限制（默认：{DEFAULT_RATE_PER_MINUTE}）")
+    parser.add_argument("--batch-results", type=str,
+                       help="批量结果清单路径（默认：清单同目录的 <清单名>.results.jsonl）")
+    parser.add_argument("--resume", action="store_true",
+                       help="继续下载之前中断的已提交任务（不会重新付费生成）")
+    parser.add_argument("--plan-curriculum", type=str, metavar="CHARS_FILE",
+                       help="按目标汉字表选出覆盖全部汉字的最少场景，写成批量清单（--batch 指定路径，默认 <汉字表名>.plan.csv）后批量生成")
+    parser.add_argument("--max-posters", type=int,
+                       help="规划时最多选择的小报数（默认不限）")
+    parser.add_argument("--plan-only", action="store_true",
+                       help="只规划并写出清单，不生成图片")
 
     args = parser.parse_args()
 
@@ -141,11 +295,23 @@ def main():
 
     # 检查 API Key
     api_key = os.getenv("KIE_AI_API_KEY")
-    if not api_key and not args.preview and not args.list_scenes:
+    plan_only = args.plan_curriculum and args.plan_only
+    if not api_key and not args.preview and not args.list_scenes and not args.poll_stats and not plan_only:
         print_error("未找到 API Key！")
         print_info("请在 .env 文件中设置 KIE_AI_API_KEY=your_api_key_here")
         sys.exit(1)
 
+    # 显示任务完成时间分布
+    if args.poll_stats:
+        distribution = get_shared_schedule().snapshot()
+        if not distribution:
+            print_info("暂无任务耗时记录")
+        for stats in distribution.values():
+            print(f"  {stats['resolution']:>3} {stats['aspect_ratio']:>5}  "
+                  f"样本 {stats['samples']:3d}  p50 {stats['p50']:.1f}s  "
+                  f"p90 {stats['p90']:.1f}s  p99 {stats['p99']:.1f}s")
+        return
+
     # 初始化组件
     prompt_generator = PromptGenerator()
 
@@ -157,6 +323,22 @@ def main():
             print(f"  {i:2d}. {scene}")
         return
 
+    # 恢复中断的任务
+    if args.resume:
+        run_resume(args, api_key)
+        return
+
+    # 课程规划：生成的清单直接进入批量模式
+    if args.plan_curriculum:
+        args.batch = run_plan(args, prompt_generator)
+        if args.plan_only:
+            return
+
+    # 批量模式
+    if args.batch:
+        run_batch(args, api_key, prompt_generator)
+        return
+
     # 交互式模式
     if args.interactive:
         theme, title, prompt = prompt_generator.interactive_generation()
@@ -208,16 +390,43 @@ def main():
         print_info(f"图片参数：{args.ratio}, {args.resolution}, {args.format}")
 
         # 创建 API 客户端
-        client = APIClient(api_key)
+        client = APIClient(api_key, base_url=os.getenv("KIE_API_BASE_URL"))
+
+        # 启动回调接收器（如果提供了回调地址）
+        callback_options = {}
+        if args.callback_url:
+            CallbackServer(get_shared_registry(), host=args.callback_host, port=args.callback_port).start()
+            callback_options = {
+                "callback_url": args.callback_url,
+                "callback_registry": get_shared_registry()
+            }
+            print_info(f"回调接收器已启动：{args.callback_host}:{args.callback_port}")
+
+        # 生成图像（任务一创建就写入任务日志，进程中断后可用 --resume 继续下载）
+        output_path = default_output_path(args.output)
+        generation_params = {
+            "aspect_ratio": args.ratio,
+            "resolution": args.resolution,
+            "output_format": args.format
+        }
+        journal = get_shared_journal()
+        created_task_ids = []
+
+        def on_task_created(task_id):
+            created_task_ids.append(task_id)
+            journal.created(task_id, client.cache_key(prompt, **generation_params), prompt,
+                            generation_params, output_path, theme=theme, title=title)
 
-        # 生成图像
         output_path = client.generate_image(
             prompt=prompt,
-            output_dir=args.output,
-            aspect_ratio=args.ratio,
-            resolution=args.resolution,
-            output_format=args.format
+            output_path=output_path,
+            use_cache=not args.no_cache,
+            on_task_created=on_task_created,
+            **generation_params,
+            **callback_options
         )
+        for task_id in created_task_ids:
+            journal.completed(task_id, output_path)
 
         # 保存历史
         save_history(theme, title, output_path)
@@ -231,9 +440,11 @@ def main():
 
     except KeyboardInterrupt:
         print_error("\n用户中断了生成过程")
+        print_info("已提交的任务可使用 --resume 继续下载，无需重新生成")
         sys.exit(1)
     except Exception as e:
         print_error(f"\n生成失败：{str(e)}")
+        print_info("如果任务已提交，可使用 --resume 重新查询并下载")
         sys.exit(1)
 
 
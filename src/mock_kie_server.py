@@ -0,0 +1,295 @@
+"""本地模拟 Kie API 服务
+实现 createTask / recordInfo 接口并按 callBackUrl 推送回调，用于离线测试；
+结果图片支持 HEAD、Range 和 If-Range（ETag 由图片内容计算）
+
+使用示例:
+  python src/mock_kie_server.py --port 8766 --delay 5
+  KIE_API_BASE_URL=http://127.0.0.1:8766 python src/main.py -t 超市 -T "走进超市"
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+import urllib.request
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import urlparse, parse_qs
+
+
+def _placeholder_png(width: int = 8, height: int = 8) -> bytes:
+    """生成一张纯色 PNG 占位图（不依赖 Pillow）"""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    row = b"\x00" + b"\xff\xcc\x66" * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
+
+
+class MockKieServer:
+    """模拟的 Kie API 服务"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay: float = 5.0,
+        fail_rate: float = 0.0
+    ):
+        """
+        初始化模拟服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口（0 表示自动分配）
+            delay: 每个任务的模拟生成耗时（秒）
+            fail_rate: 任务失败的概率（0~1）
+        """
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.requests: List[Tuple[str, str]] = []          # (方法, 路径)，按到达顺序
+        self.range_requests: List[Tuple[str, Optional[str]]] = []  # 结果图片的 (Range, If-Range)
+        self._faults: List[Dict[str, Any]] = []
+        self.image_bytes = _placeholder_png()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """模拟服务的基础 URL，可直接作为 APIClient 的 base_url"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def image_etag(self) -> str:
+        """结果图片的强 ETag（替换 image_bytes 后随之变化）"""
+        return '"%s"' % hashlib.md5(self.image_bytes).hexdigest()
+
+    def inject_errors(self, path: str, status: int, count: int = 1, task_id: Optional[str] = None):
+        """
+        让接下来的若干个请求返回错误状态码（用于测试重试与故障隔离）
+
+        Args:
+            path: 请求路径，如 /api/v1/jobs/recordInfo
+            status: 返回的 HTTP 状态码
+            count: 返回错误的次数
+            task_id: 只对查询该任务的请求生效（None 表示不限）
+        """
+        with self._lock:
+            self._faults.append({"path": path, "status": status, "remaining": count, "task_id": task_id})
+
+    def _take_fault(self, method: str, path: str, task_id: Optional[str] = None) -> Optional[int]:
+        """记录请求并取出匹配的错误状态码，没有时返回 None"""
+        with self._lock:
+            self.requests.append((method, path))
+            for fault in self._faults:
+                if fault["path"] == path and fault["remaining"] > 0 and fault["task_id"] in (None, task_id):
+                    fault["remaining"] -= 1
+                    return fault["status"]
+        return None
+
+    def create_task(self, params: Dict[str, Any]) -> str:
+        """登记任务，delay 的前三分之一为 waiting，之后为 generating，delay 秒后完成"""
+        task_id = uuid.uuid4().hex
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self.tasks[task_id] = {
+                "taskId": task_id,
+                "model": params.get("model"),
+                "state": "waiting",
+                "param": json.dumps(params, ensure_ascii=False),
+                "resultJson": None,
+                "failCode": None,
+                "failMsg": None,
+                "costTime": None,
+                "completeTime": None,
+                "createTime": now_ms,
+            }
+
+        generating = threading.Timer(self.delay / 3, self._start_generating, args=(task_id,))
+        generating.daemon = True
+        generating.start()
+
+        timer = threading.Timer(self.delay, self._complete_task, args=(task_id, params.get("callBackUrl")))
+        timer.daemon = True
+        timer.start()
+        return task_id
+
+    def _start_generating(self, task_id: str):
+        """任务进入生成阶段"""
+        with self._lock:
+            record = self.tasks[task_id]
+            if record["state"] == "waiting":
+                record["state"] = "generating"
+
+    def _complete_task(self, task_id: str, callback_url: Optional[str]):
+        """完成任务并推送回调"""
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            record = self.tasks[task_id]
+            if random.random() < self.fail_rate:
+                record.update(state="fail", failCode="500", failMsg="Mock generation failed")
+            else:
+                result_url = f"{self.base_url}/results/{task_id}.png"
+                record.update(
+                    state="success",
+                    resultJson=json.dumps({"resultUrls": [result_url]}),
+                    costTime=now_ms - record["createTime"],
+                    completeTime=now_ms
+                )
+            payload = {"code": 200, "msg": "success", "data": dict(record)}
+
+        if callback_url:
+            request = urllib.request.Request(
+                callback_url,
+                data=json.dumps(payload).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            try:
+                urllib.request.urlopen(request, timeout=10).close()
+            except Exception as e:
+                print(f"Warning: Failed to deliver callback for {task_id}: {e}")
+
+    def _make_handler(self):
+        """生成绑定到当前服务的请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, body: bytes, content_type: str = "application/json", status: int = 200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, payload: Dict[str, Any], status: int = 200):
+                self._send(json.dumps(payload, ensure_ascii=False).encode("utf-8"), status=status)
+
+            def _send_image(self, head: bool = False):
+                """发送结果图片（If-Range 与当前 ETag 一致时才按 Range 返回 206）"""
+                data = server.image_bytes
+                etag = server.image_etag
+                byte_range = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+                status = 200
+                start, end = 0, len(data) - 1
+                if not head and byte_range:
+                    with server._lock:
+                        server.range_requests.append((byte_range, if_range))
+                    if if_range in (None, etag) and byte_range.startswith("bytes="):
+                        first, _, last = byte_range[len("bytes="):].partition("-")
+                        start = int(first)
+                        end = min(int(last), end) if last else end
+                        status = 206
+
+                self.send_response(status)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("ETag", etag)
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.end_headers()
+                if not head:
+                    self.wfile.write(data[start:end + 1])
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                status = server._take_fault("POST", path)
+                if status is not None:
+                    self._send_json({"code": status, "msg": "Injected error"}, status=status)
+                    return
+                if path != "/api/v1/jobs/createTask":
+                    self._send_json({"code": 404, "msg": "Not found"}, status=404)
+                    return
+                params = json.loads(body or b"{}")
+                task_id = server.create_task(params)
+                self._send_json({"code": 200, "msg": "success", "data": {"taskId": task_id}})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                task_id = parse_qs(url.query).get("taskId", [""])[0]
+                status = server._take_fault("GET", url.path, task_id)
+                if status is not None:
+                    self._send_json({"code": status, "msg": "Injected error"}, status=status)
+                    return
+                if url.path == "/api/v1/jobs/recordInfo":
+                    with server._lock:
+                        record = server.tasks.get(task_id)
+                        record = dict(record) if record else None
+                    if record is None:
+                        self._send_json({"code": 422, "msg": "recordInfo is null"})
+                    else:
+                        self._send_json({"code": 200, "msg": "success", "data": record})
+                elif url.path.startswith("/results/"):
+                    self._send_image()
+                else:
+                    self._send_json({"code": 404, "msg": "Not found"}, status=404)
+
+            def do_HEAD(self):
+                path = urlparse(self.path).path
+                status = server._take_fault("HEAD", path)
+                if status is None and path.startswith("/results/"):
+                    self._send_image(head=True)
+                    return
+                self.send_response(status or 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockKieServer":
+        """在后台线程中启动服务"""
+        thread = threading.Thread(target=self._server.serve_forever, name="MockKieServer", daemon=True)
+        thread.start()
+        return self
+
+    def serve_forever(self):
+        """在当前线程中运行服务"""
+        self._server.serve_forever()
+
+    def stop(self):
+        """停止服务"""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="本地模拟 Kie API 服务（离线测试用）")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址（默认：127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8766, help="监听端口（默认：8766）")
+    parser.add_argument("--delay", type=float, default=5.0, help="模拟生成耗时（秒，默认：5）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="任务失败概率（默认：0）")
+    args = parser.parse_args()
+
+    server = MockKieServer(args.host, args.port, delay=args.delay, fail_rate=args.fail_rate)
+    print(f"Mock Kie API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
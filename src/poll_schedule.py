@@ -0,0 +1,319 @@
+"""自适应轮询调度模块
+根据历史任务的 costTime 学习每种 (分辨率, 宽高比) 的完成时间分布，
+据此安排轮询时间点
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Dict, Optional, Any, List, Tuple, Deque
+
+try:
+    from .file_lock import FileLock
+except ImportError:
+    from file_lock import FileLock
+
+
+# 默认调度参数
+DEFAULT_INTERVAL = 3        # 样本不足时使用的固定轮询间隔（秒）
+MIN_INTERVAL = 1            # 最小轮询间隔（秒）
+MAX_INTERVAL = 15           # 最大轮询间隔（秒）
+MIN_SAMPLES = 5             # 开始使用学习结果所需的最少样本数
+HISTORY_SIZE = 200          # 每种配置保留的样本数
+
+# 依次在这些分位点安排轮询：首次轮询接近 p50，之后越靠近尾部间隔越密
+POLL_QUANTILES = (0.5, 0.65, 0.8, 0.9, 0.95, 0.99)
+
+Profile = Tuple[str, str]
+
+
+def profile_key(profile: Profile) -> str:
+    """将 (分辨率, 宽高比) 转换为字符串键"""
+    resolution, aspect_ratio = profile
+    return f"{resolution}|{aspect_ratio}"
+
+
+def cost_seconds(data: Dict[str, Any]) -> Optional[float]:
+    """
+    从 recordInfo 的 data 中读取任务耗时
+
+    Args:
+        data: recordInfo 响应中的 data 字段
+
+    Returns:
+        耗时（秒），无法确定时返回 None
+    """
+    cost_time = data.get("costTime")
+    if cost_time:
+        return cost_time / 1000.0
+
+    complete_time = data.get("completeTime")
+    create_time = data.get("createTime")
+    if complete_time and create_time and complete_time > create_time:
+        return (complete_time - create_time) / 1000.0
+
+    return None
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    """线性插值计算分位数"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+class AdaptivePollSchedule:
+    """自适应轮询调度器
+
+    样本不足时退化为固定间隔轮询；样本充足后，首次轮询安排在 p50 附近，
+    之后在 POLL_QUANTILES 的各分位点轮询，超过 p99 后按固定间隔继续。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        default_interval: float = DEFAULT_INTERVAL,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        min_samples: int = MIN_SAMPLES,
+        history_size: int = HISTORY_SIZE
+    ):
+        """
+        初始化调度器
+
+        Args:
+            path: 样本持久化文件路径（为 None 时只保存在内存中）
+            default_interval: 样本不足时的轮询间隔（秒）
+            min_interval: 最小轮询间隔（秒）
+            max_interval: 最大轮询间隔（秒）
+            min_samples: 开始使用学习结果所需的最少样本数
+            history_size: 每种配置保留的样本数
+        """
+        self.path = path
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_samples = min_samples
+        self.history_size = history_size
+
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read_file(self) -> Dict[str, List[float]]:
+        """读取持久化文件中的样本（文件不存在时返回空字典）"""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load(self):
+        """从持久化文件加载历史样本"""
+        if not self.path:
+            return
+        try:
+            stored = self._read_file()
+        except Exception as e:
+            print(f"Warning: Failed to load poll schedule from {self.path}: {e}")
+            return
+        for key, values in stored.items():
+            self._samples[key] = deque(values, maxlen=self.history_size)
+
+    def _save_sample(self, key: str, seconds: float):
+        """
+        把一个样本合并进持久化文件（调用方需持有锁）
+
+        Web 服务和命令行进程共用同一个文件：在文件锁内重新读取、追加本次样本后
+        写入唯一的临时文件再替换，其他进程写入的样本不会被覆盖；合并结果同时更新到内存。
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with FileLock(f"{self.path}.lock"):
+                try:
+                    stored = self._read_file()
+                except ValueError:
+                    # 文件损坏时用内存中的样本重写（已包含本次样本）
+                    stored = {k: list(v) for k, v in self._samples.items()}
+                else:
+                    stored[key] = (stored.get(key, []) + [seconds])[-self.history_size:]
+
+                fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp",
+                                                dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(stored, f)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+        except Exception as e:
+            print(f"Warning: Failed to save poll schedule to {self.path}: {e}")
+            return
+
+        for stored_key, values in stored.items():
+            self._samples[stored_key] = deque(values, maxlen=self.history_size)
+
+    def observe(self, profile: Profile, data: Dict[str, Any]):
+        """
+        记录一个已完成任务的耗时
+
+        Args:
+            profile: (分辨率, 宽高比)
+            data: recordInfo 响应中的 data 字段
+        """
+        seconds = cost_seconds(data)
+        if seconds is None:
+            return
+
+        key = profile_key(profile)
+        seconds = round(seconds, 3)
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = deque(maxlen=self.history_size)
+                self._samples[key] = samples
+            samples.append(seconds)
+            if self.path:
+                self._save_sample(key, seconds)
+
+    def _sorted_samples(self, profile: Profile) -> Optional[List[float]]:
+        """获取排序后的样本，样本不足时返回 None"""
+        with self._lock:
+            samples = self._samples.get(profile_key(profile))
+            if not samples or len(samples) < self.min_samples:
+                return None
+            return sorted(samples)
+
+    def _clamp(self, interval: float) -> float:
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def first_delay(self, profile: Optional[Profile]) -> float:
+        """
+        计算首次轮询前的等待时间
+
+        Args:
+            profile: (分辨率, 宽高比)
+
+        Returns:
+            等待时间（秒）
+        """
+        samples = self._sorted_samples(profile) if profile else None
+        if samples is None:
+            return self.default_interval
+        # 首次等待可以超过 max_interval，直接跳到 p50 附近
+        return max(self.min_interval, _quantile(samples, POLL_QUANTILES[0]))
+
+    def next_interval(self, profile: Optional[Profile], elapsed: float) -> float:
+        """
+        计算下一次轮询前的等待时间
+
+        Args:
+            profile: (分辨率, 宽高比)
+            elapsed: 任务已等待的时间（秒）
+
+        Returns:
+            等待时间（秒）
+        """
+        samples = self._sorted_samples(profile) if profile else None
+        if samples is None:
+            return self.default_interval
+
+        for q in POLL_QUANTILES:
+            target = _quantile(samples, q)
+            if target > elapsed + self.min_interval / 2:
+                return self._clamp(target - elapsed)
+
+        # 已超过 p99，按固定间隔继续轮询
+        return self._clamp(self.default_interval)
+
+    def expected_seconds(self, profile: Optional[Profile]) -> Optional[float]:
+        """
+        历史完成时间的中位数
+
+        Args:
+            profile: (分辨率, 宽高比)
+
+        Returns:
+            预计耗时（秒），样本不足时返回 None
+        """
+        samples = self._sorted_samples(profile) if profile else None
+        if samples is None:
+            return None
+        return _quantile(samples, 0.5)
+
+    def estimate_progress(self, profile: Optional[Profile], elapsed: float) -> Optional[float]:
+        """
+        按历史完成时间估算任务进度
+
+        Args:
+            profile: (分辨率, 宽高比)
+            elapsed: 任务已等待的时间（秒）
+
+        Returns:
+            0~1 之间的进度估计（历史样本中已完成任务的比例，最多 0.95），样本不足时返回 None
+        """
+        samples = self._sorted_samples(profile) if profile else None
+        if samples is None:
+            return None
+        finished = bisect.bisect_right(samples, elapsed)
+        return min(finished / len(samples), 0.95)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        导出学习到的完成时间分布
+
+        Returns:
+            每种配置的样本数与分位数（秒）
+        """
+        with self._lock:
+            items = {key: sorted(values) for key, values in self._samples.items()}
+
+        result = {}
+        for key, values in items.items():
+            if not values:
+                continue
+            resolution, aspect_ratio = key.split("|", 1)
+            result[key] = {
+                "resolution": resolution,
+                "aspect_ratio": aspect_ratio,
+                "samples": len(values),
+                "active": len(values) >= self.min_samples,
+                "mean": round(sum(values) / len(values), 3),
+                "min": values[0],
+                "p50": round(_quantile(values, 0.5), 3),
+                "p90": round(_quantile(values, 0.9), 3),
+                "p99": round(_quantile(values, 0.99), 3),
+                "max": values[-1],
+            }
+        return result
+
+
+def default_schedule_path() -> str:
+    """默认的样本持久化路径（outputs/history/poll_schedule.json）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "outputs", "history", "poll_schedule.json"
+    )
+
+
+# 进程内共享的调度器
+_shared_schedule: Optional[AdaptivePollSchedule] = None
+_shared_schedule_lock = threading.Lock()
+
+
+def get_shared_schedule() -> AdaptivePollSchedule:
+    """获取进程内共享的调度器（首次调用时创建并加载历史样本）"""
+    global _shared_schedule
+    if _shared_schedule is None:
+        with _shared_schedule_lock:
+            if _shared_schedule is None:
+                _shared_schedule = AdaptivePollSchedule(path=default_schedule_path())
+    return _shared_schedule
@@ -0,0 +1,214 @@
+"""任务进度推送模块
+记录每个任务的进度阶段（queued → waiting → generating → downloading → success/fail），
+状态变化时只唤醒该任务的等待者，并以 Server-Sent Events 格式推送给浏览器
+"""
+
+import json
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, Optional, Any
+
+try:
+    from .task_registry import TaskRegistry, DEFAULT_MAX_TASKS, DEFAULT_TASK_TTL
+except ImportError:
+    from task_registry import TaskRegistry, DEFAULT_MAX_TASKS, DEFAULT_TASK_TTL
+
+
+# 结束阶段：推送后关闭事件流
+TERMINAL_STAGES = ("success", "fail")
+
+# 默认事件流参数
+DEFAULT_HEARTBEAT = 15          # 无状态变化时发送心跳的间隔（秒），防止代理断开空闲连接
+DEFAULT_STREAM_TIMEOUT = 300    # 单个事件流的最长持续时间（秒），到期后浏览器带 Last-Event-ID 重连
+RECONNECT_DELAY_MS = 3000       # 浏览器断线后的重连间隔（毫秒）
+
+
+def format_sse(data: Dict[str, Any], event: str = "progress", event_id: Optional[str] = None) -> str:
+    """
+    格式化一条 Server-Sent Event
+
+    Args:
+        data: 事件数据
+        event: 事件类型
+        event_id: 事件 ID（浏览器重连时通过 Last-Event-ID 带回）
+
+    Returns:
+        SSE 文本
+    """
+    prefix = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{prefix}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class ProgressBroker:
+    """任务进度登记与通知
+
+    每次 publish 使任务的 version 加一并唤醒该任务的等待者（每个任务一个 Condition，共用一把锁），
+    订阅方只在状态变化时收到事件，请求量与状态变化次数成正比而不是与时间成正比。
+
+    version 只在本进程内递增，进程重启后从 0 重新计数；因此 SSE 事件 ID 带上登记表的 epoch
+    （每个实例随机生成），浏览器带回其他 epoch 的 Last-Event-ID 时从头推送当前进度。
+    """
+
+    def __init__(self, max_tasks: int = DEFAULT_MAX_TASKS, ttl: float = DEFAULT_TASK_TTL):
+        """
+        初始化进度登记表
+
+        Args:
+            max_tasks: 最多保留的任务数
+            ttl: 任务进度在最后一次更新后保留的时间（秒）
+        """
+        self._states = TaskRegistry(max_size=max_tasks, ttl=ttl)
+        self._lock = threading.Lock()
+        self._conditions: Dict[str, threading.Condition] = {}   # 任务 ID -> 等待该任务的 Condition
+        self._waiters: Dict[str, int] = {}
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def event_id(self, version: int) -> str:
+        """生成 SSE 事件 ID（epoch-version）"""
+        return f"{self.epoch}-{version}"
+
+    def parse_event_id(self, last_event_id: Optional[str]) -> int:
+        """
+        解析浏览器带回的 Last-Event-ID
+
+        Args:
+            last_event_id: 事件 ID（可能来自重启前的进程或旧版本的纯数字 ID）
+
+        Returns:
+            本实例的版本号；无法识别或 epoch 不同时返回 0（从头推送）
+        """
+        epoch, _, version = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not version.isdigit():
+            return 0
+        return int(version)
+
+    def publish(self, task_id: str, stage: str, progress: Optional[int] = None,
+                message: Optional[str] = None, **info):
+        """
+        发布任务进度
+
+        Args:
+            task_id: 任务 ID
+            stage: 进度阶段（queued/waiting/generating/downloading/success/fail）
+            progress: 百分比估计（为 None 时保留上一次的值）
+            message: 状态说明
+            **info: 其他信息（如 elapsed、expected_seconds、output_path、error）
+        """
+        with self._lock:
+            current = self._states.get(task_id) or {"version": 0, "progress": 0}
+            if current.get("stage") in TERMINAL_STAGES and stage not in TERMINAL_STAGES:
+                # 已结束的任务不再回退（例如合并请求的迟到事件）
+                return
+            if (current.get("stage") == stage and stage not in TERMINAL_STAGES
+                    and (progress is None or progress == current.get("progress"))):
+                # 阶段和进度都没有变化，不唤醒订阅方
+                return
+
+            state = {
+                "task_id": task_id,
+                "stage": stage,
+                "progress": current.get("progress", 0) if progress is None else progress,
+                "message": message if message is not None else current.get("message", ""),
+                "version": current["version"] + 1,
+                "updated": time.time(),
+            }
+            if stage == "success":
+                state["progress"] = 100
+            state.update(info)
+            self._states.set(task_id, state)
+            condition = self._conditions.get(task_id)
+            if condition is not None:
+                condition.notify_all()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务当前进度，不存在时返回 None"""
+        return self._states.get(task_id)
+
+    def wait(self, task_id: str, after_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待任务进度更新
+
+        Args:
+            task_id: 任务 ID
+            after_version: 调用方已知的版本号
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            新的进度（任务已结束时即使版本号没有变化也返回）；超时时返回 None
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            condition = self._conditions.get(task_id)
+            if condition is None:
+                condition = self._conditions[task_id] = threading.Condition(self._lock)
+            self._waiters[task_id] = self._waiters.get(task_id, 0) + 1
+            try:
+                while True:
+                    state = self._states.get(task_id)
+                    if state is not None and (state["version"] > after_version
+                                              or state["stage"] in TERMINAL_STAGES):
+                        return state
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    condition.wait(remaining)
+            finally:
+                self._waiters[task_id] -= 1
+                if not self._waiters[task_id]:
+                    del self._waiters[task_id]
+                    del self._conditions[task_id]
+
+    def stream(self, task_id: str, heartbeat: float = DEFAULT_HEARTBEAT,
+               timeout: float = DEFAULT_STREAM_TIMEOUT, last_event_id: Optional[str] = None) -> Iterator[str]:
+        """
+        以 SSE 格式推送任务进度，直到任务结束或事件流到期（到期后浏览器自动重连）
+
+        Args:
+            task_id: 任务 ID
+            heartbeat: 心跳间隔（秒）
+            timeout: 事件流最长持续时间（秒）
+            last_event_id: 浏览器重连时带回的 Last-Event-ID（只推送更新的进度，其他 epoch 的 ID 从头推送）
+
+        Yields:
+            SSE 文本
+        """
+        deadline = time.monotonic() + timeout
+        version = self.parse_event_id(last_event_id)
+        yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+
+        while time.monotonic() < deadline:
+            state = self.wait(task_id, version, heartbeat)
+            if state is None:
+                if self.get(task_id) is None:
+                    yield format_sse({"task_id": task_id, "error": "任务不存在或已过期"}, event="expired")
+                    return
+                yield ": keep-alive\n\n"
+                continue
+
+            version = state["version"]
+            yield format_sse(state, event_id=self.event_id(version))
+            if state["stage"] in TERMINAL_STAGES:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """获取进度登记表统计信息"""
+        stats = self._states.memory_stats()
+        with self._lock:
+            stats["subscribers"] = sum(self._waiters.values())
+        return stats
+
+
+# 进程内共享的进度登记表
+_shared_broker: Optional[ProgressBroker] = None
+_shared_broker_lock = threading.Lock()
+
+
+def get_shared_broker() -> ProgressBroker:
+    """获取进程内共享的进度登记表（首次调用时创建）"""
+    global _shared_broker
+    if _shared_broker is None:
+        with _shared_broker_lock:
+            if _shared_broker is None:
+                _shared_broker = ProgressBroker()
+    return _shared_broker
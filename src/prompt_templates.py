@@ -0,0 +1,418 @@
+"""提示词模板引擎模块
+模板只在首次使用时从 prompt.md（或模板目录）加载并预编译，
+各场景的词汇清单和完整渲染结果都缓存起来，批量运行和预览接口不再重复拼接相同的字符串
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+
+try:
+    from .vocabulary import VocabularyManager
+except ImportError:
+    from vocabulary import VocabularyManager
+
+
+# 默认模板名称（来自 prompt.md 的「最终提示词模板」代码块）
+DEFAULT_TEMPLATE_NAME = "default"
+
+# 缓存容量
+PROMPT_CACHE_SIZE = 256     # 完整提示词 LRU 条目数
+SECTION_CACHE_SIZE = 256    # 场景词汇清单 LRU 条目数
+
+# 预览模式下词汇清单的占位文本
+PREVIEW_PLACEHOLDER = "[待生成]"
+
+# 模板占位符 {{...}}
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(.+?)\}\}", re.S)
+
+# prompt.md 中「最终提示词模板」后的第一个 markdown 代码块（代码块位于文件末尾时可以没有结束标记）
+TEMPLATE_BLOCK_PATTERN = re.compile(r"【最终提示词模板】.*?```markdown\n(.*?)\s*(?:\n```|\Z)", re.S)
+
+# 占位符 -> 模板变量，精确名称优先，其余按关键字匹配（prompt.md 中的清单占位符是一段说明文字）
+SLOT_NAMES = {
+    "主题/场景": "theme",
+    "theme": "theme",
+    "标题": "title",
+    "title": "title",
+    "core_items": "core_items",
+    "common_items": "common_items",
+    "env_items": "env_items",
+}
+SLOT_KEYWORDS = (
+    ("核心", "core_items"),
+    ("物品", "common_items"),
+    ("环境", "env_items"),
+)
+
+# prompt.md 缺失或无法解析时使用的内置模板
+BUILTIN_TEMPLATE = """请生成一张儿童识字小报《{{theme}}》，竖版 A4，学习小报版式，适合 5–9 岁孩子 认字与看图识物。
+
+# 一、小报标题区（顶部）
+
+**顶部居中大标题**：《{{title}}》
+* **风格**：十字小报 / 儿童学习报感
+* **文本要求**：大字、醒目、卡通手写体、彩色描边
+* **装饰**：周围添加与 {{theme}} 相关的贴纸风装饰，颜色鲜艳
+
+# 二、小报主体（中间主画面）
+
+画面中心是一幅 **卡通插画风的「{{theme}}」场景**：
+* **整体气氛**：明亮、温暖、积极
+* **构图**：物体边界清晰，方便对应文字，不要过于拥挤。
+
+**场景分区与核心内容**
+1.  **核心区域 A（主要对象）**：表现 {{theme}} 的核心活动。
+2.  **核心区域 B（配套设施）**：展示相关的工具或物品。
+3.  **核心区域 C（环境背景）**：体现环境特征（如墙面、指示牌等）。
+
+**主题人物**
+* **角色**：1 位可爱卡通人物（职业/身份：与 {{theme}} 匹配）。
+* **动作**：正在进行与场景相关的自然互动。
+
+# 三、必画物体与识字清单（Generated Content）
+
+**请务必在画面中清晰绘制以下物体，并为其预留贴标签的位置：**
+
+**1. 核心角色与设施：**
+{{core_items}}
+
+**2. 常见物品/工具：**
+{{common_items}}
+
+**3. 环境与装饰：**
+{{env_items}}
+
+*(注意：画面中的物体数量不限于此，但以上列表必须作为重点描绘对象)*
+
+# 四、识字标注规则
+
+对上述清单中的物体，贴上中文识字标签：
+* **格式**：两行制（第一行拼音带声调，第二行简体汉字）。
+* **样式**：彩色小贴纸风格，白底黑字或深色字，清晰可读。
+* **排版**：标签靠近对应的物体，不遮挡主体。
+
+# 五、画风参数
+* **风格**：儿童绘本风 + 识字小报风
+* **色彩**：高饱和、明快、温暖 (High Saturation, Warm Tone)
+* **质量**：8k resolution, high detail, vector illustration style, clean lines."""
+
+
+def _project_root() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_template_path() -> str:
+    """默认模板文件路径（项目根目录的 prompt.md）"""
+    return os.path.join(_project_root(), "prompt.md")
+
+
+def default_template_dir() -> str:
+    """默认模板目录（config/templates，其中每个 .md 文件是一个命名模板）"""
+    return os.path.join(_project_root(), "config", "templates")
+
+
+def _slot_for(placeholder: str) -> str:
+    """将占位符解析为模板变量名"""
+    placeholder = placeholder.strip()
+    if placeholder in SLOT_NAMES:
+        return SLOT_NAMES[placeholder]
+    for keyword, slot in SLOT_KEYWORDS:
+        if keyword in placeholder:
+            return slot
+    raise ValueError(f"Unknown template placeholder: {{{{{placeholder}}}}}")
+
+
+class CompiledTemplate:
+    """预编译的提示词模板
+
+    编译时把 {{...}} 占位符替换为 str.format 字段、其余花括号转义，
+    渲染只需一次 format_map 调用。
+    """
+
+    def __init__(self, name: str, source: str):
+        """
+        编译模板
+
+        Args:
+            name: 模板名称
+            source: 模板文本（使用 {{...}} 占位符）
+        """
+        self.name = name
+        self.version = f"{name}:{hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]}"
+
+        parts: List[str] = []
+        slots = set()
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(source):
+            literal = source[position:match.start()]
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            slot = _slot_for(match.group(1))
+            slots.add(slot)
+            parts.append("{" + slot + "}")
+            position = match.end()
+        parts.append(source[position:].replace("{", "{{").replace("}", "}}"))
+
+        self.slots = frozenset(slots)
+        self._format = "".join(parts)
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        渲染模板
+
+        Args:
+            values: 模板变量（theme/title/core_items/common_items/env_items）
+
+        Returns:
+            渲染后的文本
+        """
+        return self._format.format_map(values)
+
+
+def extract_template(text: str) -> str:
+    """
+    从模板文件中提取模板正文
+
+    prompt.md 这类说明文档取「最终提示词模板」下的 markdown 代码块，其他文件整体作为模板。
+
+    Args:
+        text: 文件内容
+
+    Returns:
+        模板正文
+    """
+    match = TEMPLATE_BLOCK_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+class _LRUCache:
+    """线程安全的 LRU 字典"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def discard(self, predicate) -> int:
+        """删除满足条件的键，返回删除数量"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class PromptTemplateEngine:
+    """提示词模板引擎
+
+    - 模板：首次使用时加载并编译，之后复用编译结果
+    - 词汇清单：按场景缓存 format_vocabulary_for_prompt 的结果
+    - 完整提示词：按 (主题, 标题, 模板版本, 是否预览) 缓存在 LRU 中
+    """
+
+    def __init__(
+        self,
+        vocab_manager: Optional[VocabularyManager] = None,
+        template_path: Optional[str] = None,
+        template_dir: Optional[str] = None,
+        cache_size: int = PROMPT_CACHE_SIZE
+    ):
+        """
+        初始化模板引擎
+
+        Args:
+            vocab_manager: 词汇管理器，默认新建
+            template_path: 默认模板文件路径，默认 prompt.md
+            template_dir: 命名模板目录，默认 config/templates
+            cache_size: 完整提示词缓存条目数
+        """
+        self.vocab_manager = vocab_manager or VocabularyManager()
+        self.template_path = template_path or default_template_path()
+        self.template_dir = template_dir or default_template_dir()
+
+        self._lock = threading.Lock()
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._sections = _LRUCache(SECTION_CACHE_SIZE)
+        self._prompts = _LRUCache(cache_size)
+
+    def source_path(self, name: str) -> Optional[str]:
+        """模板名称对应的文件路径"""
+        if name == DEFAULT_TEMPLATE_NAME:
+            return self.template_path
+        if os.path.basename(name) != name or name.startswith("."):
+            raise ValueError(f"Invalid template name: {name}")
+        return os.path.join(self.template_dir, f"{name}.md")
+
+    def _load(self, name: str) -> CompiledTemplate:
+        """读取并编译模板"""
+        path = self.source_path(name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                source = extract_template(f.read())
+        except OSError:
+            if name != DEFAULT_TEMPLATE_NAME:
+                raise ValueError(f"Template not found: {name}")
+            source = BUILTIN_TEMPLATE
+
+        try:
+            return CompiledTemplate(name, source)
+        except ValueError as e:
+            if name != DEFAULT_TEMPLATE_NAME:
+                raise
+            print(f"Warning: Failed to compile {path}: {e}, using built-in template.")
+            return CompiledTemplate(name, BUILTIN_TEMPLATE)
+
+    def get_template(self, name: str = DEFAULT_TEMPLATE_NAME) -> CompiledTemplate:
+        """
+        获取编译后的模板（首次调用时加载）
+
+        Args:
+            name: 模板名称，default 为 prompt.md，其他名称对应模板目录中的 <name>.md
+
+        Returns:
+            编译后的模板
+        """
+        template = self._templates.get(name)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(name)
+                if template is None:
+                    template = self._load(name)
+                    self._templates[name] = template
+        return template
+
+    def list_templates(self) -> List[str]:
+        """列出可用的模板名称"""
+        names = [DEFAULT_TEMPLATE_NAME]
+        if os.path.isdir(self.template_dir):
+            names.extend(sorted(
+                filename[:-3] for filename in os.listdir(self.template_dir)
+                if filename.endswith(".md") and filename[:-3] != DEFAULT_TEMPLATE_NAME
+            ))
+        return names
+
+    def sections(self, scene: str) -> Tuple[str, str, str]:
+        """
+        获取场景的词汇清单（带缓存）
+
+        Args:
+            scene: 场景名称
+
+        Returns:
+            (核心角色与设施, 常见物品/工具, 环境与装饰)
+        """
+        sections = self._sections.get(scene)
+        if sections is None:
+            sections = self.vocab_manager.format_vocabulary_for_prompt(scene)
+            self._sections.put(scene, sections)
+        return sections
+
+    def render(
+        self,
+        theme: str,
+        title: str,
+        preview: bool = False,
+        template: str = DEFAULT_TEMPLATE_NAME
+    ) -> str:
+        """
+        渲染完整提示词（带缓存）
+
+        Args:
+            theme: 主题/场景
+            title: 小报标题
+            preview: 是否只预览而不填充词汇
+            template: 模板名称
+
+        Returns:
+            完整的提示词
+        """
+        compiled = self.get_template(template)
+        key = (theme, title, compiled.version, preview)
+        prompt = self._prompts.get(key)
+        if prompt is not None:
+            return prompt
+
+        if preview:
+            core_items = common_items = env_items = PREVIEW_PLACEHOLDER
+        else:
+            core_items, common_items, env_items = self.sections(theme)
+
+        prompt = compiled.render({
+            "theme": theme,
+            "title": title,
+            "core_items": core_items,
+            "common_items": common_items,
+            "env_items": env_items,
+        })
+        self._prompts.put(key, prompt)
+        return prompt
+
+    def invalidate_templates(self, name: Optional[str] = None):
+        """
+        丢弃已编译的模板，下次使用时重新加载
+
+        模板版本随内容变化，旧版本的提示词缓存不会再命中，会被 LRU 自然淘汰。
+
+        Args:
+            name: 模板名称，None 表示全部
+        """
+        with self._lock:
+            if name is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(name, None)
+
+    def invalidate_scene(self, scene: Optional[str] = None):
+        """
+        丢弃场景的词汇清单和相关提示词缓存（词汇变更后调用）
+
+        Args:
+            scene: 场景名称，None 表示全部
+        """
+        if scene is None:
+            self._sections.clear()
+            self._prompts.clear()
+            return
+        # 模糊匹配可能把其他主题解析到同一场景，因此也按包含关系清理
+        related = lambda theme: theme == scene or scene in theme or theme in scene
+        self._sections.discard(related)
+        self._prompts.discard(lambda key: related(key[0]))
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        return {
+            "templates": sorted(self._templates),
+            "sections": len(self._sections),
+            "prompts": len(self._prompts),
+            "prompt_hits": self._prompts.hits,
+            "prompt_misses": self._prompts.misses,
+        }
@@ -0,0 +1,290 @@
+"""生成结果缓存模块
+按「最终提示词 + 生成参数」的哈希缓存已下载的图片，相同请求直接复用，不再调用 API
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Any, Union
+
+
+# 默认缓存参数
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存总大小上限（2 GB）
+DEFAULT_MAX_ENTRIES = 5000                  # 缓存条目数上限
+
+# 参与缓存键计算的生成参数
+KEY_PARAMS = ("aspect_ratio", "resolution", "output_format", "image_input")
+
+
+def cache_key(model_name: str, prompt: str, **kwargs) -> str:
+    """
+    计算缓存键
+
+    Args:
+        model_name: 模型名称
+        prompt: 最终提示词
+        **kwargs: 生成参数（只有 KEY_PARAMS 中的参数参与计算）
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    defaults = {"aspect_ratio": "3:4", "resolution": "2K", "output_format": "png", "image_input": []}
+    material = {"model": model_name, "prompt": prompt}
+    for name in KEY_PARAMS:
+        material[name] = kwargs.get(name, defaults[name])
+    encoded = json.dumps(material, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def link_or_copy(src: str, dst: str):
+    """优先使用硬链接，跨文件系统时退回复制"""
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """基于 LRU 淘汰、大小受限的持久化结果缓存
+
+    图片文件按键的前两位分目录存放，索引保存在同目录的 SQLite 数据库中。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        """
+        初始化结果缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            max_entries: 缓存条目数上限
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "index.sqlite3"),
+            check_same_thread=False,
+            timeout=30
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                params TEXT
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        self._db.commit()
+
+        self._hits = 0
+        self._misses = 0
+
+    def _path_for(self, filename: str) -> str:
+        return os.path.join(self.cache_dir, filename[:2], filename)
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查找缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存文件路径，未命中时返回 None
+        """
+        with self._lock:
+            row = self._db.execute("SELECT filename FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            path = self._path_for(row[0])
+            if not os.path.exists(path):
+                # 文件被外部删除，清理索引
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                self._misses += 1
+                return None
+
+            self._db.execute(
+                "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key)
+            )
+            self._db.commit()
+            self._hits += 1
+            return path
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        命中缓存时将图片放到 output_path
+
+        Args:
+            key: 缓存键
+            output_path: 目标文件路径
+
+        Returns:
+            是否命中
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        link_or_copy(path, output_path)
+        return True
+
+    def put(self, key: str, source_path: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        将已下载的图片加入缓存
+
+        Args:
+            key: 缓存键
+            source_path: 图片文件路径
+            params: 生成参数（仅用于查看）
+
+        Returns:
+            缓存文件路径
+        """
+        extension = os.path.splitext(source_path)[1] or ".png"
+        filename = f"{key}{extension}"
+        path = self._path_for(filename)
+        link_or_copy(source_path, path)
+        size = os.path.getsize(path)
+        now = time.time()
+
+        with self._lock:
+            self._db.execute(
+                """INSERT OR REPLACE INTO entries (key, filename, size, created, last_access, hits, params)
+                   VALUES (?, ?, ?, ?, ?, 0, ?)""",
+                (key, filename, size, now, now, json.dumps(params or {}, ensure_ascii=False))
+            )
+            self._db.commit()
+            self._evict()
+        return path
+
+    def put_bytes(
+        self,
+        key: str,
+        data: Union[bytes, bytearray, memoryview],
+        extension: str = ".png",
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        将内存中的图片直接写入缓存
+
+        Args:
+            key: 缓存键
+            data: 图片内容
+            extension: 文件扩展名
+            params: 生成参数（仅用于查看）
+
+        Returns:
+            缓存文件路径
+        """
+        filename = f"{key}{extension}"
+        path = self._path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self.put(key, path, params)
+
+    def _evict(self):
+        """按最近最少使用淘汰超出上限的条目（调用方需持有锁）"""
+        total_bytes, total_entries = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries"
+        ).fetchone()
+        if total_bytes <= self.max_bytes and total_entries <= self.max_entries:
+            return
+
+        evicted = []
+        for key, filename, size in self._db.execute(
+            "SELECT key, filename, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if total_bytes <= self.max_bytes and total_entries <= self.max_entries:
+                break
+            evicted.append((key, filename))
+            total_bytes -= size
+            total_entries -= 1
+
+        for key, filename in evicted:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            try:
+                os.remove(self._path_for(filename))
+            except OSError:
+                pass
+        self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            total_bytes, total_entries = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries"
+            ).fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "entries": total_entries,
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def default_cache_dir() -> str:
+    """默认的缓存目录（outputs/cache）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "outputs", "cache"
+    )
+
+
+# 进程内共享的结果缓存
+_shared_cache: Optional[ResultCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache(
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_entries: int = DEFAULT_MAX_ENTRIES
+) -> ResultCache:
+    """
+    获取进程内共享的结果缓存
+
+    Args:
+        max_bytes: 首次创建时使用的缓存总大小上限
+        max_entries: 首次创建时使用的缓存条目数上限
+
+    Returns:
+        共享结果缓存
+    """
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = ResultCache(default_cache_dir(), max_bytes, max_entries)
+    return _shared_cache
@@ -0,0 +1,243 @@
+"""重试与限流模块
+提供指数退避重试策略和线程安全的令牌桶限流器
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Tuple, Dict, Any
+
+
+# 默认重试参数
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 1.0      # 首次重试的基础等待时间（秒）
+DEFAULT_BACKOFF_MAX = 30.0      # 单次重试的最长等待时间（秒）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# 默认限流参数
+DEFAULT_RATE_PER_SECOND = 10.0  # 每秒允许的 API 请求数
+DEFAULT_BURST = 20              # 令牌桶容量（允许的突发请求数）
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头
+
+    Args:
+        value: 秒数或 HTTP 日期
+
+    Returns:
+        需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class RetryPolicy:
+    """指数退避重试策略（带随机抖动）"""
+
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        retry_statuses: Tuple[int, ...] = RETRY_STATUSES,
+        jitter: bool = True
+    ):
+        """
+        初始化重试策略
+
+        Args:
+            max_retries: 最大重试次数
+            backoff_base: 首次重试的基础等待时间（秒）
+            backoff_max: 单次重试的最长等待时间（秒）
+            retry_statuses: 需要重试的 HTTP 状态码
+            jitter: 是否使用随机抖动（full jitter）
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = tuple(retry_statuses)
+        self.jitter = jitter
+
+    def should_retry_status(self, status_code: int) -> bool:
+        """判断状态码是否需要重试"""
+        return status_code in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时间
+
+        Args:
+            attempt: 已重试的次数（从 0 开始）
+            retry_after: 服务端返回的 Retry-After 响应头
+
+        Returns:
+            等待时间（秒）
+        """
+        backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            # 服务端明确要求的等待时间优先，但不超过上限太多
+            return max(backoff, min(server_delay, self.backoff_max * 4))
+        return backoff
+
+
+class TokenBucket:
+    """线程安全的令牌桶限流器
+
+    所有线程共享同一个桶，保证整体请求速率不超过账户配额；
+    收到 429 时可以调用 pause 让所有线程一起暂停。
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE_PER_SECOND, capacity: int = DEFAULT_BURST):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（<= 0 表示不限流）
+            capacity: 桶容量
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._acquired = 0
+        self._waited = 0.0
+        self._pauses = 0
+
+    def _refill(self, now: float):
+        """按时间补充令牌（调用方需持有锁）"""
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        获取令牌，不足时阻塞等待
+
+        Args:
+            tokens: 需要的令牌数
+        """
+        start = time.monotonic()
+        while True:
+            wait_time = self.try_acquire(tokens, start)
+            if wait_time <= 0:
+                return
+            time.sleep(wait_time)
+
+    def try_acquire(self, tokens: float = 1.0, started: Optional[float] = None) -> float:
+        """
+        尝试获取令牌，不阻塞（异步客户端用 asyncio.sleep 等待返回的时间后再试）
+
+        Args:
+            tokens: 需要的令牌数
+            started: 开始等待的时间（time.monotonic()，用于统计等待时间）
+
+        Returns:
+            0 表示已获取；否则为需要等待的秒数
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self._acquired += 1
+                self._waited += now - (now if started is None else started)
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """
+        让所有请求暂停一段时间（例如收到 429 时）
+
+        Args:
+            seconds: 暂停时间（秒）
+        """
+        with self._lock:
+            paused_until = time.monotonic() + seconds
+            if paused_until > self._paused_until:
+                self._paused_until = paused_until
+                self._pauses += 1
+            self._tokens = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """获取限流统计信息"""
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "acquired": self._acquired,
+                "total_wait_seconds": round(self._waited, 3),
+                "pauses": self._pauses,
+            }
+
+
+# 进程内共享的限流器
+_shared_limiter: Optional[TokenBucket] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_limiter(
+    rate: float = DEFAULT_RATE_PER_SECOND,
+    capacity: int = DEFAULT_BURST
+) -> TokenBucket:
+    """
+    获取进程内共享的限流器
+
+    Args:
+        rate: 首次创建时使用的每秒请求数
+        capacity: 首次创建时使用的令牌桶容量
+
+    Returns:
+        共享限流器
+    """
+    global _shared_limiter
+    if _shared_limiter is None:
+        with _shared_limiter_lock:
+            if _shared_limiter is None:
+                _shared_limiter = TokenBucket(rate, capacity)
+    return _shared_limiter
+
+
+def configure_shared_limiter(rate: float, capacity: int) -> TokenBucket:
+    """
+    重新配置共享限流器
+
+    Args:
+        rate: 每秒允许的请求数
+        capacity: 令牌桶容量
+
+    Returns:
+        新的共享限流器
+    """
+    global _shared_limiter
+    with _shared_limiter_lock:
+        _shared_limiter = TokenBucket(rate, capacity)
+    return _shared_limiter
@@ -0,0 +1,356 @@
+"""场景索引模块
+为场景名称预先建立查找索引（精确、前缀、字符 n-gram 子串、拼音首字母），
+模糊查找和自动补全不再逐个扫描全部场景，新增场景时增量更新索引
+
+拼音首字母依赖 pypinyin（可选）：未安装时使用从词汇条目中学到的汉字读音，
+场景名中有未学到的汉字时该场景暂不参与拼音匹配，学到这些汉字的读音后再补上。
+"""
+
+import bisect
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+
+# 子串索引的 n-gram 长度（中文场景名通常只有 2–4 个字）
+NGRAM_SIZE = 2
+
+# 默认自动补全条数
+DEFAULT_SUGGESTION_LIMIT = 10
+
+# 匹配类型（数值越小排名越靠前）
+MATCH_EXACT = 0         # 名称完全相同（忽略大小写）
+MATCH_PREFIX = 1        # 名称以查询开头
+MATCH_PINYIN = 2        # 拼音首字母或全拼以查询开头
+MATCH_SUBSTRING = 3     # 名称包含查询
+MATCH_CONTAINED = 4     # 查询包含名称（如「去超市购物」->「超市」）
+
+
+def normalize(text: str) -> str:
+    """统一大小写和全角/半角，去掉首尾空白"""
+    return unicodedata.normalize("NFKC", text).strip().lower()
+
+
+def strip_tones(syllable: str) -> str:
+    """去掉拼音声调（ā -> a，ǚ -> u）"""
+    decomposed = unicodedata.normalize("NFD", syllable)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def ngrams(text: str, size: int = NGRAM_SIZE) -> Set[str]:
+    """
+    字符 n-gram 集合
+
+    Args:
+        text: 文本（已归一化）
+        size: n-gram 长度，文本更短时返回文本本身
+
+    Returns:
+        n-gram 集合
+    """
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SceneIndex:
+    """场景名称查找索引
+
+    - 精确：归一化名称 -> 场景名
+    - 前缀：按归一化名称排序的列表，二分查找
+    - 子串：字符 n-gram -> 场景名集合（倒排表），取交集后校验
+    - 拼音：首字母 / 全拼排序列表，二分查找前缀
+
+    可以挂一个只读的后备索引（如词汇包 VocabularyPack，名称索引在编译时建好），
+    后备索引中的场景不逐个加入本索引，查询时合并两边的结果，同名时取更好的匹配。
+    """
+
+    def __init__(self, names: Iterable[str] = (), backing=None):
+        """
+        初始化索引
+
+        Args:
+            names: 初始场景名称
+            backing: 只读后备索引，需提供 match_names(归一化查询) -> {场景名: (匹配类型, 序号)}、
+                names() 和 in 判断
+        """
+        self._lock = threading.RLock()
+        self._order: Dict[str, int] = {}                 # 场景名 -> 加入顺序
+        self._exact: Dict[str, str] = {}                 # 归一化名称 -> 场景名
+        self._sorted: List[Tuple[str, str]] = []         # (归一化名称, 场景名)
+        self._grams: Dict[str, Set[str]] = {}            # n-gram -> 场景名集合
+        self._chars: Dict[str, Set[str]] = {}            # 单字 -> 场景名集合（单字查询）
+        self._pinyin: List[Tuple[str, str]] = []         # (首字母或全拼, 场景名)
+        self._pinyin_keys: Dict[str, Tuple[str, ...]] = {}
+        self._readings: Dict[str, str] = {}              # 汉字 -> 不带声调的拼音
+        self._unread: Dict[str, Set[str]] = {}           # 未学到读音的汉字 -> 因此缺少拼音的场景名
+        self._next = 0
+        self.backing = backing
+        self.extend(names)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._order or (self.backing is not None and name in self.backing)
+
+    def names(self) -> List[str]:
+        """按加入顺序列出场景名称（后备索引中的场景排在后面）"""
+        with self._lock:
+            names = sorted(self._order, key=self._order.get)
+            backing = self.backing
+        if backing is not None:
+            names.extend(name for name in backing.names() if name not in self._order)
+        return names
+
+    def pinyin_keys(self, name: str) -> Tuple[str, ...]:
+        """场景名称的拼音键（首字母和全拼），没有拼音时返回空元组"""
+        with self._lock:
+            return self._pinyin_keys.get(name, ())
+
+    def learn_readings(self, items: Iterable[Tuple[str, str]]):
+        """
+        从词汇条目学习汉字读音（用于没有 pypinyin 时的拼音匹配）
+
+        只学习音节数与汉字数相同的条目，已学到的读音不覆盖；
+        因缺少读音而没有拼音的场景在学到读音后补建拼音索引。
+
+        Args:
+            items: (拼音, 汉字) 列表
+        """
+        with self._lock:
+            waiting: Set[str] = set()
+            for pinyin, chinese in items:
+                syllables = pinyin.split()
+                chinese = chinese.strip()
+                if len(syllables) != len(chinese):
+                    continue
+                for char, syllable in zip(chinese, syllables):
+                    if char not in self._readings:
+                        self._readings[char] = strip_tones(syllable)
+                        waiting |= self._unread.pop(char, set())
+            for name in waiting:
+                if name in self._order and name not in self._pinyin_keys:
+                    self._index_pinyin(name, bisect.insort)
+
+    def _syllables(self, name: str) -> Optional[List[str]]:
+        """场景名的拼音音节，无法确定读音时返回 None"""
+        if lazy_pinyin is not None:
+            syllables = [strip_tones(s) for s in lazy_pinyin(name)]
+            return syllables if all(s.isascii() for s in syllables) else None
+        syllables = []
+        for char in name:
+            if char.isascii():
+                if char.isalnum():
+                    syllables.append(char.lower())
+                continue
+            reading = self._readings.get(char)
+            if reading is None:
+                return None
+            syllables.append(reading)
+        return syllables
+
+    def extend(self, names: Iterable[str]):
+        """
+        批量加入场景（最后统一排序，比逐个 add 快）
+
+        Args:
+            names: 场景名称
+        """
+        with self._lock:
+            for name in names:
+                self._add(name, sort=False)
+            self._sorted.sort()
+            self._pinyin.sort()
+
+    def add(self, name: str):
+        """
+        加入场景（已存在时忽略）
+
+        Args:
+            name: 场景名称
+        """
+        with self._lock:
+            self._add(name, sort=True)
+
+    def _add(self, name: str, sort: bool):
+        """加入场景，sort 为 False 时由调用方负责排序（调用方需持有锁）"""
+        if name in self._order:
+            return
+        insert = bisect.insort if sort else list.append
+        self._order[name] = self._next
+        self._next += 1
+
+        key = normalize(name)
+        self._exact.setdefault(key, name)
+        insert(self._sorted, (key, name))
+        for gram in ngrams(key):
+            self._grams.setdefault(gram, set()).add(name)
+        for char in set(key):
+            self._chars.setdefault(char, set()).add(name)
+
+        self._index_pinyin(name, insert)
+
+    def _index_pinyin(self, name: str, insert: Callable):
+        """加入场景的拼音键；缺少读音时记下缺的汉字，学到后再加入（调用方需持有锁）"""
+        key = normalize(name)
+        syllables = self._syllables(key)
+        if syllables is None and lazy_pinyin is None:
+            for char in set(key):
+                if not char.isascii() and char not in self._readings:
+                    self._unread.setdefault(char, set()).add(name)
+        if syllables:
+            keys = tuple({"".join(s[0] for s in syllables), "".join(syllables)})
+            self._pinyin_keys[name] = keys
+            for pinyin_key in keys:
+                insert(self._pinyin, (pinyin_key, name))
+
+    def remove(self, name: str):
+        """
+        移除场景
+
+        Args:
+            name: 场景名称
+        """
+        with self._lock:
+            if self._order.pop(name, None) is None:
+                return
+            key = normalize(name)
+            if self._exact.get(key) == name:
+                del self._exact[key]
+                # 同名（大小写不同）的其他场景接替精确匹配
+                for other_key, other in self._prefix_range(self._sorted, key):
+                    if other_key == key and other != name:
+                        self._exact[key] = other
+                        break
+            self._sorted.remove((key, name))
+            for table, grams in ((self._grams, ngrams(key)), (self._chars, set(key))):
+                for gram in grams:
+                    postings = table.get(gram)
+                    if postings is not None:
+                        postings.discard(name)
+                        if not postings:
+                            del table[gram]
+            for pinyin_key in self._pinyin_keys.pop(name, ()):
+                self._pinyin.remove((pinyin_key, name))
+            for char in set(key):
+                waiting = self._unread.get(char)
+                if waiting is not None:
+                    waiting.discard(name)
+                    if not waiting:
+                        del self._unread[char]
+
+    @staticmethod
+    def _prefix_range(entries: List[Tuple[str, str]], prefix: str) -> List[Tuple[str, str]]:
+        """排序列表中以 prefix 开头的条目"""
+        start = bisect.bisect_left(entries, (prefix, ""))
+        end = start
+        while end < len(entries) and entries[end][0].startswith(prefix):
+            end += 1
+        return entries[start:end]
+
+    def _containing(self, query: str) -> Set[str]:
+        """名称包含 query 的场景（n-gram 倒排表取交集后校验）"""
+        if len(query) < NGRAM_SIZE:
+            return set(self._chars.get(query, ()))
+        postings = sorted((self._grams.get(gram, set()) for gram in ngrams(query)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return {name for name in candidates if query in normalize(name)}
+
+    def _contained(self, query: str) -> Set[str]:
+        """名称被 query 包含的场景"""
+        candidates = set()
+        for gram in ngrams(query):
+            candidates |= self._grams.get(gram, set())
+        for char in set(query):
+            # 单字场景名没有二元 n-gram，通过精确表查找
+            if char in self._exact:
+                candidates.add(self._exact[char])
+        return {name for name in candidates if normalize(name) in query}
+
+    def matches(self, query: str) -> List[Tuple[int, str]]:
+        """
+        查找匹配的场景
+
+        Args:
+            query: 查询文本
+
+        Returns:
+            (匹配类型, 场景名) 列表，按匹配类型、名称长度和加入顺序排序
+        """
+        key = normalize(query)
+        if not key:
+            return []
+
+        with self._lock:
+            best: Dict[str, int] = {}
+            backing_order: Dict[str, int] = {}
+
+            def offer(kind: int, names: Iterable[str]):
+                for name in names:
+                    if kind < best.get(name, MATCH_CONTAINED + 1):
+                        best[name] = kind
+
+            if self.backing is not None:
+                for name, (kind, order) in self.backing.match_names(key).items():
+                    offer(kind, [name])
+                    backing_order[name] = order
+
+            exact = self._exact.get(key)
+            if exact is not None:
+                offer(MATCH_EXACT, [exact])
+            offer(MATCH_PREFIX, (name for _, name in self._prefix_range(self._sorted, key)))
+            if key.isascii():
+                offer(MATCH_PINYIN, (name for _, name in self._prefix_range(self._pinyin, key.replace(" ", ""))))
+            offer(MATCH_SUBSTRING, self._containing(key))
+            offer(MATCH_CONTAINED, self._contained(key))
+
+            ranked = sorted(best.items(), key=lambda item: self._rank(item[1], item[0], backing_order))
+        return [(kind, name) for name, kind in ranked]
+
+    def _rank(self, kind: int, name: str, backing_order: Dict[str, int]) -> Tuple[int, int, int, int]:
+        # 查询包含名称时优先更长（更具体）的名称，其余优先更短（更接近查询）的名称；
+        # 同类同长时本索引中的场景按加入顺序排在前面，之后是只在后备索引中的场景
+        length = -len(name) if kind == MATCH_CONTAINED else len(name)
+        if name in self._order:
+            return kind, length, 0, self._order[name]
+        return kind, length, 1, backing_order[name]
+
+    def lookup(self, query: str, accept: Callable[[int], bool] = lambda kind: True) -> Optional[str]:
+        """
+        查找最匹配的场景
+
+        Args:
+            query: 查询文本
+            accept: 可接受的匹配类型
+
+        Returns:
+            场景名，没有匹配时返回 None
+        """
+        for kind, name in self.matches(query):
+            if accept(kind):
+                return name
+        return None
+
+    def suggest(self, partial: str = "", limit: Optional[int] = DEFAULT_SUGGESTION_LIMIT) -> List[str]:
+        """
+        自动补全
+
+        Args:
+            partial: 部分输入，为空时按加入顺序返回全部场景
+            limit: 返回条数（至少 1），None 表示不限
+
+        Returns:
+            按匹配程度排序的场景名列表
+        """
+        if not normalize(partial):
+            names = self.names()
+        else:
+            # 与原来的子串补全一致，不包含「查询包含名称」的匹配
+            names = [name for kind, name in self.matches(partial) if kind != MATCH_CONTAINED]
+        return names if limit is None else names[:max(limit, 1)]
@@ -0,0 +1,249 @@
+"""请求合并模块
+相同的生成请求同时到达时只向上游提交一个任务，其余请求等待并共享结果
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+try:
+    from .file_lock import FileLock
+except ImportError:
+    from file_lock import FileLock
+
+
+# 等待其他进程的 leader 时读取其事件文件的间隔（秒）
+LOCK_POLL_INTERVAL = 0.5
+
+
+class SingleFlight:
+    """请求合并器
+
+    进程内：同一个键只有第一个调用者（leader）执行函数，其余调用者等待同一个 Future。
+    跨进程：leader 执行前先获取该键的文件锁，其他进程的 leader 会在锁上等待，
+    拿到锁后由调用方通过 recheck 复用先完成的结果（例如查找结果缓存）。
+    锁文件在释放时删除，锁目录不会随缓存键无限增长。
+
+    leader 执行期间通过 publish 发布的事件（如任务 ID、进度）会转发给各等待者的 listener；
+    持有文件锁时还会把每种事件的最近一次写入锁旁边的事件文件，
+    其他进程在锁上等待期间定期读取，转发给自己的 listener 和进程内的等待者。
+    等待者在 do 中阻塞到 leader 完成，在线程池中调用时会一直占用一个工作线程。
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        """
+        初始化请求合并器
+
+        Args:
+            lock_dir: 跨进程锁文件目录（为 None 时只在进程内合并）
+        """
+        self.lock_dir = lock_dir
+        self._flights: Dict[str, Future] = {}
+        self._followers: Dict[str, int] = {}
+        self._listeners: Dict[str, List[Callable[..., None]]] = {}
+        self._last_events: Dict[str, Dict[str, Tuple[tuple, Dict[str, Any]]]] = {}
+        self._holding = set()                  # 持有文件锁（需要写事件文件）的键
+        self._lock = threading.Lock()
+        self._events_lock = threading.Lock()
+
+        # 统计信息
+        self._leaders = 0
+        self._joined = 0
+
+    def in_flight(self, key: str) -> bool:
+        """判断某个键是否正在执行"""
+        with self._lock:
+            return key in self._flights
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        recheck: Optional[Callable[[], Any]] = None,
+        listener: Optional[Callable[..., None]] = None
+    ) -> Any:
+        """
+        执行或加入一次合并请求
+
+        Args:
+            key: 请求键（相同键的并发请求会被合并）
+            fn: 实际执行的函数
+            recheck: 获取到跨进程锁后先调用的函数，返回非 None 时直接作为结果
+            listener: 接收 leader 事件的函数，以 (事件名, *参数, **信息) 调用：
+                作为等待者加入时接收进程内 leader 的事件（加入前已发布过的事件先补发每种事件的最近一次），
+                作为 leader 在文件锁上等待时接收其他进程 leader 的事件
+
+        Returns:
+            fn（或 recheck）的返回值；leader 抛出的异常会传给所有等待者
+        """
+        replay = []
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self._followers[key] = self._followers.get(key, 0) + 1
+                self._joined += 1
+                leader = False
+                if listener is not None:
+                    self._listeners.setdefault(key, []).append(listener)
+                    replay = list(self._last_events.get(key, {}).items())
+            else:
+                future = Future()
+                self._flights[key] = future
+                self._leaders += 1
+                leader = True
+
+        if not leader:
+            for event, (args, info) in replay:
+                self._deliver(listener, event, args, info)
+            return future.result()
+
+        try:
+            result = self._run_locked(key, fn, recheck, listener)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                self._followers.pop(key, None)
+                self._listeners.pop(key, None)
+                self._last_events.pop(key, None)
+
+    def publish(self, key: str, event: str, *args, **info):
+        """
+        把 leader 的事件转发给该键的所有等待者
+
+        Args:
+            key: 请求键
+            event: 事件名（如 on_task_created、on_progress）
+            *args: 事件参数
+            **info: 事件附加信息
+        """
+        with self._lock:
+            if key not in self._flights:
+                return
+            self._last_events.setdefault(key, {})[event] = (args, info)
+            listeners = list(self._listeners.get(key, ()))
+            shared = dict(self._last_events[key]) if key in self._holding else None
+        for listener in listeners:
+            self._deliver(listener, event, args, info)
+        if shared is not None:
+            self._write_events(key, shared)
+
+    @staticmethod
+    def _deliver(listener: Callable[..., None], event: str, args: tuple, info: Dict[str, Any]):
+        """调用等待者的 listener（出错不影响 leader 的执行）"""
+        try:
+            listener(event, *args, **info)
+        except Exception as e:
+            print(f"Warning: single-flight listener failed for {event}: {e}")
+
+    def _lock_path(self, key: str) -> str:
+        return os.path.join(self.lock_dir, f"{key}.lock")
+
+    def _events_path(self, key: str) -> str:
+        return os.path.join(self.lock_dir, f"{key}.events.json")
+
+    def _write_events(self, key: str, events: Dict[str, Tuple[tuple, Dict[str, Any]]]):
+        """把 leader 每种事件的最近一次写入事件文件（先写临时文件再替换）"""
+        path = self._events_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        data = {event: [list(args), info] for event, (args, info) in events.items()}
+        try:
+            with self._events_lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, default=str)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: failed to share single-flight events for {key}: {e}")
+
+    def _read_events(self, key: str) -> Dict[str, Tuple[tuple, Dict[str, Any]]]:
+        """读取其他进程 leader 的事件文件（不存在或正在替换时返回空）"""
+        try:
+            with open(self._events_path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {event: (tuple(args), info) for event, (args, info) in data.items()}
+
+    def _acquire(self, key: str, listener: Optional[Callable[..., None]]) -> FileLock:
+        """获取文件锁；等待期间转发其他进程 leader 的事件"""
+        seen: Dict[str, Tuple[tuple, Dict[str, Any]]] = {}
+        while True:
+            lock = FileLock(self._lock_path(key), timeout=LOCK_POLL_INTERVAL, unlink=True)
+            try:
+                lock.acquire()
+                return lock
+            except TimeoutError:
+                pass
+            for event, (args, info) in self._read_events(key).items():
+                if seen.get(event) == (args, info):
+                    continue
+                seen[event] = (args, info)
+                if listener is not None:
+                    self._deliver(listener, event, args, info)
+                self.publish(key, event, *args, **info)
+
+    def _run_locked(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]],
+                    listener: Optional[Callable[..., None]] = None) -> Any:
+        """在跨进程锁内执行函数"""
+        if self.lock_dir is None:
+            return fn()
+
+        lock = self._acquire(key, listener)
+        try:
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    return result
+            with self._lock:
+                # 等待期间转发的是上一个 leader 的事件，不再补发给后来的等待者
+                self._last_events.pop(key, None)
+                self._holding.add(key)
+            return fn()
+        finally:
+            with self._lock:
+                self._holding.discard(key)
+            try:
+                os.remove(self._events_path(key))
+            except OSError:
+                pass
+            lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取合并统计信息"""
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "waiting_followers": sum(self._followers.values()),
+                "leaders": self._leaders,
+                "joined": self._joined,
+            }
+
+
+def default_lock_dir() -> str:
+    """默认的锁文件目录（outputs/cache/locks）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "outputs", "cache", "locks"
+    )
+
+
+# 进程内共享的请求合并器
+_shared_single_flight: Optional[SingleFlight] = None
+_shared_single_flight_lock = threading.Lock()
+
+
+def get_shared_single_flight() -> SingleFlight:
+    """获取进程内共享的请求合并器（首次调用时创建）"""
+    global _shared_single_flight
+    if _shared_single_flight is None:
+        with _shared_single_flight_lock:
+            if _shared_single_flight is None:
+                _shared_single_flight = SingleFlight(default_lock_dir())
+    return _shared_single_flight
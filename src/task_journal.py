@@ -0,0 +1,239 @@
+"""任务日志模块
+上游任务一创建就把任务 ID、提示词哈希和生成参数追加写入日志（写入后 fsync），
+进程在下载前被杀时可以用 --resume 重新查询并下载，不必再付费重新生成
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Any
+
+try:
+    from .file_lock import FileLock
+except ImportError:
+    from file_lock import FileLock
+
+
+# 日志事件
+EVENT_CREATED = "created"       # 上游任务已创建，尚未下载
+EVENT_COMPLETED = "completed"   # 图片已下载到 output_path
+EVENT_FAILED = "failed"         # 上游任务失败，无法恢复
+
+RESUME_FIELDS = ("prompt", "params", "output_path")   # 续跑一个任务需要的字段
+TAIL_CHUNK_SIZE = 4096          # 修复末尾残行时每次向前读取的字节数
+COMPACT_THRESHOLD = 1024 * 1024 # 日志超过该大小（字节）时在记录任务结束后自动压缩
+
+
+class TaskJournal:
+    """只追加的任务日志（JSONL）
+
+    每行一个事件，写入时持有跨进程文件锁并 fsync，多个命令行进程可以共用同一份日志。
+    任务的状态由它最后一个事件决定。日志超过 compact_threshold 后，记录任务结束时自动压缩，
+    只保留未完成的任务（未完成的任务很多时，压缩后大小翻倍才再次压缩）。
+    """
+
+    def __init__(self, path: str, compact_threshold: int = COMPACT_THRESHOLD):
+        """
+        初始化任务日志
+
+        Args:
+            path: 日志文件路径
+            compact_threshold: 自动压缩的日志大小（字节）
+        """
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.compact_threshold = compact_threshold
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._compacted_size = 0    # 上次压缩后的日志大小
+
+    def _append(self, record: Dict[str, Any]):
+        """追加一个事件并落盘"""
+        record["time"] = time.time()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, FileLock(self.lock_path):
+            self._repair_tail()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            # 只有任务结束的事件会让压缩后的日志变小
+            if record["event"] != EVENT_CREATED and size > max(self.compact_threshold, 2 * self._compacted_size):
+                self._compact()
+
+    def _repair_tail(self):
+        """
+        修复末尾没有换行的残行（调用方需持有文件锁）
+
+        进程在写入一行的中途被杀时，下一次追加会接在残行后面，两条记录都无法解析。
+        残行本身是完整的 JSON 时补上换行，否则截断到上一个换行处。
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+
+            # 向前查找最后一个换行
+            start = end
+            line_start = 0
+            while start > 0:
+                chunk_start = max(start - TAIL_CHUNK_SIZE, 0)
+                f.seek(chunk_start)
+                index = f.read(start - chunk_start).rfind(b"\n")
+                if index >= 0:
+                    line_start = chunk_start + index + 1
+                    break
+                start = chunk_start
+
+            f.seek(line_start)
+            try:
+                json.loads(f.read(end - line_start).decode("utf-8"))
+            except ValueError:
+                f.truncate(line_start)
+            else:
+                f.seek(end)
+                f.write(b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def created(self, task_id: str, prompt_hash: str, prompt: str, params: Dict[str, Any],
+                output_path: str, **info):
+        """
+        记录已创建的上游任务（应在拿到任务 ID 后立即调用）
+
+        Args:
+            task_id: 上游任务 ID
+            prompt_hash: 提示词与生成参数的哈希（即结果缓存键）
+            prompt: 提示词（恢复时写入结果缓存需要）
+            params: 生成参数（aspect_ratio/resolution/output_format）
+            output_path: 图片输出路径
+            **info: 其他信息（如 theme、title）
+        """
+        self._append({
+            "event": EVENT_CREATED,
+            "task_id": task_id,
+            "prompt_hash": prompt_hash,
+            "prompt": prompt,
+            "params": params,
+            "output_path": output_path,
+            **info
+        })
+
+    def completed(self, task_id: str, output_path: Optional[str] = None):
+        """记录任务图片已下载"""
+        self._append({"event": EVENT_COMPLETED, "task_id": task_id, "output_path": output_path})
+
+    def failed(self, task_id: str, error: str):
+        """记录上游任务失败（不再尝试恢复）"""
+        self._append({"event": EVENT_FAILED, "task_id": task_id, "error": error})
+
+    def _replay(self) -> Dict[str, Dict[str, Any]]:
+        """回放日志，得到每个任务的最新状态（调用方需持有文件锁）"""
+        tasks: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.path):
+            return tasks
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程被杀时最后一行可能不完整
+                    continue
+                if not isinstance(record, dict) or not record.get("task_id") or not record.get("event"):
+                    continue
+                task = tasks.setdefault(record["task_id"], {})
+                event = record.pop("event")
+                task.update({name: value for name, value in record.items() if value is not None})
+                task["status"] = event
+        return tasks
+
+    @staticmethod
+    def _resumable(task: Dict[str, Any]) -> bool:
+        """任务是否已创建未下载，且记录了续跑需要的字段（手工编辑过的日志可能缺字段）"""
+        return task["status"] == EVENT_CREATED and all(name in task for name in RESUME_FIELDS)
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """
+        获取已创建但尚未下载的任务
+
+        Returns:
+            任务列表（按创建时间排序）
+        """
+        with self._lock, FileLock(self.lock_path):
+            tasks = self._replay()
+        pending = [task for task in tasks.values() if self._resumable(task)]
+        return sorted(pending, key=lambda task: task.get("time", 0))
+
+    def compact(self) -> int:
+        """
+        压缩日志：只保留尚未完成的任务
+
+        Returns:
+            保留的任务数
+        """
+        with self._lock, FileLock(self.lock_path):
+            return self._compact()
+
+    def _compact(self) -> int:
+        """压缩日志（调用方需持有文件锁），返回保留的任务数"""
+        pending = [task for task in self._replay().values() if self._resumable(task)]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for task in sorted(pending, key=lambda task: task.get("time", 0)):
+                record = {name: value for name, value in task.items() if name != "status"}
+                f.write(json.dumps({"event": EVENT_CREATED, **record}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            self._compacted_size = f.tell()
+        os.replace(tmp_path, self.path)
+        return len(pending)
+
+
+def upstream_failure(client, task_id: str) -> Optional[str]:
+    """
+    查询上游任务是否已失败
+
+    Args:
+        client: APIClient 实例
+        task_id: 上游任务 ID
+
+    Returns:
+        失败原因；任务未失败或查询出错时返回 None（保留在日志中，稍后再试）
+    """
+    try:
+        result = client.query_task(task_id)
+    except Exception:
+        return None
+    if result.get("code") == 200 and result["data"].get("state") == "fail":
+        return result["data"].get("failMsg") or "Task failed"
+    return None
+
+
+def default_journal_path() -> str:
+    """默认的任务日志路径（outputs/journal/tasks.jsonl）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "outputs", "journal", "tasks.jsonl"
+    )
+
+
+# 进程内共享的任务日志
+_shared_journal: Optional[TaskJournal] = None
+_shared_journal_lock = threading.Lock()
+
+
+def get_shared_journal() -> TaskJournal:
+    """获取进程内共享的任务日志（首次调用时创建）"""
+    global _shared_journal
+    if _shared_journal is None:
+        with _shared_journal_lock:
+            if _shared_journal is None:
+                _shared_journal = TaskJournal(default_journal_path())
+    return _shared_journal
@@ -0,0 +1,389 @@
+"""任务轮询模块
+由一个后台线程统一调度所有未完成任务的查询，替代每个任务各自的轮询循环；
+查询本身在一个小线程池中执行，个别任务的慢查询或重试不会拖住其他任务
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Any, List, Tuple
+
+
+# 默认轮询参数
+DEFAULT_POLL_INTERVAL = 3           # 单个任务的轮询间隔（秒）
+DEFAULT_TASK_TIMEOUT = 300          # 单个任务的超时时间（秒）
+DEFAULT_MAX_QUERIES_PER_SECOND = 5  # 全局 recordInfo 查询速率上限
+DEFAULT_QUERY_WORKERS = 4           # 同时进行的查询数
+MAX_QUERY_FAILURES = 3              # 连续查询失败多少次后放弃该任务
+
+
+class _PolledTask:
+    """轮询中的任务记录"""
+
+    def __init__(self, task_id: str, client, deadline: float, poll_interval: float,
+                 schedule=None, profile: Optional[Tuple[str, str]] = None,
+                 on_state: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self.task_id = task_id
+        self.client = client
+        self.deadline = deadline
+        self.poll_interval = poll_interval
+        self.schedule = schedule
+        self.profile = profile
+        self.on_state = on_state
+        self.future: Future = Future()
+        self.state = "waiting"
+        self.polls = 0
+        self.failures = 0       # 连续查询失败次数
+        self.submitted_at = time.time()
+
+
+class TaskPoller:
+    """批量任务轮询器
+
+    所有任务按下一次查询时间放入同一个最小堆，由调度线程依次出堆、按全局查询速率
+    交给查询线程池；查询完成后任务重新入堆。任务到达 success / fail 状态时完成对应的 Future。
+    查询出错（重试耗尽后）的任务按轮询间隔重新排队，连续失败 MAX_QUERY_FAILURES 次才放弃。
+    提交时提供 profile 的任务由自适应调度器决定轮询时间点。
+    """
+
+    def __init__(
+        self,
+        client=None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        timeout: float = DEFAULT_TASK_TIMEOUT,
+        max_queries_per_second: float = DEFAULT_MAX_QUERIES_PER_SECOND,
+        schedule=None,
+        query_workers: int = DEFAULT_QUERY_WORKERS
+    ):
+        """
+        初始化轮询器
+
+        Args:
+            client: 默认使用的 APIClient（也可以在 submit 时逐个指定）
+            poll_interval: 默认轮询间隔（秒）
+            timeout: 默认任务超时时间（秒）
+            max_queries_per_second: 全局查询速率上限（<= 0 表示不限制）
+            schedule: 自适应轮询调度器（默认使用 client.poll_schedule）
+            query_workers: 同时进行的查询数
+        """
+        self.client = client
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_queries_per_second = max_queries_per_second
+        self.schedule = schedule
+        self.query_workers = max(query_workers, 1)
+
+        self._tasks: Dict[str, _PolledTask] = {}
+        self._heap: List = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._shutdown = False
+        self._last_query_time = 0.0
+
+        # 统计信息
+        self._queries = 0
+        self._completed = 0
+        self._failed = 0
+
+    def submit(
+        self,
+        task_id: str,
+        client=None,
+        timeout: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        first_poll_delay: Optional[float] = None,
+        profile: Optional[Tuple[str, str]] = None,
+        on_state: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Future:
+        """
+        提交一个需要轮询的任务
+
+        Args:
+            task_id: Kie 任务 ID
+            client: 查询该任务使用的 APIClient（默认使用轮询器的 client）
+            timeout: 超时时间（秒）
+            poll_interval: 轮询间隔（秒）
+            first_poll_delay: 首次查询前的等待时间（默认等于轮询间隔）
+            profile: (分辨率, 宽高比)，提供时按历史耗时安排轮询时间
+            on_state: 每次查询后以 (state, data) 调用的函数（在轮询线程中执行，应尽快返回）
+
+        Returns:
+            任务完成时返回 recordInfo 响应的 Future；任务失败或超时时抛出异常
+        """
+        client = client or self.client
+        if client is None:
+            raise ValueError("TaskPoller requires an APIClient to query tasks")
+
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("TaskPoller has been shut down")
+
+            existing = self._tasks.get(task_id)
+            if existing is not None:
+                return existing.future
+
+            schedule = None
+            if profile is not None:
+                schedule = self.schedule or getattr(client, "poll_schedule", None)
+
+            interval = self.poll_interval if poll_interval is None else poll_interval
+            if first_poll_delay is not None:
+                delay = first_poll_delay
+            elif schedule is not None:
+                delay = schedule.first_delay(profile)
+            else:
+                delay = interval
+            now = time.time()
+            task = _PolledTask(
+                task_id,
+                client,
+                deadline=now + (self.timeout if timeout is None else timeout),
+                poll_interval=interval,
+                schedule=schedule,
+                profile=profile,
+                on_state=on_state
+            )
+            self._tasks[task_id] = task
+            self._schedule(task, now + delay)
+            self._ensure_thread()
+            self._condition.notify()
+
+        return task.future
+
+    def wait(self, task_id: str, **kwargs) -> Dict[str, Any]:
+        """
+        提交任务并阻塞等待结果
+
+        Args:
+            task_id: Kie 任务 ID
+            **kwargs: 传给 submit 的参数
+
+        Returns:
+            任务完成时的 recordInfo 响应
+        """
+        return self.submit(task_id, **kwargs).result()
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        取消任务轮询
+
+        Args:
+            task_id: Kie 任务 ID
+
+        Returns:
+            是否成功取消
+        """
+        with self._condition:
+            task = self._tasks.pop(task_id, None)
+        if task is None:
+            return False
+        return task.future.cancel()
+
+    def get_state(self, task_id: str) -> Optional[str]:
+        """获取任务最近一次查询到的状态"""
+        task = self._tasks.get(task_id)
+        return task.state if task else None
+
+    def pending_count(self) -> int:
+        """获取未完成的任务数量"""
+        return len(self._tasks)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取轮询统计信息"""
+        with self._condition:
+            return {
+                "pending": len(self._tasks),
+                "queries": self._queries,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_queries_per_second": self.max_queries_per_second,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """
+        停止轮询线程，未完成的任务会被取消
+
+        Args:
+            wait: 是否等待线程退出
+        """
+        with self._condition:
+            self._shutdown = True
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+            self._heap.clear()
+            self._condition.notify_all()
+            thread = self._thread
+            executor = self._executor
+
+        for task in tasks:
+            task.future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _schedule(self, task: _PolledTask, due_time: float):
+        """将任务按下一次查询时间放入堆中（调用方需持有锁）"""
+        heapq.heappush(self._heap, (due_time, next(self._counter), task.task_id))
+
+    def _ensure_thread(self):
+        """按需启动调度线程和查询线程池（调用方需持有锁）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.query_workers,
+                thread_name_prefix="TaskPoller-query"
+            )
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run,
+                name="TaskPoller",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _next_due_task(self) -> Optional[_PolledTask]:
+        """等待并取出下一个到期的任务，轮询器关闭时返回 None"""
+        with self._condition:
+            while True:
+                if self._shutdown:
+                    return None
+
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                due_time, _, task_id = self._heap[0]
+                task = self._tasks.get(task_id)
+                if task is None:
+                    # 已取消或已完成的任务
+                    heapq.heappop(self._heap)
+                    continue
+
+                now = time.time()
+                if due_time > now:
+                    self._condition.wait(due_time - now)
+                    continue
+
+                heapq.heappop(self._heap)
+                return task
+
+    def _throttle(self):
+        """遵守全局查询速率上限"""
+        if self.max_queries_per_second <= 0:
+            return
+        min_gap = 1.0 / self.max_queries_per_second
+        wait_time = self._last_query_time + min_gap - time.time()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        self._last_query_time = time.time()
+
+    def _run(self):
+        """调度线程主循环：取出到期的任务交给查询线程池"""
+        while True:
+            task = self._next_due_task()
+            if task is None:
+                return
+
+            if time.time() > task.deadline:
+                timeout = round(task.deadline - task.submitted_at)
+                self._finish(task, error=Exception(f"Task timeout after {timeout} seconds"))
+                continue
+
+            self._throttle()
+            try:
+                self._executor.submit(self._poll, task)
+            except RuntimeError:
+                # 轮询器已关闭
+                return
+
+    def _poll(self, task: _PolledTask):
+        """查询一次任务状态（在查询线程池中执行）"""
+        try:
+            result = task.client.query_task(task.task_id)
+        except Exception as e:
+            task.failures += 1
+            if task.failures >= MAX_QUERY_FAILURES:
+                self._finish(task, error=e)
+            else:
+                print(f"Warning: query failed for task {task.task_id} "
+                      f"({task.failures}/{MAX_QUERY_FAILURES}), will retry: {e}")
+                self._reschedule(task, task.poll_interval)
+            return
+
+        task.failures = 0
+        with self._condition:
+            self._queries += 1
+        task.polls += 1
+
+        if result.get("code") != 200:
+            self._finish(task, error=Exception(
+                f"API returned error code {result.get('code')}: {result.get('msg', 'Unknown error')}"
+            ))
+            return
+
+        data = result.get("data") or {}
+        task.state = data.get("state", "waiting")
+        if task.on_state is not None:
+            try:
+                task.on_state(task.state, data)
+            except Exception as e:
+                print(f"Warning: state callback failed for task {task.task_id}: {e}")
+
+        if task.state == "success":
+            if task.schedule is not None:
+                task.schedule.observe(task.profile, data)
+            self._finish(task, result=result)
+        elif task.state == "fail":
+            fail_code = data.get("failCode", "Unknown")
+            fail_msg = data.get("failMsg", "Task failed")
+            self._finish(task, error=Exception(f"Task failed with code {fail_code}: {fail_msg}"))
+        else:
+            if task.schedule is not None:
+                interval = task.schedule.next_interval(task.profile, time.time() - task.submitted_at)
+            else:
+                interval = task.poll_interval
+            self._reschedule(task, interval)
+
+    def _reschedule(self, task: _PolledTask, interval: float):
+        """查询完成后按间隔重新入堆（任务已取消时忽略）"""
+        with self._condition:
+            if task.task_id in self._tasks:
+                self._schedule(task, time.time() + interval)
+                # 调度线程可能正在等待更晚的到期时间
+                self._condition.notify()
+
+    def _finish(self, task: _PolledTask, result: Optional[Dict[str, Any]] = None,
+                error: Optional[Exception] = None):
+        """完成任务并移出轮询列表"""
+        with self._condition:
+            self._tasks.pop(task.task_id, None)
+            if error is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+        if task.future.done():
+            return
+        if error is None:
+            task.future.set_result(result)
+        else:
+            task.future.set_exception(error)
+
+
+# 进程内共享的轮询器
+_shared_poller: Optional[TaskPoller] = None
+_shared_poller_lock = threading.Lock()
+
+
+def get_shared_poller() -> TaskPoller:
+    """获取进程内共享的轮询器（首次调用时创建）"""
+    global _shared_poller
+    if _shared_poller is None:
+        with _shared_poller_lock:
+            if _shared_poller is None:
+                _shared_poller = TaskPoller()
+    return _shared_poller
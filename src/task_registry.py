@@ -0,0 +1,181 @@
+"""任务登记表模块
+生成不会冲突的任务 ID，并以容量上限 + 过期时间管理内存中的任务状态
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Any
+
+
+# 默认登记表参数
+DEFAULT_MAX_TASKS = 1000        # 最多保留的任务数
+DEFAULT_TASK_TTL = 6 * 3600     # 任务状态在最后一次更新后保留的时间（秒）
+
+
+def new_task_id(prefix: str = "task") -> str:
+    """
+    生成唯一的任务 ID（同一秒内的请求也不会冲突，可直接用作文件名）
+
+    Args:
+        prefix: ID 前缀
+
+    Returns:
+        形如 task_20240101120000_1a2b3c4d5e6f 的任务 ID
+    """
+    return f"{prefix}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:12]}"
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """估算对象及其包含的容器、字符串占用的内存（字节）"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def process_memory() -> Optional[int]:
+    """当前进程的常驻内存（字节），无法获取时返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # 无法获取当前值时退回峰值（Linux 下单位为 KB，macOS 下为字节）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class TaskRegistry:
+    """有容量上限和过期时间的任务状态登记表（线程安全）
+
+    只应保存状态、消息和文件路径等小字段，图片内容保存在磁盘上。
+    超过容量时淘汰最久未更新的任务，超过 ttl 未更新的任务会被清理。
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_TASKS, ttl: float = DEFAULT_TASK_TTL):
+        """
+        初始化任务登记表
+
+        Args:
+            max_size: 最多保留的任务数
+            ttl: 任务状态在最后一次更新后保留的时间（秒）
+        """
+        self.max_size = max(max_size, 1)
+        self.ttl = ttl
+        self._tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._updated: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self._evicted = 0
+        self._expired = 0
+
+    def set(self, task_id: str, task: Dict[str, Any]):
+        """
+        写入（替换）任务状态
+
+        Args:
+            task_id: 任务 ID
+            task: 任务状态字典
+        """
+        with self._lock:
+            self._tasks[task_id] = dict(task)
+            self._touch(task_id)
+            self._prune()
+
+    def update(self, task_id: str, **fields):
+        """
+        更新任务的部分字段（任务不存在时新建）
+
+        Args:
+            task_id: 任务 ID
+            **fields: 要更新的字段
+        """
+        with self._lock:
+            self._tasks.setdefault(task_id, {}).update(fields)
+            self._touch(task_id)
+            self._prune()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询任务状态
+
+        Args:
+            task_id: 任务 ID
+
+        Returns:
+            任务状态的副本，不存在或已过期时返回 None
+        """
+        with self._lock:
+            self._prune()
+            task = self._tasks.get(task_id)
+            return dict(task) if task is not None else None
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._prune()
+            return len(self._tasks)
+
+    def _touch(self, task_id: str):
+        """记录更新时间并移到队尾（调用方需持有锁）"""
+        self._updated[task_id] = time.monotonic()
+        self._tasks.move_to_end(task_id)
+
+    def _prune(self):
+        """清理过期任务并淘汰超出容量的任务（调用方需持有锁）"""
+        # 按更新时间排序，过期的任务都在队首
+        deadline = time.monotonic() - self.ttl
+        while self._tasks:
+            task_id = next(iter(self._tasks))
+            if self._updated[task_id] > deadline:
+                break
+            self._remove(task_id)
+            self._expired += 1
+
+        while len(self._tasks) > self.max_size:
+            self._remove(next(iter(self._tasks)))
+            self._evicted += 1
+
+    def _remove(self, task_id: str):
+        del self._tasks[task_id]
+        del self._updated[task_id]
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """
+        获取登记表的内存占用统计
+
+        Returns:
+            任务数、估算占用字节数、淘汰/过期数以及进程常驻内存
+        """
+        with self._lock:
+            self._prune()
+            registry_bytes = deep_sizeof(self._tasks) + deep_sizeof(self._updated)
+            return {
+                "tasks": len(self._tasks),
+                "max_tasks": self.max_size,
+                "ttl_seconds": self.ttl,
+                "registry_bytes": registry_bytes,
+                "evicted": self._evicted,
+                "expired": self._expired,
+                "process_rss_bytes": process_memory(),
+            }
@@ -1,20 +1,393 @@
 """词汇数据库模块
 用于管理不同场景下的中文词汇及其拼音
+
+外部词汇文件（config/vocabulary_data/*.json）启动时只建立目录清单，
+首次访问某个场景时才解析对应文件，超过内存预算时淘汰最久未使用的场景。
+编译过词汇包（config/vocabulary.pack）时，包内场景通过 mmap 按需读取，名称查找直接使用包内的索引，
+只有比词汇包新或不在包内的 JSON 文件才进入清单。
 """
 
 import json
 import os
-from typing import Dict, List, Tuple
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .scene_index import SceneIndex, MATCH_PINYIN, DEFAULT_SUGGESTION_LIMIT
+    from .vocabulary_pack import default_pack_path, open_pack
+    from .character_index import CharacterIndex, DEFAULT_RESULT_LIMIT, is_hanzi
+except ImportError:
+    from scene_index import SceneIndex, MATCH_PINYIN, DEFAULT_SUGGESTION_LIMIT
+    from vocabulary_pack import default_pack_path, open_pack
+    from character_index import CharacterIndex, DEFAULT_RESULT_LIMIT, is_hanzi
+
+
+# 内置场景名称的拼音（用于拼音首字母补全，未安装 pypinyin 时使用）
+SCENE_PINYIN = {
+    "超市": "chāo shì",
+    "医院": "yī yuàn",
+    "公园": "gōng yuán",
+    "学校": "xué xiào",
+    "动物园": "dòng wù yuán",
+    "火车站": "huǒ chē zhàn",
+}
+
+# 已解析外部场景的内存预算（按词汇文件大小估算）
+DEFAULT_MEMORY_BUDGET = 32 * 1024 * 1024
+
+# 场景词汇：类别 -> (拼音, 汉字) 列表
+SceneVocabulary = Dict[str, List[Tuple[str, str]]]
+
+
+def default_vocabulary_dir() -> str:
+    """默认的外部词汇目录（config/vocabulary_data）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "config", "vocabulary_data"
+    )
+
+
+def parse_scene_file(path: str) -> SceneVocabulary:
+    """
+    解析外部场景词汇文件
+
+    Args:
+        path: JSON 文件路径（类别 -> [{"pinyin": ..., "chinese": ...}]）
+
+    Returns:
+        场景词汇
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        scene_data = json.load(f)
+    return {
+        category: [(item["pinyin"], item["chinese"]) for item in items]
+        for category, items in scene_data.items()
+    }
+
+
+def prompt_items(vocab_dict: SceneVocabulary) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    从场景词汇中选择写入提示词的词汇
+
+    Args:
+        vocab_dict: 场景词汇
+
+    Returns:
+        (核心角色与设施, 常见物品/工具, 环境与装饰)，每项为 (拼音, 汉字) 列表
+    """
+    # 提取不同类别的词汇
+    core_items = []
+    common_items = []
+    env_items = []
+
+    # 优先级分组
+    if "人物" in vocab_dict:
+        core_items.extend(vocab_dict["人物"][:3])
+    if "设施" in vocab_dict:
+        core_items.extend(vocab_dict["设施"][:2])
+    if "物品" in vocab_dict:
+        common_items.extend(vocab_dict["物品"][:8])
+    if "环境" in vocab_dict:
+        env_items.extend(vocab_dict["环境"][:5])
+
+    return core_items, common_items, env_items
+
+
+def builtin_readings() -> Iterator[Tuple[str, str]]:
+    """内置场景名称和内置词汇的 (拼音, 汉字) 读音（用于没有 pypinyin 时的拼音匹配）"""
+    for name, pinyin in SCENE_PINYIN.items():
+        yield pinyin, name
+    for scene_data in VocabularyManager._builtin_vocabulary().values():
+        for items in scene_data.values():
+            yield from items
+
+
+class _VocabularyView(Mapping):
+    """场景名 -> 词汇的只读映射，按需加载外部场景（兼容原来的 vocabulary_data 字典）"""
+
+    def __init__(self, manager: "VocabularyManager"):
+        self._manager = manager
+
+    def __getitem__(self, scene: str) -> SceneVocabulary:
+        vocab = self._manager.load_scene(scene)
+        if vocab is None:
+            raise KeyError(scene)
+        return vocab
+
+    def __contains__(self, scene: object) -> bool:
+        return self._manager.has_scene(scene)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._manager.list_scenes())
+
+    def __len__(self) -> int:
+        return len(self._manager.list_scenes())
 
 
 class VocabularyManager:
-    """词汇管理器"""
+    """词汇管理器
+
+    内置场景和 add_scene 添加的场景常驻内存；外部场景只在清单中登记文件路径，
+    首次访问时解析，已解析的外部场景按文件大小计入内存预算，超出时按 LRU 淘汰。
+    词汇包中的场景直接从 mmap 解码，不占用内存预算；包内场景名称不逐个加入场景索引，
+    而是把词汇包作为场景索引的后备索引，启动时间和内存不随包内场景数增长。
 
-    def __init__(self):
-        self.vocabulary_data = self._load_vocabulary_data()
+    同名场景的优先级：add_scene > 清单中的 JSON 文件 > 词汇包 > 内置词汇。
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 pack_path: Optional[str] = None):
+        """
+        初始化词汇管理器
+
+        Args:
+            data_dir: 外部词汇目录，默认 config/vocabulary_data
+            memory_budget: 已解析外部场景的内存预算（字节，按文件大小估算）
+            pack_path: 词汇包路径，默认 config/vocabulary.pack（不存在时直接读取 JSON）
+        """
+        self.data_dir = data_dir or default_vocabulary_dir()
+        self.memory_budget = memory_budget
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._failed_files: Dict[str, Tuple[int, float]] = {}
+
+        self._builtin = self._builtin_vocabulary()
+        self._added: Dict[str, SceneVocabulary] = {}
+        self.pack_path = pack_path or default_pack_path()
+        self.pack = open_pack(self.pack_path)
+        self.manifest = self._scan_manifest()
+        self._loaded: "OrderedDict[str, Tuple[SceneVocabulary, int]]" = OrderedDict()
+        self._loaded_bytes = 0
+        self._loads = 0
+        self._evictions = 0
+
+        self.vocabulary_data = _VocabularyView(self)
+        self._warned_scenes = set()
+
+        # 识字倒排索引：首次查询时建立，之后随 add_scene / reload 增量更新
+        self._character_index: Optional[CharacterIndex] = None
+        self._character_index_lock = threading.Lock()
+
+        # 场景名称索引（模糊查找与自动补全），外部场景只登记名称，不解析文件；词汇包中的场景使用包内的索引
+        self.scene_index = SceneIndex(backing=self.pack)
+        self.scene_index.learn_readings(builtin_readings())
+        self.scene_index.extend(self._local_scenes())
+
+    def _scan_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """扫描外部词汇目录，只记录文件路径、大小和修改时间"""
+        manifest = {}
+        if not os.path.isdir(self.data_dir):
+            return manifest
+        pack = self.pack
+        pack_mtime = pack.mtime if pack is not None else 0
+        with os.scandir(self.data_dir) as entries:
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name.endswith(".json") and entry.is_file():
+                    stat = entry.stat()
+                    scene_name = entry.name[:-5]  # 移除 .json 后缀
+                    if pack is not None and stat.st_mtime <= pack_mtime and scene_name in pack:
+                        # 词汇包编译后未修改，直接从词汇包读取
+                        continue
+                    manifest[scene_name] = {
+                        "path": entry.path,
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime,
+                    }
+        return manifest
+
+    def has_scene(self, scene: str) -> bool:
+        """场景是否存在（不触发加载）"""
+        return scene in self.manifest or self._has_other_source(scene)
+
+    def _has_other_source(self, scene: str) -> bool:
+        """场景是否由清单以外的来源（add_scene、内置词汇、词汇包）提供"""
+        pack = self.pack
+        return scene in self._added or scene in self._builtin or (pack is not None and scene in pack)
+
+    def load_scene(self, scene: str, cache: bool = True) -> Optional[SceneVocabulary]:
+        """
+        按名称获取场景词汇（外部场景首次访问时解析文件）
+
+        外部文件与内置场景同名时外部文件优先，add_scene 添加的场景优先级最高。
+
+        Args:
+            scene: 场景名称（精确）
+            cache: 是否把解析结果放入缓存（遍历全部场景时传 False，避免挤掉常用场景）
+
+        Returns:
+            场景词汇，场景不存在或文件无法解析时返回 None
+        """
+        if scene in self._added:
+            return self._added[scene]
+        entry = self.manifest.get(scene)
+        if entry is None:
+            return self._fallback(scene)
+
+        with self._lock:
+            cached = self._loaded.get(scene)
+            if cached is not None:
+                self._loaded.move_to_end(scene)
+                return cached[0]
+
+            try:
+                vocab = parse_scene_file(entry["path"])
+            except Exception as e:
+                print(f"Warning: Failed to load vocabulary from {os.path.basename(entry['path'])}: {e}")
+                # 与原来启动时跳过坏文件一致：从清单中移除，退回词汇包或内置词汇中的同名场景（如有）
+                del self.manifest[scene]
+                vocab = self._fallback(scene)
+                if vocab is None:
+                    self.scene_index.remove(scene)
+                return vocab
+
+            self._loads += 1
+            if not cache:
+                return vocab
+            self._loaded[scene] = (vocab, entry["size"])
+            self._loaded_bytes += entry["size"]
+            self._evict(keep=scene)
+            for items in vocab.values():
+                self.scene_index.learn_readings(items)
+            return vocab
+
+    def _fallback(self, scene: str) -> Optional[SceneVocabulary]:
+        """从词汇包或内置词汇中读取场景"""
+        if self.pack is not None:
+            vocab = self.pack.get(scene)
+            if vocab is not None:
+                return vocab
+        return self._builtin.get(scene)
+
+    def _evict(self, keep: str):
+        """超出内存预算时淘汰最久未使用的外部场景（调用方需持有锁）"""
+        while self._loaded_bytes > self.memory_budget and len(self._loaded) > 1:
+            scene, (_, size) = next(iter(self._loaded.items()))
+            if scene == keep:
+                self._loaded.move_to_end(scene)
+                continue
+            del self._loaded[scene]
+            self._loaded_bytes -= size
+            self._evictions += 1
+
+    def _pack_changed(self) -> bool:
+        """词汇包文件是否被重新编译、新建或删除"""
+        try:
+            mtime = os.path.getmtime(self.pack_path)
+        except OSError:
+            return self.pack is not None
+        return self.pack is None or mtime != self.pack.mtime
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        重新扫描外部词汇，只重新解析有变化的文件，并原子替换受影响的场景
 
-    def _load_vocabulary_data(self) -> Dict[str, Dict[str, List[Tuple[str, str]]]]:
-        """加载词汇数据"""
+        新文件在锁外解析完成后才替换旧条目，解析失败时保留旧内容；
+        词汇包重新编译过时重新映射。
+
+        Returns:
+            {"added": [...], "changed": [...], "removed": [...], "failed": [...],
+             "pack_reloaded": bool}，场景名列表
+        """
+        with self._reload_lock:
+            old_manifest = self.manifest
+            pack_reloaded = self._pack_changed()
+            if pack_reloaded:
+                old_scenes = set(self.list_scenes())
+                # 旧的映射不主动关闭：可能有线程正在读取，随对象回收释放
+                pack = open_pack(self.pack_path)
+                with self._lock:
+                    self.pack = pack
+                    self.scene_index.backing = pack
+
+            manifest = self._scan_manifest()
+            parsed: Dict[str, SceneVocabulary] = {}
+            failed = []
+            for scene, entry in list(manifest.items()):
+                old = old_manifest.get(scene)
+                signature = (entry["size"], entry["mtime"])
+                if old is not None and (old["size"], old["mtime"]) == signature:
+                    continue
+                try:
+                    if self._failed_files.get(scene) == signature:
+                        # 上次解析失败后文件没有变化，不重复解析和警告
+                        raise ValueError("unchanged since last failure")
+                    parsed[scene] = parse_scene_file(entry["path"])
+                    self._failed_files.pop(scene, None)
+                except Exception as e:
+                    if self._failed_files.get(scene) != signature:
+                        print(f"Warning: Failed to reload vocabulary from {os.path.basename(entry['path'])}: {e}")
+                        self._failed_files[scene] = signature
+                    failed.append(scene)
+                    # 保留旧内容（文件可能正在写入，下次扫描时再试）
+                    if old is not None:
+                        manifest[scene] = old
+                    else:
+                        del manifest[scene]
+
+            with self._lock:
+                for scene in set(self._loaded) - set(manifest):
+                    self._loaded_bytes -= self._loaded.pop(scene)[1]
+                for scene, vocab in parsed.items():
+                    previous = self._loaded.pop(scene, None)
+                    if previous is not None:
+                        self._loaded_bytes -= previous[1]
+                    self._loaded[scene] = (vocab, manifest[scene]["size"])
+                    self._loaded_bytes += manifest[scene]["size"]
+                    for items in vocab.values():
+                        self.scene_index.learn_readings(items)
+                    self._evict(keep=scene)
+                self.manifest = manifest
+                self._warned_scenes.clear()
+
+            if pack_reloaded:
+                new_scenes = set(self.list_scenes())
+            else:
+                # 词汇包没有变化时只有清单中的场景可能增减，不必解码包内的全部场景名称
+                touched = set(old_manifest) | set(manifest)
+                old_scenes = {scene for scene in touched if scene in old_manifest or self._has_other_source(scene)}
+                new_scenes = {scene for scene in touched if scene in manifest or self._has_other_source(scene)}
+            added = sorted(new_scenes - old_scenes)
+            removed = sorted(old_scenes - new_scenes)
+            for scene in removed:
+                self.scene_index.remove(scene)
+            # 新进入清单的场景（包括覆盖词汇包同名场景的 JSON 文件）加入场景索引
+            self.scene_index.extend(manifest if pack_reloaded else
+                                    [scene for scene in manifest if scene not in old_manifest])
+
+            # 清单中消失但仍存在的场景改由词汇包或内置词汇提供，内容也可能变化
+            changed = set(parsed) | (set(old_manifest) - set(manifest))
+            changed = sorted((changed & old_scenes & new_scenes) - set(added))
+            if pack_reloaded:
+                # 词汇包中的场景都可能变化，倒排索引下次查询时重建
+                self._character_index = None
+            else:
+                self._update_character_index(added + changed, removed)
+            return {
+                "added": added,
+                "changed": changed,
+                "removed": removed,
+                "failed": failed,
+                "pack_reloaded": pack_reloaded,
+            }
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """获取外部场景加载统计"""
+        with self._lock:
+            return {
+                "external_scenes": len(self.manifest),
+                "pack_scenes": len(self.pack) if self.pack is not None else 0,
+                "loaded_scenes": len(self._loaded),
+                "loaded_bytes": self._loaded_bytes,
+                "memory_budget": self.memory_budget,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
+
+    @staticmethod
+    def _builtin_vocabulary() -> Dict[str, SceneVocabulary]:
+        """内置词汇数据"""
         vocabulary = {
             "超市": {
                 "人物": [
@@ -204,30 +577,6 @@ class VocabularyManager:
             },
         }
 
-        # 尝试从外部文件加载额外的词汇数据
-        external_data_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            "config", "vocabulary_data"
-        )
-
-        if os.path.exists(external_data_path):
-            for filename in os.listdir(external_data_path):
-                if filename.endswith(".json"):
-                    scene_name = filename[:-5]  # 移除 .json 后缀
-                    try:
-                        with open(os.path.join(external_data_path, filename), 'r', encoding='utf-8') as f:
-                            scene_data = json.load(f)
-                            # 将数据转换为正确的格式
-                            formatted_data = {}
-                            for category, items in scene_data.items():
-                                formatted_data[category] = [
-                                    (item["pinyin"], item["chinese"])
-                                    for item in items
-                                ]
-                            vocabulary[scene_name] = formatted_data
-                    except Exception as e:
-                        print(f"Warning: Failed to load vocabulary from {filename}: {e}")
-
         return vocabulary
 
     def get_scene_vocabulary(self, scene: str) -> Dict[str, List[Tuple[str, str]]]:
@@ -240,19 +589,51 @@ class VocabularyManager:
             词汇字典，包含不同类别的词汇列表
         """
         # 尝试精确匹配
-        if scene in self.vocabulary_data:
-            return self.vocabulary_data[scene]
+        vocab = self.load_scene(scene)
+        if vocab is not None:
+            return vocab
 
-        # 尝试模糊匹配
-        scene_lower = scene.lower()
-        for key, value in self.vocabulary_data.items():
-            if scene_lower == key.lower() or scene_lower in key.lower() or key.lower() in scene_lower:
-                return value
+        # 通过索引模糊匹配（忽略大小写、前缀、子串）
+        matched = self.resolve_scene(scene)
+        if matched is not None:
+            vocab = self.load_scene(matched)
+            if vocab is not None:
+                return vocab
 
-        # 如果没有找到，返回空字典
-        print(f"Warning: Scene '{scene}' not found in vocabulary database.")
+        # 如果没有找到，返回空字典（同一场景只警告一次）
+        if scene not in self._warned_scenes:
+            self._warned_scenes.add(scene)
+            print(f"Warning: Scene '{scene}' not found in vocabulary database.")
         return {}
 
+    def resolve_scene(self, scene: str) -> Optional[str]:
+        """
+        将输入的主题解析为词汇库中的场景名称
+
+        Args:
+            scene: 主题/场景（可以是部分名称）
+
+        Returns:
+            场景名称，没有匹配时返回 None
+        """
+        if self.has_scene(scene):
+            return scene
+        # 拼音前缀太宽泛（如「d」），只用于自动补全
+        return self.scene_index.lookup(scene, accept=lambda kind: kind != MATCH_PINYIN)
+
+    def suggest_scenes(self, partial: str = "", limit: Optional[int] = DEFAULT_SUGGESTION_LIMIT) -> List[str]:
+        """
+        场景自动补全
+
+        Args:
+            partial: 部分输入（汉字、拼音首字母或全拼），为空时返回全部场景
+            limit: 返回条数，None 表示不限
+
+        Returns:
+            按匹配程度排序的场景名称列表
+        """
+        return self.scene_index.suggest(partial, limit)
+
     def get_vocabulary_list(self, scene: str, limit: int = 20) -> List[Tuple[str, str]]:
         """获取场景的词汇列表（混合所有类别）
 
@@ -276,42 +657,137 @@ class VocabularyManager:
 
         return vocab_list[:limit]
 
+    def select_prompt_items(self, scene: str) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """选择写入提示词（即画在小报上）的词汇
+
+        Returns:
+            (核心角色与设施, 常见物品/工具, 环境与装饰)，每项为 (拼音, 汉字) 列表
+        """
+        return prompt_items(self.get_scene_vocabulary(scene))
+
     def format_vocabulary_for_prompt(self, scene: str) -> Tuple[str, str, str]:
         """格式化词汇用于提示词模板
 
         Returns:
             (核心角色与设施, 常见物品/工具, 环境与装饰)
         """
-        vocab_dict = self.get_scene_vocabulary(scene)
-
-        # 提取不同类别的词汇
-        core_items = []
-        common_items = []
-        env_items = []
-
-        # 优先级分组
-        if "人物" in vocab_dict:
-            core_items.extend(vocab_dict["人物"][:3])
-        if "设施" in vocab_dict:
-            core_items.extend(vocab_dict["设施"][:2])
-        if "物品" in vocab_dict:
-            common_items.extend(vocab_dict["物品"][:8])
-        if "环境" in vocab_dict:
-            env_items.extend(vocab_dict["环境"][:5])
-
         # 格式化为字符串
         format_item = lambda items: ", ".join([f"{pinyin} {chinese}" for pinyin, chinese in items])
 
-        return (
-            format_item(core_items),
-            format_item(common_items),
-            format_item(env_items)
-        )
+        return tuple(format_item(items) for items in self.select_prompt_items(scene))
+
+    def get_character_index(self) -> CharacterIndex:
+        """获取识字倒排索引（首次调用时遍历全部场景建立）"""
+        index = self._character_index
+        if index is None:
+            with self._character_index_lock:
+                index = self._character_index
+                if index is None:
+                    index = CharacterIndex()
+                    index.build(
+                        (scene, vocab) for scene, vocab in
+                        ((scene, self.load_scene(scene, cache=False)) for scene in self.list_scenes())
+                        if vocab is not None
+                    )
+                    self._character_index = index
+        return index
+
+    def character_index_stats(self) -> Optional[Dict[str, Any]]:
+        """倒排索引统计，尚未建立时返回 None（不触发建立）"""
+        index = self._character_index
+        return index.stats() if index is not None else None
+
+    def _update_character_index(self, updated: List[str], removed: List[str]):
+        """场景变化后增量更新倒排索引（索引尚未建立时跳过）"""
+        with self._character_index_lock:
+            index = self._character_index
+            if index is None:
+                return
+            for scene in removed:
+                index.remove_scene(scene)
+            for scene in updated:
+                vocab = self.load_scene(scene, cache=False)
+                if vocab is None:
+                    index.remove_scene(scene)
+                else:
+                    index.add_scene(scene, vocab)
+
+    def scenes_with_characters(self, characters: str, match_all: bool = True,
+                               limit: Optional[int] = DEFAULT_RESULT_LIMIT) -> Dict[str, Any]:
+        """
+        查找教这些汉字的场景
+
+        Args:
+            characters: 汉字（如「医药」，非汉字字符被忽略）
+            match_all: True 时场景需包含全部汉字，False 时包含任意一个即可
+            limit: 最多返回的场景数，None 表示不限
+
+        Returns:
+            {"scenes": [{"scene": 场景名, "matches": {汉字: [类别]}}], "total": 总数, "missing": [未收录的汉字]}
+        """
+        return self.get_character_index().scenes_with_characters(characters, match_all, limit)
+
+    def scenes_with_syllables(self, syllables: List[str], match_all: bool = True,
+                              limit: Optional[int] = DEFAULT_RESULT_LIMIT) -> Dict[str, Any]:
+        """
+        查找包含这些带声调拼音音节的场景（参数和返回值同 scenes_with_characters）
+
+        Args:
+            syllables: 拼音音节，如 ["yī", "yào"]
+        """
+        return self.get_character_index().scenes_with_syllables(syllables, match_all, limit)
+
+    def characters_in_scene(self, scene: str, poster_only: bool = True) -> List[Dict[str, Any]]:
+        """
+        场景（小报）教的汉字
+
+        Args:
+            scene: 场景名称（支持模糊匹配）
+            poster_only: 只统计写入提示词的词汇（即小报上实际标注的词）；False 时统计场景全部词汇
+
+        Returns:
+            [{"character": 汉字, "pinyin": 带声调拼音, "words": [包含该字的词]}]，按出现顺序
+        """
+        if poster_only:
+            items = [item for group in self.select_prompt_items(scene) for item in group]
+        else:
+            items = [item for group in self.get_scene_vocabulary(scene).values() for item in group]
+
+        characters: Dict[str, Dict[str, Any]] = {}
+        for pinyin, chinese in items:
+            syllables = pinyin.split()
+            chars = list(chinese.strip())
+            for position, char in enumerate(chars):
+                if not is_hanzi(char):
+                    continue
+                entry = characters.setdefault(char, {"character": char, "pinyin": None, "words": []})
+                if entry["pinyin"] is None and len(syllables) == len(chars):
+                    entry["pinyin"] = syllables[position]
+                if chinese not in entry["words"]:
+                    entry["words"].append(chinese)
+        return list(characters.values())
 
     def add_scene(self, scene_name: str, vocabulary_data: Dict[str, List[Tuple[str, str]]]):
-        """添加新的场景词汇"""
-        self.vocabulary_data[scene_name] = vocabulary_data
+        """添加新的场景词汇（常驻内存，增量更新场景索引）"""
+        self._added[scene_name] = vocabulary_data
+        for items in vocabulary_data.values():
+            self.scene_index.learn_readings(items)
+        self.scene_index.add(scene_name)
+        self._warned_scenes.clear()
+        self._update_character_index([scene_name], [])
 
     def list_scenes(self) -> List[str]:
-        """列出所有可用的场景"""
-        return list(self.vocabulary_data.keys())
\ No newline at end of file
+        """列出所有可用的场景（不触发加载）"""
+        scenes = list(self._builtin)
+        seen = set(scenes)
+        pack = self.pack
+        for names in (pack.names() if pack is not None else (), self.manifest, self._added):
+            for scene in names:
+                if scene not in seen:
+                    seen.add(scene)
+                    scenes.append(scene)
+        return scenes
+
+    def _local_scenes(self) -> List[str]:
+        """内置、清单和 add_scene 添加的场景（词汇包以外需要逐个加入场景索引的场景）"""
+        return list(dict.fromkeys([*self._builtin, *self.manifest, *self._added]))
@@ -0,0 +1,422 @@
+"""二进制词汇包模块
+把外部词汇目录（config/vocabulary_data/*.json）编译成一个紧凑的二进制文件，
+各进程以只读 mmap 打开，多个 Web worker 共享同一份页缓存，按需解码单个场景，不必每个进程重新解析 JSON；
+场景名称的查找索引（归一化名称、n-gram、拼音首字母）也在编译时建好写入包内，各进程不再逐个登记包内场景
+
+文件格式（小端序，除字符串数据外均为定长 u32 字段）：
+    头部          magic, 版本, 场景数, 字符串数, 类别数, 条目数, 名称键数, n-gram 数, 拼音键数, 最长名称键长度
+    字符串索引    每个字符串 (偏移, 长度)，字符串去重后只存一份
+    场景表        每个场景 (名称, 首个类别, 类别数)，按编译顺序
+    排序表        按名称 UTF-8 字节排序的场景序号（二分查找）
+    类别表        每个类别 (名称, 首个条目, 条目数)
+    条目表        每个条目 (拼音, 汉字)
+    名称键表      每个场景 (归一化名称, 场景序号)，按键排序（精确与前缀匹配）
+    n-gram 表     (二元组或单字, 场景序号)，按键排序（子串匹配）
+    拼音键表      (首字母或全拼, 场景序号)，按键排序（拼音前缀匹配）
+    字符串数据    UTF-8
+
+UTF-8 字节序与 Unicode 码点序一致，排序表都可以直接按解码后的字符串二分查找。
+
+用法：
+    python src/vocabulary_pack.py                      # 编译默认目录到 config/vocabulary.pack
+    python src/vocabulary_pack.py -d 词汇目录 -o 输出文件
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+try:
+    from .scene_index import (SceneIndex, normalize, ngrams,
+                              MATCH_EXACT, MATCH_PREFIX, MATCH_PINYIN, MATCH_SUBSTRING, MATCH_CONTAINED)
+except ImportError:
+    from scene_index import (SceneIndex, normalize, ngrams,
+                             MATCH_EXACT, MATCH_PREFIX, MATCH_PINYIN, MATCH_SUBSTRING, MATCH_CONTAINED)
+
+
+# 文件标识与版本（版本 1 的词汇包没有名称索引，需要重新编译）
+PACK_MAGIC = b"VPK1"
+PACK_VERSION = 2
+
+HEADER = struct.Struct("<4sHHIIIIIIII")  # magic, 版本, 保留, 场景数, 字符串数, 类别数, 条目数, 名称键数, n-gram 数, 拼音键数, 最长名称键长度
+STRING_ENTRY = struct.Struct("<II")     # 偏移, 长度
+SCENE_ENTRY = struct.Struct("<III")     # 名称, 首个类别, 类别数
+SORTED_ENTRY = struct.Struct("<I")      # 场景序号
+CATEGORY_ENTRY = struct.Struct("<III")  # 名称, 首个条目, 条目数
+ITEM_ENTRY = struct.Struct("<II")       # 拼音, 汉字
+KEY_ENTRY = struct.Struct("<II")        # 键, 场景序号（名称键表、n-gram 表、拼音键表共用）
+
+# 场景词汇：类别 -> (拼音, 汉字) 列表
+SceneVocabulary = Dict[str, List[Tuple[str, str]]]
+
+
+def default_pack_path() -> str:
+    """默认的词汇包路径（config/vocabulary.pack）"""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "config", "vocabulary.pack"
+    )
+
+
+def _name_keys(names: List[str], scenes: Mapping[str, SceneVocabulary],
+               readings: Iterable[Tuple[str, str]]) -> Tuple[list, list, list]:
+    """
+    计算场景名称的查找键（与 SceneIndex 的索引一致）
+
+    Args:
+        names: 场景名称（按编译顺序）
+        scenes: 场景词汇（用于学习汉字读音）
+        readings: 其他 (拼音, 汉字) 读音来源
+
+    Returns:
+        (名称键, n-gram, 拼音键)，每项为按键排序的 (键, 场景序号) 列表
+    """
+    name_index = SceneIndex()
+    name_index.learn_readings(readings)
+    for vocab in scenes.values():
+        for items in vocab.values():
+            name_index.learn_readings(items)
+    name_index.extend(names)
+
+    keys, grams, pinyin = [], [], []
+    for index, name in enumerate(names):
+        key = normalize(name)
+        keys.append((key, index))
+        # 单字也登记，单字查询通过 n-gram 表查找包含该字的场景
+        grams.extend((gram, index) for gram in sorted(ngrams(key) | set(key)))
+        pinyin.extend((pinyin_key, index) for pinyin_key in name_index.pinyin_keys(name))
+    return sorted(keys), sorted(grams), sorted(pinyin)
+
+
+def write_pack(scenes: Mapping[str, SceneVocabulary], path: str,
+               readings: Iterable[Tuple[str, str]] = ()) -> int:
+    """
+    编译词汇包（先写临时文件再替换，已打开旧文件的进程不受影响）
+
+    Args:
+        scenes: 场景名 -> 场景词汇（按迭代顺序写入）
+        path: 输出文件路径
+        readings: 计算场景名拼音时额外参考的 (拼音, 汉字) 读音（如内置词汇）
+
+    Returns:
+        文件大小（字节）
+    """
+    strings: Dict[str, int] = {}
+    string_data = bytearray()
+    string_entries = bytearray()
+
+    def intern(text: str) -> int:
+        string_id = strings.get(text)
+        if string_id is None:
+            encoded = text.encode("utf-8")
+            string_id = strings[text] = len(strings)
+            string_entries.extend(STRING_ENTRY.pack(len(string_data), len(encoded)))
+            string_data.extend(encoded)
+        return string_id
+
+    scene_entries = bytearray()
+    category_entries = bytearray()
+    item_entries = bytearray()
+    names: List[bytes] = []
+    category_count = item_count = 0
+    for scene_name, vocab in scenes.items():
+        names.append(scene_name.encode("utf-8"))
+        scene_entries.extend(SCENE_ENTRY.pack(intern(scene_name), category_count, len(vocab)))
+        for category, items in vocab.items():
+            category_entries.extend(CATEGORY_ENTRY.pack(intern(category), item_count, len(items)))
+            category_count += 1
+            for pinyin, chinese in items:
+                item_entries.extend(ITEM_ENTRY.pack(intern(pinyin), intern(chinese)))
+                item_count += 1
+
+    order = sorted(range(len(names)), key=names.__getitem__)
+    sorted_entries = b"".join(SORTED_ENTRY.pack(index) for index in order)
+
+    name_keys = _name_keys(list(scenes), scenes, readings)
+    key_tables = [b"".join(KEY_ENTRY.pack(intern(text), index) for text, index in table) for table in name_keys]
+    max_key_length = max((len(key) for key, _ in name_keys[0]), default=0)
+
+    header = HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(names), len(strings), category_count, item_count,
+                         *(len(table) // KEY_ENTRY.size for table in key_tables), max_key_length)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for section in (header, string_entries, scene_entries, sorted_entries,
+                        category_entries, item_entries, *key_tables, string_data):
+            f.write(section)
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class VocabularyPack:
+    """只读 mmap 词汇包
+
+    打开时只校验头部，场景名称和词汇都在访问时直接从映射内存（memoryview，不复制）中解码，
+    同一文件被多个进程打开时共享物理页。名称查找（match_names）使用包内的排序表二分查找，
+    可以作为 SceneIndex 的只读后备索引。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开词汇包
+
+        Args:
+            path: 词汇包路径
+
+        Raises:
+            ValueError: 文件格式或版本不正确
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.mtime = os.fstat(f.fileno()).st_mtime
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < HEADER.size:
+            self.close()
+            raise ValueError(f"Vocabulary pack too small: {path}")
+        magic, version = struct.unpack_from("<4sH", self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported vocabulary pack (rebuild with src/vocabulary_pack.py): {path}")
+        (_, _, _, scene_count, string_count, category_count, item_count,
+         key_count, gram_count, pinyin_count, self.max_key_length) = HEADER.unpack_from(self._mm, 0)
+
+        self.scene_count = scene_count
+        self._strings = HEADER.size
+        self._scenes = self._strings + string_count * STRING_ENTRY.size
+        self._sorted = self._scenes + scene_count * SCENE_ENTRY.size
+        self._categories = self._sorted + scene_count * SORTED_ENTRY.size
+        self._items = self._categories + category_count * CATEGORY_ENTRY.size
+        self._keys = (self._items + item_count * ITEM_ENTRY.size, key_count)
+        self._grams = (self._keys[0] + key_count * KEY_ENTRY.size, gram_count)
+        self._pinyin = (self._grams[0] + gram_count * KEY_ENTRY.size, pinyin_count)
+        self._data = self._pinyin[0] + pinyin_count * KEY_ENTRY.size
+        if self._data > len(self._mm):
+            self.close()
+            raise ValueError(f"Truncated vocabulary pack: {path}")
+        self._view = memoryview(self._mm)
+
+    def close(self):
+        """关闭映射"""
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.release()
+        self._mm.close()
+
+    def _string(self, string_id: int) -> str:
+        offset, length = STRING_ENTRY.unpack_from(self._mm, self._strings + string_id * STRING_ENTRY.size)
+        start = self._data + offset
+        # 直接从映射内存解码，不先复制成 bytes
+        return str(self._view[start:start + length], "utf-8")
+
+    def _scene_name(self, index: int) -> str:
+        name_id, = struct.unpack_from("<I", self._mm, self._scenes + index * SCENE_ENTRY.size)
+        return self._string(name_id)
+
+    def __len__(self) -> int:
+        return self.scene_count
+
+    def names(self) -> Iterator[str]:
+        """按编译顺序列出场景名称"""
+        for index in range(self.scene_count):
+            yield self._scene_name(index)
+
+    def find(self, scene: str) -> Optional[int]:
+        """
+        二分查找场景
+
+        Args:
+            scene: 场景名称（精确）
+
+        Returns:
+            场景序号，不存在时返回 None
+        """
+        low, high = 0, self.scene_count
+        while low < high:
+            middle = (low + high) // 2
+            index, = SORTED_ENTRY.unpack_from(self._mm, self._sorted + middle * SORTED_ENTRY.size)
+            name = self._scene_name(index)
+            if name == scene:
+                return index
+            if name < scene:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __contains__(self, scene: object) -> bool:
+        return isinstance(scene, str) and self.find(scene) is not None
+
+    def get(self, scene: str) -> Optional[SceneVocabulary]:
+        """
+        解码场景词汇（只解码该场景用到的字符串）
+
+        Args:
+            scene: 场景名称（精确）
+
+        Returns:
+            场景词汇，不存在时返回 None
+        """
+        index = self.find(scene)
+        if index is None:
+            return None
+        _, category_start, category_count = SCENE_ENTRY.unpack_from(self._mm, self._scenes + index * SCENE_ENTRY.size)
+        vocab = {}
+        for category_index in range(category_start, category_start + category_count):
+            name_id, item_start, item_count = CATEGORY_ENTRY.unpack_from(
+                self._mm, self._categories + category_index * CATEGORY_ENTRY.size
+            )
+            vocab[self._string(name_id)] = [
+                (self._string(pinyin_id), self._string(chinese_id))
+                for pinyin_id, chinese_id in ITEM_ENTRY.iter_unpack(
+                    self._view[self._items + item_start * ITEM_ENTRY.size:
+                               self._items + (item_start + item_count) * ITEM_ENTRY.size]
+                )
+            ]
+        return vocab
+
+    def _key_bounds(self, table: Tuple[int, int], prefix: str, exact: bool = False) -> Tuple[int, int]:
+        """
+        二分查找键表中以 prefix 开头（exact 为 True 时等于 prefix）的条目范围
+
+        Args:
+            table: (表偏移, 条目数)
+            prefix: 键前缀
+            exact: 是否只要键完全相同的条目
+
+        Returns:
+            条目位置范围 [start, end)
+        """
+        offset, count = table
+
+        def first(before: Callable[[str], bool]) -> int:
+            # 排序表中第一个 before 不成立的位置
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                string_id, _ = KEY_ENTRY.unpack_from(self._mm, offset + middle * KEY_ENTRY.size)
+                if before(self._string(string_id)):
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+
+        start = first(lambda key: key < prefix)
+        if exact:
+            return start, first(lambda key: key <= prefix)
+        return start, first(lambda key: key < prefix or key.startswith(prefix))
+
+    def _key_indices(self, table: Tuple[int, int], prefix: str, exact: bool = False) -> List[int]:
+        """键表中以 prefix 开头（或等于 prefix）的场景序号（只解码二分查找经过的键）"""
+        start, end = self._key_bounds(table, prefix, exact)
+        offset = table[0]
+        return [index for _, index in KEY_ENTRY.iter_unpack(
+            self._view[offset + start * KEY_ENTRY.size:offset + end * KEY_ENTRY.size]
+        )]
+
+    def match_names(self, key: str) -> Dict[str, Tuple[int, int]]:
+        """
+        按包内的名称索引查找场景（匹配规则与 SceneIndex.matches 一致）
+
+        Args:
+            key: 归一化的查询文本
+
+        Returns:
+            场景名 -> (最佳匹配类型, 场景序号)
+        """
+        best: Dict[int, int] = {}
+
+        def offer(kind: int, indices: Iterable[int]):
+            for index in indices:
+                if kind < best.get(index, MATCH_CONTAINED + 1):
+                    best[index] = kind
+
+        # 归一化后同名的场景只有第一个算精确匹配（与 SceneIndex 一致），其余算前缀匹配
+        offer(MATCH_EXACT, self._key_indices(self._keys, key, exact=True)[:1])
+        offer(MATCH_PREFIX, self._key_indices(self._keys, key))
+        if key.isascii():
+            offer(MATCH_PINYIN, self._key_indices(self._pinyin, key.replace(" ", "")))
+
+        # 名称包含查询：各 n-gram 的倒排表取交集；只有一个 n-gram（或单字）时倒排表就是结果，不必校验
+        postings = sorted((set(self._key_indices(self._grams, gram, exact=True)) for gram in ngrams(key)), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        if len(postings) > 1:
+            candidates = {index for index in candidates if key in normalize(self._scene_name(index))}
+        offer(MATCH_SUBSTRING, candidates)
+
+        # 查询包含名称：逐个精确查找查询中不超过最长场景名的子串
+        for length in range(1, min(len(key), self.max_key_length) + 1):
+            for start in range(len(key) - length + 1):
+                offer(MATCH_CONTAINED, self._key_indices(self._keys, key[start:start + length], exact=True))
+
+        return {self._scene_name(index): (kind, index) for index, kind in best.items()}
+
+
+def open_pack(path: str) -> Optional[VocabularyPack]:
+    """
+    打开词汇包
+
+    Args:
+        path: 词汇包路径
+
+    Returns:
+        词汇包；文件不存在时返回 None，格式错误时打印警告并返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return VocabularyPack(path)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Failed to open vocabulary pack {path}: {e}")
+        return None
+
+
+def build_pack(data_dir: str, path: str) -> Tuple[int, int]:
+    """
+    编译外部词汇目录
+
+    Args:
+        data_dir: 外部词汇目录
+        path: 输出文件路径
+
+    Returns:
+        (场景数, 文件大小)
+    """
+    try:
+        from .vocabulary import parse_scene_file, builtin_readings
+    except ImportError:
+        from vocabulary import parse_scene_file, builtin_readings
+
+    scenes = {}
+    for filename in sorted(os.listdir(data_dir)) if os.path.isdir(data_dir) else []:
+        if not filename.endswith(".json"):
+            continue
+        try:
+            scenes[filename[:-5]] = parse_scene_file(os.path.join(data_dir, filename))
+        except Exception as e:
+            print(f"Warning: Failed to load vocabulary from {filename}: {e}")
+    return len(scenes), write_pack(scenes, path, readings=builtin_readings())
+
+
+def main():
+    """命令行入口：编译词汇包"""
+    try:
+        from .vocabulary import default_vocabulary_dir
+    except ImportError:
+        from vocabulary import default_vocabulary_dir
+
+    parser = argparse.ArgumentParser(description="编译二进制词汇包")
+    parser.add_argument("-d", "--data-dir", default=default_vocabulary_dir(), help="外部词汇目录")
+    parser.add_argument("-o", "--output", default=default_pack_path(), help="输出文件路径")
+    args = parser.parse_args()
+
+    scene_count, size = build_pack(args.data_dir, args.output)
+    print(f"已编译 {scene_count} 个场景到 {args.output}（{size / 1024:.1f} KB）")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
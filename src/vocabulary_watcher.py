@@ -0,0 +1,144 @@
+"""词汇热更新模块
+后台线程定期检查词汇目录、词汇包和提示词模板的修改时间，
+只重新加载有变化的场景文件并清理相关的提示词缓存，Web 服务不必重启（重启会丢失内存中的任务状态）
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Any
+
+# 默认检查间隔（秒）
+DEFAULT_CHECK_INTERVAL = 5.0
+
+
+class VocabularyWatcher:
+    """词汇与模板变更监视器
+
+    基于修改时间轮询（不依赖 inotify，Windows 上同样可用）：
+    - 词汇：调用 VocabularyManager.reload()，变化的场景原子替换并清理提示词缓存
+    - 模板：prompt.md 或模板目录中的文件变化时丢弃编译结果，下次渲染时重新编译
+    """
+
+    def __init__(self, prompt_generator, interval: float = DEFAULT_CHECK_INTERVAL):
+        """
+        初始化监视器
+
+        Args:
+            prompt_generator: PromptGenerator 实例（使用其词汇管理器和模板引擎）
+            interval: 检查间隔（秒）
+        """
+        self.vocab_manager = prompt_generator.vocab_manager
+        self.template_engine = prompt_generator.template_engine
+        self.interval = interval
+
+        self._template_mtimes = self._scan_templates()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()   # 后台线程与手动触发的检查串行执行
+
+        # 统计信息
+        self._checks = 0
+        self._reloads = 0
+        self._last_reload: Optional[Dict[str, Any]] = None
+
+    def _scan_templates(self) -> Dict[str, float]:
+        """模板名称 -> 修改时间"""
+        mtimes = {}
+        engine = self.template_engine
+        for name in engine.list_templates():
+            try:
+                mtimes[name] = os.path.getmtime(engine.source_path(name))
+            except (OSError, ValueError):
+                mtimes[name] = 0.0
+        return mtimes
+
+    def start(self):
+        """启动后台检查线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="vocabulary-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台检查线程"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # 单次检查失败不影响后续检查
+                print(f"Vocabulary watcher error: {e}")
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """
+        检查一次变更并重新加载
+
+        Returns:
+            有变化时返回重新加载报告（场景变化、模板变化和耗时），否则返回 None
+        """
+        with self._check_lock:
+            return self._check()
+
+    def _check(self) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        changes = self.vocab_manager.reload()
+
+        if changes["pack_reloaded"]:
+            # 词汇包重新编译后任何场景都可能变化
+            self.template_engine.invalidate_scene()
+        else:
+            for scene in changes["added"] + changes["changed"] + changes["removed"]:
+                self.template_engine.invalidate_scene(scene)
+
+        template_mtimes = self._scan_templates()
+        templates = sorted(
+            name for name in set(template_mtimes) | set(self._template_mtimes)
+            if template_mtimes.get(name) != self._template_mtimes.get(name)
+        )
+        for name in templates:
+            self.template_engine.invalidate_templates(name)
+        self._template_mtimes = template_mtimes
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._checks += 1
+        if not (changes["added"] or changes["changed"] or changes["removed"]
+                or changes["pack_reloaded"] or templates):
+            return None
+
+        report = {
+            **changes,
+            "templates": templates,
+            "seconds": round(elapsed, 4),
+            "time": time.time(),
+        }
+        with self._lock:
+            self._reloads += 1
+            self._last_reload = report
+        print(
+            f"Vocabulary reloaded in {elapsed * 1000:.1f} ms: "
+            f"{len(changes['added'])} added, {len(changes['changed'])} changed, "
+            f"{len(changes['removed'])} removed, {len(templates)} templates"
+            + (", pack remapped" if changes["pack_reloaded"] else "")
+        )
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        """获取监视器统计信息"""
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval": self.interval,
+                "checks": self._checks,
+                "reloads": self._reloads,
+                "last_reload": self._last_reload,
+            }
@@ -0,0 +1,107 @@
+"""测试公共夹具
+src 目录加入导入路径；API 测试使用 src/mock_kie_server.py 的本地模拟服务，
+客户端的连接池、缓存、调度器等都使用测试专用实例，不读写 outputs/ 下的共享文件。
+Web 测试导入 web/app.py 后把输出目录、任务队列、历史存储和 APIClient 替换为测试专用实例
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+WEB_DIR = os.path.join(ROOT_DIR, "web")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from mock_kie_server import MockKieServer
+from http_pool import ConnectionPool
+from poll_schedule import AdaptivePollSchedule
+from retry import RetryPolicy, TokenBucket
+from result_cache import ResultCache
+from single_flight import SingleFlight
+from downloader import BackgroundWriter
+from api_client import APIClient
+from job_queue import JobQueue, JobStore
+import history_store
+
+
+@pytest.fixture
+def mock_server():
+    """本地模拟 Kie API（任务 0.3 秒后完成）"""
+    server = MockKieServer(delay=0.3).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_client(tmp_path, mock_server):
+    """创建指向模拟服务、使用独立依赖的 APIClient"""
+    created = []
+
+    def factory(**overrides):
+        options = {
+            "pool": ConnectionPool(),
+            "poll_schedule": AdaptivePollSchedule(default_interval=0.1, min_interval=0.05),
+            "base_url": mock_server.base_url,
+            "retry_policy": RetryPolicy(max_retries=2, backoff_base=0.01, backoff_max=0.05),
+            "rate_limiter": TokenBucket(0),
+            "result_cache": ResultCache(str(tmp_path / "cache")),
+            "single_flight": SingleFlight(),
+            "writer": BackgroundWriter(),
+        }
+        options.update(overrides)
+        client = APIClient("test-key", **options)
+        created.append(client)
+        return client
+
+    yield factory
+    for client in created:
+        client.pool.close()
+
+
+@pytest.fixture
+def write_scene(tmp_path):
+    """在临时词汇目录中写入场景文件，返回文件路径"""
+    data_dir = tmp_path / "vocabulary_data"
+    data_dir.mkdir(exist_ok=True)
+
+    def write(name, vocabulary):
+        path = data_dir / f"{name}.json"
+        data = {
+            category: [{"pinyin": pinyin, "chinese": chinese} for pinyin, chinese in items]
+            for category, items in vocabulary.items()
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        return str(path)
+
+    write.data_dir = str(data_dir)
+    return write
+
+
+@pytest.fixture
+def web_app(monkeypatch, tmp_path, make_client):
+    """导入 Web 应用并替换为测试专用的依赖（生成请求发往模拟服务）"""
+    monkeypatch.setenv("KIE_AI_API_KEY", "test-key")
+    if WEB_DIR not in sys.path:
+        sys.path.insert(0, WEB_DIR)
+    import app as module
+
+    output_dir = str(tmp_path / "outputs")
+    client = make_client()
+    queue = JobQueue(
+        module.run_generation_job,
+        JobStore(str(tmp_path / "jobs.sqlite3")),
+        max_workers=2,
+        max_pending=8,
+        on_status=module.publish_job_status
+    )
+    monkeypatch.setattr(module, "OUTPUT_DIR", output_dir)
+    monkeypatch.setattr(module, "APIClient", lambda api_key, base_url=None: client)
+    monkeypatch.setattr(module, "job_queue", queue)
+    monkeypatch.setattr(module, "_jobs_recovered", True)
+    monkeypatch.setattr(history_store, "_shared_store", history_store.HistoryStore(str(tmp_path / "history.sqlite3")))
+    yield module
+    queue.shutdown()
@@ -0,0 +1,84 @@
+"""异步 API 客户端测试（使用本地模拟服务）"""
+
+import asyncio
+
+import pytest
+
+from async_api_client import AsyncAPIClient
+from poll_schedule import AdaptivePollSchedule
+from retry import RetryPolicy, TokenBucket
+
+RECORD_INFO = "/api/v1/jobs/recordInfo"
+CREATE_TASK = "/api/v1/jobs/createTask"
+
+
+def make_async_client(mock_server, **overrides):
+    options = {
+        "base_url": mock_server.base_url,
+        "poll_schedule": AdaptivePollSchedule(default_interval=0.1, min_interval=0.05),
+        "retry_policy": RetryPolicy(max_retries=2, backoff_base=0.01, backoff_max=0.05),
+        "rate_limiter": TokenBucket(0),
+    }
+    options.update(overrides)
+    return AsyncAPIClient("test-key", **options)
+
+
+def test_generate_image_downloads_from_base_url(mock_server, tmp_path):
+    output_path = tmp_path / "poster.png"
+
+    async def run():
+        async with make_async_client(mock_server) as client:
+            return await client.generate_image("prompt", str(output_path), poll_interval=0.1)
+
+    assert asyncio.run(run()) == str(output_path)
+    assert output_path.read_bytes() == mock_server.image_bytes
+    assert not (tmp_path / "poster.png.part").exists()
+
+
+def test_many_tasks_share_one_loop(mock_server, tmp_path):
+    async def run():
+        async with make_async_client(mock_server) as client:
+            return await asyncio.gather(*(
+                client.generate_image(f"prompt {i}", str(tmp_path / f"{i}.png"), poll_interval=0.1)
+                for i in range(20)
+            ))
+
+    paths = asyncio.run(run())
+    assert len(set(paths)) == 20
+    assert len(mock_server.tasks) == 20
+
+
+def test_query_retries_server_errors(mock_server):
+    async def run():
+        async with make_async_client(mock_server) as client:
+            task_id = (await client.create_task("prompt"))["data"]["taskId"]
+            mock_server.inject_errors(RECORD_INFO, 503, count=2)
+            return await client.query_task(task_id)
+
+    assert asyncio.run(run())["code"] == 200
+    assert [path for _, path in mock_server.requests].count(RECORD_INFO) == 3
+
+
+def test_create_task_is_not_retried_on_server_error(mock_server):
+    mock_server.inject_errors(CREATE_TASK, 500)
+
+    async def run():
+        async with make_async_client(mock_server) as client:
+            await client.create_task("prompt")
+
+    with pytest.raises(Exception, match="Failed to create task"):
+        asyncio.run(run())
+    assert mock_server.tasks == {}
+
+
+def test_create_task_is_retried_after_429(mock_server):
+    mock_server.inject_errors(CREATE_TASK, 429)
+    limiter = TokenBucket(1000, 10)
+
+    async def run():
+        async with make_async_client(mock_server, rate_limiter=limiter) as client:
+            return await client.create_task("prompt")
+
+    assert asyncio.run(run())["code"] == 200
+    assert len(mock_server.tasks) == 1
+    assert limiter.stats()["pauses"] == 1
@@ -0,0 +1,99 @@
+"""批量生成测试"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import batch_runner
+from batch_runner import BatchRunner, load_manifest
+from prompt_generator import PromptGenerator
+from task_journal import TaskJournal
+from task_poller import TaskPoller
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    poller = TaskPoller(poll_interval=0.1)
+    monkeypatch.setattr(batch_runner, "get_shared_poller", lambda: poller)
+    monkeypatch.setattr(batch_runner, "PROGRESS_REFRESH", 0.05)
+    yield poller
+    poller.shutdown()
+
+
+def _manifest(tmp_path, rows):
+    path = tmp_path / "semester.jsonl"
+    path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def _batch_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith("batch")]
+
+
+def test_duplicate_entries_share_one_upstream_task(tmp_path, make_client, mock_server, poller):
+    entries = load_manifest(_manifest(tmp_path, [{"theme": "超市", "title": "走进超市"}] * 2))
+    assert entries[1]["id"] == f"{entries[0]['id']}-2"
+
+    runner = BatchRunner(make_client(), PromptGenerator(), str(tmp_path / "out"), rate_per_minute=0)
+    summary = runner.run(entries, str(tmp_path / "results.jsonl"))
+
+    assert summary["succeeded"] == 2
+    assert len(mock_server.tasks) == 1
+
+
+def test_interrupt_returns_without_waiting_for_running_tasks(tmp_path, make_client, mock_server,
+                                                            poller, monkeypatch):
+    mock_server.delay = 30
+    journal = TaskJournal(str(tmp_path / "journal.jsonl"))
+    entries = load_manifest(_manifest(tmp_path, [{"theme": "超市", "title": f"第 {i} 课"} for i in range(4)]))
+    runner = BatchRunner(make_client(), PromptGenerator(), str(tmp_path / "out"),
+                         concurrency=2, rate_per_minute=0, use_cache=False, journal=journal)
+
+    real_wait = batch_runner.wait
+
+    def interrupting_wait(*args, **kwargs):
+        # 两个条目都已提交上游任务后模拟 Ctrl-C
+        if poller.pending_count() == 2:
+            raise KeyboardInterrupt
+        return real_wait(*args, **kwargs)
+
+    monkeypatch.setattr(batch_runner, "wait", interrupting_wait)
+    results_path = tmp_path / "results.jsonl"
+    started = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        runner.run(entries, str(results_path))
+    assert time.monotonic() - started < 10
+
+    # 工作线程随即退出，排队中的条目不再开始
+    deadline = time.monotonic() + 5
+    while _batch_threads():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert len(mock_server.tasks) == 2
+    assert results_path.read_text(encoding="utf-8") == ""
+    # 已提交的任务留在任务日志中，续跑时继续等待
+    assert {task["task_id"] for task in journal.unfinished()} == set(mock_server.tasks)
+
+
+def test_stop_from_another_thread_skips_abandoned_entries(tmp_path, make_client, mock_server, poller):
+    mock_server.delay = 30
+    entries = load_manifest(_manifest(tmp_path, [{"theme": "超市", "title": f"第 {i} 课"} for i in range(3)]))
+    runner = BatchRunner(make_client(), PromptGenerator(), str(tmp_path / "out"),
+                         concurrency=1, rate_per_minute=0, use_cache=False)
+
+    def stop_when_submitted():
+        deadline = time.monotonic() + 10
+        while poller.pending_count() < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        runner.stop(poller=poller)
+
+    stopper = threading.Thread(target=stop_when_submitted)
+    stopper.start()
+    results_path = tmp_path / "results.jsonl"
+    summary = runner.run(entries, str(results_path))
+    stopper.join()
+
+    assert (summary["succeeded"], summary["failed"], summary["interrupted"]) == (0, 0, 3)
+    assert results_path.read_text(encoding="utf-8") == ""
@@ -0,0 +1,154 @@
+"""任务回调接收测试（使用本地模拟服务）"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from callback_receiver import CallbackRegistry, CallbackServer
+
+RECORD_INFO = "/api/v1/jobs/recordInfo"
+
+
+@pytest.fixture
+def callback_server():
+    """本机回调接收器（自动分配端口）"""
+    server = CallbackServer(CallbackRegistry(), port=0).start()
+    yield server
+    server.stop()
+
+
+def _callback_url(server: CallbackServer) -> str:
+    return f"http://127.0.0.1:{server.port}/api/callback"
+
+
+def _post(url: str, payload: dict) -> int:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def _payload(task_id: str, state: str = "success", url: str = "http://127.0.0.1:1/evil.png") -> dict:
+    return {
+        "code": 200,
+        "msg": "success",
+        "data": {"taskId": task_id, "state": state, "resultJson": json.dumps({"resultUrls": [url]})},
+    }
+
+
+def test_signed_url_keeps_existing_query():
+    registry = CallbackRegistry(token="secret")
+    assert registry.signed_url("https://example.com/cb") == "https://example.com/cb?token=secret"
+    assert registry.signed_url("https://example.com/cb?a=1") == "https://example.com/cb?a=1&token=secret"
+
+
+def test_genuine_callback_completes_generation(make_client, mock_server, callback_server, tmp_path):
+    client = make_client()
+    output_path = str(tmp_path / "poster.png")
+
+    client.generate_image(
+        "prompt",
+        output_path,
+        callback_registry=callback_server.registry,
+        callback_url=_callback_url(callback_server),
+        callback_deadline=10
+    )
+
+    with open(output_path, "rb") as f:
+        assert f.read() == mock_server.image_bytes
+    stats = callback_server.registry.stats()
+    assert stats["received"] == 1
+    assert stats["rejected"] == 0
+    # 回调唤醒后只查询一次 recordInfo 确认
+    assert [path for _, path in mock_server.requests].count(RECORD_INFO) == 1
+
+
+def test_forged_callback_without_token_is_rejected(callback_server):
+    registry = callback_server.registry
+    future = registry.expect("task-1")
+
+    assert _post(_callback_url(callback_server), _payload("task-1")) == 403
+    assert _post(_callback_url(callback_server) + "?token=guess", _payload("task-1")) == 403
+
+    assert not future.done()
+    assert registry.stats()["rejected"] == 2
+    assert registry.stats()["received"] == 0
+
+
+def test_forged_result_urls_are_ignored(make_client, mock_server, callback_server, tmp_path):
+    # 令牌泄露时伪造的回调也只能提前唤醒任务，结果地址以 recordInfo 为准
+    mock_server.delay = 1.0
+    client = make_client()
+    output_path = str(tmp_path / "poster.png")
+    created = threading.Event()
+    task_ids = []
+    errors = []
+
+    def on_task_created(task_id):
+        task_ids.append(task_id)
+        created.set()
+
+    def run():
+        try:
+            client.generate_image(
+                "prompt",
+                output_path,
+                callback_registry=callback_server.registry,
+                callback_url=_callback_url(callback_server),
+                callback_deadline=10,
+                show_progress=False,
+                on_task_created=on_task_created
+            )
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    assert created.wait(5)
+    forged_url = callback_server.registry.signed_url(_callback_url(callback_server))
+    evil = f"{mock_server.base_url}/evil.png"
+    assert _post(forged_url, _payload(task_ids[0], url=evil)) == 200
+    worker.join(10)
+
+    assert not worker.is_alive()
+    assert errors == []
+    with open(output_path, "rb") as f:
+        assert f.read() == mock_server.image_bytes
+    assert all(path != "/evil.png" for _, path in mock_server.requests)
+
+
+def test_non_terminal_callback_does_not_wake_waiter():
+    registry = CallbackRegistry(token="secret")
+    future = registry.expect("task-1")
+
+    assert registry.resolve(_payload("task-1", state="generating"), "secret") is False
+    assert registry.resolve({"code": 200, "data": {}}, "secret") is False
+
+    assert not future.done()
+    assert registry.stats()["ignored"] == 2
+    assert registry.wait("task-1", timeout=0.05) is None
+
+
+def test_failed_callback_is_confirmed_before_raising(make_client, mock_server, callback_server, tmp_path):
+    mock_server.fail_rate = 1.0
+    client = make_client()
+
+    with pytest.raises(Exception, match="Task failed"):
+        client.generate_image(
+            "prompt",
+            str(tmp_path / "poster.png"),
+            callback_registry=callback_server.registry,
+            callback_url=_callback_url(callback_server),
+            callback_deadline=10
+        )
+    assert callback_server.registry.stats()["received"] == 1
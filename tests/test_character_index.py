@@ -0,0 +1,80 @@
+"""识字倒排索引测试"""
+
+import pytest
+
+from character_index import CharacterIndex, MAX_CATEGORIES, OVERFLOW_CATEGORY
+from vocabulary import VocabularyManager
+
+
+@pytest.fixture
+def index():
+    index = CharacterIndex()
+    index.build([
+        ("医院", {"人物": [("yī shēng", "医生")], "物品": [("yào pǐn", "药品")]}),
+        ("药店", {"物品": [("yào", "药"), ("yī liáo xiāng", "医疗箱")]}),
+        ("超市", {"物品": [("píng guǒ", "苹果")]}),
+    ])
+    return index
+
+
+def test_all_and_any_character_queries(index):
+    result = index.scenes_with_characters("医药")
+    assert [scene["scene"] for scene in result["scenes"]] == ["医院", "药店"]
+    assert result["scenes"][0]["matches"] == {"医": ["人物"], "药": ["物品"]}
+
+    result = index.scenes_with_characters("医果", match_all=False)
+    assert [scene["scene"] for scene in result["scenes"]] == ["医院", "药店", "超市"]
+    assert index.scenes_with_characters("医鱼")["missing"] == ["鱼"]
+
+
+def test_syllable_queries_ignore_composition(index):
+    decomposed = "ya\u0300o"  # 组合声调符号，NFC 后为 yào
+    assert [scene["scene"] for scene in index.scenes_with_syllables([decomposed])["scenes"]] == ["医院", "药店"]
+
+
+def test_replacing_and_removing_scenes_updates_postings(index):
+    index.add_scene("超市", {"物品": [("yào", "药")]})
+    assert [scene["scene"] for scene in index.scenes_with_characters("药")["scenes"]] == ["医院", "药店", "超市"]
+    assert index.scenes_with_characters("苹")["scenes"] == []
+
+    index.remove_scene("药店")
+    assert [scene["scene"] for scene in index.scenes_with_characters("药")["scenes"]] == ["医院", "超市"]
+    assert len(index) == 2
+
+
+def test_categories_beyond_the_bitmap_share_the_overflow_bit():
+    index = CharacterIndex()
+    vocab = {f"类别{i}": [("yī", "一")] for i in range(MAX_CATEGORIES + 5)}
+    index.add_scene("很多类别", vocab)
+    index.add_scene("更多类别", {"新类别": [("èr", "二")]})
+
+    matches = index.scenes_with_characters("一")["scenes"][0]["matches"]["一"]
+    assert matches[:MAX_CATEGORIES - 1] == [f"类别{i}" for i in range(MAX_CATEGORIES - 1)]
+    assert matches[-1] == OVERFLOW_CATEGORY
+    assert index.scenes_with_characters("二")["scenes"][0]["matches"] == {"二": [OVERFLOW_CATEGORY]}
+
+
+def test_bad_vocabulary_leaves_previous_scene_intact(index):
+    with pytest.raises(ValueError):
+        index.add_scene("医院", {"人物": [("yī shēng",)]})
+
+    assert [scene["scene"] for scene in index.scenes_with_characters("医生")["scenes"]] == ["医院"]
+    assert len(index) == 3
+
+
+def test_manager_keeps_index_in_sync_with_added_scenes():
+    manager = VocabularyManager()
+    assert manager.scenes_with_characters("医")["total"] > 0
+
+    manager.add_scene("鱼塘", {"动物": [("jīn yú", "金鱼")]})
+    result = manager.scenes_with_characters("鱼")
+    assert [scene["scene"] for scene in result["scenes"]] == ["鱼塘"]
+
+
+@pytest.mark.parametrize("limit", ["0", "-1"])
+def test_non_positive_limits_return_at_least_one_result(web_app, limit):
+    client = web_app.app.test_client()
+
+    result = client.get(f"/api/characters?chars=员&limit={limit}").get_json()
+    assert result["total"] > 1 and len(result["scenes"]) == 1
+    assert len(client.get(f"/api/scenes?q=园&limit={limit}").get_json()["scenes"]) == 1
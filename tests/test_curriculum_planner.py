@@ -0,0 +1,87 @@
+"""识字课程规划测试"""
+
+import pytest
+
+from batch_runner import load_manifest
+from character_index import CharacterIndex, hanzi_in
+from curriculum_planner import CurriculumPlanner, load_character_list, write_plan_manifest
+from vocabulary import VocabularyManager, prompt_items
+
+
+class _Vocabulary:
+    """只包含给定场景的词汇管理器"""
+
+    def __init__(self, scenes):
+        self.scenes = scenes
+        self.index = CharacterIndex()
+        self.index.build(scenes.items())
+
+    def get_character_index(self):
+        return self.index
+
+    def load_scene(self, scene, cache=True):
+        return self.scenes.get(scene)
+
+
+def _scene(*words):
+    return {"物品": [("", word) for word in words]}
+
+
+def test_bundled_vocabulary_is_fully_covered():
+    manager = VocabularyManager()
+    targets = "".join(
+        chinese for scene in manager.list_scenes()
+        for group in prompt_items(manager.get_scene_vocabulary(scene)) for _, chinese in group
+    )
+    plan = CurriculumPlanner(manager).plan(targets)
+
+    assert plan["uncovered"] == []
+    assert plan["missing"] == []
+    assert plan["covered"] == plan["targets"] == len(hanzi_in(targets))
+    assert len(plan["posters"]) <= len(manager.list_scenes())
+    # 每个汉字只记在首次覆盖它的小报上
+    assigned = [char for poster in plan["posters"] for char in poster["characters"]]
+    assert sorted(assigned) == sorted(hanzi_in(targets))
+
+
+def test_greedy_choice_is_pruned_to_the_fewest_posters():
+    vocabulary = _Vocabulary({
+        "大杂烩": _scene("一二", "三四"),
+        "前半": _scene("一二五"),
+        "后半": _scene("三四六"),
+        "重复": _scene("五二一"),
+    })
+    plan = CurriculumPlanner(vocabulary).plan("一二三四五六")
+
+    # 贪心先选覆盖最多的「大杂烩」，它随后被另外两张完全覆盖
+    assert [poster["theme"] for poster in plan["posters"]] == ["前半", "后半"]
+    assert plan["candidates"] == 3
+    assert plan["posters"][0]["title"] == "走进前半"
+
+
+def test_poster_limit_and_missing_characters():
+    vocabulary = _Vocabulary({"前半": _scene("一二三"), "后半": _scene("四五六")})
+    plan = CurriculumPlanner(vocabulary).plan("一二三四五六七", max_posters=1)
+
+    assert len(plan["posters"]) == 1
+    assert plan["missing"] == ["七"]
+    assert plan["uncovered"] == ["四", "五", "六", "七"]
+
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl"])
+def test_plan_manifest_feeds_the_batch_runner(tmp_path, extension):
+    characters = tmp_path / "grade1.txt"
+    characters.write_text("一、二 三\n一", encoding="utf-8")
+    assert load_character_list(str(characters)) == ["一", "二", "三"]
+
+    plan = CurriculumPlanner(_Vocabulary({"前半": _scene("一二三")})).plan("一二三")
+    path = str(tmp_path / f"grade1.plan{extension}")
+    assert write_plan_manifest(plan, path) == 1
+
+    entries = load_manifest(path)
+    assert [(entry["theme"], entry["title"]) for entry in entries] == [("前半", "《走进前半》")]
+
+
+def test_unknown_manifest_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        write_plan_manifest({"posters": []}, str(tmp_path / "plan.txt"))
@@ -0,0 +1,91 @@
+"""衍生图流水线测试"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from derivatives import DerivativePipeline
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = DerivativePipeline(max_workers=1)
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_paths_sit_next_to_the_original(pipeline):
+    pipeline.image_format = "WEBP"
+    assert pipeline.path_for("/out/poster.png", "thumb") == "/out/poster.thumb.webp"
+    pipeline.image_format = "JPEG"
+    assert pipeline.path_for("/out/poster.png", "preview") == "/out/poster.preview.jpg"
+    with pytest.raises(ValueError):
+        pipeline.path_for("/out/poster.png", "huge")
+
+
+def test_without_pillow_nothing_is_generated(pipeline, tmp_path):
+    pipeline.image_format = None
+    source = tmp_path / "poster.png"
+    source.write_bytes(b"image")
+
+    assert pipeline.schedule(str(source)) is None
+    assert pipeline.get(str(source), "thumb") is None
+    assert pipeline.stats()["available"] is False
+
+
+def test_thumbnails_are_generated_once(pipeline, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    source = str(tmp_path / "poster.png")
+    Image.new("RGB", (2000, 1000), (255, 204, 102)).save(source)
+
+    assert pipeline.get(source, "thumb") is None
+    future = pipeline.schedule(source)
+    written = future.result(timeout=60)
+
+    assert sorted(written) == sorted(pipeline.path_for(source, size) for size in ("thumb", "preview"))
+    with Image.open(pipeline.get(source, "thumb")) as thumb:
+        assert thumb.size == (320, 160)
+    with Image.open(pipeline.get(source, "preview")) as preview:
+        assert preview.size == (1024, 512)
+    # 衍生图已是最新，不再重复生成
+    assert pipeline.schedule(source) is None
+    deadline = time.time() + 5
+    while pipeline.stats()["generated"] != 1:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_missing_original_is_ignored(pipeline, tmp_path):
+    assert pipeline.schedule(str(tmp_path / "missing.png")) is None
+
+
+ENTRY_SCRIPT = """
+import sys
+sys.path.insert(0, {src!r})
+with open({marker!r}, "a") as f:
+    f.write(__name__ + "\\n")
+
+from derivatives import DerivativePipeline
+
+if __name__ == "__main__":
+    pipeline = DerivativePipeline(max_workers=2)
+    pipeline.schedule({source!r}).result(timeout=60)
+    pipeline.shutdown()
+"""
+
+
+def test_workers_do_not_rerun_the_entry_script(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    source = str(tmp_path / "poster.png")
+    Image.new("RGB", (800, 400)).save(source)
+    marker = tmp_path / "imports.txt"
+    script = tmp_path / "entry.py"
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    script.write_text(ENTRY_SCRIPT.format(src=src, marker=str(marker), source=source), encoding="utf-8")
+
+    subprocess.run([sys.executable, str(script)], check=True, timeout=120)
+    # 入口脚本的模块级代码（Web 服务里是创建线程、任务队列等）只在主进程执行一次
+    assert marker.read_text(encoding="utf-8").split() == ["__main__"]
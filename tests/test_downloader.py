@@ -0,0 +1,189 @@
+"""图片下载器测试（使用本地模拟服务）"""
+
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from downloader import RangeDownloader, DownloadStats, BackgroundWriter, write_atomic, PART_META_SUFFIX
+from retry import RetryPolicy
+
+
+@pytest.fixture
+def image(mock_server):
+    """替换为较大的随机图片内容，返回其 URL"""
+    mock_server.image_bytes = os.urandom(10000)
+    return f"{mock_server.base_url}/results/task.png"
+
+
+@pytest.fixture
+def downloader():
+    session = requests.Session()
+    yield RangeDownloader(
+        session,
+        retry_policy=RetryPolicy(max_retries=2, backoff_base=0.01, backoff_max=0.05),
+        parallel_threshold=1 << 30,
+        stats=DownloadStats()
+    )
+    session.close()
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _leftovers(tmp_path):
+    return [name for name in os.listdir(tmp_path) if ".part" in name]
+
+
+def _write_partial(output_path, data: bytes, source):
+    with open(f"{output_path}.part", "wb") as f:
+        f.write(data)
+    if source is not None:
+        with open(f"{output_path}{PART_META_SUFFIX}", "w", encoding="utf-8") as f:
+            json.dump(source, f)
+
+
+def test_download_writes_file_atomically(downloader, mock_server, image, tmp_path):
+    output_path = str(tmp_path / "poster.png")
+    result = downloader.download(image, output_path)
+
+    assert _read(output_path) == mock_server.image_bytes
+    assert result.size == 10000
+    assert _leftovers(tmp_path) == []
+
+
+def test_matching_partial_is_resumed_with_if_range(downloader, mock_server, image, tmp_path):
+    output_path = str(tmp_path / "poster.png")
+    source = {"url": image, "validator": mock_server.image_etag, "size": 10000}
+    _write_partial(output_path, mock_server.image_bytes[:4000], source)
+
+    result = downloader.download(image, output_path)
+
+    assert _read(output_path) == mock_server.image_bytes
+    assert result.resumed_bytes == 4000
+    assert mock_server.range_requests == [("bytes=4000-9999", mock_server.image_etag)]
+    assert _leftovers(tmp_path) == []
+
+
+@pytest.mark.parametrize("source", [
+    {"url": "http://127.0.0.1:1/results/other.png", "validator": None, "size": 10000},
+    {"url": None, "validator": '"stale"', "size": 10000},
+    None,
+])
+def test_partial_from_another_source_is_discarded(downloader, mock_server, image, tmp_path, source):
+    output_path = str(tmp_path / "poster.png")
+    if source is not None and source["url"] is None:
+        source["url"] = image
+    _write_partial(output_path, b"x" * 4000, source)
+
+    result = downloader.download(image, output_path)
+
+    assert _read(output_path) == mock_server.image_bytes
+    assert result.resumed_bytes == 0
+    assert mock_server.range_requests == [("bytes=0-9999", mock_server.image_etag)]
+
+
+def test_changed_file_is_downloaded_again_from_start(downloader, mock_server, image, tmp_path):
+    # 续传过程中文件变化：If-Range 不匹配，服务端返回完整内容并从头写入
+    part_path = str(tmp_path / "poster.png.part")
+    with open(part_path, "wb") as f:
+        f.write(b"x" * 4000)
+
+    downloader._fetch_range(image, part_path, 0, 9999, validator='"old"')
+
+    assert _read(part_path) == mock_server.image_bytes
+
+
+def test_parallel_download_and_resume(mock_server, image, tmp_path):
+    session = requests.Session()
+    downloader = RangeDownloader(session, parallel_threshold=4000, max_parts=4, stats=DownloadStats())
+    output_path = str(tmp_path / "poster.png")
+    try:
+        result = downloader.download(image, output_path)
+        assert result.parts == 4
+        assert _read(output_path) == mock_server.image_bytes
+        assert _leftovers(tmp_path) == []
+
+        # 第二段已下载一半时继续
+        os.remove(output_path)
+        downloader._discard_stale_parts(output_path, image, 10000, mock_server.image_etag)
+        with open(f"{output_path}.part1", "wb") as f:
+            f.write(mock_server.image_bytes[2500:3500])
+        result = downloader.download(image, output_path)
+    finally:
+        session.close()
+
+    assert result.resumed_bytes == 1000
+    assert _read(output_path) == mock_server.image_bytes
+    assert _leftovers(tmp_path) == []
+
+
+def test_fetch_bytes_reads_into_memory(downloader, mock_server, image):
+    data, result = downloader.fetch_bytes(image)
+
+    assert data.readonly
+    assert bytes(data) == mock_server.image_bytes
+    assert result.path is None
+    assert result.parts == 1
+
+
+def test_fetch_bytes_in_parallel_ranges(mock_server, image):
+    session = requests.Session()
+    try:
+        data, result = RangeDownloader(session, parallel_threshold=4000, stats=DownloadStats()).fetch_bytes(image)
+    finally:
+        session.close()
+
+    assert bytes(data) == mock_server.image_bytes
+    assert result.parts == 4
+    assert sorted(mock_server.range_requests) == [
+        ("bytes=0-2499", None), ("bytes=2500-4999", None), ("bytes=5000-7499", None), ("bytes=7500-9999", None)
+    ]
+
+
+def test_flush_times_out_while_write_is_pending(tmp_path):
+    writer = BackgroundWriter()
+    release = threading.Event()
+    path = str(tmp_path / "poster.png")
+    writer.submit(lambda: release.wait(5), path=path)
+
+    assert writer.flush(path, timeout=0.05) is False
+    release.set()
+    assert writer.flush(path, timeout=5) is True
+    assert writer.flush(str(tmp_path / "other.png")) is True
+
+
+def test_when_written_skips_callback_after_failed_write(tmp_path):
+    writer = BackgroundWriter()
+    release = threading.Event()
+    calls = []
+
+    def fail():
+        release.wait(5)
+        raise OSError("disk full")
+
+    ok_path, bad_path = str(tmp_path / "ok.png"), str(tmp_path / "bad.png")
+    writer.submit(lambda: write_atomic(b"image", ok_path), path=ok_path)
+    writer.submit(fail, path=bad_path)
+    writer.when_written(ok_path, lambda: calls.append("ok"))
+    writer.when_written(bad_path, lambda: calls.append("bad"))
+    release.set()
+
+    assert writer.flush(bad_path, timeout=5) is True
+    assert writer.flush(ok_path, timeout=5) is True
+    assert calls == ["ok"]
+    assert _read(ok_path) == b"image"
+    assert writer.stats()["failed"] == 1
+
+
+def test_generation_downloads_into_memory_and_writes_in_background(make_client, mock_server, tmp_path):
+    client = make_client()
+    output_path = client.generate_image("prompt", str(tmp_path / "poster.png"), show_progress=False)
+
+    assert client.writer.flush(output_path, timeout=5)
+    assert _read(output_path) == mock_server.image_bytes
+    assert _leftovers(tmp_path) == []
@@ -0,0 +1,74 @@
+"""生成历史存储测试"""
+
+import json
+import threading
+
+from history_store import HistoryStore, LEGACY_HISTORY_FILE
+
+
+def test_records_are_returned_newest_first_with_extras(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    store.append("超市", "走进超市", "a.png", task_id="task-1")
+    store.append("医院", "走进医院", None, status="error", error="boom")
+
+    records = store.query()
+    assert [record["theme"] for record in records] == ["医院", "超市"]
+    assert records[0]["error"] == "boom"
+    assert records[1]["task_id"] == "task-1"
+
+
+def test_pages_follow_the_cursor(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    for i in range(5):
+        store.append("超市", f"title {i}", f"{i}.png")
+
+    first, cursor = store.page(limit=2)
+    second, cursor = store.page(limit=2, before_id=cursor)
+    third, cursor = store.page(limit=2, before_id=cursor)
+
+    titles = [record["title"] for record in first + second + third]
+    assert titles == [f"title {i}" for i in range(4, -1, -1)]
+    assert cursor is None
+
+
+def test_filters_by_theme_and_date(tmp_path):
+    legacy = [
+        {"timestamp": "2024-01-01T08:00:00", "theme": "超市", "title": "a"},
+        {"timestamp": "2024-01-02T23:59:00", "theme": "医院", "title": "b"},
+        {"timestamp": "2024-01-03T00:00:00", "theme": "超市", "title": "c"},
+    ]
+    (tmp_path / LEGACY_HISTORY_FILE).write_text(json.dumps(legacy), encoding="utf-8")
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+
+    assert [record["title"] for record in store.query(theme="超市")] == ["c", "a"]
+    # 只给日期的上界包含当天
+    assert [record["title"] for record in store.query(since="2024-01-02", until="2024-01-02")] == ["b"]
+    assert store.themes() == [{"theme": "超市", "count": 2}, {"theme": "医院", "count": 1}]
+
+
+def test_legacy_history_is_imported_once(tmp_path):
+    (tmp_path / LEGACY_HISTORY_FILE).write_text(
+        json.dumps([{"timestamp": "2024-01-01T08:00:00", "theme": "超市", "title": "a"}]),
+        encoding="utf-8"
+    )
+    HistoryStore(str(tmp_path / "history.sqlite3"))
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+
+    assert store.count() == 1
+
+
+def test_concurrent_writers_do_not_lose_records(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    stores = [HistoryStore(path), HistoryStore(path)]
+
+    def write(store, worker):
+        for i in range(50):
+            store.append("超市", f"{worker}-{i}", None)
+
+    threads = [threading.Thread(target=write, args=(stores[i % 2], i)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert HistoryStore(path).count() == 200
@@ -0,0 +1,36 @@
+"""HTTP 连接池测试"""
+
+import pytest
+
+from http_pool import ConnectionPool, API_POOL, CDN_POOL
+
+
+def test_sessions_are_created_once_per_pool():
+    pool = ConnectionPool()
+    try:
+        assert pool.session(API_POOL) is pool.api_session
+        assert pool.session(CDN_POOL) is pool.cdn_session
+        assert pool.api_session is not pool.cdn_session
+    finally:
+        pool.close()
+
+
+def test_unknown_pool_is_rejected():
+    pool = ConnectionPool()
+    with pytest.raises(ValueError):
+        pool.session("other")
+
+
+def test_api_requests_reuse_keep_alive_connections(make_client):
+    pool = ConnectionPool()
+    first = make_client(pool=pool)
+    second = make_client(pool=pool)
+
+    task_id = first.create_task("prompt")["data"]["taskId"]
+    for client in (first, second, first, second):
+        assert client.query_task(task_id)["code"] == 200
+
+    stats = pool.stats()
+    assert stats[API_POOL]["requests"] == 5
+    assert stats[API_POOL]["connections_opened"] == 1
+    assert stats[API_POOL]["reuse_ratio"] == 0.8
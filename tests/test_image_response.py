@@ -0,0 +1,107 @@
+"""图片响应测试"""
+
+import base64
+
+import pytest
+from flask import Flask, jsonify, request
+
+from image_response import send_output_file, send_image_buffer, wants_base64, encode_base64
+from derivatives import DerivativePipeline
+import derivatives
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    directory = tmp_path / "outputs"
+    directory.mkdir()
+    (directory / "poster.png").write_bytes(b"0123456789" * 100)
+    return directory
+
+
+@pytest.fixture
+def client(output_dir, monkeypatch):
+    # 不生成衍生图，size 参数退回原图
+    pipeline = DerivativePipeline()
+    pipeline.image_format = None
+    monkeypatch.setattr(derivatives, "_shared_pipeline", pipeline)
+
+    app = Flask(__name__)
+
+    @app.route("/outputs/<filename>")
+    def output_file(filename):
+        return send_output_file(str(output_dir), filename)
+
+    @app.route("/memory/<filename>")
+    def memory_file(filename):
+        data = memoryview(b"in memory").toreadonly()
+        return send_image_buffer(data, str(output_dir / filename), download_name=request.args.get("name"))
+
+    @app.route("/flag")
+    def flag():
+        return jsonify({"base64": wants_base64()})
+
+    return app.test_client()
+
+
+def test_image_is_served_with_cache_validators(client):
+    response = client.get("/outputs/poster.png")
+
+    assert response.status_code == 200
+    assert response.data == b"0123456789" * 100
+    assert response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.mimetype == "image/png"
+
+
+def test_conditional_request_returns_not_modified(client):
+    etag = client.get("/outputs/poster.png").headers["ETag"]
+    response = client.get("/outputs/poster.png", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_range_request_returns_partial_content(client):
+    response = client.get("/outputs/poster.png", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.data == b"0123456789"
+    assert response.headers["Content-Range"] == "bytes 10-19/1000"
+
+
+@pytest.mark.parametrize("filename", ["missing.png", "..%2Fsecret.png"])
+def test_missing_or_escaping_file_is_not_found(client, filename):
+    assert client.get(f"/outputs/{filename}").status_code == 404
+
+
+def test_unknown_size_is_rejected(client):
+    assert client.get("/outputs/poster.png?size=huge").status_code == 400
+
+
+def test_pending_derivative_falls_back_to_uncached_original(client):
+    response = client.get("/outputs/poster.png?size=thumb")
+
+    assert response.status_code == 200
+    assert response.data == b"0123456789" * 100
+    assert "no-cache" in response.headers["Cache-Control"]
+    assert "immutable" not in response.headers["Cache-Control"]
+
+
+def test_base64_only_on_explicit_request(client, output_dir):
+    assert client.get("/flag").get_json() == {"base64": False}
+    assert client.get("/flag?include_base64=1").get_json() == {"base64": True}
+    assert base64.b64decode(encode_base64(str(output_dir / "poster.png"))) == b"0123456789" * 100
+
+
+def test_buffer_is_served_without_caching(client):
+    response = client.get("/memory/poster.png")
+
+    assert response.data == b"in memory"
+    assert response.mimetype == "image/png"
+    assert response.content_length == 9
+    assert "no-cache" in response.headers["Cache-Control"]
+
+    response = client.get("/memory/poster.jpg?name=小报.jpg")
+    assert response.mimetype == "image/jpeg"
+    assert "attachment" in response.headers["Content-Disposition"]
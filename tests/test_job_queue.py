@@ -0,0 +1,163 @@
+"""生成任务队列测试（Web 部分使用本地模拟服务）"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, JobStore, QueueFullError
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def _blocking_handler(release):
+    def handler(job, report):
+        release.wait(5)
+    return handler
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_full_queue_rejects_with_estimated_wait(store):
+    release = threading.Event()
+    queue = JobQueue(_blocking_handler(release), store, max_workers=1, max_pending=2)
+    try:
+        queue.submit("running", {})
+        _wait_until(lambda: queue.stats()["running"] == 1)
+        queue.submit("queued-1", {})
+        queue.submit("queued-2", {})
+
+        with pytest.raises(QueueFullError) as excinfo:
+            queue.submit("rejected", {})
+        assert excinfo.value.estimated_wait > 0
+        assert store.get("rejected") is None
+    finally:
+        release.set()
+        queue.shutdown()
+
+    assert queue.stats()["rejected"] == 1
+    assert store.counts().get("success") == 3
+
+
+def test_failed_store_write_returns_queue_slot(store):
+    release = threading.Event()
+    queue = JobQueue(_blocking_handler(release), store, max_workers=1, max_pending=1)
+    try:
+        queue.submit("running", {})
+        _wait_until(lambda: queue.stats()["running"] == 1)
+
+        # 重复的任务 ID 写入失败，不能占用排队名额
+        with pytest.raises(sqlite3.IntegrityError):
+            queue.submit("running", {})
+        assert queue.stats()["queued"] == 0
+        queue.submit("queued", {})
+    finally:
+        release.set()
+        queue.shutdown()
+
+    assert store.get("queued")["status"] == "success"
+
+
+def test_handler_result_and_error_are_stored(store):
+    def handler(job, report):
+        report(kie_task_id="kie-" + job["job_id"])
+        if job["params"].get("fail"):
+            raise Exception("boom")
+        return {"output_path": "poster.png"}
+
+    queue = JobQueue(handler, store, max_workers=2)
+    queue.submit("ok", {})
+    queue.submit("bad", {"fail": True})
+    queue.shutdown()
+
+    ok, bad = store.get("ok"), store.get("bad")
+    assert (ok["status"], ok["output_path"], ok["kie_task_id"]) == ("success", "poster.png", "kie-ok")
+    assert (bad["status"], bad["error"]) == ("error", "boom")
+
+
+def test_recover_resumes_submitted_upstream_task(store):
+    store.add("job", {"prompt": "p"}, status="running", kie_task_id="kie-1")
+    seen = []
+    queue = JobQueue(lambda job, report: seen.append(job["kie_task_id"]), store)
+
+    assert queue.recover() == 1
+    queue.shutdown()
+    assert seen == ["kie-1"]
+    assert store.get("job")["status"] == "success"
+
+
+def test_concurrent_recovery_claims_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    JobStore(path).add("job", {}, status="running", kie_task_id="kie-1")
+    seen = []
+    queues = [JobQueue(lambda job, report: seen.append(job["job_id"]), JobStore(path)) for _ in range(4)]
+    threads = [threading.Thread(target=queue.recover) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for queue in queues:
+        queue.shutdown()
+
+    assert sum(queue.stats()["recovered"] for queue in queues) == 1
+    assert seen == ["job"]
+
+
+def test_live_lease_is_kept_and_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    release = threading.Event()
+    owner = JobQueue(_blocking_handler(release), JobStore(path), lease_seconds=0.3)
+    seen = []
+    other = JobQueue(lambda job, report: seen.append(job["job_id"]), JobStore(path), lease_seconds=0.3)
+    try:
+        owner.submit("job", {})
+        time.sleep(0.5)
+        # 持有者仍在续约，其他进程不能接管
+        assert other.recover() == 0
+
+        # 持有者停止续约（进程退出）后，由续约线程接管
+        owner._stopping.set()
+        _wait_until(lambda: seen == ["job"])
+        assert other.stats()["recovered"] == 1
+    finally:
+        release.set()
+        owner.shutdown()
+        other.shutdown()
+
+
+def test_store_without_lease_columns_is_migrated(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute(
+        """CREATE TABLE jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL,
+           kie_task_id TEXT, output_path TEXT, message TEXT, error TEXT,
+           created REAL NOT NULL, updated REAL NOT NULL)"""
+    )
+    db.execute("INSERT INTO jobs VALUES ('job', 'queued', '{}', NULL, NULL, NULL, NULL, 0, 0)")
+    db.commit()
+    db.close()
+
+    claimed = JobStore(path).claim_unfinished("worker", 60)
+    assert [(job["job_id"], job["owner"]) for job in claimed] == [("job", "worker")]
+
+
+def test_progress_stream_tolerates_unknown_job_status(web_app):
+    web_app.job_queue.store.add("legacy-job", {}, status="cancelled")
+
+    response = web_app.app.test_client().get("/api/progress/legacy-job", buffered=False)
+    try:
+        assert response.status_code == 200
+        events = iter(response.response)
+        next(events)  # retry 指令
+        assert '"stage": "waiting"' in next(events).decode("utf-8")
+    finally:
+        response.close()
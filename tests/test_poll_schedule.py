@@ -0,0 +1,76 @@
+"""自适应轮询调度测试"""
+
+import json
+import threading
+
+from poll_schedule import AdaptivePollSchedule, cost_seconds
+
+
+def observe_many(schedule, seconds_list, profile=("2K", "3:4")):
+    for seconds in seconds_list:
+        schedule.observe(profile, {"costTime": int(seconds * 1000)})
+
+
+def test_cost_seconds_falls_back_to_timestamps():
+    assert cost_seconds({"costTime": 12500}) == 12.5
+    assert cost_seconds({"createTime": 1000, "completeTime": 4000}) == 3.0
+    assert cost_seconds({}) is None
+
+
+def test_fixed_interval_until_enough_samples():
+    schedule = AdaptivePollSchedule(default_interval=3, min_samples=5)
+    observe_many(schedule, [10, 11, 12])
+    assert schedule.first_delay(("2K", "3:4")) == 3
+    assert schedule.expected_seconds(("2K", "3:4")) is None
+
+
+def test_polls_follow_learned_quantiles():
+    schedule = AdaptivePollSchedule(min_samples=5, min_interval=1, max_interval=15)
+    observe_many(schedule, [20, 22, 24, 26, 28, 30, 40])
+    profile = ("2K", "3:4")
+
+    assert schedule.first_delay(profile) == 26
+    assert schedule.expected_seconds(profile) == 26
+    # 越靠近尾部间隔越短，超过 p99 后按固定间隔
+    assert 0 < schedule.next_interval(profile, 26) <= 15
+    assert schedule.next_interval(profile, 100) == 3
+    assert schedule.estimate_progress(profile, 25) == 3 / 7
+
+
+def test_samples_persist_across_instances(tmp_path):
+    path = str(tmp_path / "poll_schedule.json")
+    observe_many(AdaptivePollSchedule(path=path), [10, 20])
+    assert AdaptivePollSchedule(path=path).snapshot()["2K|3:4"]["samples"] == 2
+
+
+def test_processes_sharing_the_file_do_not_lose_samples(tmp_path):
+    path = str(tmp_path / "poll_schedule.json")
+    # 两个实例模拟 Web 服务和命令行进程
+    web = AdaptivePollSchedule(path=path)
+    cli = AdaptivePollSchedule(path=path)
+
+    threads = [
+        threading.Thread(target=observe_many, args=(schedule, [i + 1] * 25))
+        for i, schedule in enumerate((web, cli, web, cli))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path, encoding="utf-8") as f:
+        stored = json.load(f)
+    assert len(stored["2K|3:4"]) == 100
+    assert sorted(set(stored["2K|3:4"])) == [1, 2, 3, 4]
+    # 没有残留的临时文件
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["poll_schedule.json", "poll_schedule.json.lock"]
+    # 后写入的实例能看到另一个实例的样本
+    assert AdaptivePollSchedule(path=path).snapshot()["2K|3:4"]["samples"] == 100
+
+
+def test_corrupt_file_is_rewritten(tmp_path):
+    path = tmp_path / "poll_schedule.json"
+    path.write_text("{not json", encoding="utf-8")
+    schedule = AdaptivePollSchedule(path=str(path))
+    observe_many(schedule, [5])
+    assert json.loads(path.read_text(encoding="utf-8")) == {"2K|3:4": [5.0]}
@@ -0,0 +1,121 @@
+"""任务进度推送测试"""
+
+import threading
+import time
+
+from progress_events import ProgressBroker
+
+
+def _events(chunks):
+    return [chunk for chunk in chunks if chunk.startswith("id:")]
+
+
+def test_wait_returns_newer_version_or_times_out():
+    broker = ProgressBroker()
+    broker.publish("a", "waiting", 10)
+
+    assert broker.wait("a", 0, timeout=1)["stage"] == "waiting"
+    assert broker.wait("a", 1, timeout=0.05) is None
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_unchanged_progress_does_not_bump_version():
+    broker = ProgressBroker()
+    broker.publish("a", "generating", 50)
+    broker.publish("a", "generating", 50)
+    broker.publish("a", "success")
+    broker.publish("a", "downloading", 95)
+
+    state = broker.get("a")
+    assert (state["stage"], state["version"], state["progress"]) == ("success", 2, 100)
+
+
+def test_subscribers_of_different_tasks_wake_independently():
+    broker = ProgressBroker()
+    results = {}
+
+    def subscribe(task_id):
+        results[task_id] = broker.wait(task_id, 0, timeout=5)
+
+    threads = [threading.Thread(target=subscribe, args=(f"task-{i}",)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while broker.stats()["subscribers"] < 20:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+    broker.publish("task-3", "waiting", 5)
+    threads[3].join(1)
+    assert results == {"task-3": broker.get("task-3")}
+    assert broker.stats()["subscribers"] == 19
+
+    for i in range(20):
+        broker.publish(f"task-{i}", "success")
+    for thread in threads:
+        thread.join(1)
+    assert len(results) == 20
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_stream_sends_event_ids_and_ends_on_terminal_stage():
+    broker = ProgressBroker()
+    broker.publish("a", "queued", 0)
+    stream = broker.stream("a", heartbeat=1)
+
+    assert next(stream).startswith("retry:")
+    assert next(stream).startswith(f"id: {broker.epoch}-1\nevent: progress")
+    broker.publish("a", "success", output_path="poster.png")
+    assert next(stream).startswith(f"id: {broker.epoch}-2\nevent: progress")
+    assert list(stream) == []
+
+
+def test_stream_resumes_after_last_event_id():
+    broker = ProgressBroker()
+    broker.publish("a", "queued", 0)
+    broker.publish("a", "waiting", 10)
+    broker.publish("a", "generating", 40)
+
+    chunks = list(broker.stream("a", heartbeat=0.05, timeout=0.2, last_event_id=broker.event_id(2)))
+    assert [chunk.split("\n")[0] for chunk in _events(chunks)] == [f"id: {broker.epoch}-3"]
+
+    # 到期的事件流正常结束，浏览器随后自动重连
+    assert chunks[-1] == ": keep-alive\n\n"
+
+
+def test_reconnect_after_terminal_event_closes_stream():
+    broker = ProgressBroker()
+    broker.publish("a", "fail", error="boom")
+
+    started = time.monotonic()
+    chunks = list(broker.stream("a", heartbeat=5, last_event_id=broker.event_id(1)))
+    assert len(_events(chunks)) == 1
+    assert time.monotonic() - started < 1
+
+
+def test_event_ids_from_another_epoch_restart_from_the_beginning():
+    before = ProgressBroker()
+    for stage in ("queued", "waiting", "generating"):
+        before.publish("a", stage)
+
+    # 进程重启后版本号从头计数，重启前的事件 ID 不能跳过新进程的进度
+    after = ProgressBroker()
+    after.publish("a", "queued", 0)
+    for last_event_id in (before.event_id(3), "3", "garbage", None):
+        chunks = list(after.stream("a", heartbeat=0.05, timeout=0.1, last_event_id=last_event_id))
+        assert [chunk.split("\n")[0] for chunk in _events(chunks)] == [f"id: {after.epoch}-1"]
+
+
+def test_progress_endpoint_honours_last_event_id(web_app):
+    web_app.progress_broker.publish("resumed-job", "queued", 0)
+    web_app.progress_broker.publish("resumed-job", "waiting", 10)
+
+    response = web_app.app.test_client().get(
+        "/api/progress/resumed-job", headers={"Last-Event-ID": web_app.progress_broker.event_id(1)}, buffered=False
+    )
+    try:
+        chunks = iter(response.response)
+        next(chunks)
+        assert next(chunks).decode("utf-8").startswith(f"id: {web_app.progress_broker.event_id(2)}\n")
+    finally:
+        response.close()
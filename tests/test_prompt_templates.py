@@ -0,0 +1,61 @@
+"""提示词模板引擎测试"""
+
+import pytest
+
+from prompt_templates import BUILTIN_TEMPLATE, PREVIEW_PLACEHOLDER, CompiledTemplate, PromptTemplateEngine
+from prompt_generator import PromptGenerator
+from vocabulary import VocabularyManager
+
+
+def _expected(manager, theme, title, preview=False):
+    """逐个替换占位符得到的提示词（与原先的 f-string 模板相同）"""
+    if preview:
+        sections = (PREVIEW_PLACEHOLDER,) * 3
+    else:
+        sections = manager.format_vocabulary_for_prompt(theme)
+    prompt = BUILTIN_TEMPLATE.replace("{{theme}}", theme).replace("{{title}}", title)
+    for slot, text in zip(("core_items", "common_items", "env_items"), sections):
+        prompt = prompt.replace("{{" + slot + "}}", text)
+    return prompt
+
+
+@pytest.mark.parametrize("preview", [False, True])
+def test_prompt_md_renders_identical_prompt(preview):
+    generator = PromptGenerator()
+
+    prompt = generator.generate_prompt("超市", "《走进超市》", preview=preview)
+    assert prompt == _expected(generator.vocab_manager, "超市", "《走进超市》", preview)
+
+
+def test_rendered_prompts_are_cached_per_template_version(tmp_path):
+    template_path = tmp_path / "prompt.md"
+    template_path.write_text("《{{title}}》{ {{theme}} }", encoding="utf-8")
+    engine = PromptTemplateEngine(VocabularyManager(), template_path=str(template_path))
+
+    assert engine.render("超市", "a") == "《a》{ 超市 }"
+    assert engine.render("超市", "a") == "《a》{ 超市 }"
+    assert (engine.stats()["prompt_hits"], engine.stats()["prompt_misses"]) == (1, 1)
+
+    template_path.write_text("{{title}}!", encoding="utf-8")
+    engine.invalidate_templates()
+    assert engine.render("超市", "a") == "a!"
+
+
+def test_scene_invalidation_drops_related_prompts():
+    engine = PromptTemplateEngine(VocabularyManager())
+    engine.render("超市", "a")
+    engine.render("医院", "b")
+
+    engine.invalidate_scene("超市")
+    assert engine.stats()["prompts"] == 1
+    assert engine.stats()["sections"] == 1
+
+
+def test_unknown_placeholder_and_template_name_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CompiledTemplate("bad", "{{unknown}}")
+    engine = PromptTemplateEngine(VocabularyManager(), template_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        engine.get_template("missing")
+    with pytest.raises(ValueError):
+        engine.get_template("../prompt")
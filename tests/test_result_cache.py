@@ -0,0 +1,93 @@
+"""结果缓存测试（生成部分使用本地模拟服务）"""
+
+import os
+import time
+
+from result_cache import ResultCache, cache_key
+import history_store
+
+CREATE_TASK = "/api/v1/jobs/createTask"
+
+
+def _write(path, data: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_cache_key_depends_on_key_params_only():
+    base = cache_key("model", "prompt")
+    assert base == cache_key("model", "prompt", aspect_ratio="3:4", resolution="2K", show_progress=False)
+    assert base != cache_key("model", "prompt", resolution="4K")
+    assert base != cache_key("model", "other prompt")
+    assert base != cache_key("other model", "prompt")
+
+
+def test_put_and_fetch(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    cache.put("k" * 64, _write(tmp_path / "a.png", b"image"))
+
+    output_path = str(tmp_path / "out" / "copy.png")
+    assert cache.fetch("k" * 64, output_path)
+    with open(output_path, "rb") as f:
+        assert f.read() == b"image"
+    assert not cache.fetch("x" * 64, str(tmp_path / "missing.png"))
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_entries=2)
+    for name in ("aa", "bb"):
+        cache.put(name * 32, _write(tmp_path / f"{name}.png", name.encode()))
+        time.sleep(0.01)
+    assert cache.get("aa" * 32) is not None
+
+    cache.put("cc" * 32, _write(tmp_path / "cc.png", b"cc"))
+
+    assert cache.get("bb" * 32) is None
+    assert cache.get("aa" * 32) is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_externally_deleted_file_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    path = cache.put_bytes("d" * 64, b"image")
+    os.remove(path)
+
+    assert cache.get("d" * 64) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_second_generation_is_served_from_cache(make_client, mock_server, tmp_path):
+    client = make_client()
+    first = client.generate_image("prompt", str(tmp_path / "first.png"), show_progress=False)
+    second = client.generate_image("prompt", str(tmp_path / "second.png"), show_progress=False)
+
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read() == mock_server.image_bytes
+    assert [path for _, path in mock_server.requests].count(CREATE_TASK) == 1
+
+
+def _wait_for_status(client, task_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f"/api/status/{task_id}").get_json()
+        if status.get("status") in ("success", "error"):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {task_id} did not finish")
+
+
+def test_web_cache_hit_is_added_to_history(web_app, mock_server):
+    client = web_app.app.test_client()
+    request = {"theme": "超市", "title": "走进超市"}
+
+    first = client.post("/api/generate", json=request).get_json()
+    assert _wait_for_status(client, first["task_id"])["status"] == "success"
+    second = client.post("/api/generate", json=request).get_json()
+
+    assert second["cached"] is True
+    records = history_store.get_shared_history_store().query(limit=10)
+    assert sorted(record["task_id"] for record in records) == sorted([first["task_id"], second["task_id"]])
+    assert [path for _, path in mock_server.requests].count(CREATE_TASK) == 1
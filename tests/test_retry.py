@@ -0,0 +1,93 @@
+"""重试与限流测试（API 请求部分使用本地模拟服务）"""
+
+import time
+
+import pytest
+
+from retry import RetryPolicy, TokenBucket, parse_retry_after
+
+CREATE_TASK = "/api/v1/jobs/createTask"
+RECORD_INFO = "/api/v1/jobs/recordInfo"
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_backoff_grows_and_is_capped():
+    policy = RetryPolicy(backoff_base=1.0, backoff_max=5.0, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    # Retry-After 优先，但不超过上限的 4 倍
+    assert policy.delay(0, "3") == 3.0
+    assert policy.delay(0, "600") == 20.0
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.05, abs=0.01)
+
+    started = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+    assert bucket.stats()["acquired"] == 6
+
+
+def test_token_bucket_pause_blocks_all_requests():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.2)
+    assert bucket.try_acquire() > 0.1
+
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+    assert bucket.stats()["pauses"] == 1
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.try_acquire() == 0 for _ in range(1000))
+
+
+def test_query_retries_server_errors(make_client, mock_server):
+    client = make_client()
+    task_id = client.create_task("prompt")["data"]["taskId"]
+    mock_server.inject_errors(RECORD_INFO, 503, count=2)
+
+    assert client.query_task(task_id)["data"]["taskId"] == task_id
+    assert [path for _, path in mock_server.requests].count(RECORD_INFO) == 3
+
+
+def test_query_gives_up_after_max_retries(make_client, mock_server):
+    client = make_client()
+    mock_server.inject_errors(RECORD_INFO, 503, count=10)
+
+    with pytest.raises(Exception, match="Failed to query task"):
+        client.query_task("missing")
+    assert [path for _, path in mock_server.requests].count(RECORD_INFO) == 3
+
+
+def test_create_task_is_not_retried_on_server_error(make_client, mock_server):
+    # createTask 不幂等：500 时任务可能已经提交，重试会重复扣费
+    client = make_client()
+    mock_server.inject_errors(CREATE_TASK, 500)
+
+    with pytest.raises(Exception, match="Failed to create task"):
+        client.create_task("prompt")
+    assert [path for _, path in mock_server.requests].count(CREATE_TASK) == 1
+
+
+def test_rate_limited_create_task_pauses_shared_bucket(make_client, mock_server):
+    bucket = TokenBucket(rate=1000, capacity=10)
+    client = make_client(rate_limiter=bucket)
+    mock_server.inject_errors(CREATE_TASK, 429)
+
+    assert client.create_task("prompt")["code"] == 200
+    assert [path for _, path in mock_server.requests].count(CREATE_TASK) == 2
+    assert bucket.stats()["pauses"] == 1
@@ -0,0 +1,86 @@
+"""场景索引测试"""
+
+import pytest
+
+import scene_index
+from scene_index import (SceneIndex, MATCH_EXACT, MATCH_PREFIX, MATCH_PINYIN,
+                         MATCH_SUBSTRING, MATCH_CONTAINED)
+from vocabulary import VocabularyManager
+
+
+@pytest.fixture
+def index(monkeypatch):
+    # 不依赖是否安装 pypinyin：读音从词汇条目中学习
+    monkeypatch.setattr(scene_index, "lazy_pinyin", None)
+    index = SceneIndex()
+    index.learn_readings([("chāo shì", "超市"), ("dà chāo shì", "大超市"), ("gōng yuán", "公园"),
+                          ("shuǐ guǒ diàn", "水果店")])
+    index.extend(["超市", "超市收银台", "大超市", "公园", "水果店"])
+    return index
+
+
+def test_matches_are_ranked_by_kind_then_length(index):
+    assert index.matches("超市") == [
+        (MATCH_EXACT, "超市"),
+        (MATCH_PREFIX, "超市收银台"),
+        (MATCH_SUBSTRING, "大超市"),
+    ]
+    assert index.matches("去大超市购物") == [(MATCH_CONTAINED, "大超市"), (MATCH_CONTAINED, "超市")]
+
+
+def test_pinyin_initials_and_full_pinyin(index):
+    assert index.lookup("gy") == "公园"
+    assert index.matches("sgd") == [(MATCH_PINYIN, "水果店")]
+    assert index.lookup("gongyuan") == "公园"
+    # 有未学到读音的汉字时不参与拼音匹配
+    assert "超市收银台" not in index.suggest("csz", limit=None)
+
+
+def test_incremental_add_and_remove(index):
+    index.add("果园")
+    assert index.suggest("园") == ["公园", "果园"]
+
+    index.remove("公园")
+    assert index.suggest("园") == ["果园"]
+    # 「果」的读音学自「水果店」
+    assert index.lookup("gy") == "果园"
+    assert "公园" not in index
+
+
+def test_names_gain_pinyin_when_their_readings_are_learned(index):
+    index.learn_readings([("shōu yín tái", "收银台")])
+    assert index.lookup("cssyt") == "超市收银台"
+
+    # 移除的场景学到读音后也不会重新出现
+    index.add("银杏林")
+    index.remove("银杏林")
+    index.learn_readings([("yín xìng lín", "银杏林")])
+    assert index.suggest("yxl") == []
+
+
+def test_external_scene_becomes_pinyin_matchable_after_loading(write_scene, tmp_path, monkeypatch):
+    monkeypatch.setattr(scene_index, "lazy_pinyin", None)
+    write_scene("面包店", {"物品": [("miàn bāo diàn", "面包店")]})
+    manager = VocabularyManager(data_dir=write_scene.data_dir, pack_path=str(tmp_path / "missing.pack"))
+
+    manager.load_scene("面包店")
+    assert manager.suggest_scenes("mbd") == ["面包店"]
+
+
+def test_suggest_without_input_keeps_insertion_order(index):
+    assert index.suggest("") == ["超市", "超市收银台", "大超市", "公园", "水果店"]
+    assert index.suggest("", limit=2) == ["超市", "超市收银台"]
+
+
+def test_manager_resolves_fuzzy_themes_and_warns_once(capsys):
+    manager = VocabularyManager()
+
+    assert manager.resolve_scene("去超市购物") == "超市"
+    assert manager.resolve_scene("超市") == "超市"
+    assert manager.get_scene_vocabulary("火星基地") == {}
+    assert manager.get_scene_vocabulary("火星基地") == {}
+    assert capsys.readouterr().out.count("火星基地") == 1
+
+    manager.add_scene("火星基地", {"core_items": [("huǒ xīng", "火星")]})
+    assert manager.resolve_scene("火星") == "火星基地"
+    assert manager.suggest_scenes("火星") == ["火星基地"]
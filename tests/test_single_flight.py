@@ -0,0 +1,210 @@
+"""请求合并测试（生成部分使用本地模拟服务）"""
+
+import threading
+import time
+
+import pytest
+
+import single_flight
+from file_lock import FileLock
+from single_flight import SingleFlight
+
+CREATE_TASK = "/api/v1/jobs/createTask"
+
+
+def _wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def _start_leader(flight, key, fn):
+    """在后台线程中以 leader 身份执行 fn，返回 (线程, 结果列表)"""
+    results = []
+    thread = threading.Thread(target=lambda: results.append(flight.do(key, fn)))
+    thread.start()
+    return thread, results
+
+
+def test_followers_share_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "image.png"
+
+    leader, results = _start_leader(flight, "key", fn)
+    _wait_until(lambda: flight.in_flight("key"))
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", fn))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    _wait_until(lambda: flight.stats()["waiting_followers"] == 3)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["image.png"] * 4
+    assert calls == [1]
+    assert flight.stats()["joined"] == 3
+
+
+def test_leader_exception_reaches_followers():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("boom")
+
+    errors = []
+    leader = threading.Thread(target=lambda: pytest.raises(ValueError, flight.do, "key", fn))
+    leader.start()
+    _wait_until(lambda: flight.in_flight("key"))
+
+    def follow():
+        try:
+            flight.do("key", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    _wait_until(lambda: flight.stats()["waiting_followers"] == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert [str(e) for e in errors] == ["boom"]
+
+
+def test_leader_events_fan_out_to_followers():
+    flight = SingleFlight()
+    published = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        flight.publish("key", "on_task_created", "task-1")
+        flight.publish("key", "on_progress", "waiting", 0)
+        published.set()
+        release.wait(5)
+        flight.publish("key", "on_progress", "downloading", 90, eta=1)
+        return "image.png"
+
+    leader, _ = _start_leader(flight, "key", fn)
+    assert published.wait(5)
+
+    events = []
+    broken = lambda event, *args, **info: 1 / 0
+    follower = threading.Thread(
+        target=lambda: flight.do("key", fn, listener=lambda event, *args, **info: events.append((event, args, info)))
+    )
+    other = threading.Thread(target=lambda: flight.do("key", fn, listener=broken))
+    follower.start()
+    other.start()
+    _wait_until(lambda: flight.stats()["waiting_followers"] == 2)
+    release.set()
+    for thread in (leader, follower, other):
+        thread.join(5)
+
+    # 加入前的事件补发最近一次，之后的事件实时转发；等待者的回调出错不影响 leader
+    assert events == [
+        ("on_task_created", ("task-1",), {}),
+        ("on_progress", ("waiting", 0), {}),
+        ("on_progress", ("downloading", 90), {"eta": 1}),
+    ]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_merged_generation_reports_task_and_progress(make_client, mock_server, tmp_path):
+    client = make_client()
+    created = threading.Event()
+    task_ids = {"leader": [], "follower": []}
+    stages = {"leader": [], "follower": []}
+    results = {}
+
+    def generate(name, output_name):
+        def on_task_created(task_id):
+            task_ids[name].append(task_id)
+            created.set()
+
+        results[name] = client.generate_image(
+            "prompt",
+            str(tmp_path / output_name),
+            show_progress=False,
+            on_task_created=on_task_created,
+            on_progress=lambda stage, progress, **info: stages[name].append(stage)
+        )
+
+    leader = threading.Thread(target=generate, args=("leader", "a.png"))
+    leader.start()
+    assert created.wait(5)
+    follower = threading.Thread(target=generate, args=("follower", "b.png"))
+    follower.start()
+    leader.join(10)
+    follower.join(10)
+
+    assert [path for _, path in mock_server.requests].count(CREATE_TASK) == 1
+    assert task_ids["follower"] == task_ids["leader"]
+    assert stages["follower"][-1] == "downloading"
+    with open(results["follower"], "rb") as f:
+        assert f.read() == mock_server.image_bytes
+
+
+def test_cross_process_waiter_sees_leader_events_and_lock_files_are_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(single_flight, "LOCK_POLL_INTERVAL", 0.05)
+    # 两个实例共用锁目录，相当于两个进程
+    first, second = SingleFlight(str(tmp_path)), SingleFlight(str(tmp_path))
+    release = threading.Event()
+
+    def fn():
+        first.publish("key", "on_task_created", "task-1")
+        first.publish("key", "on_progress", "generating", 40, elapsed=1.5)
+        release.wait(5)
+        return "image.png"
+
+    leader, _ = _start_leader(first, "key", fn)
+    _wait_until(lambda: (tmp_path / "key.events.json").exists())
+
+    events, results = [], []
+    waiter = threading.Thread(target=lambda: results.append(second.do(
+        "key", lambda: "regenerated.png", recheck=lambda: "cached.png",
+        listener=lambda event, *args, **info: events.append((event, args, info))
+    )))
+    waiter.start()
+    _wait_until(lambda: len(events) == 2)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert sorted(events) == [
+        ("on_progress", ("generating", 40), {"elapsed": 1.5}),
+        ("on_task_created", ("task-1",), {}),
+    ]
+    assert results == ["cached.png"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unlinking_file_lock_stays_exclusive(tmp_path):
+    path = str(tmp_path / "key.lock")
+    holders, overlaps = [], []
+
+    def work():
+        for _ in range(50):
+            with FileLock(path, unlink=True):
+                holders.append(1)
+                time.sleep(0.001)
+                if len(holders) > 1:
+                    overlaps.append(1)
+                holders.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert overlaps == []
+    assert not (tmp_path / "key.lock").exists()
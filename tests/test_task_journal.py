@@ -0,0 +1,75 @@
+"""任务日志测试"""
+
+import json
+
+import pytest
+
+import task_journal
+from task_journal import TaskJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return TaskJournal(str(tmp_path / "journal.jsonl"))
+
+
+def _created(journal, task_id, output_path="poster.png"):
+    journal.created(task_id, "hash", "prompt", {"aspect_ratio": "3:4"}, output_path, theme="超市")
+
+
+def test_last_event_decides_task_status(journal):
+    _created(journal, "a")
+    _created(journal, "b")
+    _created(journal, "c")
+    journal.completed("a", "poster.png")
+    journal.failed("b", "boom")
+
+    assert [task["task_id"] for task in journal.unfinished()] == ["c"]
+    assert journal.compact() == 1
+    assert len(open(journal.path, encoding="utf-8").read().splitlines()) == 1
+
+
+def test_torn_write_does_not_swallow_next_record(journal):
+    _created(journal, "a")
+    # 进程在写第二行的中途被杀
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"event": "created", "task_id": "tor')
+    _created(journal, "b")
+
+    assert [task["task_id"] for task in journal.unfinished()] == ["a", "b"]
+    lines = open(journal.path, encoding="utf-8").read().splitlines()
+    assert [json.loads(line)["task_id"] for line in lines] == ["a", "b"]
+
+
+def test_complete_record_without_newline_is_kept(journal, monkeypatch):
+    # 残行超过一个读取块时也能找到上一个换行
+    monkeypatch.setattr(task_journal, "TAIL_CHUNK_SIZE", 8)
+    _created(journal, "a")
+    with open(journal.path, "rb+") as f:
+        f.seek(-1, 2)
+        f.truncate()
+    journal.completed("a", "poster.png")
+    _created(journal, "b")
+
+    assert [task["task_id"] for task in journal.unfinished()] == ["b"]
+
+
+def test_records_missing_fields_are_skipped(journal):
+    with open(journal.path, "w", encoding="utf-8") as f:
+        f.write('{"event": "created"}\n')
+        f.write('["not", "a", "record"]\n')
+        f.write('{"event": "created", "task_id": "partial", "time": 1}\n')
+    _created(journal, "a")
+
+    assert [task["task_id"] for task in journal.unfinished()] == ["a"]
+
+
+def test_journal_is_compacted_once_it_passes_the_threshold(tmp_path):
+    journal = TaskJournal(str(tmp_path / "journal.jsonl"), compact_threshold=2048)
+    _created(journal, "pending")
+    for i in range(100):
+        _created(journal, f"task-{i}")
+        journal.completed(f"task-{i}", "poster.png")
+
+    assert (tmp_path / "journal.jsonl").stat().st_size <= 2048 + 512
+    assert [task["task_id"] for task in journal.unfinished()] == ["pending"]
@@ -0,0 +1,100 @@
+"""批量轮询器测试（使用本地模拟服务）"""
+
+import time
+
+import pytest
+
+from retry import RetryPolicy
+from task_poller import TaskPoller, MAX_QUERY_FAILURES
+
+RECORD_INFO = "/api/v1/jobs/recordInfo"
+
+
+def test_many_tasks_complete_through_one_poller(make_client):
+    client = make_client()
+    poller = TaskPoller(client, poll_interval=0.1, max_queries_per_second=0)
+    try:
+        task_ids = [client.create_task(f"prompt {i}")["data"]["taskId"] for i in range(10)]
+        futures = [poller.submit(task_id) for task_id in task_ids]
+        results = [future.result(timeout=10) for future in futures]
+    finally:
+        poller.shutdown()
+
+    assert [result["data"]["taskId"] for result in results] == task_ids
+    assert all(result["data"]["state"] == "success" for result in results)
+    assert poller.stats()["completed"] == 10
+
+
+def test_failing_task_does_not_block_other_tasks(make_client, mock_server):
+    # 查询重试耗时较长的任务只占用一个查询线程
+    client = make_client(retry_policy=RetryPolicy(max_retries=2, backoff_base=1.0, backoff_max=1.0, jitter=False))
+    poller = TaskPoller(client, poll_interval=0.1, max_queries_per_second=0, query_workers=4)
+    try:
+        stuck = client.create_task("stuck")["data"]["taskId"]
+        mock_server.inject_errors(RECORD_INFO, 503, count=100, task_id=stuck)
+        stuck_future = poller.submit(stuck, first_poll_delay=0)
+
+        started = time.time()
+        healthy = [client.create_task(f"prompt {i}")["data"]["taskId"] for i in range(3)]
+        results = [poller.submit(task_id).result(timeout=10) for task_id in healthy]
+        elapsed = time.time() - started
+        stuck_done = stuck_future.done()
+    finally:
+        poller.shutdown(wait=False)
+
+    assert all(result["data"]["state"] == "success" for result in results)
+    # 每次失败的查询要重试约 2 秒；其他任务不必等它
+    assert elapsed < 1.5
+    assert not stuck_done
+
+
+def test_transient_query_failure_is_rescheduled(make_client, mock_server):
+    client = make_client()
+    poller = TaskPoller(client, poll_interval=0.1, max_queries_per_second=0)
+    try:
+        task_id = client.create_task("prompt")["data"]["taskId"]
+        # 每次查询都会重试 2 次，这里让第一次查询（含重试）整体失败
+        mock_server.inject_errors(RECORD_INFO, 503, count=3, task_id=task_id)
+        result = poller.submit(task_id, first_poll_delay=0).result(timeout=10)
+    finally:
+        poller.shutdown()
+
+    assert result["data"]["state"] == "success"
+
+
+def test_task_fails_after_repeated_query_failures(make_client, mock_server):
+    client = make_client()
+    poller = TaskPoller(client, poll_interval=0.05, max_queries_per_second=0)
+    try:
+        task_id = client.create_task("prompt")["data"]["taskId"]
+        mock_server.inject_errors(RECORD_INFO, 500, count=100, task_id=task_id)
+        with pytest.raises(Exception, match="Failed to query task"):
+            poller.submit(task_id, first_poll_delay=0).result(timeout=10)
+    finally:
+        poller.shutdown()
+
+    # 每次查询 1 + 2 次重试
+    assert [path for _, path in mock_server.requests].count(RECORD_INFO) == MAX_QUERY_FAILURES * 3
+
+
+def test_failed_generation_is_reported(make_client, mock_server):
+    mock_server.fail_rate = 1.0
+    client = make_client()
+    poller = TaskPoller(client, poll_interval=0.1, max_queries_per_second=0)
+    try:
+        task_id = client.create_task("prompt")["data"]["taskId"]
+        with pytest.raises(Exception, match="Task failed"):
+            poller.wait(task_id)
+    finally:
+        poller.shutdown()
+
+
+def test_task_timeout(make_client):
+    client = make_client()
+    poller = TaskPoller(client, poll_interval=0.05, max_queries_per_second=0)
+    try:
+        task_id = client.create_task("prompt")["data"]["taskId"]
+        with pytest.raises(Exception, match="timeout"):
+            poller.wait(task_id, timeout=0.1)
+    finally:
+        poller.shutdown()
@@ -0,0 +1,68 @@
+"""任务登记表测试"""
+
+import re
+import threading
+import time
+
+from task_registry import TaskRegistry, new_task_id, deep_sizeof
+
+
+def test_task_ids_are_unique_within_one_second():
+    ids = set()
+
+    def generate():
+        for _ in range(500):
+            ids.add(new_task_id())
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ids) == 2000
+    assert all(re.fullmatch(r"task_\d{14}_[0-9a-f]{12}", task_id) for task_id in ids)
+
+
+def test_least_recently_updated_tasks_are_evicted():
+    registry = TaskRegistry(max_size=2)
+    registry.set("a", {"status": "processing"})
+    registry.set("b", {"status": "processing"})
+    registry.update("a", status="success")
+    registry.set("c", {"status": "processing"})
+
+    assert "b" not in registry
+    assert registry.get("a") == {"status": "success"}
+    assert len(registry) == 2
+    assert registry.memory_stats()["evicted"] == 1
+
+
+def test_stale_tasks_expire():
+    registry = TaskRegistry(ttl=0.05)
+    registry.set("old", {"status": "success"})
+    time.sleep(0.1)
+    registry.set("new", {"status": "processing"})
+
+    assert registry.get("old") is None
+    assert registry.get("new") is not None
+    assert registry.memory_stats()["expired"] == 1
+
+
+def test_get_returns_a_copy():
+    registry = TaskRegistry()
+    registry.set("a", {"status": "processing"})
+    registry.get("a")["status"] = "changed"
+
+    assert registry.get("a")["status"] == "processing"
+
+
+def test_memory_stats_grow_with_contents():
+    registry = TaskRegistry()
+    empty = registry.memory_stats()["registry_bytes"]
+    for i in range(100):
+        registry.set(f"task-{i}", {"status": "success", "message": "x" * 100})
+
+    stats = registry.memory_stats()
+    assert stats["tasks"] == 100
+    assert stats["registry_bytes"] > empty + 100 * 100
+    assert deep_sizeof({"a": ["x" * 1000]}) > 1000
@@ -0,0 +1,62 @@
+"""词汇管理器按需加载测试"""
+
+import os
+
+from vocabulary import VocabularyManager
+
+
+FARM = {"人物": [("nóng mín", "农民")], "物品": [("chú tou", "锄头")]}
+BAKERY = {"人物": [("miàn bāo shī", "面包师")], "物品": [("miàn bāo", "面包")]}
+
+
+def _manager(write_scene, tmp_path, **options):
+    return VocabularyManager(data_dir=write_scene.data_dir, pack_path=str(tmp_path / "missing.pack"), **options)
+
+
+def test_startup_only_builds_the_manifest(write_scene, tmp_path):
+    write_scene("农场", FARM)
+    manager = _manager(write_scene, tmp_path)
+
+    assert "农场" in manager.list_scenes()
+    assert manager.memory_stats()["loads"] == 0
+    assert manager.get_scene_vocabulary("农场") == FARM
+    assert manager.get_scene_vocabulary("农场") == FARM
+    assert manager.memory_stats()["loads"] == 1
+
+
+def test_cold_scenes_are_evicted_under_the_budget(write_scene, tmp_path):
+    paths = [write_scene("农场", FARM), write_scene("面包店", BAKERY)]
+    manager = _manager(write_scene, tmp_path, memory_budget=max(os.path.getsize(path) for path in paths))
+
+    manager.load_scene("农场")
+    manager.load_scene("面包店")
+    stats = manager.memory_stats()
+    assert (stats["loaded_scenes"], stats["evictions"]) == (1, 1)
+    assert stats["loaded_bytes"] <= stats["memory_budget"]
+
+    # 被淘汰的场景再次访问时重新解析
+    assert manager.load_scene("农场") == FARM
+    assert manager.memory_stats()["loads"] == 3
+
+
+def test_uncached_iteration_does_not_evict_hot_scenes(write_scene, tmp_path):
+    write_scene("农场", FARM)
+    write_scene("面包店", BAKERY)
+    manager = _manager(write_scene, tmp_path)
+
+    manager.load_scene("农场")
+    assert manager.load_scene("面包店", cache=False) == BAKERY
+    assert manager.memory_stats()["loaded_scenes"] == 1
+
+
+def test_external_file_overrides_builtin_and_bad_file_falls_back(write_scene, tmp_path, capsys):
+    write_scene("超市", FARM)
+    broken = write_scene("医院", {})
+    with open(broken, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    manager = _manager(write_scene, tmp_path)
+
+    assert manager.get_scene_vocabulary("超市") == FARM
+    assert "医生" in [chinese for _, chinese in manager.get_vocabulary_list("医院")]
+    assert "医院.json" in capsys.readouterr().out
+    assert "医院" in manager.list_scenes()
@@ -0,0 +1,117 @@
+"""二进制词汇包测试"""
+
+import os
+
+import scene_index
+from scene_index import MATCH_EXACT, SceneIndex
+from vocabulary import VocabularyManager
+from vocabulary_pack import VocabularyPack, build_pack, open_pack, write_pack
+
+
+SCENES = {
+    "超市": {"人物": [("shōu yín yuán", "收银员")], "物品": [("píng guǒ", "苹果"), ("xiāng jiāo", "香蕉")]},
+    "果园": {"物品": [("píng guǒ", "苹果")], "环境": []},
+    "Zoo": {"动物": [("shī zi", "狮子")]},
+}
+
+
+def test_pack_round_trip(tmp_path):
+    path = str(tmp_path / "vocabulary.pack")
+    size = write_pack(SCENES, path)
+    pack = VocabularyPack(path)
+    try:
+        assert os.path.getsize(path) == size
+        assert list(pack.names()) == list(SCENES)
+        assert len(pack) == 3
+        for name, vocab in SCENES.items():
+            assert pack.get(name) == vocab
+        assert pack.get("医院") is None
+        assert "果园" in pack and "果" not in pack
+    finally:
+        pack.close()
+
+
+def test_damaged_pack_is_ignored(tmp_path, capsys):
+    path = tmp_path / "vocabulary.pack"
+    write_pack(SCENES, str(path))
+    path.write_bytes(path.read_bytes()[:40])
+
+    assert open_pack(str(path)) is None
+    assert "Truncated" in capsys.readouterr().out
+    assert open_pack(str(tmp_path / "missing.pack")) is None
+
+
+def test_manager_reads_pack_and_prefers_newer_json(write_scene, tmp_path):
+    for name, vocab in SCENES.items():
+        write_scene(name, vocab)
+    path = str(tmp_path / "vocabulary.pack")
+    assert build_pack(write_scene.data_dir, path)[0] == 3
+
+    # 词汇包之后修改过的 JSON 文件仍然按文件读取
+    edited = write_scene("果园", {"物品": [("lí", "梨")]})
+    pack_mtime = os.path.getmtime(path)
+    os.utime(edited, (pack_mtime + 10, pack_mtime + 10))
+    manager = VocabularyManager(data_dir=write_scene.data_dir, pack_path=path)
+
+    assert list(manager.manifest) == ["果园"]
+    assert manager.get_scene_vocabulary("超市") == SCENES["超市"]
+    assert manager.get_scene_vocabulary("果园") == {"物品": [("lí", "梨")]}
+    assert manager.memory_stats()["pack_scenes"] == 3
+
+
+NAMED_SCENES = {name: {"物品": [(pinyin, name)]} for name, pinyin in [
+    ("超市", "chāo shì"), ("超市收银台", "chāo shì shōu yín tái"), ("大超市", "dà chāo shì"),
+    ("公园", "gōng yuán"), ("水果店", "shuǐ guǒ diàn"), ("果", "guǒ"), ("Zoo", "zoo"), ("zoo", "zoo"),
+]}
+
+
+def test_pack_name_index_matches_scene_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(scene_index, "lazy_pinyin", None)
+    path = str(tmp_path / "vocabulary.pack")
+    write_pack(NAMED_SCENES, path)
+    pack = VocabularyPack(path)
+    try:
+        expected = SceneIndex()
+        for vocab in NAMED_SCENES.values():
+            expected.learn_readings(vocab["物品"])
+        expected.extend(NAMED_SCENES)
+        backed = SceneIndex(backing=pack)
+
+        for query in ["超市", "超", "去大超市购物", "cs", "cssyt", "gongyuan", "果", "吃水果", "ZOO", "园", "火星"]:
+            assert backed.matches(query) == expected.matches(query), query
+        assert backed.names() == list(NAMED_SCENES)
+        assert len(backed) == 0 and "公园" in backed
+    finally:
+        pack.close()
+
+
+def test_manager_does_not_list_pack_scenes(write_scene, tmp_path, monkeypatch):
+    for name, vocab in NAMED_SCENES.items():
+        write_scene(name, vocab)
+    path = str(tmp_path / "vocabulary.pack")
+    build_pack(write_scene.data_dir, path)
+
+    def no_listing(self):
+        raise AssertionError("pack names listed")
+
+    monkeypatch.setattr(VocabularyPack, "names", no_listing)
+    manager = VocabularyManager(data_dir=write_scene.data_dir, pack_path=path)
+    # 只有内置场景逐个加入场景索引，包内场景通过包内索引查找
+    assert len(manager.scene_index) == len(manager._builtin)
+    assert manager.resolve_scene("去水果店") == "水果店"
+    assert manager.suggest_scenes("sgd") == ["水果店"]
+
+    write_scene("面包店", {"物品": [("miàn bāo", "面包")]})
+    report = manager.reload()
+    assert (report["added"], report["pack_reloaded"]) == (["面包店"], False)
+    assert manager.resolve_scene("面包") == "面包店"
+
+
+def test_closing_pack_after_reads(tmp_path):
+    path = str(tmp_path / "vocabulary.pack")
+    write_pack(SCENES, path)
+    pack = VocabularyPack(path)
+    assert pack.get("超市") == SCENES["超市"]
+    assert pack.match_names("超市") == {"超市": (MATCH_EXACT, 0)}
+    # 读取不保留映射内存的导出，可以直接关闭
+    pack.close()
@@ -0,0 +1,81 @@
+"""词汇热更新测试"""
+
+import os
+
+import pytest
+
+from prompt_generator import PromptGenerator
+from prompt_templates import PromptTemplateEngine
+from vocabulary import VocabularyManager
+from vocabulary_watcher import VocabularyWatcher
+
+
+FARM = {"人物": [("nóng mín", "农民")]}
+
+
+def _touch_later(path, seconds=10):
+    """推后修改时间，保证文件变化能被检测到"""
+    mtime = os.path.getmtime(path) + seconds
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def generator(write_scene, tmp_path):
+    template_path = tmp_path / "prompt.md"
+    template_path.write_text("{{theme}}: {{core_items}}", encoding="utf-8")
+    manager = VocabularyManager(data_dir=write_scene.data_dir, pack_path=str(tmp_path / "missing.pack"))
+    return PromptGenerator(PromptTemplateEngine(manager, template_path=str(template_path),
+                                                template_dir=str(tmp_path / "templates")))
+
+
+def test_changed_scene_file_is_reloaded_and_prompt_refreshed(generator, write_scene):
+    path = write_scene("农场", FARM)
+    watcher = VocabularyWatcher(generator)
+    report = watcher.check()
+    assert report["added"] == ["农场"]
+    assert "农民" in generator.generate_prompt("农场", "a")
+
+    write_scene("农场", {"人物": [("mù mín", "牧民")]})
+    _touch_later(path)
+    report = watcher.check()
+    assert report["changed"] == ["农场"]
+    assert "牧民" in generator.generate_prompt("农场", "a")
+
+    os.remove(path)
+    assert watcher.check()["removed"] == ["农场"]
+    assert "农场" not in generator.vocab_manager.list_scenes()
+    assert watcher.check() is None
+    assert watcher.stats()["reloads"] == 3
+
+
+def test_broken_update_keeps_previous_content(generator, write_scene, capsys):
+    path = write_scene("农场", FARM)
+    watcher = VocabularyWatcher(generator)
+    watcher.check()
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"人物": [')
+    _touch_later(path)
+    assert watcher.check() is None
+    assert generator.vocab_manager.get_scene_vocabulary("农场") == FARM
+    # 同一个坏文件只警告一次
+    watcher.check()
+    assert capsys.readouterr().out.count("Failed to reload") == 1
+
+
+def test_template_change_recompiles(generator, tmp_path):
+    watcher = VocabularyWatcher(generator)
+    assert generator.generate_prompt("超市", "a").startswith("超市: ")
+
+    template_path = tmp_path / "prompt.md"
+    template_path.write_text("{{title}}", encoding="utf-8")
+    _touch_later(str(template_path))
+    assert watcher.check()["templates"] == ["default"]
+    assert generator.generate_prompt("超市", "a") == "a"
+
+
+def test_reload_endpoint_reports_no_changes(web_app):
+    response = web_app.app.test_client().post("/api/vocabulary/reload")
+
+    assert response.status_code == 200
+    assert response.get_json()["reloaded"] is False
@@ -2,11 +2,9 @@
 在浏览器中运行的版本
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import os
 import sys
-import json
-import time
 from datetime import datetime
 import threading
 
@@ -15,6 +13,20 @@ sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src
 
 from prompt_generator import PromptGenerator
 from api_client import APIClient
+from http_pool import get_shared_pool
+from task_poller import TaskPoller
+from poll_schedule import get_shared_schedule
+from callback_receiver import get_shared_registry
+from downloader import get_shared_download_stats
+from job_queue import JobQueue, JobStore, QueueFullError, default_job_store_path, UNFINISHED_STATUSES
+from task_registry import new_task_id, process_memory
+from progress_events import get_shared_broker
+from image_response import send_output_file
+from derivatives import get_shared_pipeline
+from history_store import get_shared_history_store, DEFAULT_PAGE_SIZE
+from scene_index import DEFAULT_SUGGESTION_LIMIT
+from vocabulary_watcher import VocabularyWatcher
+from character_index import DEFAULT_RESULT_LIMIT
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -25,12 +37,125 @@ app.config['SECRET_KEY'] = 'your-secret-key-here'
 app.config['UPLOAD_FOLDER'] = 'outputs'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# 全局变量存储生成任务
-generation_tasks = {}
-
 # 初始化组件
 prompt_generator = PromptGenerator()
 
+# 词汇热更新：config/vocabulary_data 和提示词模板变化时自动重新加载，无需重启服务
+vocabulary_watcher = VocabularyWatcher(prompt_generator, interval=float(os.getenv('VOCABULARY_CHECK_INTERVAL', '5')))
+vocabulary_watcher.start()
+
+# 所有后台任务共用一个轮询器，统一调度 recordInfo 查询
+task_poller = TaskPoller()
+
+# 任务回调：配置公网可访问的回调地址后优先等待回调，超时再轮询
+# 例如 KIE_CALLBACK_URL=https://example.com/api/callback；多进程部署时用 KIE_CALLBACK_TOKEN 指定相同的回调令牌
+callback_registry = get_shared_registry()
+CALLBACK_URL = os.getenv('KIE_CALLBACK_URL')
+
+# API 地址（离线测试时可指向 src/mock_kie_server.py）
+API_BASE_URL = os.getenv('KIE_API_BASE_URL')
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
+
+# 任务进度：状态变化时通过 /api/progress/<task_id> 推送给浏览器
+progress_broker = get_shared_broker()
+STAGE_MESSAGES = {
+    'queued': '排队中...',
+    'waiting': '任务已提交，等待生成...',
+    'generating': '正在生成中...',
+    'downloading': '正在下载图片...',
+    'success': '生成成功！',
+    'fail': '生成失败'
+}
+
+
+def publish_job_status(job_id, status, fields):
+    """将任务队列的状态变化发布为进度事件（执行中的细分阶段由 APIClient 报告）"""
+    if status == 'queued':
+        progress_broker.publish(job_id, 'queued', 0, fields.get('message') or STAGE_MESSAGES['queued'],
+                                estimated_wait=round(job_queue.estimated_wait()))
+    elif status == 'success':
+        progress_broker.publish(job_id, 'success', 100, fields.get('message') or STAGE_MESSAGES['success'],
+                                output_path=fields.get('output_path'))
+    elif status == 'error':
+        progress_broker.publish(job_id, 'fail', message=STAGE_MESSAGES['fail'], error=fields.get('error'))
+
+
+def record_generated_image(job_id, params, output_path):
+    """记录生成好的图片（新生成或命中缓存）：后台生成缩略图和预览图，追加到生成历史（与命令行共用）"""
+    get_shared_pipeline().schedule(output_path)
+    get_shared_history_store().append(
+        params['theme'], params['title'], output_path, task_id=job_id
+    )
+
+
+def run_generation_job(job, report):
+    """在任务队列的工作线程中执行生成任务"""
+    params = job['params']
+    api_key = os.getenv('KIE_AI_API_KEY')
+    if not api_key:
+        raise Exception('未配置API Key')
+
+    client = APIClient(api_key, base_url=API_BASE_URL)
+
+    # 配置了回调地址时等待回调（重新接管的任务可能已错过回调，直接轮询）
+    callback_options = {}
+    if CALLBACK_URL and not job.get('kie_task_id'):
+        callback_options = {
+            'callback_url': CALLBACK_URL,
+            'callback_registry': callback_registry
+        }
+
+    # 生成图片
+    output_path = client.generate_image(
+        prompt=params['prompt'],
+        output_dir=OUTPUT_DIR,
+        poller=task_poller,
+        use_cache=params['use_cache'],
+        show_progress=False,  # 禁用进度条
+        resume_task_id=job.get('kie_task_id'),
+        on_task_created=lambda kie_task_id: report(kie_task_id=kie_task_id),
+        on_progress=lambda stage, progress, **info: progress_broker.publish(
+            job['job_id'], stage, progress, STAGE_MESSAGES.get(stage), **info
+        ),
+        **params['generation_params'],
+        **callback_options
+    )
+
+    # 历史记录只加载后台生成的小图
+    record_generated_image(job['job_id'], params, output_path)
+
+    return {
+        'output_path': os.path.basename(output_path),
+        'message': '生成成功！'
+    }
+
+
+# 生成任务队列：有界并发，排队过多时拒绝；任务持久化，重启后继续等待已提交的上游任务
+job_queue = JobQueue(
+    run_generation_job,
+    JobStore(default_job_store_path('app')),
+    max_workers=int(os.getenv('WEB_JOB_WORKERS', '4')),
+    max_pending=int(os.getenv('WEB_JOB_QUEUE_SIZE', '64')),
+    on_status=publish_job_status
+)
+_jobs_recovered = False
+_jobs_recovered_lock = threading.Lock()
+
+
+@app.before_request
+def recover_jobs():
+    """首次处理请求时接管上次未完成的任务（多个 worker 共用任务库时每个任务只会被一个 worker 接管；调试重载器的监控进程不会执行）"""
+    global _jobs_recovered
+    if _jobs_recovered:
+        return
+    with _jobs_recovered_lock:
+        if not _jobs_recovered:
+            _jobs_recovered = True
+            recovered = job_queue.recover()
+            if recovered:
+                print(f"已恢复 {recovered} 个未完成的生成任务")
+
 
 @app.route('/')
 def index():
@@ -40,8 +165,11 @@ def index():
 
 @app.route('/api/scenes', methods=['GET'])
 def get_scenes():
-    """获取所有可用场景"""
-    scenes = prompt_generator.get_theme_suggestions()
+    """获取可用场景（带 q 参数时按匹配程度返回自动补全结果）"""
+    scenes = prompt_generator.get_theme_suggestions(
+        request.args.get('q', '').strip(),
+        limit=request.args.get('limit', DEFAULT_SUGGESTION_LIMIT, type=int)
+    )
     return jsonify({
         'success': True,
         'scenes': scenes
@@ -83,6 +211,7 @@ def generate_image():
     ratio = data.get('ratio', '3:4')
     resolution = data.get('resolution', '2K')
     format_type = data.get('format', 'png')
+    use_cache = data.get('use_cache', True)
 
     if not theme or not title:
         return jsonify({
@@ -99,79 +228,268 @@ def generate_image():
         })
 
     # 生成任务ID
-    task_id = f"task_{int(time.time())}"
+    task_id = new_task_id()
 
     # 创建输出目录
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
-    os.makedirs(output_dir, exist_ok=True)
-
-    # 在后台线程中执行生成
-    def generate_in_background():
-        try:
-            # 生成提示词
-            prompt = prompt_generator.generate_prompt(theme, title)
-
-            # 创建API客户端
-            client = APIClient(api_key)
-
-            # 生成图片
-            output_path = client.generate_image(
-                prompt=prompt,
-                output_dir=output_dir,
-                aspect_ratio=ratio,
-                resolution=resolution,
-                output_format=format_type,
-                show_progress=False  # 禁用进度条
-            )
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-            # 更新任务状态
-            generation_tasks[task_id] = {
-                'status': 'success',
-                'output_path': os.path.basename(output_path),
-                'message': '生成成功！'
-            }
-
-        except Exception as e:
-            generation_tasks[task_id] = {
-                'status': 'error',
-                'error': str(e),
-                'message': '生成失败'
-            }
-
-    # 启动后台任务
-    thread = threading.Thread(target=generate_in_background)
-    thread.daemon = True
-    thread.start()
-
-    # 初始化任务状态
-    generation_tasks[task_id] = {
-        'status': 'processing',
-        'message': '正在生成中...'
+    # 生成提示词
+    prompt = prompt_generator.generate_prompt(theme, title)
+
+    # 创建API客户端
+    client = APIClient(api_key, base_url=API_BASE_URL)
+    generation_params = {
+        'aspect_ratio': ratio,
+        'resolution': resolution,
+        'output_format': format_type
+    }
+    job_params = {
+        'theme': theme,
+        'title': title,
+        'prompt': prompt,
+        'use_cache': use_cache,
+        'generation_params': generation_params
     }
 
+    # 相同提示词和参数已生成过时直接返回缓存结果
+    deduplicated = False
+    if use_cache:
+        cached_path = client.fetch_cached_image(prompt, output_dir=OUTPUT_DIR, **generation_params)
+        if cached_path:
+            record_generated_image(task_id, job_params, cached_path)
+            job_queue.record(
+                task_id, job_params, 'success',
+                output_path=os.path.basename(cached_path),
+                message='生成成功！（命中缓存）'
+            )
+            return jsonify({
+                'success': True,
+                'task_id': task_id,
+                'status': 'success',
+                'output_path': os.path.basename(cached_path),
+                'cached': True,
+                'message': '命中缓存，已直接返回'
+            })
+
+        # 相同请求正在生成时，工作线程会合并到同一个上游任务并收到它的进度
+        # （合并的任务在上游任务完成前同样占用一个工作线程）
+        deduplicated = client.single_flight.in_flight(client.cache_key(prompt, **generation_params))
+
+    # 提交到任务队列（排队过多时返回 429 和预计等待时间）
+    message = '已有相同任务正在生成，已合并到该任务' if deduplicated else '正在生成中...'
+    try:
+        job_queue.submit(task_id, job_params, message=message)
+    except QueueFullError as e:
+        wait_seconds = int(e.estimated_wait) + 1
+        return jsonify({
+            'success': False,
+            'error': f'当前排队任务过多，预计需要等待 {wait_seconds} 秒，请稍后再试',
+            'estimated_wait': wait_seconds
+        }), 429, {'Retry-After': str(wait_seconds)}
+
     return jsonify({
         'success': True,
         'task_id': task_id,
-        'message': '任务已开始，请等待...'
+        'deduplicated': deduplicated,
+        'message': message if deduplicated else '任务已开始，请等待...'
     })
 
 
 @app.route('/api/status/<task_id>', methods=['GET'])
 def check_status(task_id):
     """检查任务状态"""
-    if task_id not in generation_tasks:
+    job = job_queue.get(task_id)
+    if job is None:
         return jsonify({
             'success': False,
             'error': '任务不存在'
         })
 
-    task = generation_tasks[task_id]
+    # 排队中和执行中对前端都是 processing
+    status = 'processing' if job['status'] in UNFINISHED_STATUSES else job['status']
+    return jsonify({
+        'success': True,
+        'status': status,
+        'state': job['status'],
+        'message': job.get('message') or '',
+        'output_path': job.get('output_path') or '',
+        'error': job.get('error') or ''
+    })
+
+
+@app.route('/api/progress/<task_id>', methods=['GET'])
+def stream_progress(task_id):
+    """以 Server-Sent Events 推送任务进度（状态变化时才发送，替代轮询 /api/status）"""
+    if progress_broker.get(task_id) is None:
+        # 进度已过期或服务重启过，用任务记录中的状态作为起点
+        job = job_queue.get(task_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': '任务不存在'
+            }), 404
+        stage = {'queued': 'queued', 'running': 'waiting', 'success': 'success', 'error': 'fail'}.get(job['status'], 'waiting')
+        progress_broker.publish(
+            task_id, stage,
+            message=job.get('message') or STAGE_MESSAGES[stage],
+            output_path=job.get('output_path'),
+            error=job.get('error')
+        )
+
+    # 事件流定期结束，浏览器重连时带回最后收到的事件 ID，只推送之后的进度
+    return Response(
+        stream_with_context(progress_broker.stream(
+            task_id, last_event_id=request.headers.get('Last-Event-ID')
+        )),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # 关闭反向代理缓冲，事件立即送达
+        }
+    )
+
+
+@app.route('/api/memory', methods=['GET'])
+def get_memory_stats():
+    """获取进程内存与任务存储占用（任务状态保存在 SQLite 中，图片只保存在磁盘上）"""
+    return jsonify({
+        'success': True,
+        'stats': {
+            'process_rss_bytes': process_memory(),
+            'job_store_bytes': job_queue.store.size_bytes(),
+            'jobs': job_queue.store.counts(),
+            'progress': progress_broker.stats(),
+            'derivatives': get_shared_pipeline().stats()
+        }
+    })
+
+
+@app.route('/api/characters', methods=['GET'])
+def get_characters():
+    """识字查询
+
+    查询参数（三选一）：
+    - chars=医药：教这些汉字的场景，match=all（默认，全部包含）或 any（包含任意一个）
+    - pinyin=yī yào：包含这些带声调拼音音节的场景
+    - scene=医院：该场景小报教的汉字，all_items=1 时统计场景全部词汇
+    limit 限制返回的场景数
+    """
+    vocab_manager = prompt_generator.vocab_manager
+    scene = request.args.get('scene', '').strip()
+    if scene:
+        resolved = vocab_manager.resolve_scene(scene)
+        if resolved is None:
+            return jsonify({
+                'success': False,
+                'error': f'场景不存在: {scene}'
+            }), 404
+        return jsonify({
+            'success': True,
+            'scene': resolved,
+            'characters': vocab_manager.characters_in_scene(
+                resolved, poster_only=request.args.get('all_items') not in ('1', 'true')
+            )
+        })
+
+    chars = request.args.get('chars', '').strip()
+    pinyin = request.args.get('pinyin', '').strip()
+    match_all = request.args.get('match', 'all') != 'any'
+    limit = request.args.get('limit', DEFAULT_RESULT_LIMIT, type=int)
+    if chars:
+        result = vocab_manager.scenes_with_characters(chars, match_all=match_all, limit=limit)
+    elif pinyin:
+        result = vocab_manager.scenes_with_syllables(pinyin.replace(',', ' ').split(), match_all=match_all, limit=limit)
+    else:
+        return jsonify({
+            'success': False,
+            'error': '请提供 chars、pinyin 或 scene 参数'
+        }), 400
+
     return jsonify({
         'success': True,
-        'status': task['status'],
-        'message': task.get('message', ''),
-        'output_path': task.get('output_path', ''),
-        'error': task.get('error', '')
+        'match': 'all' if match_all else 'any',
+        **result
+    })
+
+
+@app.route('/api/vocabulary-stats', methods=['GET'])
+def get_vocabulary_stats():
+    """获取词汇加载、热更新和提示词缓存统计"""
+    return jsonify({
+        'success': True,
+        'stats': {
+            'vocabulary': prompt_generator.vocab_manager.memory_stats(),
+            'character_index': prompt_generator.vocab_manager.character_index_stats(),
+            'watcher': vocabulary_watcher.stats(),
+            'prompt_cache': prompt_generator.template_engine.stats()
+        }
+    })
+
+
+@app.route('/api/vocabulary/reload', methods=['POST'])
+def reload_vocabulary():
+    """立即检查并重新加载有变化的词汇文件和模板"""
+    report = vocabulary_watcher.check()
+    return jsonify({
+        'success': True,
+        'reloaded': report is not None,
+        'report': report
+    })
+
+
+@app.route('/api/queue-stats', methods=['GET'])
+def get_queue_stats():
+    """获取生成任务队列统计（并发数、排队数、预计等待时间）"""
+    return jsonify({
+        'success': True,
+        'stats': job_queue.stats()
+    })
+
+
+@app.route('/api/pool-stats', methods=['GET'])
+def get_pool_stats():
+    """获取HTTP连接池统计（连接复用率）"""
+    return jsonify({
+        'success': True,
+        'stats': get_shared_pool().stats()
+    })
+
+
+@app.route('/api/download-stats', methods=['GET'])
+def get_download_stats():
+    """获取图片下载统计（CDN 吞吐量，与生成耗时分开统计）"""
+    return jsonify({
+        'success': True,
+        'stats': get_shared_download_stats().snapshot()
+    })
+
+
+@app.route('/api/poller-stats', methods=['GET'])
+def get_poller_stats():
+    """获取任务轮询器统计"""
+    return jsonify({
+        'success': True,
+        'stats': task_poller.stats()
+    })
+
+
+@app.route('/api/callback', methods=['POST'])
+def receive_callback():
+    """接收 Kie API 的任务完成回调（令牌不正确时拒绝；任务状态由生成线程再查询 recordInfo 确认）"""
+    token = request.args.get('token')
+    if not callback_registry.verify(token):
+        return jsonify({'success': False, 'error': 'Invalid callback token'}), 403
+    payload = request.get_json(silent=True) or {}
+    callback_registry.resolve(payload, token)
+    return jsonify({'success': True})
+
+
+@app.route('/api/poll-schedule', methods=['GET'])
+def get_poll_schedule():
+    """获取学习到的任务完成时间分布"""
+    return jsonify({
+        'success': True,
+        'distribution': get_shared_schedule().snapshot()
     })
 
 
@@ -179,31 +497,39 @@ def check_status(task_id):
 def get_output_file(filename):
     """获取生成的图片"""
     output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
-    return send_file(os.path.join(output_dir, filename))
+    return send_output_file(output_dir, filename)
 
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """获取生成历史"""
-    history_file = os.path.join(
-        os.path.dirname(os.path.dirname(__file__)),
-        'outputs', 'history', 'generation_history.json'
-    )
+    """获取生成历史
 
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-            return jsonify({
-                'success': True,
-                'history': history[-20:]  # 返回最近20条
-            })
-        except:
-            pass
+    查询参数：theme（主题）、since/until（日期，如 2024-01-01）、
+    limit（每页条数）、before（分页游标，上一页返回的 next_before）
+    """
+    try:
+        records, next_before = get_shared_history_store().page(
+            theme=request.args.get('theme') or None,
+            since=request.args.get('since') or None,
+            until=request.args.get('until') or None,
+            limit=int(request.args.get('limit', DEFAULT_PAGE_SIZE)),
+            before_id=request.args.get('before', type=int)
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'查询参数无效: {e}'
+        }), 400
+
+    for record in records:
+        # 前端通过 /outputs/<文件名> 加载图片
+        if record.get('output_path'):
+            record['output_path'] = os.path.basename(record['output_path'])
 
     return jsonify({
         'success': True,
-        'history': []
+        'history': records,  # 最新的在前
+        'next_before': next_before
     })
 
 
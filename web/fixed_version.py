@@ -5,19 +5,25 @@
 import os
 import sys
 import json
-import time
 import threading
 from datetime import datetime
 from pathlib import Path
-import base64
+from io import BytesIO
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
 
 try:
-    from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, Response
+    from flask import Flask, render_template, request, jsonify
     from prompt_generator import PromptGenerator
     from api_client import APIClient
+    from downloader import get_shared_writer, write_atomic
+    from image_response import (send_image, send_image_buffer, send_image_variant, send_output_file,
+                                wants_base64, encode_base64)
+    from derivatives import get_shared_pipeline
+    from scene_index import DEFAULT_SUGGESTION_LIMIT
+    from job_queue import JobQueue, JobStore, QueueFullError, default_job_store_path, UNFINISHED_STATUSES
+    from task_registry import new_task_id, process_memory
     from dotenv import load_dotenv
 except ImportError as e:
     print(f"缺少依赖包: {e}")
@@ -31,9 +37,6 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'literacy-poster-generator-secret-key'
 
-# 全局变量存储生成任务
-generation_tasks = {}
-
 # 初始化组件
 prompt_generator = PromptGenerator()
 
@@ -41,8 +44,133 @@ prompt_generator = PromptGenerator()
 task_history = []
 MAX_HISTORY = 50
 
-# 存储生成的图片数据（Base64编码）
-generated_images = {}
+# 请求中提供的 API Key 只保存在内存中，不写入任务数据库
+job_api_keys = {}
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
+
+# 后台写盘尚未完成的图片：输出路径 -> 内存中的图片，写盘完成后移除，之后从磁盘提供
+# （写盘失败时保留，内存中是唯一的副本）
+pending_images = {}
+
+
+def remember_image(output_path, data):
+    """登记刚生成的图片，写盘完成前直接从内存提供，写盘完成后生成缩略图和预览图"""
+    pending_images[output_path] = data
+
+    def written():
+        pending_images.pop(output_path, None)
+        get_shared_pipeline().schedule(output_path)
+    get_shared_writer().when_written(output_path, written)
+
+
+def image_response(job, download_name=None):
+    """返回任务的图片：仍在内存中时直接发送，否则从磁盘发送（支持 size 参数）"""
+    image_path = os.path.join(OUTPUT_DIR, job['output_path'])
+    data = pending_images.get(image_path)
+    if data is not None:
+        return send_image_buffer(data, image_path, download_name=download_name)
+    if not os.path.exists(image_path):
+        return 'File not found', 404
+    if download_name is not None:
+        return send_image(image_path, download_name=download_name)
+    return send_image_variant(image_path)
+
+
+def run_generation_job(job, report):
+    """在任务队列的工作线程中执行生成任务"""
+    task_id = job['job_id']
+    params = job['params']
+    theme = params['theme']
+    title = params['title']
+    format_type = params['format']
+    output_path = os.path.join(OUTPUT_DIR, f"{task_id}.{format_type}")
+
+    if params['demo']:
+        # 演示模式：生成一个占位图片
+        from PIL import Image, ImageDraw, ImageFont
+
+        # 创建演示图片
+        width, height = 600, 800
+        img = Image.new('RGB', (width, height), color='white')
+        draw = ImageDraw.Draw(img)
+
+        # 绘制标题
+        draw.text((50, 50), title, fill='black')
+        draw.text((50, 100), f'场景: {theme}', fill='gray')
+
+        # 编码到内存，后台异步写盘
+        buffer = BytesIO()
+        img.save(buffer, format='PNG' if format_type == 'png' else 'JPEG')
+        img_data = buffer.getbuffer().toreadonly()
+        get_shared_writer().submit(lambda: write_atomic(img_data, output_path), path=output_path)
+        remember_image(output_path, img_data)
+    else:
+        # 服务重启后请求中的 API Key 已丢失，使用环境变量中的配置
+        api_key = job_api_keys.pop(task_id, None) or os.getenv('KIE_AI_API_KEY')
+        if not api_key:
+            raise Exception('API Key 不可用，请重新提交任务')
+
+        # 真实API调用：图片直接下载到内存，后台异步写盘
+        client = APIClient(api_key)
+        img_data = client.generate_image_bytes(
+            prompt=prompt_generator.generate_prompt(theme, title),
+            save_to=output_path,
+            aspect_ratio=params['ratio'],
+            resolution=params['resolution'],
+            output_format=format_type,
+            show_progress=False,
+            resume_task_id=job.get('kie_task_id'),
+            on_task_created=lambda kie_task_id: report(kie_task_id=kie_task_id)
+        )
+        # 写盘完成后在后台生成缩略图和预览图，历史记录只加载小图
+        remember_image(output_path, img_data)
+
+    # 添加到历史记录
+    task_history.append({
+        'timestamp': datetime.now().isoformat(),
+        'task_id': task_id,
+        'theme': theme,
+        'title': title,
+        'output_path': os.path.basename(output_path),
+        'output_url': f'/api/image/{task_id}',
+        'thumbnail_url': f'/api/image/{task_id}?size=thumb',
+        'status': 'success'
+    })
+
+    # 限制历史记录数量
+    if len(task_history) > MAX_HISTORY:
+        task_history.pop(0)
+
+    return {
+        'output_path': os.path.basename(output_path),
+        'message': '生成成功！'
+    }
+
+
+# 生成任务队列：有界并发，排队过多时拒绝；任务持久化，重启后继续等待已提交的上游任务
+job_queue = JobQueue(
+    run_generation_job,
+    JobStore(default_job_store_path('fixed_version')),
+    max_workers=int(os.getenv('WEB_JOB_WORKERS', '4')),
+    max_pending=int(os.getenv('WEB_JOB_QUEUE_SIZE', '64'))
+)
+_jobs_recovered = False
+_jobs_recovered_lock = threading.Lock()
+
+
+@app.before_request
+def recover_jobs():
+    """首次处理请求时接管上次未完成的任务（多个 worker 共用任务库时每个任务只会被一个 worker 接管）"""
+    global _jobs_recovered
+    if _jobs_recovered:
+        return
+    with _jobs_recovered_lock:
+        if not _jobs_recovered:
+            _jobs_recovered = True
+            recovered = job_queue.recover()
+            if recovered:
+                print(f"已恢复 {recovered} 个未完成的生成任务")
 
 
 @app.route('/')
@@ -54,9 +182,12 @@ def index():
 
 @app.route('/api/scenes', methods=['GET'])
 def get_scenes():
-    """获取所有可用场景"""
+    """获取可用场景（带 q 参数时按匹配程度返回自动补全结果）"""
     try:
-        scenes = prompt_generator.get_theme_suggestions()
+        scenes = prompt_generator.get_theme_suggestions(
+            request.args.get('q', '').strip(),
+            limit=request.args.get('limit', DEFAULT_SUGGESTION_LIMIT, type=int)
+        )
         return jsonify({
             'success': True,
             'scenes': scenes
@@ -120,108 +251,33 @@ def generate_image():
             })
 
         # 生成任务ID
-        task_id = f"task_{int(time.time())}"
+        task_id = new_task_id()
 
         # 创建输出目录
-        output_dir = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)),
-            'outputs'
-        )
-        os.makedirs(output_dir, exist_ok=True)
-
-        # 在后台线程中执行生成
-        def generate_in_background():
-            try:
-                # 生成提示词
-                prompt = prompt_generator.generate_prompt(theme, title)
-
-                # 创建API客户端
-                client = APIClient(api_key)
-
-                # 模拟生成过程（如果没有API Key）
-                if api_key == 'demo_key' or not api_key.startswith('sk-'):
-                    # 演示模式：生成一个占位图片
-                    import urllib.request
-                    from io import BytesIO
-                    from PIL import Image, ImageDraw, ImageFont
-
-                    # 创建演示图片
-                    width, height = 600, 800
-                    img = Image.new('RGB', (width, height), color='white')
-                    draw = ImageDraw.Draw(img)
-
-                    # 绘制标题
-                    draw.text((50, 50), title, fill='black')
-                    draw.text((50, 100), f'场景: {theme}', fill='gray')
-
-                    # 保存图片
-                    output_path = os.path.join(output_dir, f"{task_id}.{format_type}")
-                    img.save(output_path)
-
-                    # 读取并编码为Base64
-                    with open(output_path, 'rb') as f:
-                        img_data = f.read()
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-                else:
-                    # 真实API调用
-                    output_path = client.generate_image(
-                        prompt=prompt,
-                        output_dir=output_dir,
-                        aspect_ratio=ratio,
-                        resolution=resolution,
-                        output_format=format_type,
-                        show_progress=False
-                    )
-
-                    # 读取并编码为Base64
-                    with open(output_path, 'rb') as f:
-                        img_data = f.read()
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-
-                # 更新任务状态
-                generation_tasks[task_id] = {
-                    'status': 'success',
-                    'output_path': os.path.basename(output_path),
-                    'output_url': f'/api/image/{task_id}',
-                    'image_base64': img_base64,
-                    'theme': theme,
-                    'title': title,
-                    'message': '生成成功！'
-                }
-
-                # 添加到历史记录
-                task_history.append({
-                    'timestamp': datetime.now().isoformat(),
-                    'task_id': task_id,
-                    'theme': theme,
-                    'title': title,
-                    'output_path': os.path.basename(output_path),
-                    'image_base64': img_base64,
-                    'status': 'success'
-                })
-
-                # 限制历史记录数量
-                if len(task_history) > MAX_HISTORY:
-                    task_history.pop(0)
-
-            except Exception as e:
-                generation_tasks[task_id] = {
-                    'status': 'error',
-                    'error': str(e),
-                    'message': '生成失败'
-                }
-
-        # 启动后台任务
-        thread = threading.Thread(target=generate_in_background)
-        thread.daemon = True
-        thread.start()
-
-        # 初始化任务状态
-        generation_tasks[task_id] = {
-            'status': 'processing',
-            'message': '正在生成中...',
-            'progress': 0
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+        # 提交到任务队列（排队过多时返回 429 和预计等待时间）
+        demo = api_key == 'demo_key' or not api_key.startswith('sk-')
+        job_params = {
+            'theme': theme,
+            'title': title,
+            'ratio': ratio,
+            'resolution': resolution,
+            'format': format_type,
+            'demo': demo
         }
+        if not demo:
+            job_api_keys[task_id] = api_key
+        try:
+            job_queue.submit(task_id, job_params, message='正在生成中...')
+        except QueueFullError as e:
+            job_api_keys.pop(task_id, None)
+            wait_seconds = int(e.estimated_wait) + 1
+            return jsonify({
+                'success': False,
+                'error': f'当前排队任务过多，预计需要等待 {wait_seconds} 秒，请稍后再试',
+                'estimated_wait': wait_seconds
+            }), 429, {'Retry-After': str(wait_seconds)}
 
         return jsonify({
             'success': True,
@@ -239,73 +295,92 @@ def generate_image():
 @app.route('/api/status/<task_id>', methods=['GET'])
 def check_status(task_id):
     """检查任务状态"""
-    if task_id not in generation_tasks:
+    job = job_queue.get(task_id)
+    if job is None:
         return jsonify({
             'success': False,
             'error': '任务不存在'
         })
 
-    task = generation_tasks[task_id]
+    # 排队中和执行中对前端都是 processing
+    status = 'processing' if job['status'] in UNFINISHED_STATUSES else job['status']
+    result = {
+        'success': True,
+        'status': status,
+        'state': job['status'],
+        'message': job.get('message') or '',
+        'output_path': job.get('output_path') or '',
+        'output_url': f'/api/image/{task_id}' if status == 'success' else '',
+        'download_url': f'/api/download/{task_id}' if status == 'success' else '',
+        'error': job.get('error') or '',
+        'theme': job['params'].get('theme', ''),
+        'title': job['params'].get('title', ''),
+        'progress': 100 if status == 'success' else 0
+    }
+
+    # 图片通过 output_url 获取；只有显式要求时才内嵌 Base64
+    if status == 'success' and wants_base64():
+        image_path = os.path.join(OUTPUT_DIR, job['output_path'])
+        data = pending_images.get(image_path)
+        if data is not None:
+            result['image_base64'] = encode_base64(data)
+        elif os.path.exists(image_path):
+            result['image_base64'] = encode_base64(image_path)
+    return jsonify(result)
+
+
+@app.route('/api/memory', methods=['GET'])
+def get_memory_stats():
+    """获取进程内存与任务存储占用（图片只保存在磁盘上）"""
     return jsonify({
         'success': True,
-        'status': task['status'],
-        'message': task.get('message', ''),
-        'output_path': task.get('output_path', ''),
-        'output_url': task.get('output_url', ''),
-        'image_base64': task.get('image_base64', ''),
-        'error': task.get('error', ''),
-        'theme': task.get('theme', ''),
-        'title': task.get('title', ''),
-        'progress': task.get('progress', 0)
+        'stats': {
+            'process_rss_bytes': process_memory(),
+            'job_api_keys': len(job_api_keys),
+            'pending_images': len(pending_images),
+            'task_history': len(task_history),
+            'job_store_bytes': job_queue.store.size_bytes(),
+            'background_writer': get_shared_writer().stats(),
+            'derivatives': get_shared_pipeline().stats()
+        }
+    })
+
+
+@app.route('/api/queue-stats', methods=['GET'])
+def get_queue_stats():
+    """获取生成任务队列统计（并发数、排队数、预计等待时间）"""
+    return jsonify({
+        'success': True,
+        'stats': job_queue.stats()
     })
 
 
 @app.route('/api/image/<task_id>')
 def get_image(task_id):
     """获取生成的图片"""
-    if task_id not in generation_tasks:
+    job = job_queue.get(task_id)
+    if job is None:
         return 'Image not found', 404
 
-    task = generation_tasks[task_id]
-    if task['status'] != 'success':
+    if job['status'] != 'success':
         return 'Image not ready', 404
 
-    # 从Base64解码并返回
-    if 'image_base64' in task:
-        image_data = base64.b64decode(task['image_base64'])
-        return Response(image_data, mimetype='image/png')
-
-    # 或从文件读取
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
-    image_path = os.path.join(output_dir, task['output_path'])
-
-    if os.path.exists(image_path):
-        return send_file(image_path)
-    else:
-        return 'File not found', 404
+    return image_response(job)
 
 
 @app.route('/api/download/<task_id>')
 def download_image(task_id):
     """下载生成的图片"""
-    if task_id not in generation_tasks:
+    job = job_queue.get(task_id)
+    if job is None:
         return 'Image not found', 404
 
-    task = generation_tasks[task_id]
-    if task['status'] != 'success':
+    if job['status'] != 'success':
         return 'Image not ready', 404
 
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
-    image_path = os.path.join(output_dir, task['output_path'])
-
-    if os.path.exists(image_path):
-        return send_file(
-            image_path,
-            as_attachment=True,
-            download_name=f"{task['title']}_{task['theme']}.{task['output_path'].split('.')[-1]}"
-        )
-    else:
-        return 'File not found', 404
+    params = job['params']
+    download_name = f"{params['title']}_{params['theme']}.{job['output_path'].split('.')[-1]}"
+    return image_response(job, download_name=download_name)
 
 
 @app.route('/outputs/<filename>')
@@ -315,7 +390,7 @@ def get_output_file(filename):
         os.path.dirname(os.path.dirname(__file__)),
         'outputs'
     )
-    return send_from_directory(output_dir, filename)
+    return send_output_file(output_dir, filename)
 
 
 @app.route('/api/history', methods=['GET'])
@@ -739,13 +814,8 @@ def get_fixed_html():
         function showResult(data) {
             const resultPanel = document.getElementById('resultPanel');
 
-            // 使用Base64数据显示图片
-            let imageHtml = '';
-            if (data.image_base64) {
-                imageHtml = `<img src="data:image/png;base64,${data.image_base64}" class="result-image" alt="${data.title}">`;
-            } else {
-                imageHtml = `<img src="${data.output_url}" class="result-image" alt="${data.title}">`;
-            }
+            // 通过图片 URL 显示预览图（浏览器可缓存，不在状态 JSON 中传输图片）
+            const imageHtml = `<img src="${data.output_url}?size=preview" class="result-image" alt="${data.title}">`;
 
             resultPanel.innerHTML = `
                 <div class="text-center">
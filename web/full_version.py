@@ -5,7 +5,6 @@
 import os
 import sys
 import json
-import time
 import threading
 from datetime import datetime
 from pathlib import Path
@@ -14,9 +13,14 @@ from pathlib import Path
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
 
 try:
-    from flask import Flask, render_template, request, jsonify, send_file
+    from flask import Flask, render_template, request, jsonify, Response, stream_with_context
     from prompt_generator import PromptGenerator
     from api_client import APIClient
+    from task_registry import TaskRegistry, new_task_id
+    from progress_events import get_shared_broker
+    from image_response import send_output_file
+    from derivatives import get_shared_pipeline
+    from scene_index import DEFAULT_SUGGESTION_LIMIT
     from dotenv import load_dotenv
 except ImportError as e:
     print(f"缺少依赖包: {e}")
@@ -30,8 +34,18 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = ' literacy-poster-generator-secret-key'
 
-# 全局变量存储生成任务
-generation_tasks = {}
+# 生成任务状态（容量上限 + 过期清理，只保存状态和文件名）
+generation_tasks = TaskRegistry()
+
+# 任务进度：状态变化时通过 /api/progress/<task_id> 推送给浏览器
+progress_broker = get_shared_broker()
+STAGE_MESSAGES = {
+    'waiting': '任务已提交，等待生成...',
+    'generating': '正在生成中...',
+    'downloading': '正在下载图片...',
+    'success': '生成成功！',
+    'fail': '生成失败'
+}
 
 # 初始化组件
 prompt_generator = PromptGenerator()
@@ -49,9 +63,12 @@ def index():
 
 @app.route('/api/scenes', methods=['GET'])
 def get_scenes():
-    """获取所有可用场景"""
+    """获取可用场景（带 q 参数时按匹配程度返回自动补全结果）"""
     try:
-        scenes = prompt_generator.get_theme_suggestions()
+        scenes = prompt_generator.get_theme_suggestions(
+            request.args.get('q', '').strip(),
+            limit=request.args.get('limit', DEFAULT_SUGGESTION_LIMIT, type=int)
+        )
         return jsonify({
             'success': True,
             'scenes': scenes
@@ -115,7 +132,7 @@ def generate_image():
             })
 
         # 生成任务ID
-        task_id = f"task_{int(time.time())}"
+        task_id = new_task_id()
 
         # 创建输出目录
         output_dir = os.path.join(
@@ -140,17 +157,25 @@ def generate_image():
                     aspect_ratio=ratio,
                     resolution=resolution,
                     output_format=format_type,
-                    show_progress=False
+                    show_progress=False,
+                    on_progress=lambda stage, progress, **info: progress_broker.publish(
+                        task_id, stage, progress, STAGE_MESSAGES.get(stage), **info
+                    )
                 )
 
+                # 后台生成缩略图和预览图
+                get_shared_pipeline().schedule(output_path)
+
                 # 更新任务状态
-                generation_tasks[task_id] = {
+                generation_tasks.set(task_id, {
                     'status': 'success',
                     'output_path': os.path.basename(output_path),
                     'theme': theme,
                     'title': title,
                     'message': '生成成功！'
-                }
+                })
+                progress_broker.publish(task_id, 'success', 100, STAGE_MESSAGES['success'],
+                                        output_path=os.path.basename(output_path), theme=theme, title=title)
 
                 # 添加到历史记录
                 task_history.append({
@@ -167,24 +192,26 @@ def generate_image():
                     task_history.pop(0)
 
             except Exception as e:
-                generation_tasks[task_id] = {
+                generation_tasks.set(task_id, {
                     'status': 'error',
                     'error': str(e),
                     'message': '生成失败'
-                }
+                })
+                progress_broker.publish(task_id, 'fail', message=STAGE_MESSAGES['fail'], error=str(e))
+
+        # 初始化任务状态（先于后台线程写入，避免覆盖已完成的结果）
+        generation_tasks.set(task_id, {
+            'status': 'processing',
+            'message': '正在生成中...',
+            'progress': 0
+        })
+        progress_broker.publish(task_id, 'waiting', 0, STAGE_MESSAGES['waiting'])
 
         # 启动后台任务
         thread = threading.Thread(target=generate_in_background)
         thread.daemon = True
         thread.start()
 
-        # 初始化任务状态
-        generation_tasks[task_id] = {
-            'status': 'processing',
-            'message': '正在生成中...',
-            'progress': 0
-        }
-
         return jsonify({
             'success': True,
             'task_id': task_id,
@@ -201,13 +228,13 @@ def generate_image():
 @app.route('/api/status/<task_id>', methods=['GET'])
 def check_status(task_id):
     """检查任务状态"""
-    if task_id not in generation_tasks:
+    task = generation_tasks.get(task_id)
+    if task is None:
         return jsonify({
             'success': False,
             'error': '任务不存在'
         })
 
-    task = generation_tasks[task_id]
     return jsonify({
         'success': True,
         'status': task['status'],
@@ -220,6 +247,50 @@ def check_status(task_id):
     })
 
 
+@app.route('/api/progress/<task_id>', methods=['GET'])
+def stream_progress(task_id):
+    """以 Server-Sent Events 推送任务进度（状态变化时才发送，替代轮询 /api/status）"""
+    if progress_broker.get(task_id) is None:
+        # 进度已过期，用任务登记表中的状态作为起点
+        task = generation_tasks.get(task_id)
+        if task is None:
+            return jsonify({
+                'success': False,
+                'error': '任务不存在'
+            }), 404
+        stage = {'processing': 'waiting', 'success': 'success', 'error': 'fail'}.get(task['status'], 'waiting')
+        progress_broker.publish(
+            task_id, stage,
+            message=task.get('message') or STAGE_MESSAGES[stage],
+            output_path=task.get('output_path'),
+            theme=task.get('theme'),
+            title=task.get('title'),
+            error=task.get('error')
+        )
+
+    return Response(
+        stream_with_context(progress_broker.stream(task_id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # 关闭反向代理缓冲，事件立即送达
+        }
+    )
+
+
+@app.route('/api/memory', methods=['GET'])
+def get_memory_stats():
+    """获取任务登记表的内存占用"""
+    return jsonify({
+        'success': True,
+        'stats': {
+            **generation_tasks.memory_stats(),
+            'progress': progress_broker.stats(),
+            'derivatives': get_shared_pipeline().stats()
+        }
+    })
+
+
 @app.route('/outputs/<filename>')
 def get_output_file(filename):
     """获取生成的图片"""
@@ -227,7 +298,7 @@ def get_output_file(filename):
         os.path.dirname(os.path.dirname(__file__)),
         'outputs'
     )
-    return send_file(os.path.join(output_dir, filename))
+    return send_output_file(output_dir, filename)
 
 
 @app.route('/api/history', methods=['GET'])
@@ -345,7 +416,7 @@ def create_template():
 
                 if (data.success) {
                     currentTaskId = data.task_id;
-                    await checkTaskStatus();
+                    await waitForTask();
                 } else {
                     throw new Error(data.error || '生成失败');
                 }'''
@@ -353,6 +424,43 @@ def create_template():
 
         # 添加任务状态检查函数
         status_check_function = '''
+        // 等待任务完成：优先订阅进度推送，浏览器不支持或连接失败时退回轮询
+        async function waitForTask() {
+            if (!window.EventSource) {
+                return checkTaskStatus();
+            }
+
+            const outcome = await new Promise((resolve) => {
+                const source = new EventSource(`/api/progress/${currentTaskId}`);
+                source.addEventListener('progress', (event) => {
+                    const data = JSON.parse(event.data);
+                    if (data.stage === 'success' || data.stage === 'fail') {
+                        source.close();
+                        resolve(data);
+                    } else if (data.progress !== null && data.progress !== undefined) {
+                        updateProgress(data.progress);
+                    }
+                });
+                source.addEventListener('expired', () => {
+                    source.close();
+                    resolve(null);
+                });
+                source.onerror = () => {
+                    if (source.readyState === EventSource.CLOSED) {
+                        resolve(null);
+                    }
+                };
+            });
+
+            if (outcome === null) {
+                return checkTaskStatus();
+            }
+            if (outcome.stage === 'fail') {
+                throw new Error(outcome.error || '生成失败');
+            }
+            showRealResult(outcome.output_path, outcome.title, outcome.theme);
+        }
+
         // 检查任务状态
         async function checkTaskStatus() {
             while (currentTaskId) {
@@ -388,7 +496,7 @@ def create_template():
                         <i class="fas fa-check-circle text-success"></i> 生成完成！
                     </h4>
                     <div style="position: relative; display: inline-block;">
-                        <img src="/outputs/${imagePath}" class="result-image" alt="${title}">
+                        <img src="/outputs/${imagePath}?size=preview" class="result-image" alt="${title}">
                         <a href="/outputs/${imagePath}" download="${title}_${new Date().getTime()}.png" class="download-btn">
                             <i class="fas fa-download"></i> 下载
                         </a>
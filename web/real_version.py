@@ -3,9 +3,7 @@
 import os
 import sys
 import json
-import time
 import threading
-import base64
 from datetime import datetime
 from pathlib import Path
 import requests
@@ -15,9 +13,12 @@ from io import BytesIO
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
 
 try:
-    from flask import Flask, render_template_string, request, jsonify, send_file, send_from_directory, Response
+    from flask import Flask, render_template_string, request, jsonify, send_from_directory, Response
     from PIL import Image, ImageDraw, ImageFont
     from dotenv import load_dotenv
+    from downloader import get_shared_writer, write_atomic
+    from image_response import send_image, wants_base64, encode_base64
+    from task_registry import new_task_id
 except ImportError as e:
     print(f"缺少依赖包: {e}")
     print("请运行: pip install flask Pillow python-dotenv requests")
@@ -30,7 +31,6 @@ load_dotenv()
 app = Flask(__name__)
 
 # 全局变量
-generation_tasks = {}
 task_history = []
 
 # 正式版HTML模板（包含真实API调用和演示模式）
@@ -570,13 +570,8 @@ HTML_TEMPLATE = '''
         function showResult(data) {
             const resultPanel = document.getElementById('resultPanel');
 
-            // 使用Base64显示图片
-            let imageHtml = '';
-            if (data.image_base64) {
-                imageHtml = `<img src="data:image/png;base64,${data.image_base64}" class="result-image" alt="${data.title}">`;
-            } else if (data.image_url) {
-                imageHtml = `<img src="${data.image_url}" class="result-image" alt="${data.title}">`;
-            }
+            // 通过图片 URL 显示（浏览器可缓存，不在 JSON 中传输图片）
+            const imageHtml = `<img src="${data.image_url}" class="result-image" alt="${data.title}">`;
 
             resultPanel.innerHTML = `
                 <div class="text-center">
@@ -588,7 +583,7 @@ HTML_TEMPLATE = '''
                         <a href="${data.download_url}" class="download-btn">
                             <i class="fas fa-download"></i> 下载图片
                         </a>
-                        <button class="download-btn" onclick="window.open('${data.image_url || `data:image/png;base64,${data.image_base64}`}, '_blank')">
+                        <button class="download-btn" onclick="window.open('${data.image_url}', '_blank')">
                             <i class="fas fa-expand"></i> 新窗口查看
                         </button>
                     </div>
@@ -814,15 +809,17 @@ def generate_sample_image(title, theme, task_id):
         note_width = bbox[2] - bbox[0]
         draw.text(((width - note_width) // 2, height - 80), note_text, fill='#666', font=vocab_font)
 
-        # 保存图片
+        # 编码到内存，后台异步写盘
         output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
-
         image_path = os.path.join(output_dir, f"{task_id}.png")
-        img.save(image_path, 'PNG', quality=95, optimize=True)
+
+        buffer = BytesIO()
+        img.save(buffer, 'PNG', quality=95, optimize=True)
+        img_data = buffer.getbuffer().toreadonly()
+        get_shared_writer().submit(lambda: write_atomic(img_data, image_path), path=image_path)
 
         print(f"图片已生成: {image_path}")
-        return image_path, vocabulary
+        return img_data, vocabulary
 
     except Exception as e:
         print(f"生成图片失败: {e}")
@@ -839,21 +836,19 @@ def generate_real_image(prompt, api_key, task_id):
 
         client = APIClient(api_key)
 
-        # 创建输出目录
         output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'outputs')
-        os.makedirs(output_dir, exist_ok=True)
 
-        # 生成图片
-        output_path = client.generate_image(
+        # 生成图片：直接下载到内存，后台异步写盘
+        img_data = client.generate_image_bytes(
             prompt=prompt,
-            output_dir=output_dir,
+            save_to=os.path.join(output_dir, f"{task_id}.png"),
             aspect_ratio='3:4',
             resolution='2K',
             output_format='png',
             show_progress=False
         )
 
-        return output_path, []
+        return img_data, []
 
     except Exception as e:
         print(f"API生成失败: {e}")
@@ -878,13 +873,13 @@ def generate_image():
         api_key = data.get('api_key')
 
         # 生成任务ID
-        task_id = f"task_{int(time.time())}"
+        task_id = new_task_id()
 
         # 根据模式生成图片
         if mode == 'demo' or not api_key:
             # 演示模式
-            image_path, vocabulary = generate_sample_image(title, theme, task_id)
-            if not image_path:
+            img_data, vocabulary = generate_sample_image(title, theme, task_id)
+            if img_data is None:
                 return jsonify({
                     'success': False,
                     'error': '生成失败'
@@ -909,32 +904,30 @@ def generate_image():
 2. 贴上识字标签（两行：拼音+汉字）
 3. 标签样式：彩色贴纸风格"""
 
-            image_path, vocabulary = generate_real_image(prompt, api_key, task_id)
+            img_data, vocabulary = generate_real_image(prompt, api_key, task_id)
 
             # 如果API失败，使用演示图片
-            if not image_path:
+            if img_data is None:
                 print("API失败，使用演示图片")
-                image_path, vocabulary = generate_sample_image(title, theme, task_id)
-
-        # 读取图片并转换为Base64
-        with open(image_path, 'rb') as f:
-            img_data = f.read()
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
+                img_data, vocabulary = generate_sample_image(title, theme, task_id)
 
         # 获取词汇
         if not vocabulary:
             vocabulary = VOCABULARIES.get(theme, [])
 
-        return jsonify({
+        result = {
             'success': True,
             'task_id': task_id,
             'title': title,
             'theme': theme,
             'image_url': f'/api/image/{task_id}',
             'download_url': f'/api/download/{task_id}',
-            'image_base64': img_base64,
             'vocabulary': vocabulary
-        })
+        }
+        # 图片通过 image_url 获取；只有显式要求时才内嵌 Base64
+        if wants_base64():
+            result['image_base64'] = encode_base64(img_data)
+        return jsonify(result)
 
     except Exception as e:
         print(f"生成错误: {e}")
@@ -955,8 +948,10 @@ def get_image(task_id):
         f"{task_id}.png"
     )
 
+    # 图片可能还在后台写盘
+    get_shared_writer().flush(image_path, timeout=10)
     if os.path.exists(image_path):
-        return send_file(image_path, mimetype='image/png')
+        return send_image(image_path, mimetype='image/png')
     else:
         return 'Image not found', 404
 
@@ -970,10 +965,11 @@ def download_image(task_id):
         f"{task_id}.png"
     )
 
+    # 图片可能还在后台写盘
+    get_shared_writer().flush(image_path, timeout=10)
     if os.path.exists(image_path):
-        return send_file(
+        return send_image(
             image_path,
-            as_attachment=True,
             download_name=f"识字小报_{task_id}.png",
             mimetype='image/png'
         )
@@ -988,7 +984,7 @@ if __name__ == '__main__':
     print("\n特点:")
     print("✓ 双模式：演示模式 + 正式模式")
     print("✓ 图片确保正常显示和下载")
-    print("✓ Base64 + URL 双重保障")
+    print("✓ 图片 URL 支持缓存与断点续传")
     print("✓ 词汇标注完整")
     print("\n访问地址: http://localhost:5000")
     print("\n按 Ctrl+C 停止服务")
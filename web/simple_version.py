@@ -3,19 +3,19 @@
 import os
 import sys
 import json
-import time
 import threading
 from datetime import datetime
 from pathlib import Path
-import base64
 from io import BytesIO
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
 
 try:
-    from flask import Flask, render_template_string, request, jsonify, send_file, send_from_directory, Response
+    from flask import Flask, render_template_string, request, jsonify, send_from_directory, Response
     from PIL import Image, ImageDraw, ImageFont
+    from task_registry import new_task_id
+    from image_response import send_image, wants_base64, encode_base64
 except ImportError as e:
     print(f"缺少依赖包: {e}")
     print("请运行: pip install flask Pillow")
@@ -25,7 +25,6 @@ except ImportError as e:
 app = Flask(__name__)
 
 # 全局变量
-generation_tasks = {}
 task_history = []
 
 # 内嵌HTML模板
@@ -363,26 +362,24 @@ def generate_image():
         title = data.get('title', '识字小报')
 
         # 生成任务ID
-        task_id = f"task_{int(time.time())}"
+        task_id = new_task_id()
 
         # 生成图片
         image_path = generate_sample_image(title, theme, task_id)
 
         if image_path and os.path.exists(image_path):
-            # 转换为Base64（确保显示）
-            with open(image_path, 'rb') as f:
-                img_data = f.read()
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
-
-            return jsonify({
+            result = {
                 'success': True,
                 'task_id': task_id,
                 'title': title,
                 'theme': theme,
                 'image_url': f'/api/image/{task_id}',
-                'download_url': f'/api/download/{task_id}',
-                'image_base64': f"data:image/png;base64,{img_base64}"
-            })
+                'download_url': f'/api/download/{task_id}'
+            }
+            # 图片通过 image_url 获取；只有显式要求时才内嵌 Base64
+            if wants_base64():
+                result['image_base64'] = f"data:image/png;base64,{encode_base64(image_path)}"
+            return jsonify(result)
         else:
             return jsonify({
                 'success': False,
@@ -406,7 +403,7 @@ def get_image(task_id):
     )
 
     if os.path.exists(image_path):
-        return send_file(image_path, mimetype='image/png')
+        return send_image(image_path, mimetype='image/png')
     else:
         return 'Image not found', 404
 
@@ -421,9 +418,8 @@ def download_image(task_id):
     )
 
     if os.path.exists(image_path):
-        return send_file(
+        return send_image(
             image_path,
-            as_attachment=True,
             download_name=f"识字小报_{task_id}.png"
         )
     else:
@@ -3,6 +3,8 @@
 // 全局变量
 let currentTaskId = null;
 let statusCheckInterval = null;
+let progressSource = null;
+let progressTimer = null;
 
 // 页面加载完成后执行
 document.addEventListener('DOMContentLoaded', function() {
@@ -42,22 +44,22 @@ async function loadScenes() {
 // 加载生成历史
 async function loadHistory() {
     try {
-        const response = await fetch('/api/history');
+        const response = await fetch('/api/history?limit=6');
         const data = await response.json();
 
         if (data.success && data.history.length > 0) {
             const historyList = document.getElementById('historyList');
             historyList.innerHTML = '';
 
-            // 显示最近6条历史记录
-            data.history.slice(-6).reverse().forEach(item => {
+            // 显示最近6条历史记录（接口返回的记录最新的在前）
+            data.history.forEach(item => {
                 const col = document.createElement('div');
                 col.className = 'col-md-4';
 
                 const card = document.createElement('div');
                 card.className = 'card history-item fade-in';
                 card.innerHTML = `
-                    <img src="/outputs/${item.output_path}" class="card-img-top" alt="${item.title}">
+                    <img src="/outputs/${item.output_path}?size=thumb" class="card-img-top" loading="lazy" alt="${item.title}">
                     <div class="card-body p-2">
                         <h6 class="card-title small mb-1">${item.title}</h6>
                         <p class="card-text small text-muted mb-0">${item.theme}</p>
@@ -115,11 +117,16 @@ async function handleGenerate(e) {
 
         const data = await response.json();
 
-        if (data.success) {
+        if (data.success && data.status === 'success') {
+            // 命中缓存，直接显示结果
+            hideStatus();
+            showImageResult(data.output_path, title, theme);
+            setTimeout(loadHistory, 1000);
+        } else if (data.success) {
             currentTaskId = data.task_id;
             showStatus(data.message);
-            // 开始轮询任务状态
-            startStatusPolling();
+            // 订阅任务进度（浏览器不支持 SSE 时退回轮询）
+            startProgressStream();
         } else {
             showError(data.error || '提交任务失败');
         }
@@ -167,6 +174,95 @@ async function handlePreview() {
     }
 }
 
+// 订阅任务进度推送，只在状态变化时收到事件
+function startProgressStream() {
+    if (!window.EventSource) {
+        startStatusPolling();
+        return;
+    }
+
+    stopProgressStream();
+    const taskId = currentTaskId;
+    progressSource = new EventSource(`/api/progress/${taskId}`);
+
+    progressSource.addEventListener('progress', (event) => {
+        const data = JSON.parse(event.data);
+        if (data.stage === 'success') {
+            stopProgressStream();
+            hideStatus();
+            showImageResult(data.output_path,
+                         document.getElementById('title').value,
+                         document.getElementById('theme').value);
+            // 刷新历史记录
+            setTimeout(loadHistory, 1000);
+        } else if (data.stage === 'fail') {
+            stopProgressStream();
+            hideStatus();
+            showError(data.error || '生成失败');
+        } else {
+            showStatus(data.message || '正在生成中...');
+            updateProgress(data);
+        }
+    });
+
+    // 任务进度已过期，改为查询任务状态
+    progressSource.addEventListener('expired', () => {
+        stopProgressStream();
+        startStatusPolling();
+    });
+
+    progressSource.onerror = () => {
+        // 连接被拒绝（例如旧版服务端没有该接口）时退回轮询；网络中断时浏览器会自动重连
+        if (progressSource && progressSource.readyState === EventSource.CLOSED) {
+            stopProgressStream();
+            startStatusPolling();
+        }
+    };
+}
+
+// 关闭进度推送
+function stopProgressStream() {
+    if (progressSource) {
+        progressSource.close();
+        progressSource = null;
+    }
+    if (progressTimer) {
+        clearInterval(progressTimer);
+        progressTimer = null;
+    }
+}
+
+// 更新进度条：服务端只在状态变化时推送，两次推送之间按历史耗时在本地推算
+function updateProgress(data) {
+    const progressBar = document.getElementById('progressBar');
+    if (!progressBar) return;
+
+    if (progressTimer) {
+        clearInterval(progressTimer);
+        progressTimer = null;
+    }
+
+    if (data.progress === null || data.progress === undefined) {
+        progressBar.style.width = '100%';
+        return;
+    }
+
+    const receivedAt = Date.now();
+    const render = () => {
+        let percent = data.progress;
+        if (data.expected_seconds && data.stage !== 'downloading') {
+            const elapsed = (data.elapsed || 0) + (Date.now() - receivedAt) / 1000;
+            percent = Math.max(percent, Math.min(elapsed / data.expected_seconds, 0.95) * 90);
+        }
+        progressBar.style.width = `${Math.max(percent, 5)}%`;
+        progressBar.textContent = `${Math.round(percent)}%`;
+    };
+    render();
+    if (data.expected_seconds && data.stage !== 'downloading') {
+        progressTimer = setInterval(render, 1000);
+    }
+}
+
 // 开始轮询任务状态
 function startStatusPolling() {
     statusCheckInterval = setInterval(async () => {
@@ -209,7 +305,8 @@ function showImageResult(imagePath, title, theme) {
     const resultTitle = document.getElementById('resultTitle');
     const resultTheme = document.getElementById('resultTheme');
 
-    resultImage.src = `/outputs/${imagePath}`;
+    // 页面上显示预览图，下载时使用原图
+    resultImage.src = `/outputs/${imagePath}?size=preview`;
     resultTitle.textContent = title;
     resultTheme.textContent = `主题：${theme}`;
 